@@ -1,5 +1,6 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
 
+from _cnu.hybrid_serverless_db.db_concurrency import Snapshot, Transaction
 from _cnu.hybrid_serverless_db.db_core import DocumentDatabase
 from _cnu.hybrid_serverless_db.db_registry import DatabaseRegistry
 
@@ -9,7 +10,7 @@ class DatabaseAPI:
     DatabaseAPI class to handle the database API.
     """
 
-    def __init__(self, db_file: str, registry_file: str):
+    def __init__(self, db_file: str, registry_file: str, multi_process: bool = False):
         """
         Initializes the DatabaseAPI, DocumentDatabase, and DatabaseRegistry.
 
@@ -17,37 +18,49 @@ class DatabaseAPI:
         will load the data and registry from their respective files.
         Initializes the DatabaseAPI.
 
+        The API may be called from several threads. To serve it from several
+        worker processes, open it in each with multi_process=True.
+
         Args:
-            data_db: An instance of the DocumentDatabase class.
-            registry: An instance of the DatabaseRegistry class.
+            db_file: The path to the database file.
+            registry_file: The path to the registry file.
+            multi_process: Whether other processes may open the same files at the same time.
         """
-        self.data_db = data_db
-        self.registry = DatabaseRegistry(registry_file)
-        self.data_db = DocumentDatabase(db_file)
+        self.registry = DatabaseRegistry(registry_file, multi_process=multi_process)
+        self.data_db = DocumentDatabase(db_file, multi_process=multi_process)
     
     def save_db(self) -> None:
+        """
+        Compacts the database's write-ahead log into its snapshot and saves the registry.
+        """
         self.data_db.save_data()
         self.registry.save_registry()
 
-    def add_index(self, index_name: str, field: str, index_type: str = "hash") -> None:
+    def close(self) -> None:
+        """
+        Syncs and closes the database's write-ahead log.
+        """
+        self.data_db.close()
+
+    def add_index(self, name: str, field: Union[str, List[str]], index_type: str = "hash",
+                  description: str = "") -> None:
         """
         Adds an index.
 
         Args:
-            index_name: The name of the index.
-            field: The field to index.
-            index_type: The type of index to create.
+            name: The name of the index.
+            field: The field to index, or a list of fields for a compound index.
+            index_type: "hash" for equality lookups, or "sorted" / "b-tree" for
+                range, prefix and ordered queries as well.
+            description: A description of the index.
 
         Raises:
             ValueError: If the index type is invalid or the index already exists.
         """
-        if index_type not in ["hash"]:
-            raise ValueError(f"Invalid index type: {index_type}")
-
-        if index_name in self.registry.indexes:
-            raise ValueError(f"Index '{index_name}' already exists")
-        self.data_db.create_index(field, index_type)
-        self.registry.add_index_info(index_name, field, index_type)
+        if name in self.registry.indexes:
+            raise ValueError(f"Index '{name}' already exists")
+        self.data_db.create_index(field, index_type, name=name)
+        self.registry.add_index_info(name, field, index_type, description)
 
     def get_index(self, index_name: str) -> Dict[str, Any]:
         """
@@ -80,7 +93,7 @@ class DatabaseAPI:
         index_info = self.registry.get_index_info(index_name)
         if not index_info:
             raise ValueError(f"Index '{index_name}' not found")
-        self.data_db.delete_index(index_info["field"])
+        self.data_db.delete_index(index_name)
         self.registry.delete_index_info(index_name)
 
     def add_data(self, data: Dict[str, Any]) -> None:
@@ -145,13 +158,15 @@ class DatabaseAPI:
             raise ValueError("Invalid data_id for get")
         return self.data_db.get_data(data_id)
 
-    def query(self, index_name: str, query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def query(self, index_name: str, query_value: Any,
+              query: Optional[Union[Callable[[Dict[str, Any]], bool], Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
         """
-        Queries data using an index and optional query.
+        Queries data using an index and optional filter.
 
         Args:
             index_name: The name of the index to use.
-            query: The query to use.
+            query_value: The value to look up; a list of values for compound indexes.
+            query: An optional filter function or filter dictionary.
 
         Returns:
             A list of data matching the query.
@@ -159,12 +174,115 @@ class DatabaseAPI:
         Raises:
             ValueError: If the index is not found.
         """
-        index_info = self.registry.get_index_info(index_name)
-        if not index_info:
-            raise ValueError(f"Index '{index_name}' not found")
-        
-        return self.data_db.query(index_info["field"], query)
+        self.get_index(index_name)
+        return self.data_db.query(index_name, query_value, query)
+
+    def query_range(self, index_name: str, low: Any = None, high: Any = None, include_low: bool = True,
+                    include_high: bool = True, reverse: bool = False, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Queries data whose indexed value lies between low and high, using a sorted index.
+
+        Args:
+            index_name: The name of the sorted index to use.
+            low: The lower bound, or None for no lower bound.
+            high: The upper bound, or None for no upper bound.
+            include_low: Whether values equal to low match.
+            include_high: Whether values equal to high match.
+            reverse: Whether to return the highest values first.
+            limit: The maximum number of documents to return.
+
+        Returns:
+            A list of data in order of the indexed value.
+
+        Raises:
+            ValueError: If the index is not found or is not a sorted index.
+        """
+        self.get_index(index_name)
+        return self.data_db.query_range(index_name, low, high, include_low, include_high, reverse, limit)
+
+    def query_prefix(self, index_name: str, prefix: Any, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Queries data whose indexed value starts with prefix, using a sorted index.
+
+        Args:
+            index_name: The name of the sorted index to use.
+            prefix: A string prefix, or a list of leading values for a compound index.
+            limit: The maximum number of documents to return.
+
+        Returns:
+            A list of data in order of the indexed value.
+
+        Raises:
+            ValueError: If the index is not found or is not a sorted index.
+        """
+        self.get_index(index_name)
+        return self.data_db.query_prefix(index_name, prefix, limit)
     
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None,
+             sort: Optional[Union[str, List[Any]]] = None, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Finds data matching a declarative filter, using indexes where possible.
+
+        Args:
+            filter: The filter, e.g. {"type": "event", "timestamp": {"$gte": 100}};
+                None matches all data. Supports $eq, $ne, $gt, $gte, $lt, $lte,
+                $in, $nin, $exists, $prefix, $and, $or and $not.
+            projection: The fields to return; None returns whole documents.
+            sort: A field, or a list of fields and [field, direction] pairs.
+            limit: The maximum number of documents to return.
+
+        Returns:
+            An iterator over the matching data, produced lazily.
+
+        Raises:
+            ValueError: If the filter, sort or limit is malformed.
+        """
+        return self.data_db.find(filter, projection, sort, limit)
+
+    def explain(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None,
+                sort: Optional[Union[str, List[Any]]] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Describes the plan find() would use for a query.
+
+        Args:
+            filter: The filter.
+            projection: The fields to return.
+            sort: The sort specification.
+            limit: The maximum number of documents to return.
+
+        Returns:
+            A dictionary of plan stages, each with the stage feeding it as "input".
+
+        Raises:
+            ValueError: If the filter, sort or limit is malformed.
+        """
+        return self.data_db.explain(filter, projection, sort, limit)
+
+    def transaction(self) -> Transaction:
+        """
+        Opens a transaction: writes made through it are committed atomically.
+
+        Use it as a context manager; it commits when the block ends and rolls
+        back if the block raises:
+
+            with api.transaction() as txn:
+                txn.update_data("a", {...})
+                txn.delete_data("b")
+
+        Returns:
+            The transaction.
+        """
+        return self.data_db.transaction()
+
+    def snapshot(self) -> Snapshot:
+        """
+        Opens a consistent, read-only view of the data as it is now.
+
+        Returns:
+            The snapshot, with get_data() and find(); close it when done, or use it as a context manager.
+        """
+        return self.data_db.snapshot()
+
     def get_indexes(self) -> Dict[str, Any]:
         """
         Gets all index information from the registry.
@@ -0,0 +1,232 @@
+"""
+Benchmarks for the hybrid serverless database.
+
+Run from the repository root, for example:
+
+    python -m _cnu.hybrid_serverless_db.db_benchmark insert --count 1000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from _cnu.hybrid_serverless_db.db_core import DocumentDatabase
+from _cnu.hybrid_serverless_db.db_query import compile_filter, compile_predicate, normalize_sort, sort_documents
+from _cnu.hybrid_serverless_db.db_storage import OP_PUT, LogStorage
+
+TYPES = ["event", "log", "record"]
+CATEGORIES = ["system", "user", "network"]
+
+
+def make_doc(i):
+    """
+    Builds a sample document like the ones init_db creates.
+
+    Args:
+        i (int): The document number.
+
+    Returns:
+        dict: The document.
+    """
+    return {
+        "id": f"doc-{i:08d}",
+        "timestamp": 1700000000 + i,
+        "type": TYPES[i % len(TYPES)],
+        "category": CATEGORIES[(i // 3) % len(CATEGORIES)],
+        "value": i * 0.5,
+    }
+
+
+def benchmark_insert(count, legacy_max, batch_size, group_threads):
+    """
+    Times inserting count documents with the write-ahead log against rewriting the whole file per write.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        # Rewriting the whole JSON file per insert, as save_data used to, is O(n^2)
+        legacy_count = min(count, legacy_max)
+        data = {}
+        path = os.path.join(directory, "legacy.json")
+        start = time.perf_counter()
+        for i in range(legacy_count):
+            doc = make_doc(i)
+            data[doc["id"]] = doc
+            with open(path, "w") as f:
+                json.dump(data, f, indent=4)
+        legacy = time.perf_counter() - start
+        print(f"{'rewrite per insert':<28} {legacy_count:>9} docs {legacy:>9.2f} s "
+              f"{legacy_count / legacy:>11.0f} docs/s")
+
+        for sync_mode in ("interval", "none"):
+            db_file = os.path.join(directory, f"{sync_mode}.json")
+            db = DocumentDatabase(db_file, sync_mode=sync_mode)
+            start = time.perf_counter()
+            for i in range(count):
+                db.add_data(make_doc(i))
+            db.close()
+            elapsed = time.perf_counter() - start
+            print(f"{'log, sync=' + sync_mode:<28} {count:>9} docs {elapsed:>9.2f} s "
+                  f"{count / elapsed:>11.0f} docs/s")
+
+        db_file = os.path.join(directory, "batch.json")
+        db = DocumentDatabase(db_file, sync_mode="group")
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            db.add_data_batch([make_doc(i) for i in range(offset, min(count, offset + batch_size))])
+        db.close()
+        elapsed = time.perf_counter() - start
+        print(f"{'log, sync=group, batch=' + str(batch_size):<28} {count:>9} docs {elapsed:>9.2f} s "
+              f"{count / elapsed:>11.0f} docs/s")
+
+        # Group commit: concurrent committers share fsyncs
+        group_count = min(count, 20000)
+        storage = LogStorage(os.path.join(directory, "group.json"), sync_mode="group")
+        storage.recover()
+
+        def writer(thread_index):
+            for i in range(thread_index, group_count, group_threads):
+                doc = make_doc(i)
+                storage.commit([[OP_PUT, doc["id"], doc]])
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=writer, args=(t,)) for t in range(group_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        fsyncs = storage.fsyncs
+        storage.close()
+        print(f"{'log, sync=group, ' + str(group_threads) + ' threads':<28} {group_count:>9} docs {elapsed:>9.2f} s "
+              f"{group_count / elapsed:>11.0f} docs/s {fsyncs:>7} fsyncs")
+
+        start = time.perf_counter()
+        db = DocumentDatabase(os.path.join(directory, "none.json"))
+        elapsed = time.perf_counter() - start
+        print(f"{'recovery (snapshot + log)':<28} {len(db.data):>9} docs {elapsed:>9.2f} s")
+        db.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def benchmark_query(count, repeats):
+    """
+    Times declarative queries planned over indexes against filtering every document.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        db = DocumentDatabase(os.path.join(directory, "query.json"), sync_mode="none")
+        db.add_data_batch([make_doc(i) for i in range(count)])
+        db.create_index("type")
+        db.create_index("timestamp", "sorted")
+        db.create_index(["type", "category"], name="type_category")
+        middle = 1700000000 + count // 2
+        queries = {
+            "equality": ({"type": "event", "category": "user"}, None, None),
+            "range": ({"timestamp": {"$gte": middle, "$lt": middle + 1000}}, None, None),
+            "range and equality": ({"type": "log", "timestamp": {"$gte": middle, "$lt": middle + 1000}}, None, None),
+            "$or": ({"$or": [{"type": "log", "category": "system"},
+                             {"timestamp": {"$lt": 1700000000 + 100}}]}, None, None),
+            "top 10 by time": ({"type": "record"}, [["timestamp", -1]], 10),
+        }
+        for label, (spec, sort, limit) in queries.items():
+            planned = min(_time(lambda: list(db.find(spec, sort=sort, limit=limit))) for _ in range(repeats))
+            plan = db.explain(spec, sort=sort, limit=limit)
+            test = compile_predicate(compile_filter(spec))
+            scan = lambda: sort_documents((doc for doc in db.data.values() if test(doc)), normalize_sort(sort), limit)
+            scanned = min(_time(scan) for _ in range(repeats))
+            print(f"{label:<20} planned {planned * 1000:>9.2f} ms   full scan {scanned * 1000:>9.2f} ms   "
+                  f"{_stages(plan)}")
+        db.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def benchmark_open(count, reads):
+    """
+    Times opening a database and reading random documents, JSON snapshot against segment.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        for storage_format in ("json", "segment"):
+            db_file = os.path.join(directory, f"open.{storage_format}")
+            db = DocumentDatabase(db_file, sync_mode="none", storage_format=storage_format)
+            db.add_data_batch([make_doc(i) for i in range(count)])
+            db.save_data()
+            db.close()
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            db = DocumentDatabase(db_file, storage_format=storage_format)
+            opened = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            rng = random.Random(0)
+            ids = [make_doc(rng.randrange(count))["id"] for _ in range(reads)]
+            start = time.perf_counter()
+            for doc_id in ids:
+                db.get_data(doc_id)
+            read = (time.perf_counter() - start) / reads
+            db.close()
+            print(f"{storage_format:<8} {count:>9} docs {os.path.getsize(db_file) / 2 ** 20:>8.1f} MiB on disk  "
+                  f"open {opened:>8.3f} s  {memory / 2 ** 20:>8.1f} MiB allocated  "
+                  f"get_data {read * 1e6:>6.1f} us")
+    finally:
+        shutil.rmtree(directory)
+
+
+def _time(function):
+    """Returns how long function() takes, in seconds."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def _stages(plan):
+    """Summarizes an explain() plan as its stage names, outermost first."""
+    stages = []
+    while plan:
+        stages.append(plan["stage"])
+        plan = plan.get("input")
+    return " > ".join(stages)
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Hybrid serverless database benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    insert_parser = subparsers.add_parser("insert", help="Single-document inserts, log vs full rewrite")
+    insert_parser.add_argument("--count", type=int, default=1000000)
+    insert_parser.add_argument("--legacy-max", type=int, default=2000,
+                               help="Largest count to run the rewrite-per-insert strategy on")
+    insert_parser.add_argument("--batch-size", type=int, default=1000)
+    insert_parser.add_argument("--threads", type=int, default=8,
+                               help="Writer threads for the group commit run")
+
+    query_parser = subparsers.add_parser("query", help="Planned queries vs filtering every document")
+    query_parser.add_argument("--count", type=int, default=100000)
+    query_parser.add_argument("--repeats", type=int, default=5)
+
+    open_parser = subparsers.add_parser("open", help="Startup time, memory and reads, JSON vs segment")
+    open_parser.add_argument("--count", type=int, default=1000000)
+    open_parser.add_argument("--reads", type=int, default=100000)
+
+    args = parser.parse_args()
+
+    if args.benchmark == "insert":
+        benchmark_insert(args.count, args.legacy_max, args.batch_size, args.threads)
+    elif args.benchmark == "query":
+        benchmark_query(args.count, args.repeats)
+    elif args.benchmark == "open":
+        benchmark_open(args.count, args.reads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,652 @@
+"""
+Concurrency control for the hybrid serverless database.
+
+* ReadWriteLock guards a DocumentDatabase's in-memory documents and indexes
+  within a process. Queries share it while they read the indexes; a commit
+  holds it alone only while applying its operations in memory, never while
+  writing or syncing the log.
+* FileLock serializes writers across processes that share a database.
+* VersionHistory and Snapshot give multi-version reads: while a snapshot is
+  open, writers keep the version of every document they replace, so the
+  snapshot reads the documents as they were when it was opened without
+  ever waiting for a writer.
+* Transaction groups writes into one atomic commit.
+"""
+import os
+import threading
+from collections.abc import Mapping
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from _cnu.hybrid_serverless_db.db_storage import OP_DELETE, OP_PUT, document_id
+
+MISSING = object()  # The version of a document that did not exist
+_DELETED = object()
+
+PRUNE_MIN_ENTRIES = 1024
+
+
+class ReadWriteLock:
+    """
+    A lock held by any number of readers at once, or by one writer.
+
+    Writers take precedence: once one is waiting, new readers wait too, so a
+    steady stream of readers cannot starve it. A thread may take the read
+    lock again while it holds it, and the writer may take either lock again.
+    Upgrading a read lock to the write lock is not allowed.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._sleepers = 0
+        self._local = threading.local()
+        self._read_guard = _Guard(self.acquire_read, self.release_read)
+        self._write_guard = _Guard(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        """Takes the lock for reading, waiting while a writer holds it or is waiting for it."""
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        if depth or self._writer == threading.get_ident():
+            local.depth = depth + 1
+            return
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._wait()
+            self._readers += 1
+        local.depth = 1
+
+    def release_read(self):
+        """Releases a read lock taken by this thread."""
+        local = self._local
+        local.depth -= 1
+        if local.depth or self._writer == threading.get_ident():
+            return
+        with self._condition:
+            self._readers -= 1
+            if not self._readers and self._sleepers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """
+        Takes the lock for writing, waiting until no other thread holds it.
+
+        Raises:
+            RuntimeError: If this thread holds the read lock.
+        """
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            return
+        if getattr(self._local, "depth", 0):
+            raise RuntimeError("Cannot take the write lock while holding the read lock")
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        """Releases the write lock held by this thread."""
+        self._write_depth -= 1
+        if self._write_depth:
+            return
+        with self._condition:
+            self._writer = None
+            if self._sleepers:
+                self._condition.notify_all()
+
+    def _wait(self):
+        """Waits on the condition, counted so releases only notify when a thread is waiting."""
+        self._sleepers += 1
+        try:
+            self._condition.wait()
+        finally:
+            self._sleepers -= 1
+
+    def read(self):
+        """
+        Holds the lock for reading for the duration of a with block.
+
+        Returns:
+            A context manager.
+        """
+        return self._read_guard
+
+    def write(self):
+        """
+        Holds the lock for writing for the duration of a with block.
+
+        Returns:
+            A context manager.
+        """
+        return self._write_guard
+
+
+class _Guard:
+    """A reusable context manager calling acquire and release functions (cheaper than @contextmanager)."""
+
+    __slots__ = ("_acquire", "_release")
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._release()
+
+
+class FileLock:
+    """
+    An exclusive lock shared between processes, held on a lock file.
+
+    Uses flock() on POSIX and msvcrt.locking() on Windows. Within a process
+    it also excludes other threads, and the holding thread may take it again.
+
+    Attributes:
+        path (str): The lock file.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the lock; the lock file is created on first use.
+
+        Args:
+            path (str): The lock file.
+        """
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        """Takes the lock, waiting for any other process or thread holding it."""
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                _lock_file(self._fd)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        """Releases the lock."""
+        self._depth -= 1
+        if self._depth == 0:
+            _unlock_file(self._fd)
+        self._thread_lock.release()
+
+    def close(self):
+        """Closes the lock file; the lock must not be held."""
+        with self._thread_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _lock_file(fd):
+    """Locks an open file exclusively, waiting as long as it takes."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:  # LK_LOCK gives up after ten seconds
+            continue
+
+
+def _unlock_file(fd):
+    """Unlocks a file locked by _lock_file."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class VersionHistory:
+    """
+    The replaced versions of documents, kept while snapshots need them.
+
+    Every commit applied to the database advances the version by one.
+    While any snapshot is open, the commit first records, for each
+    document it writes, the document's previous version tagged with the
+    commit's version. The version of a document as of snapshot version s
+    is then the previous version recorded by the first commit after s, or
+    the current document if none has changed it.
+
+    open() must be called with the database's read lock held, and record()
+    and advance() with its write lock held.
+
+    Attributes:
+        version (int): The number of commits applied.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._entries = {}  # Document ID -> [(commit version, previous document or MISSING), ...]
+        self._open = {}     # Snapshot version -> number of snapshots open at it
+        self._open_lock = threading.Lock()
+        self._recorded = 0  # Entries recorded since the last prune
+        self._prune_at = PRUNE_MIN_ENTRIES
+
+    def open(self):
+        """
+        Registers a snapshot at the current version.
+
+        Returns:
+            tuple: The version and the entries the snapshot reads.
+        """
+        with self._open_lock:
+            self._open[self.version] = self._open.get(self.version, 0) + 1
+        return self.version, self._entries
+
+    def close(self, version):
+        """
+        Unregisters a snapshot.
+
+        Args:
+            version (int): The version open() returned.
+        """
+        with self._open_lock:
+            count = self._open.pop(version) - 1
+            if count:
+                self._open[version] = count
+
+    def record(self, data, ops):
+        """
+        Records the versions a commit is about to replace, if a snapshot is open.
+
+        Args:
+            data (Mapping): The documents before the commit.
+            ops (list): The commit's operations.
+        """
+        if not self._open:
+            if self._entries:
+                self._entries = {}
+                self._recorded = 0
+            return
+        version = self.version + 1
+        entries = self._entries
+        for op in ops:
+            doc_id = op[1]
+            versions = entries.get(doc_id)
+            if versions is None:
+                entries[doc_id] = [(version, data.get(doc_id, MISSING))]
+            elif versions[-1][0] != version:
+                versions.append((version, data.get(doc_id, MISSING)))
+            else:
+                continue
+            self._recorded += 1
+
+    def advance(self):
+        """Marks a commit as applied, pruning versions no open snapshot can read any more."""
+        self.version += 1
+        if self._recorded >= self._prune_at:
+            self._prune()
+
+    def _prune(self):
+        """Drops the versions recorded at or before the oldest open snapshot."""
+        with self._open_lock:
+            oldest = min(self._open, default=self.version)
+        entries = self._entries
+        kept = 0
+        for doc_id, versions in list(entries.items()):
+            if versions[-1][0] <= oldest:
+                del entries[doc_id]
+                continue
+            if versions[0][0] <= oldest:
+                # Replaced, not trimmed in place: snapshots may be reading the list
+                versions = entries[doc_id] = [entry for entry in versions if entry[0] > oldest]
+            kept += len(versions)
+        # Pruning again after as many entries as were kept keeps its cost amortized
+        self._recorded = 0
+        self._prune_at = max(PRUNE_MIN_ENTRIES, kept)
+
+    def reset(self):
+        """
+        Starts a new history, for when the documents were replaced by ones
+        read from disk (say, after another process compacted the log).
+
+        Snapshots already open keep the old history and documents.
+        """
+        self._entries = {}
+        self._recorded = 0
+
+    def changed_since(self, version, entries):
+        """
+        Lists the documents committed to since a snapshot was opened.
+
+        Args:
+            version (int): The snapshot's version.
+            entries (dict): The entries the snapshot reads.
+
+        Returns:
+            list: The document IDs, or None if the history was reset since.
+        """
+        if entries is not self._entries:
+            return None
+        return [doc_id for doc_id, versions in list(entries.items()) if versions[-1][0] > version]
+
+
+class Snapshot(Mapping):
+    """
+    A read-only view of a database's documents as they were when it was opened.
+
+    Reads never wait for writers, and writers never wait for snapshots.
+    Close a snapshot when done with it (or use it as a context manager):
+    while one is open, writers keep the versions it may need.
+
+    Attributes:
+        version (int): The number of commits applied when the snapshot was opened.
+    """
+
+    def __init__(self, db, data, history):
+        """
+        Opens a snapshot. Use DocumentDatabase.snapshot() rather than calling this directly.
+
+        Args:
+            db (DocumentDatabase): The database; its read lock must be held.
+            data (Mapping): The database's documents.
+            history (VersionHistory): The database's version history.
+        """
+        self.db = db
+        self._data = data
+        self._history = history
+        self.version, self._entries = history.open()
+        self._length = len(data)
+        self._closed = False
+
+    def get(self, doc_id, default=None):
+        # The document is read before its history: a writer records the
+        # version it replaces before replacing it
+        doc = self._data.get(doc_id, MISSING)
+        versions = self._entries.get(doc_id)
+        if versions:
+            for version, previous in versions:
+                if version > self.version:
+                    doc = previous
+                    break
+        return default if doc is MISSING else doc
+
+    def __getitem__(self, doc_id):
+        doc = self.get(doc_id, MISSING)
+        if doc is MISSING:
+            raise KeyError(doc_id)
+        return doc
+
+    def __contains__(self, doc_id):
+        return self.get(doc_id, MISSING) is not MISSING
+
+    def __iter__(self):
+        # Listing the documents is not atomic (a segment store scans its
+        # file, then its overlay), so a commit must not land in between
+        with self.reading():
+            keys = list(self._data)
+            changed = list(self._entries)
+        for doc_id in keys:
+            if doc_id in self:
+                yield doc_id
+        if changed:
+            # Documents deleted since the snapshot are only in the history
+            current = set(keys)
+            for doc_id in changed:
+                if doc_id not in current and doc_id in self:
+                    yield doc_id
+
+    def __len__(self):
+        return self._length
+
+    def get_data(self, doc_id):
+        """
+        Gets a document as it was when the snapshot was opened.
+
+        Args:
+            doc_id (str or int): The document's ID.
+
+        Returns:
+            dict: The document.
+
+        Raises:
+            ValueError: If the document did not exist.
+        """
+        doc = self.get(document_id(doc_id), MISSING)
+        if doc is MISSING:
+            raise ValueError(f"Document ID '{doc_id}' not found")
+        return doc
+
+    def find(self, filter=None, projection=None, sort=None, limit=None):
+        """
+        Finds documents matching a declarative filter as of the snapshot.
+
+        Takes the same arguments as DocumentDatabase.find().
+
+        Returns:
+            iterator: The matching documents.
+        """
+        return self.db.find(filter, projection, sort, limit, snapshot=self)
+
+    def reading(self):
+        """
+        Holds the database's read lock, for reading its indexes consistently.
+
+        Returns:
+            A context manager.
+        """
+        return self.db.lock.read()
+
+    def changed_ids(self):
+        """
+        Lists the documents committed to since the snapshot was opened.
+
+        Call with the database's read lock held, so the list matches the
+        indexes.
+
+        Returns:
+            list: The document IDs, or None if the database's documents were
+            reloaded from disk since, so the indexes no longer describe them.
+        """
+        return self._history.changed_since(self.version, self._entries)
+
+    def close(self):
+        """Releases the snapshot. Closing it twice does nothing."""
+        if not self._closed:
+            self._closed = True
+            self._history.close(self.version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Transaction:
+    """
+    A group of writes committed atomically: they are all applied and
+    recovered together, or not at all.
+
+    A transaction holds the database's writer lock (and, for a database
+    shared between processes, its file lock) from the moment it is opened
+    until it is committed or rolled back, so transactions are serializable.
+    Readers are not blocked. Reads through the transaction see its own
+    writes.
+
+    Used as a context manager, a transaction commits when the block ends
+    and rolls back if it raises.
+    """
+
+    def __init__(self, db):
+        """
+        Opens a transaction. Use DocumentDatabase.transaction() rather than calling this directly.
+
+        Args:
+            db (DocumentDatabase): The database; its writer lock must be held.
+        """
+        self.db = db
+        self._writes = {}  # Document ID -> new document, or _DELETED
+        self._active = True
+
+    def _check_active(self):
+        if not self._active:
+            raise RuntimeError("The transaction has already been committed or rolled back")
+
+    def _exists(self, doc_id):
+        write = self._writes.get(doc_id, MISSING)
+        if write is MISSING:
+            return doc_id in self.db.data
+        return write is not _DELETED
+
+    def get_data(self, doc_id):
+        """
+        Gets a document, including the transaction's uncommitted writes.
+
+        Args:
+            doc_id (str or int): The document's ID.
+
+        Returns:
+            dict: The document.
+
+        Raises:
+            ValueError: If the document does not exist.
+        """
+        self._check_active()
+        doc_id = document_id(doc_id)
+        write = self._writes.get(doc_id, MISSING)
+        if write is MISSING:
+            return self.db.get_data(doc_id)
+        if write is _DELETED:
+            raise ValueError(f"Document ID '{doc_id}' not found")
+        return write
+
+    def add_data(self, doc):
+        """
+        Adds a new document.
+
+        Args:
+            doc (dict): The document; its "id" field is its document ID, a
+                string or an integer (stored as its decimal string).
+
+        Raises:
+            ValueError: If the document has no valid ID or its ID already exists.
+        """
+        self.add_data_batch([doc])
+
+    def add_data_batch(self, docs):
+        """
+        Adds several documents; if any is invalid, none is added.
+
+        Args:
+            docs (list): The documents; each one's "id" field is its document ID.
+
+        Raises:
+            ValueError: If a document has no ID, its ID is not a string or an
+                integer, or its ID already exists.
+        """
+        self._check_active()
+        batch = {}
+        for doc in docs:
+            doc_id = doc.get("id")
+            if doc_id is None:
+                raise ValueError("Document has no 'id' field")
+            doc_id = document_id(doc_id)
+            if doc_id in batch or self._exists(doc_id):
+                raise ValueError(f"Document ID '{doc_id}' already exists")
+            batch[doc_id] = doc
+        self._writes.update(batch)
+
+    def update_data(self, doc_id, doc):
+        """
+        Replaces a document.
+
+        Args:
+            doc_id (str or int): The document's ID.
+            doc (dict): The new document.
+
+        Raises:
+            ValueError: If the document does not exist.
+        """
+        self._check_active()
+        doc_id = document_id(doc_id)
+        if not self._exists(doc_id):
+            raise ValueError(f"Document ID '{doc_id}' not found")
+        self._writes[doc_id] = doc
+
+    def delete_data(self, doc_id):
+        """
+        Deletes a document.
+
+        Args:
+            doc_id (str or int): The document's ID.
+
+        Raises:
+            ValueError: If the document does not exist.
+        """
+        self._check_active()
+        doc_id = document_id(doc_id)
+        if not self._exists(doc_id):
+            raise ValueError(f"Document ID '{doc_id}' not found")
+        self._writes[doc_id] = _DELETED
+
+    def commit(self):
+        """
+        Commits the transaction's writes as one log record and releases its locks.
+
+        Returns once the commit is as durable as the database's sync mode promises.
+        """
+        self._check_active()
+        self._active = False
+        ops = [[OP_DELETE, doc_id] if doc is _DELETED else [OP_PUT, doc_id, doc]
+               for doc_id, doc in self._writes.items()]
+        try:
+            lsn = self.db._commit(ops) if ops else None
+        finally:
+            self.db._end_transaction()
+        if lsn is not None:
+            self.db.storage.sync_commit(lsn)
+
+    def rollback(self):
+        """Discards the transaction's writes and releases its locks."""
+        self._check_active()
+        self._active = False
+        self._writes = {}
+        self.db._end_transaction()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._active:
+            return
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
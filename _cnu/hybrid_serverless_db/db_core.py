@@ -1,179 +1,508 @@
 import json
+import logging
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from urllib.parse import quote
+
+from _cnu.hybrid_serverless_db.db_concurrency import (FileLock, ReadWriteLock, Snapshot, Transaction,
+                                                      VersionHistory)
+from _cnu.hybrid_serverless_db.db_index import create_index, index_from_dict
+from _cnu.hybrid_serverless_db.db_query import compile_filter, compile_predicate, plan_query
+from _cnu.hybrid_serverless_db.db_segment import SegmentStore
+from _cnu.hybrid_serverless_db.db_storage import LogStorage, apply_commit, document_id, write_json_atomic
+
+logger = logging.getLogger("hybrid_serverless_db")
 
 
 class DocumentDatabase:
     """
     A simple document database that stores data in a JSON file.
 
+    The JSON file holds a snapshot of the documents; writes are appended to
+    a write-ahead log next to it (see db_storage.LogStorage) and folded into
+    the snapshot when the log grows large.
+
+    With storage_format="segment" the snapshot is a segment file instead
+    (see db_segment): data is then a SegmentStore that memory-maps it and
+    decodes documents on demand, so opening the database does not depend
+    on its size and memory holds only recently used and changed documents.
+
+    Index definitions are kept in ``<db_file>.indexes.json`` and each
+    index's entries in ``<db_file>.index.<name>.json``, written whenever the
+    log is compacted. An index is loaded on first use: its file is read if
+    it was written for the current snapshot, and only the documents changed
+    since then are re-indexed; otherwise it is rebuilt from the data.
+
+    The database may be shared between threads (see db_concurrency). Writes
+    run as transactions, one at a time; each commits as one log record.
+    Reads do not wait for transactions: find() and snapshot() read the
+    documents as of one moment however long they take, and only the brief
+    in-memory application of a commit excludes readers of the indexes.
+
+    With multi_process=True, several processes may open the same database:
+    a transaction takes the file lock ``<db_file>.lock`` and first applies
+    the commits other processes have logged, and reads apply them too. An
+    index created in another process is seen once either process compacts
+    the log.
+
     Attributes:
-        data (dict): The in-memory representation of the database.
+        data (dict or SegmentStore): The documents by ID.
         db_file (str): The path to the JSON file where data is stored.
-        indexes (dict): A dictionary to store indexes.
+        indexes (dict): The loaded indexes by name (see db_index).
+        index_definitions (dict): The fields and type of every index by name.
+        storage (LogStorage): The snapshot and write-ahead log.
+        lock (ReadWriteLock): Guards the in-memory documents and indexes.
+        history (VersionHistory): The versions of documents snapshots may still read.
     """
 
-    def __init__(self, db_file="database.json"):
+    def __init__(self, db_file="database.json", sync_mode="interval", sync_interval=0.05,
+                 storage_format="json", cache_size=10000, multi_process=False):
         """
         Initializes the DocumentDatabase.
 
         Args:
             db_file (str): The path to the JSON file for data storage.
+            sync_mode (str): When commits are fsynced: "group", "interval" or "none".
+            sync_interval (float): Seconds between fsyncs in "interval" mode.
+            storage_format (str): The snapshot format to write, "json" or "segment".
+                An existing snapshot is read in whichever format it has.
+            cache_size (int): Decoded documents to keep cached with the segment format.
+            multi_process (bool): Whether other processes may open the database at the same time.
         """
         self.db_file = db_file
         self.data = {}
-        self.indexes = {}    
-        self.load_data()
-        self.save_data(self.db_file)
-
-    def load_data(self, db_file):
+        self.indexes = {}
+        self.index_definitions = {}
+        self.index_file = db_file + ".indexes.json"
+        self._changed_ids = set()  # Documents changed since the snapshot
+        self.storage = LogStorage(db_file, sync_mode=sync_mode, sync_interval=sync_interval,
+                                  snapshot_format=storage_format, cache_size=cache_size)
+        self.lock = ReadWriteLock()
+        self.history = VersionHistory()
+        self._writer_lock = threading.RLock()  # Held by the open transaction
+        self._refresh_lock = threading.Lock()  # Held while applying other processes' commits
+        self._index_lock = threading.Lock()    # Held while loading an index
+        self._local = threading.local()
+        self._file_lock = FileLock(db_file + ".lock") if multi_process else None
+        with self._writer_lock, self._file_lock or nullcontext():
+            self.load_data()
+            if not os.path.exists(self.db_file):
+                self._save_data()
+
+    def load_data(self, db_file=None):
         """
-        Loads data from the JSON file into memory.
-        If the file doesn't exist, initializes an empty database.
-        
+        Loads data from the snapshot (into memory for JSON, memory-mapped for
+        a segment) and write-ahead log, and the index definitions. Indexes themselves are loaded on first use.
+        If the files don't exist, initializes an empty database.
+
         Args:
+            db_file (str, optional): Unused; the database's own file is loaded.
 
+        Raises:
+            ValueError: If the snapshot or index definitions are not valid JSON.
         """
         try:
-            with open(self.db_file, "r") as f:
-                    self.data = json.load(f)
-        except json.JSONDecodeError as e:
-            self.data = {}
-            raise ValueError(f"Error decoding JSON from {db_file}: {e}")
+            data = self.storage.recover()
+        except ValueError:
+            with self.lock.write():
+                self.data = {}
+                self.history.reset()
+            raise
         except Exception as e:
             raise RuntimeError(f"An error occurred while loading data: {e}")
+        index_definitions = self._read_index_definitions()
+        with self.lock.write():
+            self.data = data
+            self.history.reset()
+            self._changed_ids = set(self.storage.replayed_ids)
+            self.indexes = {}
+            self.index_definitions = index_definitions
+
+    def _read_index_definitions(self):
+        """Reads the index definitions file, if there is one."""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error decoding JSON from {self.index_file}: {e}")
 
-    def save_data(self, db_file):
+    def save_data(self, db_file=None):
         """
-        Saves the current in-memory data to the JSON file.
+        Writes the in-memory data as a new snapshot, empties the write-ahead
+        log and persists every index for the new snapshot.
+
+        Individual writes are already durable through the log; this only
+        compacts it.
 
+        Args:
+            db_file (str, optional): Unused; the database's own file is written.
         """
         try:
-            with open(self.db_file, "w") as f:
-                json.dump(self.data, f, indent=4)
+            with self._writing():
+                self._save_data()
         except Exception as e:
             raise RuntimeError(f"An error occurred while saving data: {e}")
 
-    def create_index(self, field):
+    def _save_data(self):
+        """Compacts the log; the writer lock must be held."""
+        indexes = {name: self._load_index(name) for name in self.index_definitions}
+        # Writers are excluded, so readers may go on reading the old documents while they are written
+        data = self.storage.compact(self.data)
+        with self.lock.write():
+            self.data = data
+            self._changed_ids = set()
+        stamp = self.storage.stamp
+        for name, index in indexes.items():
+            write_json_atomic(self._index_path(name), {"snapshot": stamp, "index": index.to_dict()})
+
+    def close(self):
+        """
+        Syncs and closes the write-ahead log, and unmaps a segment snapshot.
         """
-        Creates an index on a specified field.
+        self.storage.close()
+        if isinstance(self.data, SegmentStore):
+            self.data.close()
+        if self._file_lock is not None:
+            self._file_lock.close()
 
-        Args:
-            field (str): The field to create an index on.
+    def transaction(self):
+        """
+        Opens a transaction, waiting for any other one to end.
+
+        Use it as a context manager; it commits when the block ends:
+
+            with db.transaction() as txn:
+                txn.update_data("a", {...})
+                txn.delete_data("b")
+
+        Returns:
+            Transaction: The transaction, holding the writer lock until it
+            is committed or rolled back.
 
         Raises:
-            ValueError: If the field is already indexed.
-            ValueError: if the field is not present in the data.
+            RuntimeError: If this thread already has a transaction open.
         """
-        if field in self.indexes:
-            raise ValueError(f"Index already exists for field: {field}")
-        
-        if not all(field in doc for doc in self.data.values()):
-            raise ValueError(f"Field '{field}' is not present in all documents.")
+        if getattr(self._local, "transaction", None) is not None:
+            raise RuntimeError("This thread already has a transaction open")
+        self._lock_writers()
+        self._local.transaction = transaction = Transaction(self)
+        return transaction
+
+    def _end_transaction(self):
+        """Releases the locks of the thread's open transaction."""
+        self._local.transaction = None
+        self._unlock_writers()
+
+    def _lock_writers(self):
+        """
+        Takes the writer lock and, when shared between processes, the file
+        lock, then applies the commits other processes have logged.
+        """
+        self._writer_lock.acquire()
+        if self._file_lock is None:
+            return
+        try:
+            self._file_lock.acquire()
+            try:
+                self._catch_up(truncate=True)
+            except BaseException:
+                self._file_lock.release()
+                raise
+        except BaseException:
+            self._writer_lock.release()
+            raise
+
+    def _unlock_writers(self):
+        """Releases the locks _lock_writers took."""
+        if self._file_lock is not None:
+            self._file_lock.release()
+        self._writer_lock.release()
+
+    @contextmanager
+    def _writing(self):
+        """Holds the writer locks for the duration of a with block, for writes outside a transaction."""
+        self._lock_writers()
+        try:
+            yield
+        finally:
+            self._unlock_writers()
+
+    def snapshot(self):
+        """
+        Opens a snapshot of the documents as they are now.
+
+        Returns:
+            Snapshot: The snapshot; close it, or use it as a context manager.
+        """
+        self.refresh()
+        with self.lock.read():
+            return Snapshot(self, self.data, self.history)
 
-        self.indexes[field] = {}
-        for doc_id, doc in self.data.items():
-            self.indexes[field].setdefault(doc[field], []).append(doc_id)
+    def refresh(self):
+        """
+        Applies the commits other processes have logged since this one last
+        looked. Reads and transactions do so themselves; this does nothing
+        unless the database was opened with multi_process=True.
+        """
+        if self._file_lock is not None:
+            self._catch_up(truncate=False)
 
-    def get_index(self, field):
+    def _catch_up(self, truncate):
+        """
+        Applies other processes' new commits, or reloads the database if one has compacted the log.
+
+        Args:
+            truncate (bool): Whether the file lock is held, so a torn record may be cut off the log.
         """
-        Retrieves an index for a given field.
+        with self._refresh_lock:
+            commits = self.storage.read_new(truncate)
+            if commits is not None:
+                for ops in commits:
+                    self._apply(ops)
+                return
+            if truncate:
+                self.load_data()
+                return
+        # Reloading truncates a torn log, which needs the file lock, taken
+        # before the refresh lock as writers take them
+        with self._file_lock, self._refresh_lock:
+            if self.storage.read_new(truncate=True) is None:
+                self.load_data()
+
+    def _commit(self, ops):
+        """
+        Logs a commit and applies it to the in-memory data and loaded
+        indexes, compacting the log when it has grown large enough.
+
+        The writer lock must be held. The commit is written to the log but
+        not necessarily synced; pass the returned sequence number to
+        storage.sync_commit() once the lock is released, so that concurrent
+        transactions can share an fsync.
 
         Args:
-            field (str): The field to get the index for.
+            ops (list): The commit's storage operations.
 
         Returns:
-            dict: The index for the given field.
+            int: The commit's log sequence number.
+        """
+        lsn = self.storage.append(ops)
+        self._apply(ops)
+        if self.storage.should_compact():
+            self._save_data()
+        return lsn
+
+    def _apply(self, ops):
+        """Applies a logged commit to the in-memory data and loaded indexes."""
+        with self.lock.write():
+            self.history.record(self.data, ops)
+            apply_commit(self.data, ops)
+            for op in ops:
+                doc_id = op[1]
+                self._changed_ids.add(doc_id)
+                doc = self.data.get(doc_id)
+                for index in self.indexes.values():
+                    index.update(doc_id, doc)
+            self.history.advance()
+
+    def _index_path(self, name):
+        """Returns the path of the file holding an index's entries."""
+        return f"{self.db_file}.index.{quote(name, safe='')}.json"
+
+    def _load_index(self, name):
+        """
+        Returns a loaded index, reading or building it on first use.
+
+        Args:
+            name (str): The index's name.
+
+        Returns:
+            Index: The index.
+        """
+        index = self.indexes.get(name)
+        if index is not None:
+            return index
+        with self._index_lock:
+            # Another reader may have loaded it meanwhile
+            index = self.indexes.get(name)
+            if index is not None:
+                return index
+            index = self._read_index(name)
+            self.indexes[name] = index
+            return index
+
+    def _read_index(self, name):
+        """Reads an index from its file, or builds it if the file is missing or stale."""
+        index = None
+        definition = self.index_definitions[name]
+        path = self._index_path(name)
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    payload = json.load(f)
+                if payload["snapshot"] == self.storage.stamp:
+                    index = index_from_dict(payload["index"])
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Rebuilding index '{name}': cannot read {path}: {e}")
+
+        if index is None:
+            index = create_index(definition["fields"], definition["index_type"])
+            index.build(self.data)
+        else:
+            for doc_id in self._changed_ids:
+                index.update(doc_id, self.data.get(doc_id))
+        return index
+
+    def create_index(self, field, index_type="hash", name=None):
+        """
+        Creates an index on a field, or a compound index on several fields.
+
+        Documents missing an indexed field are left out of the index.
+
+        Args:
+            field (str or list): The field, or fields, to index.
+            index_type (str): "hash" for equality lookups, or "sorted" (also
+                "b-tree") for equality, range, prefix and ordered scans.
+            name (str, optional): The index's name; defaults to the fields joined by commas.
 
         Raises:
-            ValueError: If no index exists for the specified field.
+            ValueError: If the index already exists or the index type is invalid.
+        """
+        fields = [field] if isinstance(field, str) else list(field)
+        if name is None:
+            name = ",".join(fields)
+        with self._writing():
+            self._sync_index_definitions()
+            if name in self.index_definitions:
+                raise ValueError(f"Index already exists for field: {name}")
+
+            index = create_index(fields, index_type)
+            index.build(self.data)
+            definitions = dict(self.index_definitions)
+            definitions[name] = {"fields": fields, "index_type": index_type}
+            write_json_atomic(self.index_file, definitions)
+            with self.lock.write():
+                self.indexes[name] = index
+                self.index_definitions = definitions
+
+    def get_index(self, name):
         """
-        if field not in self.indexes:
-            raise ValueError(f"No index found for field: {field}")
-        return self.indexes[field]
+        Retrieves an index, loading it on first use.
 
-    def delete_index(self, field):
+        Args:
+            name (str): The index's name (by default, the indexed field).
+
+        Returns:
+            Index: The index.
+
+        Raises:
+            ValueError: If no index exists with that name.
         """
-        Deletes the index for a given field.
+        if name not in self.index_definitions:
+            raise ValueError(f"No index found for field: {name}")
+        return self._load_index(name)
+
+    def delete_index(self, name):
+        """
+        Deletes an index.
 
         Args:
-            field (str): The field to delete the index for.
+            name (str): The index's name (by default, the indexed field).
 
         Raises:
-            ValueError: If no index exists for the specified field.
+            ValueError: If no index exists with that name.
+        """
+        with self._writing():
+            self._sync_index_definitions()
+            if name not in self.index_definitions:
+                raise ValueError(f"No index found for field: {name}")
+            definitions = dict(self.index_definitions)
+            del definitions[name]
+            write_json_atomic(self.index_file, definitions)
+            with self.lock.write():
+                self.indexes.pop(name, None)
+                self.index_definitions = definitions
+            if os.path.exists(self._index_path(name)):
+                os.remove(self._index_path(name))
+
+    def _sync_index_definitions(self):
         """
-        if field not in self.indexes:
-            raise ValueError(f"No index found for field: {field}")
-        del self.indexes[field]
+        Adopts the index definitions other processes have written, before
+        this one changes them. The writer locks must be held.
+        """
+        if self._file_lock is None:
+            return
+        definitions = self._read_index_definitions()
+        if definitions == self.index_definitions:
+            return
+        with self.lock.write():
+            self.indexes = {name: index for name, index in self.indexes.items()
+                            if definitions.get(name) == self.index_definitions[name]}
+            self.index_definitions = definitions
 
     def add_data(self, doc):
         """
         Adds new data to the database.
 
         Args:
-            doc (dict): The document data.
+            doc (dict): The document data; its "id" field is the document ID.
 
         
         Raises:
-            ValueError: If the document ID already exists.
+            ValueError: If the document has no ID or the document ID already exists.
         """
-        if doc_id in self.data:
-            raise ValueError(f"Document ID '{doc_id}' already exists")
+        with self.transaction() as transaction:
+            transaction.add_data(doc)
+
+    def add_data_batch(self, docs):
+        """
+        Adds several documents in one commit; either all or none are stored.
+
+        Args:
+            docs (list): The documents; each one's "id" field is its document ID.
 
-        self.data[doc_id] = doc
-        for field in self.indexes:
-            self.indexes[field].setdefault(doc[field], []).append(doc_id)
-        self.save_data()
+        Raises:
+            ValueError: If a document has no ID or its ID already exists.
+        """
+        with self.transaction() as transaction:
+            transaction.add_data_batch(docs)
         
     def update_data(self, doc_id, doc):
         """
         Updates data in the database.
 
         Args:
-            doc_id (str): The unique ID of the document to update.
+            doc_id (str or int): The unique ID of the document to update.
             doc (dict): The new document data.
 
         Raises:
             ValueError: If the document ID does not exist.
         """
-        if doc_id not in self.data:
-            raise ValueError(f"Document ID '{doc_id}' not found")
-
-        old_doc = self.data[doc_id]
-        self.data[doc_id] = doc
-
-        for field in self.indexes:
-            if old_doc.get(field) != doc.get(field):
-                self.indexes[field][old_doc[field]].remove(doc_id)
-                self.indexes[field].setdefault(doc[field], []).append(doc_id)
-        self.save_data()
+        with self.transaction() as transaction:
+            transaction.update_data(doc_id, doc)
 
     def delete_data(self, doc_id):
         """
         Deletes data from the database.
 
         Args:
-            doc_id (str): The unique ID of the document to delete.
+            doc_id (str or int): The unique ID of the document to delete.
 
         Raises:
             ValueError: If the document ID does not exist.
         """
-        if doc_id not in self.data:
-            raise ValueError(f"Document ID '{doc_id}' not found")
-
-        doc = self.data[doc_id]
-        del self.data[doc_id]
-
-        for field in self.indexes:
-            if doc[field] in self.indexes[field]:
-                self.indexes[field][doc[field]].remove(doc_id)
-
-        self.save_data()
+        with self.transaction() as transaction:
+            transaction.delete_data(doc_id)
 
     def get_data(self, doc_id):
         """
         Gets data from the database.
 
         Args:
-            doc_id (str): The unique ID of the document to retrieve.
+            doc_id (str or int): The unique ID of the document to retrieve.
 
         Returns:
             dict: The document data.
@@ -181,48 +510,165 @@ class DocumentDatabase:
         Raises:
             ValueError: If the document ID does not exist.
         """
-        if doc_id not in self.data:
-            raise ValueError(f"Document ID '{doc_id}' not found")
-        return self.data[doc_id]
+        doc_id = document_id(doc_id)
+        self.refresh()
+        try:
+            return self.data[doc_id]  # One lookup: a segment-backed miss costs a table search
+        except KeyError:
+            raise ValueError(f"Document ID '{doc_id}' not found") from None
 
-    def create_query(self, index_field, query_value):
+    def create_query(self, index_name, query_value):
         """
         Creates a query using index information.
 
         Args:
-            index_field (str): The field to use for the index.
-            query_value: The value to query for.
+            index_name (str): The index to use (by default named after its field).
+            query_value: The value to query for; a tuple or list for compound indexes.
 
         Returns:
             list: The list of document IDs that match the query.
 
         Raises:
-            ValueError: If no index exists for the specified field.
+            ValueError: If no index exists with that name.
         """
-        if index_field not in self.indexes:
-            raise ValueError(f"No index found for field: {index_field}")
-        return self.indexes[index_field].get(query_value, [])
+        self.refresh()
+        with self.lock.read():
+            return self.get_index(index_name).lookup(query_value)
 
-    def query(self, index_field, query_value, query=None):
+    def query(self, index_name, query_value, query=None):
         """
         Queries the database using an index and an optional filter.
 
         Args:
-            index_field (str): The field to use for the index.
-            query_value: The value to query for.
-            query (callable, optional): An optional filter function.
+            index_name (str): The index to use (by default named after its field).
+            query_value: The value to query for; a tuple or list for compound indexes.
+            query (callable or dict, optional): An optional filter function, or a
+                filter dictionary (see db_query).
 
         Returns:
             list: The list of documents that match the query.
 
         Raises:
-            ValueError: If no index exists for the specified field.
+            ValueError: If no index exists with that name or the filter is malformed.
+        """
+        if isinstance(query, dict):
+            query = compile_predicate(compile_filter(query))
+        self.refresh()
+        with self.lock.read():
+            return self._fetch(self.get_index(index_name).lookup(query_value), query)
+
+    def find(self, filter=None, projection=None, sort=None, limit=None, snapshot=None):
         """
-        doc_ids = self.create_query(index_field, query_value)
+        Finds documents matching a declarative filter, choosing indexes automatically.
+
+        The results are produced lazily, from a snapshot taken when find()
+        is called: writes made while they are consumed do not affect them.
 
+        Args:
+            filter (dict, optional): The filter, e.g. {"type": "event", "timestamp": {"$gte": 100}};
+                None matches every document.
+            projection (list, optional): The fields to return; None returns whole documents.
+            sort (str or list, optional): A field, or a list of fields and [field, direction]
+                pairs with direction 1 (ascending) or -1 (descending).
+            limit (int, optional): The maximum number of documents to return.
+            snapshot (Snapshot, optional): An open snapshot to read instead of a new one.
+
+        Returns:
+            iterator: The matching documents.
+
+        Raises:
+            ValueError: If the filter, sort or limit is malformed.
+        """
+        if snapshot is not None:
+            with self.lock.read():
+                return plan_query(self, filter, projection, sort, limit, data=snapshot).execute(snapshot)
+        self.refresh()
+        with self.lock.read():
+            snapshot = Snapshot(self, self.data, self.history)
+            try:
+                docs = plan_query(self, filter, projection, sort, limit, data=snapshot).execute(snapshot)
+            except BaseException:
+                snapshot.close()
+                raise
+        return _closing(docs, snapshot)
+
+    def explain(self, filter=None, projection=None, sort=None, limit=None):
+        """
+        Describes how find() would run a query, without running it.
+
+        Args:
+            filter (dict, optional): The filter.
+            projection (list, optional): The fields to return.
+            sort (str or list, optional): The sort specification.
+            limit (int, optional): The maximum number of documents to return.
+
+        Returns:
+            dict: The plan's stages, from the output down to the index or scan feeding it.
+
+        Raises:
+            ValueError: If the filter, sort or limit is malformed.
+        """
+        self.refresh()
+        with self.lock.read():
+            return plan_query(self, filter, projection, sort, limit).explain()
+
+    def query_range(self, index_name, low=None, high=None, include_low=True, include_high=True,
+                    reverse=False, limit=None):
+        """
+        Queries a sorted index for documents whose value lies between low and high.
+
+        Args:
+            index_name (str): The sorted index to use.
+            low: The lower bound, or None for no lower bound.
+            high: The upper bound, or None for no upper bound.
+            include_low (bool): Whether values equal to low match.
+            include_high (bool): Whether values equal to high match.
+            reverse (bool): Whether to return the highest values first.
+            limit (int, optional): The maximum number of documents to return.
+
+        Returns:
+            list: The matching documents, in order of their indexed value.
+
+        Raises:
+            ValueError: If no index exists with that name or it is not a sorted index.
+        """
+        self.refresh()
+        with self.lock.read():
+            doc_ids = self.get_index(index_name).range(low, high, include_low, include_high, reverse)
+            return self._fetch(islice(doc_ids, limit))
+
+    def query_prefix(self, index_name, prefix, limit=None):
+        """
+        Queries a sorted index for documents whose value starts with prefix.
+
+        Args:
+            index_name (str): The sorted index to use.
+            prefix: A string prefix, or leading field values for a compound index.
+            limit (int, optional): The maximum number of documents to return.
+
+        Returns:
+            list: The matching documents, in order of their indexed value.
+
+        Raises:
+            ValueError: If no index exists with that name or it is not a sorted index.
+        """
+        self.refresh()
+        with self.lock.read():
+            return self._fetch(islice(self.get_index(index_name).prefix(prefix), limit))
+
+    def _fetch(self, doc_ids, query=None):
+        """Returns the documents with the given IDs that pass an optional filter."""
         results = []
         for doc_id in doc_ids:
             doc = self.data[doc_id]
             if query is None or query(doc):
                 results.append(doc)
-        return results
\ No newline at end of file
+        return results
+
+
+def _closing(docs, snapshot):
+    """Yields the documents, then closes the snapshot they were read from."""
+    try:
+        yield from docs
+    finally:
+        snapshot.close()
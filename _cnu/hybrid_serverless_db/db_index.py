@@ -0,0 +1,562 @@
+"""
+Secondary indexes for the hybrid serverless database.
+
+An index maps the values of one field, or of several fields for a compound
+index, to the IDs of the documents holding them:
+
+* HashIndex keeps a set of document IDs per value, for equality lookups.
+* SortedIndex keeps (value, document ID) entries in order, B-tree style,
+  for equality, range, prefix and ordered scans.
+
+Both keep a reverse map from document ID to its key, so a write updates an
+index in O(1) (hash) or O(log n) plus a list shift (sorted) without needing
+the document's previous version. Documents missing an indexed field are not
+indexed.
+"""
+import bisect
+import json
+
+# Values of different types are ordered None < numbers < strings < anything else
+_RANK_NONE = 0
+_RANK_NUMBER = 1
+_RANK_STRING = 2
+_RANK_OTHER = 3
+
+_MISSING = object()
+
+
+def sort_key(value):
+    """
+    Converts a field value into a key that orders consistently across types.
+
+    Args:
+        value: A JSON-compatible field value.
+
+    Returns:
+        tuple: A (rank, value) pair; lists and dictionaries are compared as JSON text.
+    """
+    if value is None:
+        return (_RANK_NONE, 0)
+    if isinstance(value, (bool, int, float)):
+        return (_RANK_NUMBER, value)
+    if isinstance(value, str):
+        return (_RANK_STRING, value)
+    return (_RANK_OTHER, json.dumps(value, sort_keys=True))
+
+
+def hash_key(value):
+    """
+    Converts a field value into a hashable key.
+
+    Args:
+        value: A JSON-compatible field value.
+
+    Returns:
+        The value itself, or its JSON text for lists and dictionaries.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return json.dumps(value, sort_keys=True)
+
+
+class Index:
+    """
+    Base class for secondary indexes.
+
+    Attributes:
+        fields (list): The indexed fields; more than one makes a compound index.
+    """
+
+    index_type = None
+
+    def __init__(self, fields):
+        """
+        Initializes an empty index.
+
+        Args:
+            fields (list): The indexed fields.
+        """
+        self.fields = list(fields)
+        self._keys = {}  # Document ID -> its key in this index
+
+    def _value(self, doc):
+        """Returns the indexed value of a document, a tuple for compound indexes, or _MISSING."""
+        if len(self.fields) == 1:
+            return doc.get(self.fields[0], _MISSING)
+        values = []
+        for field in self.fields:
+            if field not in doc:
+                return _MISSING
+            values.append(doc[field])
+        return tuple(values)
+
+    def key(self, value):
+        """
+        Converts an indexed value (a tuple or list for compound indexes) into this index's key.
+
+        Args:
+            value: The value to convert.
+
+        Returns:
+            The key.
+        """
+        raise NotImplementedError
+
+    def build(self, data):
+        """
+        Indexes every document in a document dictionary.
+
+        Args:
+            data (dict): Documents by ID.
+        """
+        for doc_id, doc in data.items():
+            self.add(doc_id, doc)
+
+    def add(self, doc_id, doc):
+        """
+        Indexes a document that is not yet in the index.
+
+        Args:
+            doc_id (str): The document's ID.
+            doc (dict): The document.
+        """
+        raise NotImplementedError
+
+    def discard(self, doc_id):
+        """
+        Removes a document from the index if it is there.
+
+        Args:
+            doc_id (str): The document's ID.
+        """
+        raise NotImplementedError
+
+    def update(self, doc_id, doc):
+        """
+        Re-indexes a document after it was added, replaced or deleted.
+
+        Args:
+            doc_id (str): The document's ID.
+            doc (dict): The document's new version, or None if it was deleted.
+        """
+        self.discard(doc_id)
+        if doc is not None:
+            self.add(doc_id, doc)
+
+    def lookup(self, value):
+        """
+        Finds the documents whose indexed value equals value.
+
+        Args:
+            value: The value to look up (a tuple or list for compound indexes).
+
+        Returns:
+            list: The matching document IDs.
+        """
+        raise NotImplementedError
+
+    def count(self, value):
+        """
+        Counts the documents whose indexed value equals value.
+
+        Args:
+            value: The value to count.
+
+        Returns:
+            int: The number of matching documents.
+        """
+        raise NotImplementedError
+
+    def range(self, low=None, high=None, include_low=True, include_high=True, reverse=False):
+        """
+        Finds the documents whose indexed value lies between low and high.
+
+        Raises:
+            ValueError: If the index does not keep its values in order.
+        """
+        raise ValueError(f"{self.index_type} indexes do not support range queries")
+
+    def prefix(self, prefix):
+        """
+        Finds the documents whose indexed value starts with prefix.
+
+        Raises:
+            ValueError: If the index does not keep its values in order.
+        """
+        raise ValueError(f"{self.index_type} indexes do not support prefix queries")
+
+    def scan(self, reverse=False):
+        """
+        Iterates over every indexed document in the order of its indexed value.
+
+        Raises:
+            ValueError: If the index does not keep its values in order.
+        """
+        raise ValueError(f"{self.index_type} indexes do not support ordered scans")
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._keys
+
+    def to_dict(self):
+        """
+        Serializes the index for persistence.
+
+        Returns:
+            dict: The index's type, fields and entries.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def from_dict(cls, payload):
+        """
+        Restores an index serialized by to_dict.
+
+        Args:
+            payload (dict): The serialized index.
+
+        Returns:
+            Index: The restored index.
+        """
+        raise NotImplementedError
+
+
+class HashIndex(Index):
+    """
+    An index from each value to the set of IDs of the documents holding it.
+    """
+
+    index_type = "hash"
+
+    def __init__(self, fields):
+        super().__init__(fields)
+        self._postings = {}
+
+    def key(self, value):
+        if len(self.fields) == 1:
+            return hash_key(value)
+        return tuple(hash_key(v) for v in value)
+
+    def add(self, doc_id, doc):
+        value = self._value(doc)
+        if value is _MISSING:
+            return
+        key = self.key(value)
+        self._postings.setdefault(key, set()).add(doc_id)
+        self._keys[doc_id] = key
+
+    def discard(self, doc_id):
+        key = self._keys.pop(doc_id, _MISSING)
+        if key is _MISSING:
+            return
+        postings = self._postings[key]
+        postings.discard(doc_id)
+        if not postings:
+            del self._postings[key]
+
+    def lookup(self, value):
+        return list(self._postings.get(self.key(value), ()))
+
+    def postings(self, value):
+        """
+        Returns the set of IDs of the documents whose indexed value equals value.
+
+        The set belongs to the index and must not be modified.
+
+        Args:
+            value: The value to look up.
+
+        Returns:
+            set: The matching document IDs.
+        """
+        return self._postings.get(self.key(value), set())
+
+    def count(self, value):
+        """
+        Counts the documents whose indexed value equals value.
+
+        Args:
+            value: The value to count.
+
+        Returns:
+            int: The number of matching documents.
+        """
+        return len(self._postings.get(self.key(value), ()))
+
+    def to_dict(self):
+        return {
+            "index_type": self.index_type,
+            "fields": self.fields,
+            "entries": [[key, sorted(ids)] for key, ids in self._postings.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        index = cls(payload["fields"])
+        compound = len(index.fields) > 1
+        for key, ids in payload["entries"]:
+            if compound:
+                key = tuple(key)
+            index._postings[key] = set(ids)
+            for doc_id in ids:
+                index._keys[doc_id] = key
+        return index
+
+
+class SortedIndex(Index):
+    """
+    An index keeping (value, document ID) entries sorted by value.
+
+    Entries live in a Python list kept in order with bisect; inserting
+    shifts the list, which is a memmove and outperforms a pure-Python B-tree
+    for the sizes this database holds in memory.
+    """
+
+    index_type = "sorted"
+
+    def __init__(self, fields):
+        super().__init__(fields)
+        self._entries = []
+
+    def key(self, value):
+        if len(self.fields) == 1:
+            return sort_key(value)
+        return tuple(sort_key(v) for v in value)
+
+    def build(self, data):
+        for doc_id, doc in data.items():
+            value = self._value(doc)
+            if value is not _MISSING:
+                self._keys[doc_id] = self.key(value)
+        self._entries = sorted((key, doc_id) for doc_id, key in self._keys.items())
+
+    def add(self, doc_id, doc):
+        value = self._value(doc)
+        if value is _MISSING:
+            return
+        key = self.key(value)
+        bisect.insort(self._entries, (key, doc_id))
+        self._keys[doc_id] = key
+
+    def discard(self, doc_id):
+        key = self._keys.pop(doc_id, _MISSING)
+        if key is _MISSING:
+            return
+        position = bisect.bisect_left(self._entries, (key, doc_id))
+        del self._entries[position]
+
+    def ids_between(self, start, stop, reverse=False):
+        """
+        Iterates over the document IDs of the entries at positions start to stop.
+
+        Args:
+            start (int): The first position, as returned by bounds() or prefix_bounds().
+            stop (int): The position after the last one.
+            reverse (bool): Whether to go from the last position to the first.
+
+        Returns:
+            iterator: The document IDs.
+        """
+        entries = self._entries
+        if reverse:
+            for position in range(stop - 1, start - 1, -1):
+                yield entries[position][1]
+        else:
+            for position in range(start, stop):
+                yield entries[position][1]
+
+    def bounds(self, low_key=None, high_key=None, include_low=True, include_high=True):
+        """
+        Finds the positions of the entries whose key lies between two keys.
+
+        Args:
+            low_key (tuple, optional): The lower bound as an index key, or None for no lower bound.
+            high_key (tuple, optional): The upper bound as an index key, or None for no upper bound.
+            include_low (bool): Whether keys equal to low_key are included.
+            include_high (bool): Whether keys equal to high_key are included.
+
+        Returns:
+            tuple: The start and stop positions; stop - start entries match.
+        """
+        start = 0
+        stop = len(self._entries)
+        if low_key is not None:
+            bound = bisect.bisect_left if include_low else bisect.bisect_right
+            start = bound(self._entries, low_key, key=_entry_key)
+        if high_key is not None:
+            bound = bisect.bisect_right if include_high else bisect.bisect_left
+            stop = bound(self._entries, high_key, key=_entry_key)
+        return start, max(start, stop)
+
+    def prefix_bounds(self, prefix):
+        """
+        Finds the positions of the entries whose value starts with prefix.
+
+        Args:
+            prefix: A string for a single-field index, or a tuple or list of
+                values for the leading fields of a compound index.
+
+        Returns:
+            tuple: The start and stop positions.
+
+        Raises:
+            ValueError: If prefix is not a string on a single-field index.
+        """
+        if len(self.fields) == 1:
+            if not isinstance(prefix, str):
+                raise ValueError("Prefix queries on a single field take a string")
+            # Strings are one contiguous run of entries, still in order when cut to the prefix's length
+            low, high = self.bounds((_RANK_STRING,), (_RANK_STRING + 1,), True, False)
+            length = len(prefix)
+            truncated = lambda entry: entry[0][1][:length]
+            start = bisect.bisect_left(self._entries, prefix, low, high, key=truncated)
+            stop = bisect.bisect_right(self._entries, prefix, start, high, key=truncated)
+        else:
+            prefix_key = tuple(sort_key(v) for v in prefix)
+            length = len(prefix_key)
+            truncated = lambda entry: entry[0][:length]
+            start = bisect.bisect_left(self._entries, prefix_key, key=truncated)
+            stop = bisect.bisect_right(self._entries, prefix_key, start, key=truncated)
+        return start, stop
+
+    def lookup(self, value):
+        # Exact key bounds: range() would read a None value as no bound
+        key = self.key(value)
+        return list(self.ids_between(*self.bounds(key, key)))
+
+    def count(self, value):
+        """
+        Counts the documents whose indexed value equals value.
+
+        Args:
+            value: The value to count.
+
+        Returns:
+            int: The number of matching documents.
+        """
+        start, stop = self.bounds(self.key(value), self.key(value))
+        return stop - start
+
+    def range(self, low=None, high=None, include_low=True, include_high=True, reverse=False):
+        """
+        Finds the documents whose indexed value lies between low and high.
+
+        Args:
+            low: The lower bound, or None for no lower bound.
+            high: The upper bound, or None for no upper bound.
+            include_low (bool): Whether values equal to low match.
+            include_high (bool): Whether values equal to high match.
+            reverse (bool): Whether to yield the highest values first.
+
+        Returns:
+            iterator: The matching document IDs, in order of their value.
+        """
+        start, stop = self.bounds(None if low is None else self.key(low),
+                                  None if high is None else self.key(high),
+                                  include_low, include_high)
+        return self.ids_between(start, stop, reverse)
+
+    def prefix(self, prefix):
+        """
+        Finds the documents whose indexed value starts with prefix.
+
+        For a single-field index, prefix is a string and matches string
+        values starting with it. For a compound index, prefix is a tuple or
+        list of values for the leading fields.
+
+        Args:
+            prefix: The prefix to match.
+
+        Returns:
+            iterator: The matching document IDs, in order of their value.
+        """
+        return self.ids_between(*self.prefix_bounds(prefix))
+
+    def scan(self, reverse=False):
+        """
+        Iterates over every indexed document in the order of its indexed value.
+
+        Args:
+            reverse (bool): Whether to yield the highest values first.
+
+        Returns:
+            iterator: The document IDs.
+        """
+        return self.ids_between(0, len(self._entries), reverse)
+
+    def to_dict(self):
+        # Stored as flat columns (document IDs, then each field's ranks and
+        # values): decoding a few long lists is much cheaper than one small
+        # list per entry
+        columns = []
+        if len(self.fields) == 1:
+            columns.append([key[0] for key, _ in self._entries])
+            columns.append([key[1] for key, _ in self._entries])
+        else:
+            for position in range(len(self.fields)):
+                columns.append([key[position][0] for key, _ in self._entries])
+                columns.append([key[position][1] for key, _ in self._entries])
+        return {
+            "index_type": self.index_type,
+            "fields": self.fields,
+            "ids": [doc_id for _, doc_id in self._entries],
+            "columns": columns,
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        index = cls(payload["fields"])
+        columns = payload["columns"]
+        pairs = [zip(columns[i], columns[i + 1]) for i in range(0, len(columns), 2)]
+        keys = pairs[0] if len(pairs) == 1 else zip(*pairs)
+        # Entries were written in order, so no sort is needed
+        index._entries = list(zip(keys, payload["ids"]))
+        index._keys = dict(zip(payload["ids"], (key for key, _ in index._entries)))
+        return index
+
+
+def _entry_key(entry):
+    """Returns the key of a SortedIndex entry."""
+    return entry[0]
+
+
+# Index types accepted by create_index; "b-tree" names the sorted index
+INDEX_TYPES = {
+    "hash": HashIndex,
+    "sorted": SortedIndex,
+    "b-tree": SortedIndex,
+}
+
+
+def create_index(fields, index_type="hash"):
+    """
+    Creates an empty index of the given type.
+
+    Args:
+        fields (list): The indexed fields.
+        index_type (str): One of INDEX_TYPES.
+
+    Returns:
+        Index: The new index.
+
+    Raises:
+        ValueError: If the index type is invalid.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Invalid index type: {index_type}")
+    return INDEX_TYPES[index_type](fields)
+
+
+def index_from_dict(payload):
+    """
+    Restores an index serialized by Index.to_dict.
+
+    Args:
+        payload (dict): The serialized index.
+
+    Returns:
+        Index: The restored index.
+    """
+    return INDEX_TYPES[payload["index_type"]].from_dict(payload)
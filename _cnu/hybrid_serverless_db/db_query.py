@@ -0,0 +1,698 @@
+"""
+Declarative queries for the hybrid serverless database.
+
+A filter is a dictionary in the style of MongoDB:
+
+    {"type": "event", "timestamp": {"$gte": 100, "$lt": 200}}
+    {"$or": [{"category": "system"}, {"category": {"$in": ["user", "network"]}}]}
+
+A plain value tests equality. An operator dictionary may use $eq, $ne,
+$gt, $gte, $lt, $lte, $in, $nin, $exists and $prefix. Comparisons only
+match values of the same type as their operand (numbers with numbers,
+strings with strings). Conditions combine with $and, $or and $not; the
+keys of one dictionary are combined with $and.
+
+plan_query() turns a filter, projection, sort and limit into a QueryPlan.
+The planner answers what it can from indexes: equality and $in from hash
+or sorted indexes, ranges and $prefix from sorted indexes, and equality on
+several fields from compound indexes. It intersects the postings of the
+conditions of an $and, starting from the smallest, and unites those of an
+$or. Every fetched document is re-checked against the whole filter, so an
+index only has to narrow the candidates down. Results are streamed: a
+limit stops the scan early, and documents are projected as they are
+produced. QueryPlan.explain() describes the chosen plan.
+"""
+import heapq
+import operator
+from itertools import chain, islice
+
+from _cnu.hybrid_serverless_db.db_index import HashIndex, SortedIndex, sort_key
+
+FIELD_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$exists", "$prefix"}
+LOGICAL_OPERATORS = {"$and", "$or", "$not"}
+RANGE_OPERATORS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+# An index is only intersected with the smallest one if it is at most this many times larger;
+# otherwise reading its postings costs more than filtering the fetched documents
+INTERSECT_RATIO = 8
+
+_MISSING = object()
+
+
+def compile_filter(spec):
+    """
+    Validates a filter and converts it into a predicate tree.
+
+    The tree is made of ("$and", [...]), ("$or", [...]) and ("$not", node)
+    nodes, with (operator, field, operand) conditions as leaves.
+
+    Args:
+        spec (dict): The filter, or None to match every document.
+
+    Returns:
+        tuple: The predicate tree.
+
+    Raises:
+        ValueError: If the filter is malformed or uses an unknown operator.
+    """
+    if spec is None:
+        return ("$and", [])
+    if not isinstance(spec, dict):
+        raise ValueError(f"A filter must be a dictionary, not {type(spec).__name__}")
+    nodes = []
+    for key, value in spec.items():
+        if key in ("$and", "$or"):
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"{key} takes a non-empty list of filters")
+            nodes.append((key, [compile_filter(item) for item in value]))
+        elif key == "$not":
+            nodes.append(("$not", compile_filter(value)))
+        elif key.startswith("$"):
+            raise ValueError(f"Unknown operator: {key}")
+        elif isinstance(value, dict) and any(k.startswith("$") for k in value):
+            for op, operand in value.items():
+                if op not in FIELD_OPERATORS:
+                    raise ValueError(f"Unknown operator: {op}")
+                if op in ("$in", "$nin") and not isinstance(operand, list):
+                    raise ValueError(f"{op} takes a list")
+                if op == "$prefix" and not isinstance(operand, str):
+                    raise ValueError("$prefix takes a string")
+                nodes.append((op, key, operand))
+        else:
+            nodes.append(("$eq", key, value))
+    return nodes[0] if len(nodes) == 1 else ("$and", nodes)
+
+
+def compile_predicate(node):
+    """
+    Compiles a predicate tree into a function that tests a document.
+
+    Args:
+        node (tuple): A predicate tree from compile_filter.
+
+    Returns:
+        callable: A function taking a document and returning whether it matches.
+    """
+    op = node[0]
+    if op in ("$and", "$or"):
+        tests = [compile_predicate(child) for child in node[1]]
+        if not tests:
+            return lambda doc: True
+        if len(tests) == 1:
+            return tests[0]
+        combine = all if op == "$and" else any
+        return lambda doc: combine(test(doc) for test in tests)
+    if op == "$not":
+        test = compile_predicate(node[1])
+        return lambda doc: not test(doc)
+
+    _, field, operand = node
+    if op == "$eq":
+        return lambda doc: doc.get(field, _MISSING) == operand
+    if op == "$ne":
+        return lambda doc: doc.get(field, _MISSING) != operand
+    if op == "$in":
+        return lambda doc: field in doc and doc[field] in operand
+    if op == "$nin":
+        return lambda doc: doc.get(field, _MISSING) not in operand
+    if op == "$exists":
+        return lambda doc: (field in doc) == bool(operand)
+    if op == "$prefix":
+        return lambda doc: isinstance(doc.get(field), str) and doc[field].startswith(operand)
+
+    compare = RANGE_OPERATORS[op]
+    rank, bound = sort_key(operand)
+
+    def test(doc):
+        value = doc.get(field, _MISSING)
+        if value is _MISSING:
+            return False
+        value_rank, value = sort_key(value)
+        return value_rank == rank and compare(value, bound)
+    return test
+
+
+def normalize_sort(sort):
+    """
+    Converts a sort specification into a list of (field, direction) pairs.
+
+    Args:
+        sort: A field name, or a list of field names and [field, direction]
+            pairs, where direction is 1 (ascending) or -1 (descending).
+
+    Returns:
+        list: The (field, direction) pairs; empty if sort is None.
+
+    Raises:
+        ValueError: If the specification is malformed.
+    """
+    if sort is None:
+        return []
+    if isinstance(sort, str):
+        return [(sort, 1)]
+    keys = []
+    for item in sort:
+        if isinstance(item, str):
+            keys.append((item, 1))
+            continue
+        field, direction = item
+        if direction not in (1, -1):
+            raise ValueError(f"Sort direction must be 1 or -1, not {direction!r}")
+        keys.append((field, direction))
+    return keys
+
+
+def sort_documents(docs, sort, limit=None):
+    """
+    Sorts documents by one or more fields; documents missing a field sort last.
+
+    Args:
+        docs (iterable): The documents.
+        sort (list): (field, direction) pairs from normalize_sort.
+        limit (int, optional): Only the first limit documents are needed.
+
+    Returns:
+        list: The sorted documents.
+    """
+    def ascending(field):
+        return lambda doc: (0, sort_key(doc[field])) if field in doc else (1,)
+
+    def descending(field):
+        return lambda doc: (1, sort_key(doc[field])) if field in doc else (0,)
+
+    if limit is not None and len(sort) == 1:
+        field, direction = sort[0]
+        if direction > 0:
+            return heapq.nsmallest(limit, docs, key=ascending(field))
+        return heapq.nlargest(limit, docs, key=descending(field))
+
+    docs = list(docs)
+    for field, direction in reversed(sort):
+        if direction > 0:
+            docs.sort(key=ascending(field))
+        else:
+            docs.sort(key=descending(field), reverse=True)
+    return docs if limit is None else docs[:limit]
+
+
+class IndexLookup:
+    """
+    Document IDs with one of several values in an index.
+    """
+
+    ordered_by = None
+
+    def __init__(self, name, index, values):
+        self.name = name
+        self.index = index
+        unique = {}
+        for value in values:
+            unique.setdefault(index.key(value), value)
+        self.values = list(unique.values())
+
+    def ids(self):
+        if isinstance(self.index, HashIndex):
+            if len(self.values) == 1:
+                return self.index.postings(self.values[0])
+            return set().union(*(self.index.postings(value) for value in self.values))
+        # Exact key bounds (range() reads None as no bound); the values have
+        # distinct keys, so their runs of entries do not overlap
+        index = self.index
+        return chain.from_iterable(index.ids_between(*index.bounds(key, key))
+                                   for key in map(index.key, self.values))
+
+    def estimate(self):
+        return sum(self.index.count(value) for value in self.values)
+
+    def explain(self):
+        return {"stage": "INDEX_LOOKUP", "index": self.name, "values": self.values, "estimate": self.estimate()}
+
+
+class IndexRange:
+    """
+    Document IDs whose value in a sorted index lies between two keys, in order.
+    """
+
+    def __init__(self, name, index, field, low, high, conditions):
+        self.name = name
+        self.index = index
+        self.ordered_by = field
+        self.reverse = False
+        self.conditions = conditions
+        self.start, self.stop = index.bounds(low[0], high[0], low[1], high[1])
+
+    def order(self, reverse):
+        self.reverse = reverse
+
+    def ids(self):
+        return self.index.ids_between(self.start, self.stop, self.reverse)
+
+    def estimate(self):
+        return self.stop - self.start
+
+    def explain(self):
+        return {"stage": "INDEX_RANGE", "index": self.name, "conditions": self.conditions,
+                "reverse": self.reverse, "estimate": self.estimate()}
+
+
+class IndexPrefix:
+    """
+    Document IDs whose value in a sorted index starts with a prefix, in order.
+    """
+
+    def __init__(self, name, index, prefix):
+        self.name = name
+        self.index = index
+        self.prefix = prefix
+        self.reverse = False
+        self.ordered_by = index.fields[0] if len(index.fields) == 1 else None
+        self.start, self.stop = index.prefix_bounds(prefix)
+
+    def order(self, reverse):
+        self.reverse = reverse
+
+    def ids(self):
+        return self.index.ids_between(self.start, self.stop, self.reverse)
+
+    def estimate(self):
+        return self.stop - self.start
+
+    def explain(self):
+        return {"stage": "INDEX_PREFIX", "index": self.name, "prefix": self.prefix,
+                "reverse": self.reverse, "estimate": self.estimate()}
+
+
+class IndexScan:
+    """
+    Every document ID in the order of a sorted index, then the documents missing its field.
+    """
+
+    def __init__(self, name, index, data, reverse):
+        self.name = name
+        self.index = index
+        self.data = data
+        self.reverse = reverse
+        self.ordered_by = index.fields[0]
+
+    def order(self, reverse):
+        self.reverse = reverse
+
+    def ids(self):
+        index = self.index
+        return chain(index.scan(self.reverse), (doc_id for doc_id in self.data if doc_id not in index))
+
+    def estimate(self):
+        return len(self.data)
+
+    def explain(self):
+        return {"stage": "INDEX_SCAN", "index": self.name, "reverse": self.reverse, "estimate": self.estimate()}
+
+
+class Intersect:
+    """
+    Document IDs from the smallest source that are also in the other sources.
+
+    Sources much larger than the smallest are left to the filter instead.
+    """
+
+    def __init__(self, sources):
+        sources = sorted(sources, key=lambda source: source.estimate())
+        self.driver = sources[0]
+        limit = max(1, self.driver.estimate()) * INTERSECT_RATIO
+        self.others = [source for source in sources[1:] if source.estimate() <= limit]
+        self.skipped = [source for source in sources[1:] if source.estimate() > limit]
+
+    @property
+    def ordered_by(self):
+        return self.driver.ordered_by
+
+    def order(self, reverse):
+        self.driver.order(reverse)
+
+    def ids(self):
+        others = [ids if isinstance(ids, (set, frozenset)) else set(ids)
+                  for ids in (source.ids() for source in self.others)]
+        others.sort(key=len)
+        return (doc_id for doc_id in self.driver.ids() if all(doc_id in ids for ids in others))
+
+    def estimate(self):
+        return self.driver.estimate()
+
+    def explain(self):
+        node = {"stage": "INTERSECT", "inputs": [source.explain() for source in [self.driver] + self.others],
+                "estimate": self.estimate()}
+        if self.skipped:
+            node["filtered_instead"] = [source.explain() for source in self.skipped]
+        return node
+
+
+class Union:
+    """
+    Document IDs from any of several sources, each ID once.
+    """
+
+    ordered_by = None
+
+    def __init__(self, sources):
+        self.sources = sources
+
+    def ids(self):
+        seen = set()
+        for source in self.sources:
+            for doc_id in source.ids():
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    yield doc_id
+
+    def estimate(self):
+        return sum(source.estimate() for source in self.sources)
+
+    def explain(self):
+        return {"stage": "UNION", "inputs": [source.explain() for source in self.sources],
+                "estimate": self.estimate()}
+
+
+class QueryPlanner:
+    """
+    Chooses index sources for a predicate tree from a DocumentDatabase's indexes.
+    """
+
+    def __init__(self, db):
+        """
+        Initializes the planner.
+
+        Args:
+            db (DocumentDatabase): The database whose indexes are used.
+        """
+        self.db = db
+
+    def find_index(self, fields, sorted_only=False):
+        """
+        Finds an index on exactly the given fields, preferring hash indexes.
+
+        Args:
+            fields (list): The indexed fields.
+            sorted_only (bool): Whether only sorted indexes qualify.
+
+        Returns:
+            tuple: The index's name and the loaded index, or (None, None).
+        """
+        found = (None, None)
+        for name, definition in self.db.index_definitions.items():
+            if definition["fields"] != fields:
+                continue
+            index = self.db.get_index(name)
+            if isinstance(index, HashIndex) and not sorted_only:
+                return name, index
+            if isinstance(index, SortedIndex) and found[0] is None:
+                found = (name, index)
+        return found
+
+    def plan(self, node):
+        """
+        Plans the index sources for a predicate tree.
+
+        Args:
+            node (tuple): A predicate tree from compile_filter.
+
+        Returns:
+            The source of candidate document IDs, or None if every document must be scanned.
+        """
+        if node[0] == "$or":
+            sources = [self.plan(child) for child in node[1]]
+            if any(source is None for source in sources):
+                return None
+            return Union(sources)
+        if node[0] == "$and":
+            return self._plan_and(node[1])
+        return self._plan_and([node])
+
+    def _plan_and(self, nodes):
+        """Plans the sources for conditions that must all hold."""
+        flat = []
+        pending = list(nodes)
+        while pending:
+            node = pending.pop(0)
+            if node[0] == "$and":
+                pending.extend(node[1])
+            else:
+                flat.append(node)
+
+        sources = []
+        equalities = {}
+        ranges = {}
+        for node in flat:
+            op = node[0]
+            if op == "$or":
+                source = self.plan(node)
+                if source is not None:
+                    sources.append(source)
+            elif op in ("$eq", "$in"):
+                field, operand = node[1], node[2]
+                if op == "$eq":
+                    equalities[field] = operand
+                name, index = self.find_index([field])
+                if index is not None:
+                    sources.append(IndexLookup(name, index, [operand] if op == "$eq" else operand))
+            elif op in RANGE_OPERATORS:
+                ranges.setdefault(node[1], []).append((op, node[2]))
+            elif op == "$prefix":
+                name, index = self.find_index([node[1]], sorted_only=True)
+                if index is not None:
+                    sources.append(IndexPrefix(name, index, node[2]))
+
+        for field, conditions in ranges.items():
+            name, index = self.find_index([field], sorted_only=True)
+            if index is not None:
+                low, high = _range_keys(conditions)
+                sources.append(IndexRange(name, index, field, low, high, {op: v for op, v in conditions}))
+
+        # Compound indexes leave out documents missing any of their fields,
+        # so only an equality on every field can be answered from one: a
+        # prefix of leading fields would miss documents lacking the others
+        for name, definition in self.db.index_definitions.items():
+            fields = definition["fields"]
+            if len(fields) < 2 or not all(field in equalities for field in fields):
+                continue
+            index = self.db.get_index(name)
+            sources.append(IndexLookup(name, index, [tuple(equalities[field] for field in fields)]))
+
+        if not sources:
+            return None
+        if len(sources) == 1:
+            return sources[0]
+        return Intersect(sources)
+
+
+def _range_keys(conditions):
+    """
+    Combines range conditions on one field into the tightest pair of index key bounds.
+
+    A comparison only matches values of its operand's type, so a missing
+    bound is replaced by the edge of that type's keys.
+
+    Args:
+        conditions (list): (operator, operand) pairs.
+
+    Returns:
+        tuple: (low_key, include_low) and (high_key, include_high).
+    """
+    low = high = None
+    for op, operand in conditions:
+        key = sort_key(operand)
+        if op in ("$gt", "$gte"):
+            inclusive = op == "$gte"
+            if low is None or key > low[0] or (key == low[0] and not inclusive):
+                low = (key, inclusive)
+        else:
+            inclusive = op == "$lte"
+            if high is None or key < high[0] or (key == high[0] and not inclusive):
+                high = (key, inclusive)
+    if low is None:
+        low = ((high[0][0],), True)
+    if high is None:
+        high = ((low[0][0] + 1,), False)
+    return low, high
+
+
+class QueryPlan:
+    """
+    An executable plan for a declarative query.
+
+    Attributes:
+        source: The source of candidate document IDs, or None for a full scan.
+        sort (list): The (field, direction) pairs to sort by.
+        sorted_by_source (bool): Whether the source already yields documents in sort order.
+    """
+
+    def __init__(self, data, spec, predicate, source, projection, sort, limit):
+        self.data = data
+        self.spec = spec
+        self.predicate = predicate
+        self.source = source
+        self.projection = list(projection) if projection is not None else None
+        self.sort = sort
+        self.limit = limit
+        self.sorted_by_source = False
+
+    def execute(self, snapshot=None):
+        """
+        Runs the plan lazily.
+
+        Without a snapshot, documents and index entries are read as the
+        iterator is consumed, so the database must not be written to until
+        it is exhausted. With one, call this holding the database's read
+        lock: candidate IDs are read from the indexes now, or in batches
+        under the read lock, and documents as the snapshot saw them, so
+        the database may be written to meanwhile.
+
+        Args:
+            snapshot (Snapshot, optional): The snapshot the plan's data presents.
+
+        Returns:
+            iterator: The matching documents, projected if a projection was given.
+        """
+        test = compile_predicate(self.predicate)
+        if snapshot is not None:
+            docs = self._snapshot_matches(snapshot, test)
+        else:
+            docs = self._matches(self.source.ids() if self.source is not None else iter(self.data), test)
+        if self.sort and not self.sorted_by_source:
+            docs = _deferred(sort_documents, docs, self.sort, self.limit)
+        elif self.limit is not None:
+            docs = islice(docs, self.limit)
+        if self.projection is not None:
+            fields = self.projection
+            docs = ({field: doc[field] for field in fields if field in doc} for doc in docs)
+        return docs
+
+    def _matches(self, ids, test):
+        """Yields the documents with the given IDs that pass the filter."""
+        return (doc for doc in map(self.data.get, ids) if doc is not None and test(doc))
+
+    def _snapshot_matches(self, snapshot, test):
+        """Yields the documents in a snapshot that pass the filter."""
+        changed = snapshot.changed_ids()
+        if self.source is None or changed is None:
+            # Without usable indexes, scan the snapshot itself
+            self.sorted_by_source = False
+            return self._matches(list(self.data), test)
+        if self.sorted_by_source and self.limit is not None and not changed:
+            return self._ordered_matches(snapshot, test)
+        ids = list(self.source.ids())
+        if changed:
+            # The indexes describe the documents as they are now; those
+            # changed since the snapshot may match as they were then
+            seen = set(ids)
+            ids.extend(doc_id for doc_id in changed if doc_id not in seen)
+            self.sorted_by_source = False
+        return self._matches(ids, test)
+
+    def _ordered_matches(self, snapshot, test):
+        """
+        Yields the documents in a snapshot that pass the filter in index
+        order, reading the index in growing batches under the read lock.
+
+        If the database is written to between batches, positions in the
+        index may have shifted, so the remaining candidates are sorted in
+        memory instead.
+        """
+        ids = self.source.ids()
+        yielded = set()
+        size = max(1, self.limit)
+        while True:
+            with snapshot.reading():
+                changed = snapshot.changed_ids()
+                if changed == []:
+                    batch = list(islice(ids, size))
+                elif changed is None:
+                    rest = list(self.data)
+                else:
+                    rest = list(self.source.ids())
+                    rest.extend(changed)
+            if changed != []:
+                docs = self._matches((doc_id for doc_id in dict.fromkeys(rest) if doc_id not in yielded), test)
+                yield from sort_documents(docs, self.sort)
+                return
+            if not batch:
+                return
+            for doc_id in batch:
+                doc = self.data.get(doc_id)
+                if doc is not None and test(doc):
+                    yielded.add(doc_id)
+                    yield doc
+            size *= 2
+
+    def explain(self):
+        """
+        Describes the plan as a tree of stages, from the output down to the source.
+
+        Returns:
+            dict: The outermost stage; each stage's "input" is the stage feeding it.
+        """
+        if self.source is not None:
+            node = self.source.explain()
+        else:
+            node = {"stage": "FULL_SCAN", "estimate": len(self.data)}
+        node = {"stage": "FETCH", "filter": self.spec or {}, "input": node}
+        if self.sort:
+            node = {"stage": "SORT", "by": [list(key) for key in self.sort],
+                    "method": "index order" if self.sorted_by_source else "in memory", "input": node}
+        if self.limit is not None:
+            node = {"stage": "LIMIT", "limit": self.limit, "input": node}
+        if self.projection is not None:
+            node = {"stage": "PROJECT", "fields": self.projection, "input": node}
+        return node
+
+
+def _deferred(function, *args):
+    """Yields the results of function(*args), calling it only once the first result is needed."""
+    yield from function(*args)
+
+
+def plan_query(db, spec=None, projection=None, sort=None, limit=None, data=None):
+    """
+    Plans a declarative query against a DocumentDatabase.
+
+    Args:
+        db (DocumentDatabase): The database to query.
+        spec (dict, optional): The filter; None matches every document.
+        projection (list, optional): The fields to return; None returns whole documents.
+        sort: The sort specification (see normalize_sort).
+        limit (int, optional): The maximum number of documents to return.
+        data (Mapping, optional): The documents to read, such as a Snapshot;
+            defaults to the database's own.
+
+    Returns:
+        QueryPlan: The plan.
+
+    Raises:
+        ValueError: If the filter, sort or limit is malformed.
+    """
+    if limit is not None and (not isinstance(limit, int) or limit < 0):
+        raise ValueError(f"Limit must be a non-negative integer, not {limit!r}")
+    predicate = compile_filter(spec)
+    sort = normalize_sort(sort)
+    if data is None:
+        data = db.data
+    planner = QueryPlanner(db)
+    source = planner.plan(predicate)
+
+    sorted_by_source = False
+    if len(sort) == 1:
+        field, direction = sort[0]
+        if source is not None and source.ordered_by == field:
+            source.order(direction < 0)
+            sorted_by_source = True
+        else:
+            name, index = planner.find_index([field], sorted_only=True)
+            # Scanning in index order and stopping at the limit beats sorting
+            # the candidates when few of them are needed out of many
+            if index is not None and (source is None or (
+                    limit is not None and limit * len(data) < source.estimate() ** 2)):
+                source = IndexScan(name, index, data, direction < 0)
+                sorted_by_source = True
+
+    plan = QueryPlan(data, spec, predicate, source, projection, sort, limit)
+    plan.sorted_by_source = sorted_by_source
+    return plan
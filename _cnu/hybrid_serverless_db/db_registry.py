@@ -1,19 +1,32 @@
 import json
 import os
+import threading
+from contextlib import contextmanager
+
+from _cnu.hybrid_serverless_db.db_concurrency import FileLock
+from _cnu.hybrid_serverless_db.db_storage import write_atomic
 
 class DatabaseRegistry:
     """
     Manages the registry for database indexes, schema, and API endpoints.
+
+    Changes are made one at a time, each saved atomically. With
+    multi_process=True, a change takes the file lock ``<registry_file>.lock``
+    and re-reads the registry first, so processes do not overwrite each
+    other's changes.
     """
 
-    def __init__(self, registry_file="registry.json"):
+    def __init__(self, registry_file="registry.json", multi_process=False):
         """
         Initializes the DatabaseRegistry.
 
         Args:
             registry_file (str): The path to the JSON file used for persistence.
+            multi_process (bool): Whether other processes may change the registry at the same time.
         """
         self.registry_file = registry_file
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(registry_file + ".lock") if multi_process else None
         self.indexes = {}  # Stores metadata about indexes
         self.schema = {}  # Stores metadata about the data schema
         self.endpoints = {}  # Stores metadata about API endpoints
@@ -42,30 +55,44 @@ class DatabaseRegistry:
         """
         Saves the registry to a JSON file.
         """
+        registry = {"indexes": self.indexes, "schema": self.schema, "endpoints": self.endpoints}
         try:
-            with open(self.registry_file, 'w') as f:
-                json.dump({"indexes": self.indexes, "schema": self.schema, "endpoints": self.endpoints}, f, indent=4)
+            write_atomic(self.registry_file, lambda f: json.dump(registry, f, indent=4))
         except Exception as e:
             print(f"Error saving registry to JSON file: {e}")
 
-    def add_index_info(self, index_name, index_info):
+    @contextmanager
+    def _updating(self):
+        """
+        Holds the registry's locks for the duration of a change, re-reading
+        it first if other processes may have changed it.
+        """
+        with self._lock:
+            if self._file_lock is None:
+                yield
+                return
+            with self._file_lock:
+                self.load_registry()
+                yield
+
+    def add_index_info(self, index_name, field, index_type="hash", description=""):
         """
         Adds information about an index.
 
         Args:
             index_name (str): The name of the index.
-            index_info (dict): A dictionary containing metadata about the index.
+            field (str or list): The indexed field, or fields for a compound index.
+            index_type (str): The type of the index.
+            description (str): A description of the index.
 
         Raises:
             ValueError: If index_name already exists
-            TypeError: If index_info is not a dict
         """
-        if not isinstance(index_info, dict):
-            raise TypeError("index_info must be a dictionary")
-        if index_name in self.indexes:
-            raise ValueError(f"Index '{index_name}' already exists")
-        self.indexes[index_name] = index_info
-        self.save_registry()
+        with self._updating():
+            if index_name in self.indexes:
+                raise ValueError(f"Index '{index_name}' already exists")
+            self.indexes[index_name] = {"field": field, "index_type": index_type, "description": description}
+            self.save_registry()
 
     def get_index_info(self, index_name):
         """
@@ -89,11 +116,12 @@ class DatabaseRegistry:
         Raises:
             ValueError: If index_name does not exists
         """
-        if index_name not in self.indexes:
-            raise ValueError(f"Index '{index_name}' does not exists")
-        if index_name in self.indexes:
-            del self.indexes[index_name]
-            self.save_registry()
+        with self._updating():
+            if index_name not in self.indexes:
+                raise ValueError(f"Index '{index_name}' does not exists")
+            if index_name in self.indexes:
+                del self.indexes[index_name]
+                self.save_registry()
 
     def add_schema_info(self, schema_name, schema_info):
         """
@@ -107,12 +135,13 @@ class DatabaseRegistry:
             ValueError: If schema_name already exists
             TypeError: If schema_info is not a dict
         """
-        if not isinstance(schema_info, dict):
-            raise TypeError("schema_info must be a dictionary")
-        if schema_name in self.schema:
-            raise ValueError(f"Schema '{schema_name}' already exists")
-        self.schema[schema_name] = schema_info
-        self.save_registry()
+        with self._updating():
+            if not isinstance(schema_info, dict):
+                raise TypeError("schema_info must be a dictionary")
+            if schema_name in self.schema:
+                raise ValueError(f"Schema '{schema_name}' already exists")
+            self.schema[schema_name] = schema_info
+            self.save_registry()
 
     def get_schema_info(self, schema_name):
         """
@@ -136,11 +165,12 @@ class DatabaseRegistry:
         Raises:
             ValueError: If schema_name does not exists
         """
-        if schema_name not in self.schema:
-            raise ValueError(f"Schema '{schema_name}' does not exists")
-        if schema_name in self.schema:
-            del self.schema[schema_name]
-            self.save_registry()
+        with self._updating():
+            if schema_name not in self.schema:
+                raise ValueError(f"Schema '{schema_name}' does not exists")
+            if schema_name in self.schema:
+                del self.schema[schema_name]
+                self.save_registry()
 
     def add_endpoint_info(self, endpoint_name, endpoint_info):
         """
@@ -154,12 +184,13 @@ class DatabaseRegistry:
             ValueError: If endpoint_name already exists
             TypeError: If endpoint_info is not a dict
         """
-        if not isinstance(endpoint_info, dict):
-            raise TypeError("endpoint_info must be a dictionary")
-        if endpoint_name in self.endpoints:
-            raise ValueError(f"Endpoint '{endpoint_name}' already exists")
-        self.endpoints[endpoint_name] = endpoint_info
-        self.save_registry()
+        with self._updating():
+            if not isinstance(endpoint_info, dict):
+                raise TypeError("endpoint_info must be a dictionary")
+            if endpoint_name in self.endpoints:
+                raise ValueError(f"Endpoint '{endpoint_name}' already exists")
+            self.endpoints[endpoint_name] = endpoint_info
+            self.save_registry()
 
     def get_endpoint_info(self, endpoint_name):
         """
@@ -183,8 +214,9 @@ class DatabaseRegistry:
         Raises:
             ValueError: If endpoint_name does not exists
         """
-        if endpoint_name not in self.endpoints:
-            raise ValueError(f"Endpoint '{endpoint_name}' does not exists")
-        if endpoint_name in self.endpoints:
-            del self.endpoints[endpoint_name]
-            self.save_registry()
\ No newline at end of file
+        with self._updating():
+            if endpoint_name not in self.endpoints:
+                raise ValueError(f"Endpoint '{endpoint_name}' does not exists")
+            if endpoint_name in self.endpoints:
+                del self.endpoints[endpoint_name]
+                self.save_registry()
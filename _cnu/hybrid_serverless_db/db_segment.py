@@ -0,0 +1,376 @@
+"""
+Segment files: a snapshot format read through mmap, one document at a time.
+
+A segment file holds:
+
+* a header line, ``HSDBSEG1``;
+* one record per document: the JSON-encoded document ID, a tab, the
+  JSON-encoded document and a newline (JSON never contains a raw tab, so
+  the ID can be read without parsing the document);
+* an offset table sorted by ID hash, stored as three little-endian columns:
+  the 64-bit ID hashes, the 64-bit record offsets and the 32-bit record
+  lengths;
+* a footer with the document count and the table's offset.
+
+Opening a segment reads only its footer, so it takes the same time however
+large the database is. A lookup binary-searches the hash column in the
+mapped file (with bisect, in C, on little-endian machines) and decodes just
+the requested record.
+
+SegmentStore presents a segment as a mutable mapping of documents: writes
+made since the segment was written are kept in an in-memory overlay, and
+recently decoded documents in a bounded LRU cache.
+"""
+import hashlib
+import json
+import mmap
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+SEGMENT_MAGIC = b"HSDBSEG1"
+_HEADER = SEGMENT_MAGIC + b"\n"
+_HASH = struct.Struct("<Q")
+_OFFSET = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+_ENTRY_SIZE = _HASH.size + _OFFSET.size + _LENGTH.size
+_FOOTER = struct.Struct("<QQ8s")  # Document count, table offset, magic
+
+_DELETED = object()
+_ABSENT = object()
+
+
+def encode_id(doc_id):
+    """
+    Encodes a document ID as it is stored in a record.
+
+    Args:
+        doc_id: The document ID.
+
+    Returns:
+        bytes: The JSON-encoded ID.
+    """
+    return json.dumps(doc_id).encode()
+
+
+def id_hash(encoded_id):
+    """
+    Hashes an encoded document ID for the offset table.
+
+    Python's hash() is randomized per process, so a stable hash is used.
+
+    Args:
+        encoded_id (bytes): The ID from encode_id.
+
+    Returns:
+        int: A 64-bit hash.
+    """
+    return int.from_bytes(hashlib.blake2b(encoded_id, digest_size=8).digest(), "little")
+
+
+def is_segment(path):
+    """
+    Checks whether a file is a segment file.
+
+    Args:
+        path (str): The file's path.
+
+    Returns:
+        bool: True if the file starts with the segment header.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def write_segment(f, data):
+    """
+    Writes documents to an open file in segment format.
+
+    Documents of a SegmentStore that have not changed since its segment
+    was written are copied as raw bytes, without being decoded.
+
+    Args:
+        f: A file opened for binary writing.
+        data (Mapping): Documents by ID.
+    """
+    f.write(_HEADER)
+    offset = len(_HEADER)
+    entries = []
+
+    def write_record(hashed, record):
+        nonlocal offset
+        f.write(record)
+        entries.append((hashed, offset, len(record)))
+        offset += len(record)
+
+    if isinstance(data, SegmentStore):
+        changes = data._changes
+        for encoded_id, record_offset, length in data._raw_records():
+            if changes and json.loads(encoded_id) in changes:
+                continue
+            write_record(id_hash(encoded_id), data._mm[record_offset:record_offset + length])
+        items = ((doc_id, doc) for doc_id, doc in data._changes.items() if doc is not _DELETED)
+    else:
+        items = data.items()
+
+    for doc_id, doc in items:
+        encoded_id = encode_id(doc_id)
+        record = encoded_id + b"\t" + json.dumps(doc, separators=(",", ":")).encode() + b"\n"
+        write_record(id_hash(encoded_id), record)
+
+    entries.sort()
+    table_offset = offset
+    for column, typecode in enumerate("QQI"):
+        values = array(typecode, (entry[column] for entry in entries))
+        if sys.byteorder != "little":
+            values.byteswap()
+        f.write(values.tobytes())
+    f.write(_FOOTER.pack(len(entries), table_offset, SEGMENT_MAGIC))
+
+
+class _Column:
+    """A read-only sequence over a column of little-endian 64-bit integers, for big-endian machines."""
+
+    def __init__(self, buffer, offset, count):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, position):
+        return _HASH.unpack_from(self._buffer, self._offset + position * _HASH.size)[0]
+
+
+class SegmentStore(MutableMapping):
+    """
+    A mutable mapping of documents backed by a memory-mapped segment file.
+
+    Any number of threads may read at once, alongside one writing thread.
+
+    Attributes:
+        path (str): The segment file.
+        cache_size (int): The maximum number of decoded documents kept in the LRU cache.
+    """
+
+    def __init__(self, path, cache_size=10000):
+        """
+        Opens a segment file.
+
+        Args:
+            path (str): The segment file.
+            cache_size (int): The maximum number of decoded documents to cache.
+
+        Raises:
+            ValueError: If the file is not a valid segment.
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()  # Readers in several threads share the cache
+        self._changes = {}  # Document ID -> document, or _DELETED, since the segment was written
+        self._mm = None
+        self._hashes = None
+        self._open()
+
+    def _open(self):
+        """Maps the segment file and reads its footer."""
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < len(_HEADER) + _FOOTER.size or self._mm[:len(_HEADER)] != _HEADER:
+            self._close()
+            raise ValueError(f"{self.path} is not a segment file")
+        count, table_offset, magic = _FOOTER.unpack_from(self._mm, len(self._mm) - _FOOTER.size)
+        if magic != SEGMENT_MAGIC or table_offset + count * _ENTRY_SIZE + _FOOTER.size != len(self._mm):
+            self._close()
+            raise ValueError(f"{self.path} has a corrupt segment footer")
+        self._count = count
+        self._table_offset = table_offset
+        self._offsets_at = table_offset + count * _HASH.size
+        self._lengths_at = self._offsets_at + count * _OFFSET.size
+        self._length = count
+        if sys.byteorder == "little":
+            self._hashes = memoryview(self._mm)[table_offset:self._offsets_at].cast("Q")
+        else:
+            self._hashes = _Column(self._mm, table_offset, count)
+
+    def _close(self):
+        """Unmaps the segment file."""
+        if self._mm is not None:
+            if isinstance(self._hashes, memoryview):
+                self._hashes.release()  # The map cannot close while a view of it exists
+            self._hashes = None
+            self._mm.close()
+            self._mm = None
+
+    def reopened(self):
+        """
+        Opens the freshly written segment at this store's path as a new store.
+
+        The new segment must hold the documents this store currently
+        presents, so the cached documents are carried over. This store
+        keeps its own mapping of the old file and stays readable.
+
+        Returns:
+            SegmentStore: The new store.
+        """
+        store = SegmentStore(self.path, self.cache_size)
+        with self._cache_lock:
+            store._cache.update(self._cache)
+        return store
+
+    def close(self):
+        """Unmaps the segment file; the store must not be used afterwards."""
+        self._close()
+
+    def _find(self, doc_id):
+        """Returns the (offset, length) of a document's record in the segment, or None."""
+        encoded_id = encode_id(doc_id)
+        hashed = id_hash(encoded_id)
+        hashes = self._hashes
+        position = bisect_left(hashes, hashed)
+        prefix = encoded_id + b"\t"
+        while position < self._count and hashes[position] == hashed:
+            offset = _OFFSET.unpack_from(self._mm, self._offsets_at + position * _OFFSET.size)[0]
+            if self._mm[offset:offset + len(prefix)] == prefix:
+                return offset, _LENGTH.unpack_from(self._mm, self._lengths_at + position * _LENGTH.size)[0]
+            position += 1
+        return None
+
+    def _in_segment(self, doc_id):
+        """Checks whether a document is in the segment, ignoring the overlay."""
+        return self._find(doc_id) is not None
+
+    def _decode(self, offset, length):
+        """Decodes a record into its document ID and document."""
+        record = self._mm[offset:offset + length]
+        tab = record.index(b"\t")
+        return json.loads(record[:tab]), json.loads(record[tab + 1:])
+
+    def _raw_records(self):
+        """Yields (encoded document ID, record offset, record length) for every record, in file order."""
+        mm = self._mm
+        offset = len(_HEADER)
+        end = self._table_offset
+        while offset < end:
+            newline = mm.find(b"\n", offset, end)
+            tab = mm.find(b"\t", offset, newline)
+            yield mm[offset:tab], offset, newline + 1 - offset
+            offset = newline + 1
+
+    def _records(self):
+        """Yields (document ID, record offset, record length) for every record, in file order."""
+        for encoded_id, offset, length in self._raw_records():
+            yield json.loads(encoded_id), offset, length
+
+    def __getitem__(self, doc_id):
+        change = self._changes.get(doc_id, _ABSENT)
+        if change is not _ABSENT:
+            if change is _DELETED:
+                raise KeyError(doc_id)
+            return change
+        with self._cache_lock:
+            doc = self._cache.get(doc_id, _ABSENT)
+            if doc is not _ABSENT:
+                self._cache.move_to_end(doc_id)
+                return doc
+        span = self._find(doc_id)
+        if span is None:
+            raise KeyError(doc_id)
+        doc = self._decode(*span)[1]
+        with self._cache_lock:
+            # A writer may have replaced the document since it was decoded;
+            # caching the old version would outlive the overlay entry
+            if doc_id in self._changes:
+                return doc
+            self._cache[doc_id] = doc
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return doc
+
+    def __contains__(self, doc_id):
+        change = self._changes.get(doc_id, _ABSENT)
+        if change is not _ABSENT:
+            return change is not _DELETED
+        return doc_id in self._cache or self._in_segment(doc_id)
+
+    def __setitem__(self, doc_id, doc):
+        if doc_id not in self:
+            self._length += 1
+        with self._cache_lock:
+            self._changes[doc_id] = doc
+            self._cache.pop(doc_id, None)
+
+    def __delitem__(self, doc_id):
+        if doc_id not in self:
+            raise KeyError(doc_id)
+        self._length -= 1
+        with self._cache_lock:
+            self._changes[doc_id] = _DELETED
+            self._cache.pop(doc_id, None)
+
+    def pop(self, doc_id, default=_ABSENT):
+        if doc_id not in self:
+            if default is _ABSENT:
+                raise KeyError(doc_id)
+            return default
+        doc = self[doc_id]
+        del self[doc_id]
+        return doc
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        # A copy, so a document written during the scan is yielded only once
+        changes = dict(self._changes)
+        for doc_id, _, _ in self._records():
+            if doc_id not in changes:
+                yield doc_id
+        for doc_id, doc in changes.items():
+            if doc is not _DELETED:
+                yield doc_id
+
+    def items(self):
+        """
+        Iterates over every (document ID, document) pair without filling the cache.
+
+        Returns:
+            iterator: The pairs, segment documents first in file order.
+        """
+        return self._items()
+
+    def _items(self):
+        changes = dict(self._changes)
+        for doc_id, offset, length in self._records():
+            if doc_id not in changes:
+                yield self._decode(offset, length)
+        for doc_id, doc in changes.items():
+            if doc is not _DELETED:
+                yield doc_id, doc
+
+    def values(self):
+        """
+        Iterates over every document without filling the cache.
+
+        Returns:
+            iterator: The documents.
+        """
+        return (doc for _, doc in self._items())
+
+    def cache_info(self):
+        """
+        Reports the store's memory use.
+
+        Returns:
+            dict: The cached document count, cache size and overlay size.
+        """
+        return {"cached": len(self._cache), "cache_size": self.cache_size, "changes": len(self._changes)}
@@ -0,0 +1,444 @@
+"""
+Storage engine for the hybrid serverless database.
+
+Documents live in a snapshot file (the database's JSON file) plus an
+append-only write-ahead log next to it (``<db_file>.wal``). Every commit is
+one log line holding its operations, so a write costs one append instead of
+a rewrite of the whole database. When the log outgrows the snapshot it is
+compacted: the current documents are written to a new snapshot, which
+atomically replaces the old one, and the log is truncated. Recovery loads
+the snapshot and replays the log over it.
+
+Several processes may share a log: each appends under the database's file
+lock and reads the commits the others appended with read_new().
+
+The snapshot is either a JSON object, loaded whole into a dict, or a
+segment file (see db_segment), memory-mapped and decoded one document at a
+time. Recovery detects the format; compaction writes the configured one,
+so a database converts on its next compaction.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+from _cnu.hybrid_serverless_db.db_segment import SegmentStore, is_segment, write_segment
+
+logger = logging.getLogger("hybrid_serverless_db")
+
+# Log operations: ["put", doc_id, doc] and ["del", doc_id]
+OP_PUT = "put"
+OP_DELETE = "del"
+
+SYNC_MODES = ("group", "interval", "none")
+SNAPSHOT_FORMATS = ("json", "segment")
+
+
+def encode_commit(ops):
+    """
+    Encodes a commit as one log line: a CRC32 of the payload, then the payload.
+
+    Args:
+        ops (list): The commit's operations.
+
+    Returns:
+        bytes: The log line, including its trailing newline.
+    """
+    payload = json.dumps(ops, separators=(",", ":")).encode()
+    return b"%08x " % zlib.crc32(payload) + payload + b"\n"
+
+
+def decode_commit(line):
+    """
+    Decodes a log line written by encode_commit.
+
+    Args:
+        line (bytes): The log line, with or without its trailing newline.
+
+    Returns:
+        list: The commit's operations, or None if the line is torn or corrupt.
+    """
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def document_id(doc_id):
+    """
+    Returns the key a document is stored under.
+
+    JSON snapshots can only hold string keys, so an integer ID is stored
+    as its decimal string, both in the log and in memory; otherwise a
+    document would change keys at its next compaction.
+
+    Args:
+        doc_id (str or int): The document's ID.
+
+    Returns:
+        str: The document's key.
+
+    Raises:
+        ValueError: If the ID is neither a string nor an integer.
+    """
+    if isinstance(doc_id, str):
+        return doc_id
+    if isinstance(doc_id, int) and not isinstance(doc_id, bool):
+        return str(doc_id)
+    raise ValueError(f"Document ID {doc_id!r} must be a string or an integer")
+
+
+def apply_commit(data, ops):
+    """
+    Applies a commit's operations to a document dictionary.
+
+    Replaying a commit is idempotent, so a log may be replayed over a
+    snapshot that already contains some of its commits.
+
+    Args:
+        data (dict): Documents by ID, updated in place.
+        ops (list): The commit's operations.
+    """
+    for op in ops:
+        if op[0] == OP_PUT:
+            data[op[1]] = op[2]
+        elif op[0] == OP_DELETE:
+            data.pop(op[1], None)
+
+
+def write_atomic(path, write, binary=False):
+    """
+    Writes a file so that readers see either the old file or the new one.
+
+    The content is written to a temporary file, fsynced and renamed over path.
+
+    Args:
+        path (str): The file to write.
+        write (callable): Called with the open temporary file to write the content.
+        binary (bool): Whether to open the file in binary mode.
+    """
+    temp_file = path + ".tmp"
+    with open(temp_file, "wb" if binary else "w") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+    _sync_directory(path)
+
+
+def write_json_atomic(path, obj):
+    """
+    Writes an object as JSON so that readers see either the old file or the new one.
+
+    Args:
+        path (str): The file to write.
+        obj: The JSON-serializable object.
+    """
+    write_atomic(path, lambda f: json.dump(obj, f, separators=(",", ":")))
+
+
+def _sync_directory(path):
+    """Fsyncs the directory holding path so a rename into it is durable."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class LogStorage:
+    """
+    Snapshot plus write-ahead log persistence for a document dictionary.
+
+    Commits are appended with a single write. How they reach the disk
+    depends on sync_mode:
+
+    * ``"group"``: each commit returns once it is fsynced; commits from
+      concurrent threads share one fsync (group commit).
+    * ``"interval"``: the log is fsynced at most every sync_interval
+      seconds, on a later commit or on close. A process crash loses
+      nothing; a power failure may lose the last interval's commits.
+    * ``"none"``: fsync is left to the operating system.
+
+    Attributes:
+        snapshot_file (str): The path of the snapshot file.
+        log_file (str): The path of the write-ahead log.
+        log_bytes (int): The current size of the log.
+        snapshot_bytes (int): The size of the snapshot.
+        fsyncs (int): The number of log fsyncs so far.
+        replayed_ids (set): The document IDs written by the commits replayed on recovery.
+        stamp (list): The snapshot_stamp() of the snapshot last recovered or
+            written by this process; another process may have replaced it since.
+    """
+
+    def __init__(self, snapshot_file, sync_mode="interval", sync_interval=0.05,
+                 compact_min_bytes=64 * 1024 * 1024, compact_ratio=1.0, snapshot_format="json",
+                 cache_size=10000):
+        """
+        Initializes the storage. Call recover() before committing.
+
+        Args:
+            snapshot_file (str): The path of the snapshot file.
+            sync_mode (str): One of SYNC_MODES.
+            sync_interval (float): Seconds between fsyncs in "interval" mode.
+            compact_min_bytes (int): The log is never compacted below this size.
+            compact_ratio (float): Compact once the log is this many times the snapshot's size.
+            snapshot_format (str): The format compaction writes, one of SNAPSHOT_FORMATS.
+            cache_size (int): Decoded documents a segment snapshot keeps cached.
+
+        Raises:
+            ValueError: If sync_mode or snapshot_format is invalid.
+        """
+        if sync_mode not in SYNC_MODES:
+            raise ValueError(f"Invalid sync mode: {sync_mode}")
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Invalid snapshot format: {snapshot_format}")
+        self.snapshot_file = snapshot_file
+        self.log_file = snapshot_file + ".wal"
+        self.sync_mode = sync_mode
+        self.sync_interval = sync_interval
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_ratio = compact_ratio
+        self.snapshot_format = snapshot_format
+        self.cache_size = cache_size
+        self.log_bytes = 0
+        self.snapshot_bytes = 0
+        self.fsyncs = 0
+        self.replayed_ids = set()
+        self._fd = None
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0      # Commits written to the log
+        self._synced = 0       # Commits known to be on disk
+        self._last_sync = time.monotonic()
+        self.stamp = None
+
+    def recover(self):
+        """
+        Loads the snapshot and replays the log over it.
+
+        A torn or corrupt record ends the replay, and the log is truncated
+        before it so new commits are not appended after garbage.
+
+        Returns:
+            dict or SegmentStore: The recovered documents by ID.
+
+        Raises:
+            ValueError: If the snapshot is not valid JSON or a valid segment.
+        """
+        self.close()
+        data = {}
+        self.stamp = self.snapshot_stamp()
+        if is_segment(self.snapshot_file):
+            data = SegmentStore(self.snapshot_file, self.cache_size)
+            self.snapshot_bytes = os.path.getsize(self.snapshot_file)
+        elif os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, "r") as f:
+                    data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Error decoding JSON from {self.snapshot_file}: {e}")
+            self.snapshot_bytes = os.path.getsize(self.snapshot_file)
+
+        valid_bytes = 0
+        replayed = 0
+        self.replayed_ids = set()
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "rb") as f:
+                for line in f:
+                    ops = decode_commit(line)
+                    if ops is None:
+                        logger.warning(
+                            f"Truncating {self.log_file} at byte {valid_bytes}: torn or corrupt record")
+                        break
+                    apply_commit(data, ops)
+                    self.replayed_ids.update(op[1] for op in ops)
+                    valid_bytes += len(line)
+                    replayed += 1
+
+        # O_APPEND: other processes sharing the log may have extended it since
+        self._fd = os.open(self.log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.ftruncate(self._fd, valid_bytes)
+        self.log_bytes = valid_bytes
+        if replayed:
+            logger.info(f"Replayed {replayed} commits from {self.log_file}")
+        return data
+
+    def commit(self, ops):
+        """
+        Appends a commit to the log. Its operations are recovered all or none.
+
+        Args:
+            ops (list): The operations, e.g. [["put", doc_id, doc], ["del", doc_id]].
+        """
+        self.sync_commit(self.append(ops))
+
+    def append(self, ops):
+        """
+        Writes a commit to the log without waiting for it to reach the disk.
+
+        Args:
+            ops (list): The commit's operations.
+
+        Returns:
+            int: The commit's sequence number, to pass to sync_commit().
+        """
+        line = encode_commit(ops)
+        with self._write_lock:
+            os.write(self._fd, line)
+            self.log_bytes += len(line)
+            self._written += 1
+            return self._written
+
+    def sync_commit(self, lsn):
+        """
+        Waits until an appended commit is as durable as the sync mode promises.
+
+        Args:
+            lsn (int): The sequence number append() returned.
+        """
+        if self.sync_mode == "group":
+            self._sync_to(lsn)
+        elif self.sync_mode == "interval" and time.monotonic() - self._last_sync >= self.sync_interval:
+            self._sync_to(lsn)
+
+    def read_new(self, truncate=False):
+        """
+        Reads the commits other processes appended to the log since it was last read.
+
+        A record still being written, or torn, ends the read; it is read
+        again next time unless truncate is set.
+
+        Args:
+            truncate (bool): Whether to cut a torn record off the end of the
+                log. Only safe while holding the database's file lock.
+
+        Returns:
+            list: The new commits' operations, oldest first, or None if
+            another process has compacted the log since, in which case
+            recover() must be called instead.
+        """
+        stamp = self.snapshot_stamp()
+        if stamp != self.stamp:
+            return None
+        size = os.path.getsize(self.log_file)
+        if size < self.log_bytes:
+            return None
+        commits = []
+        valid_bytes = self.log_bytes
+        if size > valid_bytes:
+            with open(self.log_file, "rb") as f:
+                f.seek(valid_bytes)
+                for line in f:
+                    ops = decode_commit(line)
+                    if ops is None:
+                        if truncate:
+                            logger.warning(
+                                f"Truncating {self.log_file} at byte {valid_bytes}: torn or corrupt record")
+                            os.ftruncate(self._fd, valid_bytes)
+                        break
+                    commits.append(ops)
+                    valid_bytes += len(line)
+        # Compaction renames the new snapshot into place before emptying the
+        # log, so a read that overlapped it sees a new stamp here
+        if self.snapshot_stamp() != stamp:
+            return None
+        self.log_bytes = valid_bytes
+        return commits
+
+    def _sync_to(self, lsn):
+        """Fsyncs the log unless another thread's fsync already covered commit lsn."""
+        with self._sync_lock:
+            if self._synced >= lsn:
+                return
+            target = self._written
+            os.fsync(self._fd)
+            self.fsyncs += 1
+            self._synced = target
+            self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Forces every written commit to disk."""
+        if self._fd is not None:
+            self._sync_to(self._written)
+
+    def should_compact(self):
+        """
+        Checks whether the log has grown enough to be worth compacting.
+
+        Compacting once the log reaches a multiple of the snapshot's size
+        keeps the amortized cost of a write constant.
+
+        Returns:
+            bool: True if compact() should be called.
+        """
+        return self.log_bytes >= max(self.compact_min_bytes, self.compact_ratio * self.snapshot_bytes)
+
+    def compact(self, data):
+        """
+        Writes the documents as the new snapshot and empties the log.
+
+        The snapshot is written to a temporary file and renamed over the old
+        one, so a crash leaves either the old snapshot and the full log or
+        the new snapshot (with a log whose replay is idempotent).
+
+        Args:
+            data (dict or SegmentStore): The current documents by ID.
+
+        Returns:
+            dict or SegmentStore: The documents, read from the new snapshot
+            if it is a segment; use this in place of data from now on. A
+            SegmentStore passed in is left open and unchanged.
+        """
+        with self._write_lock:
+            if self.snapshot_format == "segment":
+                write_atomic(self.snapshot_file, lambda f: write_segment(f, data), binary=True)
+                if isinstance(data, SegmentStore) and data.path == self.snapshot_file:
+                    data = data.reopened()
+                else:
+                    data = SegmentStore(self.snapshot_file, self.cache_size)
+            else:
+                if not isinstance(data, dict):
+                    data = dict(data.items())
+                write_json_atomic(self.snapshot_file, data)
+            self.snapshot_bytes = os.path.getsize(self.snapshot_file)
+            self.stamp = self.snapshot_stamp()
+            if self._fd is not None:
+                os.ftruncate(self._fd, 0)
+                os.fsync(self._fd)
+                self._synced = self._written
+            self.log_bytes = 0
+        return data
+
+    def snapshot_stamp(self):
+        """
+        Identifies the current snapshot, so files derived from it can tell whether they are stale.
+
+        Every compaction renames a new file into place, which changes the stamp.
+
+        Returns:
+            list: The snapshot's inode, size and modification time, or None if there is no snapshot.
+        """
+        try:
+            stat = os.stat(self.snapshot_file)
+        except FileNotFoundError:
+            return None
+        return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+    def close(self):
+        """Syncs and closes the log."""
+        if self._fd is None:
+            return
+        self.sync()
+        os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,275 @@
+"""
+This module contains tests for transactions, snapshots and concurrent access.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from _cnu.hybrid_serverless_db.db_concurrency import ReadWriteLock
+from _cnu.hybrid_serverless_db.db_core import DocumentDatabase
+from _cnu.hybrid_serverless_db.db_registry import DatabaseRegistry
+
+
+def increment_counter(db_file, times):
+    """
+    Increments the "counter" document's value in transactions, from another process.
+    """
+    db = DocumentDatabase(db_file, multi_process=True)
+    # Compact often, so the other processes have to reload
+    db.storage.compact_min_bytes = 2000
+    for i in range(times):
+        with db.transaction() as txn:
+            doc = txn.get_data("counter")
+            txn.update_data("counter", {"id": "counter", "value": doc["value"] + 1})
+            txn.add_data({"id": f"{os.getpid()}-{i}", "type": "log"})
+    db.close()
+
+
+def add_registry_endpoints(registry_file, prefix, count):
+    """
+    Adds endpoints to a registry shared with other processes.
+    """
+    registry = DatabaseRegistry(registry_file, multi_process=True)
+    for i in range(count):
+        registry.add_endpoint_info(f"{prefix}-{i}", {"method": "GET"})
+
+
+class TestConcurrency(unittest.TestCase):
+    """
+    Tests for DocumentDatabase transactions and snapshots, and for sharing a database between threads and processes.
+    """
+
+    def setUp(self):
+        """
+        Creates a database in a temporary directory.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "db.json")
+        self.db = DocumentDatabase(self.db_file)
+
+    def tearDown(self):
+        """
+        Closes the database and removes the temporary directory.
+        """
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def test_transaction_commits_atomically(self):
+        """
+        Test that a transaction's writes are applied and recovered together, and discarded on error.
+        """
+        self.db.add_data_batch([{"id": "a", "balance": 10}, {"id": "b", "balance": 0}])
+        with self.db.transaction() as txn:
+            txn.update_data("a", {"id": "a", "balance": 4})
+            txn.update_data("b", {"id": "b", "balance": 6})
+            txn.add_data({"id": "c", "balance": 0})
+            txn.delete_data("c")
+            self.assertEqual(txn.get_data("a")["balance"], 4)
+            self.assertEqual(self.db.get_data("a")["balance"], 10)  # Not visible until committed
+            with self.assertRaises(ValueError):
+                txn.get_data("c")
+
+        with self.assertRaises(ValueError):
+            with self.db.transaction() as txn:
+                txn.update_data("a", {"id": "a", "balance": 0})
+                txn.add_data({"id": "b"})  # Already exists
+
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.add_data({"id": "d"})  # The thread's transaction holds the writer lock
+
+        self.db.close()
+        self.db = DocumentDatabase(self.db_file)
+        self.assertEqual({doc_id: doc["balance"] for doc_id, doc in self.db.data.items()}, {"a": 4, "b": 6})
+
+    def test_snapshot_isolation(self):
+        """
+        Test that a snapshot keeps reading the documents as they were when it was opened.
+        """
+        self.db.add_data_batch([{"id": str(i), "type": "even" if i % 2 == 0 else "odd", "value": i}
+                                for i in range(20)])
+        self.db.create_index("type")
+        self.db.create_index("value", "sorted")
+        before = {doc_id: dict(doc) for doc_id, doc in self.db.data.items()}
+
+        with self.db.snapshot() as snapshot:
+            self.db.update_data("2", {"id": "2", "type": "odd", "value": 100})
+            self.db.delete_data("4")
+            self.db.add_data({"id": "new", "type": "even", "value": -1})
+            with self.db.transaction() as txn:
+                txn.update_data("6", {"id": "6", "type": "even", "value": 7})
+                txn.update_data("7", {"id": "7", "type": "even", "value": 6})
+
+            self.assertEqual(dict(snapshot.items()), before)
+            self.assertEqual(len(snapshot), 20)
+            self.assertEqual(snapshot.get_data("4"), before["4"])
+            with self.assertRaises(ValueError):
+                snapshot.get_data("new")
+            self.assertEqual(sorted(doc["id"] for doc in snapshot.find({"type": "even"})),
+                             sorted(doc_id for doc_id, doc in before.items() if doc["type"] == "even"))
+            self.assertEqual([doc["value"] for doc in snapshot.find({"value": {"$gte": 3}}, sort="value", limit=4)],
+                             [3, 4, 5, 6])
+
+        self.assertEqual(self.db.get_data("2")["value"], 100)
+        self.assertEqual([doc["id"] for doc in self.db.find({"value": {"$gte": 3}}, sort="value", limit=4)],
+                         ["3", "5", "7", "6"])
+
+    def test_writes_while_iterating_find(self):
+        """
+        Test that find() results reflect the database as of the call, even when written to while being consumed.
+        """
+        self.db.add_data_batch([{"id": f"{i:03d}", "value": i} for i in range(300)])
+        self.db.create_index("value", "sorted")
+        ids = []
+        for doc in self.db.find({"value": {"$gte": 100}}, sort="value", limit=150):
+            ids.append(doc["id"])
+            if doc["value"] % 10 == 0:
+                # Moves a later document to the front of the index and adds new ones
+                self.db.update_data(f"{doc['value'] + 5:03d}", {"id": "moved", "value": -1})
+                self.db.add_data({"id": f"new-{doc['value']}", "value": doc["value"] + 1})
+        self.assertEqual(ids, [f"{i:03d}" for i in range(100, 250)])
+
+    def test_snapshot_iteration_during_writes(self):
+        """
+        Test that iterating a snapshot of a segment store lists each document once while transactions run.
+        """
+        self.db.close()
+        self.db = DocumentDatabase(self.db_file, storage_format="segment")
+        ids = [str(i) for i in range(500)]
+        self.db.add_data_batch([{"id": doc_id, "version": 0} for doc_id in ids])
+        self.db.save_data()
+        stop = threading.Event()
+
+        def write(offset):
+            version = 0
+            while not stop.is_set():
+                version += 1
+                with self.db.transaction() as txn:
+                    for doc_id in ids[offset::10]:
+                        txn.update_data(doc_id, {"id": doc_id, "version": version})
+
+        writers = [threading.Thread(target=write, args=(offset,)) for offset in range(2)]
+        for thread in writers:
+            thread.start()
+        try:
+            for _ in range(100):
+                with self.db.snapshot() as snapshot:
+                    self.assertEqual(sorted(snapshot), sorted(ids))
+                    self.assertEqual(len(list(snapshot.items())), len(ids))
+        finally:
+            stop.set()
+            for thread in writers:
+                thread.join()
+
+    def test_concurrent_threads(self):
+        """
+        Test that transfers in many threads stay serializable and readers only see consistent snapshots.
+        """
+        accounts = 10
+        self.db.add_data_batch([{"id": str(i), "kind": "account", "balance": 100} for i in range(accounts)])
+        self.db.create_index("kind")
+        errors = []
+        stop = threading.Event()
+
+        def transfer(seed):
+            for i in range(200):
+                source, target = str((seed + i) % accounts), str((seed * 7 + i * 3 + 1) % accounts)
+                if source == target:
+                    continue
+                with self.db.transaction() as txn:
+                    a, b = txn.get_data(source), txn.get_data(target)
+                    txn.update_data(source, dict(a, balance=a["balance"] - 1))
+                    txn.update_data(target, dict(b, balance=b["balance"] + 1))
+
+        def audit():
+            try:
+                while not stop.is_set():
+                    total = sum(doc["balance"] for doc in self.db.find({"kind": "account"}))
+                    if total != accounts * 100:
+                        errors.append(total)
+            except Exception as e:
+                errors.append(e)
+
+        auditors = [threading.Thread(target=audit) for _ in range(2)]
+        writers = [threading.Thread(target=transfer, args=(seed,)) for seed in range(6)]
+        for thread in auditors + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in auditors:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(doc["balance"] for doc in self.db.data.values()), accounts * 100)
+
+    def test_multiple_processes(self):
+        """
+        Test that transactions in several processes sharing a database do not lose each other's writes.
+        """
+        self.db.close()
+        self.db = DocumentDatabase(self.db_file, multi_process=True)
+        self.db.add_data({"id": "counter", "value": 0})
+        self.db.create_index("type")
+
+        context = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+        processes = [context.Process(target=increment_counter, args=(self.db_file, 50)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertTrue(all(process.exitcode == 0 for process in processes))
+
+        # The open database picks up the other processes' commits, even across compactions
+        self.assertEqual(self.db.get_data("counter")["value"], 150)
+        self.assertEqual(len(self.db.query("type", "log")), 150)
+        self.db.close()
+        self.db = DocumentDatabase(self.db_file)
+        self.assertEqual(self.db.get_data("counter")["value"], 150)
+        self.assertEqual(len(self.db.data), 151)
+
+        registry_file = os.path.join(self.directory, "registry.json")
+        DatabaseRegistry(registry_file)
+        processes = [context.Process(target=add_registry_endpoints, args=(registry_file, prefix, 20))
+                     for prefix in ("a", "b")]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(len(DatabaseRegistry(registry_file).endpoints), 40)
+
+    def test_read_write_lock(self):
+        """
+        Test that the write lock excludes readers, and that both locks are re-entrant but not upgradable.
+        """
+        lock = ReadWriteLock()
+        events = []
+        with lock.read():
+            with lock.read():
+                writer = threading.Thread(target=lambda: (lock.acquire_write(), events.append("write"),
+                                                          lock.release_write()))
+                writer.start()
+                writer.join(0.1)
+                self.assertEqual(events, [])
+            with self.assertRaises(RuntimeError):
+                lock.acquire_write()
+        writer.join()
+        self.assertEqual(events, ["write"])
+
+        with lock.write():
+            with lock.read():
+                with lock.write():
+                    reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append("read"),
+                                                              lock.release_read()))
+                    reader.start()
+                    reader.join(0.1)
+                    self.assertEqual(events, ["write"])
+        reader.join()
+        self.assertEqual(events, ["write", "read"])
+
+
+if __name__ == '__main__':
+    unittest.main()
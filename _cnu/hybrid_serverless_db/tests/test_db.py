@@ -2,6 +2,7 @@
 This module contains the test suite for the Hybrid Serverless Database.
 It uses the unittest framework to define and run various test cases.
 """
+import glob
 import unittest
 import os
 import json
@@ -40,10 +41,13 @@ class TestHybridServerlessDB(unittest.TestCase):
 
     def tearDown(self):
         """
-        Teardown after each test case. Removes the test database and registry files.
+        Teardown after each test case. Removes the test database, its write-ahead log, index and registry files.
         """
+        self.api.close()
         if os.path.exists(self.db_file):
             os.remove(self.db_file)
+        for path in glob.glob(glob.escape(self.db_file) + ".*"):
+            os.remove(path)
         if os.path.exists(self.registry_file):
             os.remove(self.registry_file)
 
@@ -0,0 +1,136 @@
+"""
+This module contains tests for the secondary indexes of DocumentDatabase.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from _cnu.hybrid_serverless_db.db_core import DocumentDatabase
+from _cnu.hybrid_serverless_db.db_index import HashIndex, SortedIndex
+
+
+class TestIndexes(unittest.TestCase):
+    """
+    Tests for hash, sorted and compound indexes and their persistence.
+    """
+
+    def setUp(self):
+        """
+        Creates a database with a few documents in a temporary directory.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "db.json")
+        self.db = DocumentDatabase(self.db_file)
+        self.db.add_data_batch([
+            {"id": "1", "type": "event", "name": "alpha", "timestamp": 30},
+            {"id": "2", "type": "log", "name": "beta", "timestamp": 10},
+            {"id": "3", "type": "event", "name": "alphabet", "timestamp": 20},
+            {"id": "4", "type": "record", "timestamp": 40},
+        ])
+
+    def tearDown(self):
+        """
+        Closes the database and removes the temporary directory.
+        """
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def test_hash_index(self):
+        """
+        Test equality lookups and that writes keep a hash index consistent.
+        """
+        self.db.create_index("type")
+        self.assertEqual(sorted(self.db.create_query("type", "event")), ["1", "3"])
+        self.db.update_data("1", {"id": "1", "type": "log"})
+        self.db.delete_data("3")
+        self.db.add_data({"id": "5", "type": "event"})
+        self.assertEqual(self.db.create_query("type", "event"), ["5"])
+        self.assertEqual(sorted(self.db.create_query("type", "log")), ["1", "2"])
+        with self.assertRaises(ValueError):
+            self.db.query_range("type", "a", "z")
+
+    def test_sorted_index(self):
+        """
+        Test range, prefix and ordered scans on a sorted index.
+        """
+        self.db.create_index("timestamp", "b-tree")
+        ids = lambda docs: [doc["id"] for doc in docs]
+        self.assertEqual(ids(self.db.query_range("timestamp", 15, 35)), ["3", "1"])
+        self.assertEqual(ids(self.db.query_range("timestamp", 20, 40, include_low=False, include_high=False)), ["1"])
+        self.assertEqual(ids(self.db.query_range("timestamp", reverse=True, limit=2)), ["4", "1"])
+        self.assertEqual(self.db.create_query("timestamp", 10), ["2"])
+
+        # None is an indexed value like any other, not a missing bound
+        self.db.add_data({"id": "5", "timestamp": None})
+        self.assertEqual(self.db.create_query("timestamp", None), ["5"])
+        self.assertEqual([doc["id"] for doc in self.db.query("timestamp", None)], ["5"])
+
+        self.db.create_index("name", "sorted")
+        self.assertEqual(ids(self.db.query_prefix("name", "alpha")), ["1", "3"])
+        self.assertEqual(list(self.db.get_index("name").scan()), ["1", "3", "2"])
+
+    def test_compound_index(self):
+        """
+        Test lookups and leading-field prefixes on compound indexes.
+        """
+        self.db.create_index(["type", "timestamp"], "sorted", name="type_time")
+        self.assertEqual(self.db.create_query("type_time", ["event", 20]), ["3"])
+        self.assertEqual([doc["id"] for doc in self.db.query_prefix("type_time", ["event"])], ["3", "1"])
+        self.db.create_index(["type", "name"])
+        self.assertEqual(self.db.create_query("type,name", ("log", "beta")), ["2"])
+        # Document 4 has no name, so it is not in the compound index
+        self.assertNotIn("4", self.db.get_index("type,name"))
+
+    def test_indexes_persist_and_load_lazily(self):
+        """
+        Test that indexes are persisted on compaction and caught up with later writes when loaded.
+        """
+        self.db.create_index("type")
+        self.db.create_index("timestamp", "sorted")
+        self.db.save_data()
+        self.db.add_data({"id": "5", "type": "event", "timestamp": 5})
+        self.db.delete_data("1")
+        self.db.close()
+
+        self.db = DocumentDatabase(self.db_file)
+        self.assertEqual(self.db.indexes, {})
+        self.assertEqual(sorted(self.db.create_query("type", "event")), ["3", "5"])
+        self.assertIsInstance(self.db.indexes["type"], HashIndex)
+        self.assertEqual(list(self.db.get_index("timestamp").scan()), ["5", "2", "3", "4"])
+        self.assertIsInstance(self.db.indexes["timestamp"], SortedIndex)
+
+    def test_stale_index_file_is_rebuilt(self):
+        """
+        Test that an index file written for an older snapshot is not trusted.
+        """
+        self.db.create_index("type")
+        self.db.save_data()
+        index_path = self.db._index_path("type")
+        with open(index_path, "r") as f:
+            stale = f.read()
+        self.db.add_data({"id": "5", "type": "event"})
+        self.db.save_data()
+        with open(index_path, "w") as f:
+            f.write(stale)
+        self.db.close()
+
+        self.db = DocumentDatabase(self.db_file)
+        self.assertEqual(sorted(self.db.create_query("type", "event")), ["1", "3", "5"])
+
+    def test_delete_index(self):
+        """
+        Test that deleting an index removes its definition and file.
+        """
+        self.db.create_index("type")
+        self.db.save_data()
+        with self.assertRaises(ValueError):
+            self.db.create_index("type")
+        self.db.delete_index("type")
+        self.assertFalse(os.path.exists(self.db._index_path("type")))
+        with self.assertRaises(ValueError):
+            self.db.get_index("type")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+This module contains tests for declarative queries and the query planner.
+"""
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from _cnu.hybrid_serverless_db.db_core import DocumentDatabase
+from _cnu.hybrid_serverless_db.db_query import compile_filter, compile_predicate
+
+
+class TestQuery(unittest.TestCase):
+    """
+    Tests for DocumentDatabase.find and explain.
+    """
+
+    def setUp(self):
+        """
+        Creates a database of sample documents with a few indexes.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.db = DocumentDatabase(os.path.join(self.directory, "db.json"))
+        rng = random.Random(7)
+        docs = []
+        for i in range(500):
+            doc = {
+                "id": f"{i:04d}",
+                "type": rng.choice(["event", "log", "record"]),
+                "category": rng.choice(["system", "user", "network"]),
+                "timestamp": rng.randrange(1000),
+                "name": rng.choice(["alpha", "alphabet", "beta", "gamma"]) + str(i % 10),
+            }
+            if i % 7 == 0:
+                del doc["timestamp"]
+            docs.append(doc)
+        self.db.add_data_batch(docs)
+        self.db.create_index("type")
+        self.db.create_index("timestamp", "sorted")
+        self.db.create_index("name", "sorted")
+        self.db.create_index(["type", "category"], name="type_category")
+
+    def tearDown(self):
+        """
+        Closes the database and removes the temporary directory.
+        """
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def assertMatchesScan(self, spec):
+        """
+        Asserts that find() returns exactly the documents a full scan matches.
+        """
+        test = compile_predicate(compile_filter(spec))
+        expected = sorted(doc_id for doc_id, doc in self.db.data.items() if test(doc))
+        self.assertEqual(sorted(doc["id"] for doc in self.db.find(spec)), expected, spec)
+
+    def test_filters_match_full_scan(self):
+        """
+        Test that indexed plans return the same documents as a full scan.
+        """
+        filters = [
+            {"type": "event"},
+            {"type": "event", "category": "user"},
+            {"type": {"$in": ["log", "record"]}, "timestamp": {"$gte": 100, "$lt": 300}},
+            {"timestamp": {"$gt": 900}},
+            {"timestamp": {"$lte": 5}},
+            {"name": {"$prefix": "alpha"}},
+            {"$or": [{"type": "log"}, {"timestamp": {"$lt": 50}}]},
+            {"$or": [{"type": "log"}, {"category": "system"}]},
+            {"$and": [{"type": "event"}, {"$not": {"category": "user"}}]},
+            {"timestamp": {"$exists": False}},
+            {"category": {"$nin": ["user"]}, "type": {"$ne": "log"}},
+            {"timestamp": {"$gt": "a"}},
+        ]
+        for spec in filters:
+            self.assertMatchesScan(spec)
+
+    def test_compound_index_missing_trailing_field(self):
+        """
+        Test that a compound index on a prefix of the filter's fields does not hide documents missing the others.
+        """
+        self.db.create_index(["type", "timestamp"], "sorted", name="type_timestamp")
+        self.assertTrue(any("timestamp" not in doc and doc["type"] == "event" for doc in self.db.data.values()))
+        self.assertMatchesScan({"type": "event"})
+        self.assertMatchesScan({"type": "event", "category": "user"})
+        self.assertMatchesScan({"type": "event", "timestamp": 5})
+
+    def test_none_operands_on_sorted_index(self):
+        """
+        Test that None in an equality or $in is matched exactly on a sorted index, without duplicates.
+        """
+        self.db.add_data_batch([{"id": "z1", "z": None}, {"id": "z2", "z": "a"}, {"id": "z3", "z": "b"}])
+        self.db.create_index("z", "sorted")
+        for spec in ({"z": None}, {"z": {"$in": [None, "a"]}}, {"z": {"$in": ["b", None, "a"]}}):
+            self.assertMatchesScan(spec)
+            self.assertEqual(len(list(self.db.find(spec))), self.db.explain(spec)["input"]["estimate"], spec)
+
+    def test_writes_are_visible(self):
+        """
+        Test that indexed queries see documents written after the indexes were built.
+        """
+        self.db.add_data({"id": "new", "type": "event", "category": "user", "timestamp": 2000})
+        self.db.delete_data("0001")
+        self.assertEqual([doc["id"] for doc in self.db.find({"timestamp": {"$gte": 2000}})], ["new"])
+        self.assertMatchesScan({"type": "event", "category": "user"})
+
+    def test_sort_limit_projection(self):
+        """
+        Test sorting, limits and projection, and that documents missing the sort field come last.
+        """
+        docs = list(self.db.find(sort=[["timestamp", -1]], limit=3, projection=["id", "timestamp"]))
+        self.assertEqual([doc["timestamp"] for doc in docs],
+                         sorted((d["timestamp"] for d in self.db.data.values() if "timestamp" in d), reverse=True)[:3])
+        self.assertEqual(set(docs[0]), {"id", "timestamp"})
+
+        docs = list(self.db.find({"type": "log"}, sort=["category", ["timestamp", -1]]))
+        # Within each category: descending timestamps, then the documents without one
+        keys = [(doc["category"], "timestamp" not in doc, -doc.get("timestamp", 0)) for doc in docs]
+        self.assertEqual(keys, sorted(keys))
+
+        ascending = list(self.db.find(sort="timestamp"))
+        self.assertEqual(len(ascending), len(self.db.data))
+        self.assertNotIn("timestamp", ascending[-1])
+
+    def test_explain(self):
+        """
+        Test that explain shows the indexes the planner chose.
+        """
+        plan = self.db.explain({"type": "event", "category": "user"})
+        self.assertEqual(plan["stage"], "FETCH")
+        self.assertEqual(plan["input"]["stage"], "INTERSECT")
+        self.assertEqual(plan["input"]["inputs"][0]["index"], "type_category")
+
+        plan = self.db.explain({"timestamp": {"$gte": 10, "$lt": 20}}, sort=[["timestamp", -1]], limit=2,
+                               projection=["id"])
+        self.assertEqual([plan["stage"], plan["input"]["stage"], plan["input"]["input"]["stage"]],
+                         ["PROJECT", "LIMIT", "SORT"])
+        self.assertEqual(plan["input"]["input"]["method"], "index order")
+        source = plan["input"]["input"]["input"]["input"]
+        self.assertEqual(source["stage"], "INDEX_RANGE")
+        self.assertTrue(source["reverse"])
+
+        self.assertEqual(self.db.explain({"category": "user"})["input"]["stage"], "FULL_SCAN")
+        self.assertEqual(self.db.explain({"category": "user"}, sort="timestamp")["input"]["input"]["stage"],
+                         "INDEX_SCAN")
+
+    def test_results_are_lazy(self):
+        """
+        Test that find() only fetches documents as results are consumed, stopping at the limit.
+        """
+        fetched = []
+
+        class CountingDict(dict):
+            def get(self, key, default=None):
+                fetched.append(key)
+                return super().get(key, default)
+
+        self.db.data = CountingDict(self.db.data)
+        results = self.db.find({"timestamp": {"$gte": 0}}, sort="timestamp", limit=2)
+        self.assertEqual(fetched, [])
+        self.assertEqual(len(list(results)), 2)
+        self.assertEqual(len(fetched), 2)
+
+    def test_invalid_queries(self):
+        """
+        Test that malformed filters, sorts and limits are rejected.
+        """
+        with self.assertRaises(ValueError):
+            self.db.find({"type": {"$regex": "e"}})
+        with self.assertRaises(ValueError):
+            self.db.find({"$or": []})
+        with self.assertRaises(ValueError):
+            self.db.find(sort=[["type", 2]])
+        with self.assertRaises(ValueError):
+            self.db.find(limit=-1)
+
+    def test_query_with_filter_dict(self):
+        """
+        Test that query() accepts a filter dictionary as well as a function.
+        """
+        results = self.db.query("type", "event", {"category": "user"})
+        self.assertTrue(results)
+        self.assertTrue(all(doc["type"] == "event" and doc["category"] == "user" for doc in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
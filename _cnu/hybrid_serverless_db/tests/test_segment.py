@@ -0,0 +1,179 @@
+"""
+This module contains tests for the memory-mapped segment snapshot format.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from _cnu.hybrid_serverless_db.db_core import DocumentDatabase
+from _cnu.hybrid_serverless_db.db_segment import SegmentStore, is_segment, write_segment
+
+
+class TestSegmentStorage(unittest.TestCase):
+    """
+    Tests for SegmentStore and DocumentDatabase with storage_format="segment".
+    """
+
+    def setUp(self):
+        """
+        Creates a temporary directory for the database files.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "db.seg")
+
+    def tearDown(self):
+        """
+        Removes the temporary directory.
+        """
+        shutil.rmtree(self.directory)
+
+    def open(self, **kwargs):
+        """
+        Opens the test database in segment format.
+        """
+        return DocumentDatabase(self.db_file, storage_format="segment", **kwargs)
+
+    def test_round_trip(self):
+        """
+        Test that documents written before and after compaction are read back.
+        """
+        db = self.open()
+        db.add_data_batch([{"id": str(i), "value": i, "text": "café\ttab"} for i in range(200)])
+        db.save_data()
+        self.assertIsInstance(db.data, SegmentStore)
+        db.update_data("5", {"id": "5", "value": -5})
+        db.delete_data("6")
+        db.add_data({"id": "new", "value": 1000})
+        db.close()
+
+        db = self.open()
+        self.assertTrue(is_segment(self.db_file))
+        self.assertEqual(len(db.data), 200)
+        self.assertEqual(db.get_data("7"), {"id": "7", "value": 7, "text": "café\ttab"})
+        self.assertEqual(db.get_data("5"), {"id": "5", "value": -5})
+        self.assertEqual(db.get_data("new")["value"], 1000)
+        self.assertNotIn("6", db.data)
+        with self.assertRaises(ValueError):
+            db.get_data("6")
+
+        db.save_data()
+        self.assertEqual(db.data.cache_info()["changes"], 0)
+        self.assertEqual(sorted(db.data, key=str), sorted([str(i) for i in range(200) if i != 6] + ["new"], key=str))
+        self.assertEqual(dict(db.data.items())["5"], {"id": "5", "value": -5})
+        db.close()
+
+    def test_cache_is_bounded(self):
+        """
+        Test that only cache_size decoded documents are kept.
+        """
+        db = self.open(cache_size=10)
+        db.add_data_batch([{"id": str(i)} for i in range(100)])
+        db.save_data()
+        for i in range(100):
+            db.get_data(str(i))
+        self.assertEqual(db.data.cache_info()["cached"], 10)
+        db.close()
+
+    def test_read_racing_a_write_is_not_cached(self):
+        """
+        Test that a document replaced while being read is not cached, nor carried over by compaction.
+        """
+        with open(self.db_file, "wb") as f:
+            write_segment(f, {"a": {"version": 0}})
+        store = SegmentStore(self.db_file)
+        decode = store._decode
+
+        def decode_then_write(offset, length):
+            # Another thread replaces the document between the read and the caching
+            result = decode(offset, length)
+            writer = threading.Thread(target=store.__setitem__, args=("a", {"version": 1}))
+            writer.start()
+            writer.join()
+            return result
+
+        store._decode = decode_then_write
+        self.assertEqual(store["a"], {"version": 0})
+        self.assertEqual(store["a"], {"version": 1})
+        self.assertEqual(store.cache_info()["cached"], 0)
+
+        with open(self.db_file + ".new", "wb") as f:
+            write_segment(f, store)
+        os.replace(self.db_file + ".new", self.db_file)
+        reopened = store.reopened()
+        self.assertEqual(reopened["a"], {"version": 1})
+        reopened.close()
+        store.close()
+
+    def test_write_during_iteration(self):
+        """
+        Test that a document written while the store is iterated is listed once.
+        """
+        with open(self.db_file, "wb") as f:
+            write_segment(f, {str(i): {"version": 0} for i in range(10)})
+        store = SegmentStore(self.db_file)
+        keys = iter(store)
+        listed = [next(keys)]
+        store[listed[0]] = {"version": 1}
+        store["9" if listed[0] != "9" else "0"] = {"version": 1}
+        listed.extend(keys)
+        self.assertEqual(sorted(listed), [str(i) for i in range(10)])
+        store.close()
+
+    def test_converts_json_snapshot(self):
+        """
+        Test that a JSON snapshot is read and rewritten as a segment on compaction, and back.
+        """
+        db = DocumentDatabase(self.db_file)
+        db.add_data({"id": "1", "value": "a"})
+        db.save_data()
+        db.close()
+
+        db = self.open()
+        self.assertEqual(db.get_data("1"), {"id": "1", "value": "a"})
+        db.save_data()
+        db.close()
+        self.assertTrue(is_segment(self.db_file))
+
+        db = DocumentDatabase(self.db_file)
+        self.assertEqual(db.get_data("1"), {"id": "1", "value": "a"})
+        db.save_data()
+        db.close()
+        with open(self.db_file, "r") as f:
+            self.assertEqual(json.load(f), {"1": {"id": "1", "value": "a"}})
+
+    def test_indexes_and_queries(self):
+        """
+        Test that indexes and planned queries work over a segment.
+        """
+        db = self.open()
+        db.add_data_batch([{"id": str(i), "type": "even" if i % 2 == 0 else "odd", "n": i} for i in range(50)])
+        db.create_index("type")
+        db.create_index("n", "sorted")
+        db.save_data()
+        db.close()
+
+        db = self.open()
+        self.assertEqual([doc["n"] for doc in db.find({"type": "odd", "n": {"$gt": 40}}, sort="n")],
+                         [41, 43, 45, 47, 49])
+        self.assertEqual(len(list(db.find({"n": {"$lt": 10}}))), 10)
+        db.close()
+
+    def test_corrupt_segment_is_rejected(self):
+        """
+        Test that a truncated segment is rejected rather than misread.
+        """
+        db = self.open()
+        db.add_data({"id": "1"})
+        db.save_data()
+        db.close()
+        with open(self.db_file, "r+b") as f:
+            f.truncate(os.path.getsize(self.db_file) - 4)
+        with self.assertRaises(ValueError):
+            self.open()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+This module contains tests for the write-ahead log storage engine used by DocumentDatabase.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from _cnu.hybrid_serverless_db.db_core import DocumentDatabase
+from _cnu.hybrid_serverless_db.db_storage import LogStorage, encode_commit
+
+
+class TestLogStorage(unittest.TestCase):
+    """
+    Tests for LogStorage recovery, compaction and DocumentDatabase persistence.
+    """
+
+    def setUp(self):
+        """
+        Creates a temporary directory for the database files.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "db.json")
+
+    def tearDown(self):
+        """
+        Removes the temporary directory.
+        """
+        shutil.rmtree(self.directory)
+
+    def test_writes_survive_reopen(self):
+        """
+        Test that adds, updates and deletes are recovered from the log.
+        """
+        db = DocumentDatabase(self.db_file)
+        db.add_data({"id": "1", "value": "a"})
+        db.add_data({"id": "2", "value": "b"})
+        db.update_data("1", {"id": "1", "value": "c"})
+        db.delete_data("2")
+        db.close()
+
+        with open(self.db_file, "r") as f:
+            self.assertEqual(json.load(f), {})
+        reopened = DocumentDatabase(self.db_file)
+        self.assertEqual(reopened.data, {"1": {"id": "1", "value": "c"}})
+        reopened.close()
+
+    def test_integer_ids_keep_their_key_across_compaction(self):
+        """
+        Test that integer document IDs are stored as strings, so compacted and logged documents are found alike.
+        """
+        db = DocumentDatabase(self.db_file)
+        db.add_data({"id": 1, "value": "compacted"})
+        db.save_data()
+        db.add_data({"id": 2, "value": "logged"})
+        with self.assertRaises(ValueError):
+            db.add_data({"id": "1"})  # The same document as 1
+        with self.assertRaises(ValueError):
+            db.add_data({"id": 1.5})
+        db.close()
+
+        db = DocumentDatabase(self.db_file)
+        self.assertEqual(sorted(db.data), ["1", "2"])
+        self.assertEqual(db.get_data(1)["value"], "compacted")
+        self.assertEqual(db.get_data("2")["value"], "logged")
+        db.update_data(2, {"id": 2, "value": "updated"})
+        db.delete_data(1)
+        db.save_data()
+        db.close()
+
+        db = DocumentDatabase(self.db_file)
+        self.assertEqual(db.data, {"2": {"id": 2, "value": "updated"}})
+        db.close()
+
+    def test_torn_tail_is_truncated(self):
+        """
+        Test that a partially written commit is dropped and new commits follow the last valid one.
+        """
+        db = DocumentDatabase(self.db_file)
+        db.add_data({"id": "1"})
+        db.close()
+        with open(self.db_file + ".wal", "ab") as f:
+            f.write(encode_commit([["put", "2", {"id": "2"}]])[:-5])
+
+        db = DocumentDatabase(self.db_file)
+        self.assertEqual(list(db.data), ["1"])
+        db.add_data({"id": "3"})
+        db.close()
+        self.assertEqual(sorted(DocumentDatabase(self.db_file).data), ["1", "3"])
+
+    def test_batch_is_one_commit(self):
+        """
+        Test that a batch is logged as a single commit and rejected as a whole on duplicate IDs.
+        """
+        db = DocumentDatabase(self.db_file)
+        db.add_data_batch([{"id": str(i)} for i in range(10)])
+        with self.assertRaises(ValueError):
+            db.add_data_batch([{"id": "10"}, {"id": "0"}])
+        db.close()
+        with open(self.db_file + ".wal", "rb") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(len(DocumentDatabase(self.db_file).data), 10)
+
+    def test_compaction(self):
+        """
+        Test that compaction folds the log into the snapshot and keeps the data.
+        """
+        storage = LogStorage(self.db_file, compact_min_bytes=1000)
+        data = storage.recover()
+        for i in range(100):
+            ops = [["put", str(i), {"id": str(i), "payload": "x" * 20}]]
+            storage.commit(ops)
+            data[str(i)] = ops[0][2]
+            if storage.should_compact():
+                storage.compact(data)
+        self.assertLess(storage.log_bytes, 1000)
+        self.assertGreater(storage.snapshot_bytes, 0)
+        storage.close()
+
+        self.assertEqual(LogStorage(self.db_file).recover(), data)
+
+    def test_compaction_keeps_triggering_write(self):
+        """
+        Test that the write which triggers compaction is part of the new snapshot.
+        """
+        db = DocumentDatabase(self.db_file)
+        db.storage.compact_min_bytes = 500
+        for i in range(50):
+            db.add_data({"id": str(i)})
+        db.close()
+        self.assertEqual(len(DocumentDatabase(self.db_file).data), 50)
+
+    def test_group_sync_mode(self):
+        """
+        Test that commits in group sync mode are synced before they return.
+        """
+        storage = LogStorage(self.db_file, sync_mode="group")
+        storage.recover()
+        storage.commit([["put", "1", {"id": "1"}]])
+        self.assertEqual(storage._synced, storage._written)
+        storage.close()
+
+    def test_invalid_sync_mode(self):
+        """
+        Test that an unknown sync mode is rejected.
+        """
+        with self.assertRaises(ValueError):
+            LogStorage(self.db_file, sync_mode="sometimes")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,9 @@ import logging
 import numpy as np
 import json
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
 from typing import Dict, List, Tuple, Optional, Any, Union
 from enum import Enum
 
@@ -182,13 +185,31 @@ class EmotionalDimensionalityModel:
         self.model_name = "BaseEDFModel"
         self.dimensions = [dim.value for dim in EmotionalDimension]
         self.contextual_dimensions = [dim.value for dim in ContextualDimension]
+        
+        # Models with the same tokenizer_id produce identical tokens for a
+        # text, so the framework tokenizes once and shares the result.
+        # None means the model does its own tokenization inside analyze().
+        self.tokenizer_id = None
+    
+    def tokenize(self, text: str) -> List[str]:
+        """Split text into the tokens consumed by analyze().
+        
+        Args:
+            text: The text to tokenize
+            
+        Returns:
+            List of tokens
+        """
+        return text.lower().split()
     
-    def analyze(self, text: str, context: Dict = None) -> EmotionalState:
+    def analyze(self, text: str, context: Dict = None,
+                tokens: List[str] = None) -> EmotionalState:
         """Analyze text to produce an emotional state representation.
         
         Args:
             text: The text to analyze
             context: Optional contextual information
+            tokens: Pre-computed tokens for text (optional)
             
         Returns:
             EmotionalState representing the analysis
@@ -201,12 +222,14 @@ class EmotionalDimensionalityModel:
         return state
     
     def batch_analyze(self, texts: List[str], 
-                     contexts: List[Dict] = None) -> List[EmotionalState]:
+                     contexts: List[Dict] = None,
+                     tokens: List[List[str]] = None) -> List[EmotionalState]:
         """Analyze multiple texts in batch.
         
         Args:
             texts: List of texts to analyze
             contexts: Optional list of context dictionaries
+            tokens: Optional list of pre-computed tokens, one per text
             
         Returns:
             List of EmotionalState objects
@@ -218,8 +241,11 @@ class EmotionalDimensionalityModel:
             context = None
             if contexts and i < len(contexts):
                 context = contexts[i]
-                
-            results.append(self.analyze(text, context))
+            
+            if tokens is not None and self.tokenizer_id is not None:
+                results.append(self.analyze(text, context, tokens=tokens[i]))
+            else:
+                results.append(self.analyze(text, context))
             
         return results
 
@@ -235,6 +261,7 @@ class RuleBasedEDFModel(EmotionalDimensionalityModel):
         """
         super().__init__()
         self.model_name = "RuleBasedEDF"
+        self.tokenizer_id = "whitespace_lower"
         
         # Load lexicon if provided
         self.lexicon = {}
@@ -295,18 +322,20 @@ class RuleBasedEDFModel(EmotionalDimensionalityModel):
         }
         logger.info("Created default lexicon")
     
-    def analyze(self, text: str, context: Dict = None) -> EmotionalState:
+    def analyze(self, text: str, context: Dict = None,
+                tokens: List[str] = None) -> EmotionalState:
         """Analyze text using rule-based approach.
         
         Args:
             text: Text to analyze
             context: Optional contextual information
+            tokens: Pre-computed tokens for text (optional)
             
         Returns:
             EmotionalState representing the analysis
         """
         state = EmotionalState()
-        words = text.lower().split()
+        words = tokens if tokens is not None else self.tokenize(text)
         
         # Count matches from lexicon
         matches = 0
@@ -430,12 +459,14 @@ class NeuralEDFModel(EmotionalDimensionalityModel):
             logger.error(f"Error loading model: {e}")
             return False
     
-    def analyze(self, text: str, context: Dict = None) -> EmotionalState:
+    def analyze(self, text: str, context: Dict = None,
+                tokens: List[str] = None) -> EmotionalState:
         """Analyze text using neural model.
         
         Args:
             text: Text to analyze
             context: Optional contextual information
+            tokens: Pre-computed tokens for text (optional)
             
         Returns:
             EmotionalState representing the analysis
@@ -464,11 +495,13 @@ class NeuralEDFModel(EmotionalDimensionalityModel):
             # Generate pseudo-random output based on text characteristics
             import hashlib
             text_hash = int(hashlib.md5(text.encode()).hexdigest(), 16)
-            np.random.seed(text_hash % 2**32)
+            # Local generator rather than the global seed, so concurrent
+            # analyses (e.g. from compare_models) don't interfere
+            rng = np.random.RandomState(text_hash % 2**32)
             
             # Generate dimension values
-            dimension_scores = np.random.uniform(-1, 1, len(self.dimensions))
-            contextual_scores = np.random.uniform(0, 1, len(self.contextual_dimensions))
+            dimension_scores = rng.uniform(-1, 1, len(self.dimensions))
+            contextual_scores = rng.uniform(0, 1, len(self.contextual_dimensions))
             
             # Set the dimensions
             for i, dim in enumerate(self.dimensions):
@@ -496,12 +529,14 @@ class NeuralEDFModel(EmotionalDimensionalityModel):
         return state
     
     def batch_analyze(self, texts: List[str], 
-                     contexts: List[Dict] = None) -> List[EmotionalState]:
+                     contexts: List[Dict] = None,
+                     tokens: List[List[str]] = None) -> List[EmotionalState]:
         """Analyze multiple texts in batch for efficiency.
         
         Args:
             texts: List of texts to analyze
             contexts: Optional list of context dictionaries
+            tokens: Optional list of pre-computed tokens, one per text
             
         Returns:
             List of EmotionalState objects
@@ -510,7 +545,7 @@ class NeuralEDFModel(EmotionalDimensionalityModel):
         
         if not self.model_loaded:
             # Fall back to individual analysis if model not loaded
-            return super().batch_analyze(texts, contexts)
+            return super().batch_analyze(texts, contexts, tokens)
         
         try:
             # This is a placeholder for actual batch inference
@@ -549,6 +584,13 @@ class EmotionalDimensionalityFramework:
         self.models = {}
         self.default_model = None
         
+        # Worker pool shared by compare_models/compare_models_batch,
+        # created lazily on first comparison
+        self._executor = None
+        # Tasks that outlived their timeout and still hold a worker, by model ID
+        self._overrunning = {}
+        self._overrunning_lock = threading.Lock()
+        
         # Initialize with a rule-based model by default
         self.add_model("rule_based", RuleBasedEDFModel())
         self.set_default_model("rule_based")
@@ -564,6 +606,9 @@ class EmotionalDimensionalityFramework:
         """
         self.models[model_id] = model
         logger.info(f"Added model '{model_id}' ({model.model_name})")
+        
+        # Resize the comparison pool on next use to cover the new model
+        self.shutdown(wait=False)
     
     def set_default_model(self, model_id: str):
         """Set the default model for analysis.
@@ -605,22 +650,214 @@ class EmotionalDimensionalityFramework:
         # Run the analysis
         return self.models[model_id].analyze(text, context)
     
-    def compare_models(self, text: str, context: Dict = None) -> Dict[str, EmotionalState]:
+    def compare_models(self, text: str, context: Dict = None,
+                       timeout: float = None) -> Dict[str, EmotionalState]:
         """Compare analysis from all available models.
         
+        Models are evaluated concurrently on the shared worker pool, so the
+        comparison takes roughly as long as the slowest model. A model that
+        does not finish within its timeout is reported with a zero-confidence
+        placeholder state instead of holding up the other results.
+        
         Args:
             text: Text to analyze
             context: Optional contextual information
+            timeout: Seconds each model may take (defaults to the
+                'compare_timeout' config value; None waits indefinitely)
             
         Returns:
             Dictionary mapping model IDs to EmotionalState objects
         """
+        shared_tokens = self._shared_tokens([text])
+        
+        def submit(executor, model):
+            if model.tokenizer_id in shared_tokens:
+                return executor.submit(model.analyze, text, context,
+                                       tokens=shared_tokens[model.tokenizer_id][0])
+            return executor.submit(model.analyze, text, context)
+        
+        return self._run_concurrently(submit, timeout)
+    
+    def compare_models_batch(self, texts: List[str], contexts: List[Dict] = None,
+                             timeout: float = None) -> List[Dict[str, EmotionalState]]:
+        """Compare analysis from all available models over several texts.
+        
+        Each model receives the whole batch through batch_analyze, and the
+        models run concurrently on the shared worker pool.
+        
+        Args:
+            texts: List of texts to analyze
+            contexts: Optional list of context dictionaries
+            timeout: Seconds each model may take for the whole batch
+                (defaults to the 'compare_timeout' config value)
+            
+        Returns:
+            List with one dictionary per text, mapping model IDs to
+            EmotionalState objects
+        """
+        if not texts:
+            return []
+        
+        shared_tokens = self._shared_tokens(texts)
+        
+        def submit(executor, model):
+            if model.tokenizer_id in shared_tokens:
+                return executor.submit(model.batch_analyze, texts, contexts,
+                                       tokens=shared_tokens[model.tokenizer_id])
+            return executor.submit(model.batch_analyze, texts, contexts)
+        
+        results = self._run_concurrently(submit, timeout, batch_size=len(texts))
+        return [{model_id: states[i] for model_id, states in results.items()}
+                for i in range(len(texts))]
+    
+    def shutdown(self, wait: bool = True):
+        """Release the worker pool used for model comparison.
+        
+        Args:
+            wait: Whether to wait for running analyses to finish
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+    
+    def _get_executor(self):
+        """Get the shared worker pool, creating it on first use.
+        
+        The 'compare_executor' config value selects 'thread' (default) or
+        'process' workers; process workers require picklable models.
+        
+        Returns:
+            concurrent.futures Executor instance
+        """
+        if self._executor is None:
+            max_workers = self.config.get('compare_max_workers') or max(1, len(self.models))
+            if self.config.get('compare_executor', 'thread') == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                    thread_name_prefix='edf-compare')
+        return self._executor
+    
+    def _shared_tokens(self, texts: List[str]) -> Dict[str, List[List[str]]]:
+        """Tokenize texts once per distinct tokenizer among the models.
+        
+        Args:
+            texts: Texts to tokenize
+            
+        Returns:
+            Dictionary mapping tokenizer IDs to one token list per text
+        """
+        shared = {}
+        for model in self.models.values():
+            tokenizer_id = getattr(model, 'tokenizer_id', None)
+            if tokenizer_id is not None and tokenizer_id not in shared:
+                shared[tokenizer_id] = [model.tokenize(text) for text in texts]
+        return shared
+    
+    def _run_concurrently(self, submit, timeout: float = None,
+                          batch_size: int = None) -> Dict[str, Any]:
+        """Run one task per model on the worker pool and collect results.
+        
+        A model's timeout counts from when its task starts running, not
+        from when it was queued. A task that times out cannot be cancelled
+        and keeps its worker, so until it finishes the model is not given
+        new tasks and is reported as timed out straight away; otherwise one
+        hung model would fill the pool and starve the others.
+        
+        Args:
+            submit: Callable (executor, model) -> Future
+            timeout: Default per-model timeout in seconds; overridden per model
+                by the 'model_timeouts' config mapping
+            batch_size: Number of states each task returns (None for one)
+            
+        Returns:
+            Dictionary mapping model IDs to task results, with placeholder
+            states for models that timed out or failed
+        """
+        if timeout is None:
+            timeout = self.config.get('compare_timeout')
+        model_timeouts = self.config.get('model_timeouts', {})
+        
+        executor = self._get_executor()
         results = {}
+        futures = {}
+        with self._overrunning_lock:
+            for model_id, model in self.models.items():
+                previous = self._overrunning.get(model_id)
+                if previous is not None:
+                    if not previous.done():
+                        logger.warning(f"Model '{model_id}' is still running a timed-out analysis")
+                        results[model_id] = self._timeout_states(model_id, batch_size)
+                        continue
+                    del self._overrunning[model_id]
+                futures[submit(executor, model)] = model_id
+        
+        started = {}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            wait_for = None
+            for future in list(pending):
+                model_id = futures[future]
+                model_timeout = model_timeouts.get(model_id, timeout)
+                if model_timeout is None:
+                    continue
+                if future not in started:
+                    if not future.running():
+                        # Still queued; check again shortly
+                        wait_for = 0.01 if wait_for is None else min(wait_for, 0.01)
+                        continue
+                    started[future] = now
+                remaining = started[future] + model_timeout - now
+                if remaining <= 0 and not future.done():
+                    logger.warning(f"Model '{model_id}' timed out after {model_timeout}s")
+                    with self._overrunning_lock:
+                        self._overrunning[model_id] = future
+                    results[model_id] = self._timeout_states(model_id, batch_size)
+                    pending.discard(future)
+                else:
+                    remaining = max(0.0, remaining)
+                    wait_for = remaining if wait_for is None else min(wait_for, remaining)
+            if not pending:
+                break
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                model_id = futures[future]
+                try:
+                    results[model_id] = future.result()
+                except Exception as e:
+                    logger.error(f"Error during analysis with model '{model_id}': {e}")
+                    results[model_id] = self._placeholder_states(
+                        f"{self.models[model_id].model_name} (error)", 0.1, batch_size)
+        
+        return {model_id: results[model_id] for model_id in self.models if model_id in results}
+    
+    def _timeout_states(self, model_id: str, batch_size: int = None) -> Union[EmotionalState, List[EmotionalState]]:
+        """Build the placeholder states reported for a model that timed out."""
+        return self._placeholder_states(f"{self.models[model_id].model_name} (timeout)", 0.0, batch_size)
+    
+    @staticmethod
+    def _placeholder_states(source: str, confidence: float,
+                            batch_size: int = None) -> Union[EmotionalState, List[EmotionalState]]:
+        """Build neutral states standing in for a missing model result.
         
-        for model_id, model in self.models.items():
-            results[model_id] = model.analyze(text, context)
+        Args:
+            source: Source label for the states
+            confidence: Confidence to assign
+            batch_size: Number of states to build (None for a single state)
+            
+        Returns:
+            EmotionalState, or list of EmotionalState objects for batches
+        """
+        def make():
+            state = EmotionalState()
+            state.confidence = confidence
+            state.source = source
+            return state
         
-        return results
+        if batch_size is None:
+            return make()
+        return [make() for _ in range(batch_size)]
     
     def calculate_emotional_distance(self, state1: EmotionalState, 
                                     state2: EmotionalState) -> float:
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+
+from head_1.frameworks.emotional_dimensionality.___files.emotional_dimensionality import (
+    EmotionalDimensionalityFramework, EmotionalDimensionalityModel
+)
+
+
+class SleepingModel(EmotionalDimensionalityModel):
+    """Model whose analysis takes a fixed time, or until released."""
+
+    def __init__(self, name, seconds=None):
+        super().__init__()
+        self.model_name = name
+        self.seconds = seconds
+        self.release = threading.Event()
+        self.calls = 0
+
+    def analyze(self, text, context=None, tokens=None):
+        self.calls += 1
+        if self.seconds is None:
+            self.release.wait()
+        else:
+            time.sleep(self.seconds)
+        return super().analyze(text, context, tokens)
+
+
+class TestCompareModels(unittest.TestCase):
+    def test_hung_model_does_not_starve_others(self):
+        framework = EmotionalDimensionalityFramework()
+        hung = SleepingModel("hung")
+        framework.add_model("hung", hung)
+        try:
+            for _ in range(4):
+                results = framework.compare_models("I am happy", timeout=0.2)
+                self.assertEqual(results["hung"].source, "hung (timeout)")
+                self.assertEqual(results["hung"].confidence, 0.0)
+                self.assertNotIn("timeout", results["rule_based"].source)
+            # Not resubmitted while its first analysis still holds a worker
+            self.assertEqual(hung.calls, 1)
+
+            hung.release.set()
+            time.sleep(0.1)
+            hung.seconds = 0.0
+            self.assertEqual(framework.compare_models("I am happy", timeout=0.2)["hung"].source, "hung")
+            self.assertEqual(hung.calls, 2)
+        finally:
+            hung.release.set()
+            framework.shutdown()
+
+    def test_timeout_counts_from_task_start(self):
+        framework = EmotionalDimensionalityFramework({"compare_max_workers": 1})
+        del framework.models["rule_based"]
+        framework.add_model("first", SleepingModel("first", 0.3))
+        framework.add_model("second", SleepingModel("second", 0.1))
+        try:
+            # The second model waits 0.3s for the only worker, then runs well within its timeout
+            results = framework.compare_models("text", timeout=0.25 + 0.15)
+            self.assertEqual({model_id: state.source for model_id, state in results.items()},
+                             {"first": "first", "second": "second"})
+        finally:
+            framework.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,12 @@ COMPASS Framework API
 REST API for interacting with the COMPASS ethical framework.
 """
 
+import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from .compass_core import COMPASSFramework, Action
+import numpy as np
+from .compass_core import COMPASSFramework, Action, VectorizedConstraint
+from .compass_log import RetentionPolicy
 
 app = Flask(__name__)
 CORS(app)
@@ -22,11 +25,22 @@ DIRECTIVES = [
     "Environmental Sustainability"
 ]
 
-def no_harm_constraint(action: Action, environment: dict) -> bool:
-    # Placeholder: always returns True (no harm detected)
-    return True
+def no_harm_predicate(features: np.ndarray, environment: dict) -> np.ndarray:
+    # Placeholder: no harm detected for any action
+    return np.ones(len(features), dtype=bool)
 
-framework = COMPASSFramework(DIRECTIVES, [no_harm_constraint])
+no_harm_constraint = VectorizedConstraint([], no_harm_predicate, name="no_harm")
+
+# Decisions and metrics persist to COMPASS_LOG_PATH (SQLite) when set
+LOG_POLICY = RetentionPolicy(
+    tail_size=int(os.environ.get("COMPASS_LOG_TAIL", 1000)),
+    max_age_seconds=float(os.environ["COMPASS_LOG_MAX_AGE"]) if "COMPASS_LOG_MAX_AGE" in os.environ else None,
+    max_records=int(os.environ["COMPASS_LOG_MAX_RECORDS"]) if "COMPASS_LOG_MAX_RECORDS" in os.environ else None
+)
+MAX_PAGE_SIZE = 1000
+
+framework = COMPASSFramework(DIRECTIVES, [no_harm_constraint],
+                             log_path=os.environ.get("COMPASS_LOG_PATH"), log_policy=LOG_POLICY)
 
 @app.route("/api/compass/info", methods=["GET"])
 def info():
@@ -55,13 +69,26 @@ def decide():
         "outcome": result["outcome"]
     })
 
+def page_filters() -> dict:
+    # ?start=&end= (epoch seconds), ?action_id=, ?cursor= and ?limit=
+    args = request.args
+    return {
+        "start": args.get("start", type=float),
+        "end": args.get("end", type=float),
+        "action_id": args.get("action_id"),
+        "after": args.get("cursor", 0, type=int),
+        "limit": max(1, min(args.get("limit", 100, type=int), MAX_PAGE_SIZE))
+    }
+
 @app.route("/api/compass/logs", methods=["GET"])
 def logs():
-    return jsonify(framework.get_logs())
+    entries, next_cursor = framework.query_logs(**page_filters())
+    return jsonify({"entries": entries, "next_cursor": next_cursor})
 
 @app.route("/api/compass/metrics", methods=["GET"])
 def metrics():
-    return jsonify(framework.get_metrics())
+    entries, next_cursor = framework.query_metrics(**page_filters())
+    return jsonify({"entries": entries, "next_cursor": next_cursor})
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5100, debug=True)
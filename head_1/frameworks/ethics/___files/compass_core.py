@@ -11,7 +11,10 @@ Implements the COMPASS ethical architecture:
 
 import time
 import uuid
-from typing import Any, Dict, List, Optional, Callable
+import numpy as np
+from typing import Any, Dict, List, Optional, Callable, Sequence, Tuple
+
+from .compass_log import RecordLog, RetentionPolicy
 
 # --- Data Models ---
 
@@ -33,42 +36,143 @@ class ActionEvaluation:
         self.scores = scores
         self.explanation = explanation
 
-class CompassDecisionLog:
-    def __init__(self):
-        self.entries = []
+class ActionFeatures:
+    """Numeric action parameters as an (n_actions, n_features) matrix.
+
+    Missing or non-numeric parameters are NaN.
+    """
+    def __init__(self, actions: List[Action], feature_names: Sequence[str]):
+        self.actions = actions
+        self.feature_names = list(dict.fromkeys(feature_names))
+        self.columns = {name: i for i, name in enumerate(self.feature_names)}
+        self.matrix = np.full((len(actions), len(self.feature_names)), np.nan)
+        for row, action in enumerate(actions):
+            for name, value in action.parameters.items():
+                col = self.columns.get(name)
+                if col is not None and isinstance(value, (int, float)):
+                    self.matrix[row, col] = value
+
+    def select(self, features: Sequence[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Columns for the given features, optionally restricted to rows."""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return matrix[:, [self.columns[name] for name in features]]
+
+class VectorizedConstraint:
+    """Hard constraint declared as a predicate over the action feature matrix.
+
+    predicate(matrix, environment) receives one column per entry of
+    features and returns a boolean array with one entry per row.
+    Instances are also plain (action, environment) callables.
+    """
+    def __init__(self, features: Sequence[str], predicate: Callable[[np.ndarray, Dict], np.ndarray],
+                 name: str = ""):
+        self.features = list(features)
+        self.predicate = predicate
+        self.name = name or getattr(predicate, "__name__", "constraint")
+
+    def evaluate(self, features: ActionFeatures, environment: Dict,
+                 rows: Optional[np.ndarray] = None) -> np.ndarray:
+        matrix = features.select(self.features, rows)
+        return np.asarray(self.predicate(matrix, environment), dtype=bool).reshape(len(matrix))
+
+    def __call__(self, action: Action, environment: Dict) -> bool:
+        return bool(self.evaluate(ActionFeatures([action], self.features), environment)[0])
+
+class VectorizedScorer:
+    """Directive scorer declared as a function of the action feature matrix.
+
+    scorer(matrix, environment) returns one float score per row.
+    """
+    def __init__(self, features: Sequence[str], scorer: Callable[[np.ndarray, Dict], np.ndarray]):
+        self.features = list(features)
+        self.scorer = scorer
+
+    def evaluate(self, features: ActionFeatures, environment: Dict,
+                 rows: Optional[np.ndarray] = None) -> np.ndarray:
+        matrix = features.select(self.features, rows)
+        return np.broadcast_to(np.asarray(self.scorer(matrix, environment), dtype=float),
+                               (len(matrix),))
+
+class CompassDecisionLog(RecordLog):
+    def __init__(self, path: Optional[str] = None, policy: Optional[RetentionPolicy] = None):
+        super().__init__(path, "decisions", policy)
+
+    @property
+    def entries(self) -> List[Dict]:
+        return self.recent()
 
     def log(self, entry: Dict):
-        self.entries.append(entry)
+        self.append(entry)
 
     def get_logs(self):
-        return self.entries
+        # Only the in-memory tail; use query() for older entries
+        return self.recent()
 
 # --- Core Components ---
 
 class EthicalReasoningEngine:
-    def __init__(self, directives: List[str]):
+    def __init__(self, directives: List[str], scorers: Optional[Dict[str, VectorizedScorer]] = None):
         self.directives = directives
+        # Directives without a scorer get the placeholder score of 1.0
+        self.scorers = scorers or {}
+
+    @property
+    def feature_names(self) -> List[str]:
+        return [f for scorer in self.scorers.values() for f in scorer.features]
+
+    def score_matrix(self, features: ActionFeatures, context: PerceptionInput,
+                     rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n_rows, n_directives) score array, in directive order."""
+        n = len(features.actions) if rows is None else len(rows)
+        scores = np.ones((n, len(self.directives)))
+        for col, directive in enumerate(self.directives):
+            scorer = self.scorers.get(directive)
+            if scorer is not None:
+                scores[:, col] = scorer.evaluate(features, context.environment, rows)
+        return scores
+
+    def evaluation(self, action: Action, scores: np.ndarray) -> ActionEvaluation:
+        scores = {d: float(score) for d, score in zip(self.directives, scores)}
+        explanation = f"Action {action.id} evaluated against COMPASS directives."
+        return ActionEvaluation(action, scores, explanation)
 
     def evaluate_actions(self, actions: List[Action], context: PerceptionInput) -> List[ActionEvaluation]:
-        # Placeholder: real implementation would use advanced logic
-        evaluations = []
-        for action in actions:
-            # Example: assign random scores for each directive
-            scores = {d: 1.0 for d in self.directives}
-            explanation = f"Action {action.id} evaluated against COMPASS directives."
-            evaluations.append(ActionEvaluation(action, scores, explanation))
-        return evaluations
+        features = ActionFeatures(actions, self.feature_names)
+        scores = self.score_matrix(features, context)
+        return [self.evaluation(action, row) for action, row in zip(actions, scores)]
 
 class EthicalConstraintEnforcement:
     def __init__(self, hard_constraints: List[Callable[[Action, Dict], bool]]):
         self.hard_constraints = hard_constraints
 
+    @property
+    def feature_names(self) -> List[str]:
+        return [f for c in self.hard_constraints if isinstance(c, VectorizedConstraint)
+                for f in c.features]
+
+    def permissible_mask(self, features: ActionFeatures, context: PerceptionInput) -> np.ndarray:
+        """Boolean mask of actions satisfying every hard constraint.
+
+        Vectorized constraints run first, each only on the rows that are
+        still permissible; plain callables then run per remaining action.
+        """
+        mask = np.ones(len(features.actions), dtype=bool)
+        vectorized = [c for c in self.hard_constraints if isinstance(c, VectorizedConstraint)]
+        scalar = [c for c in self.hard_constraints if not isinstance(c, VectorizedConstraint)]
+        for constraint in vectorized:
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return mask
+            mask[rows] = constraint.evaluate(features, context.environment, rows)
+        for row in np.flatnonzero(mask):
+            action = features.actions[row]
+            mask[row] = all(constraint(action, context.environment) for constraint in scalar)
+        return mask
+
     def filter_permissible(self, evaluations: List[ActionEvaluation], context: PerceptionInput) -> List[ActionEvaluation]:
-        permissible = []
-        for eval in evaluations:
-            if all(constraint(eval.action, context.environment) for constraint in self.hard_constraints):
-                permissible.append(eval)
-        return permissible
+        features = ActionFeatures([e.action for e in evaluations], self.feature_names)
+        mask = self.permissible_mask(features, context)
+        return [e for e, ok in zip(evaluations, mask) if ok]
 
 class ActionSelector:
     def select(self, permissible_evaluations: List[ActionEvaluation]) -> Optional[ActionEvaluation]:
@@ -77,6 +181,12 @@ class ActionSelector:
             return None
         return max(permissible_evaluations, key=lambda e: sum(e.scores.values()))
 
+    def select_index(self, scores: np.ndarray) -> Optional[int]:
+        """Row with the highest total score (first on ties), or None if empty."""
+        if not len(scores):
+            return None
+        return int(np.argmax(scores.sum(axis=1)))
+
 class TransparencyExplainability:
     def __init__(self, decision_log: CompassDecisionLog):
         self.decision_log = decision_log
@@ -92,8 +202,8 @@ class TransparencyExplainability:
         return explanation
 
 class MonitoringFeedbackLoop:
-    def __init__(self):
-        self.metrics = []
+    def __init__(self, path: Optional[str] = None, policy: Optional[RetentionPolicy] = None):
+        self.metrics = RecordLog(path, "metrics", policy)
 
     def record_outcome(self, action: Action, outcome: Dict):
         self.metrics.append({
@@ -103,7 +213,7 @@ class MonitoringFeedbackLoop:
         })
 
     def get_metrics(self):
-        return self.metrics
+        return self.metrics.recent()
 
 class GovernanceOversight:
     def __init__(self):
@@ -120,24 +230,32 @@ class GovernanceOversight:
 # --- Main COMPASS Framework ---
 
 class COMPASSFramework:
-    def __init__(self, directives: List[str], hard_constraints: List[Callable[[Action, Dict], bool]]):
-        self.decision_log = CompassDecisionLog()
-        self.reasoning_engine = EthicalReasoningEngine(directives)
+    def __init__(self, directives: List[str], hard_constraints: List[Callable[[Action, Dict], bool]],
+                 directive_scorers: Optional[Dict[str, VectorizedScorer]] = None,
+                 log_path: Optional[str] = None, log_policy: Optional[RetentionPolicy] = None):
+        # With log_path, decisions and metrics are persisted to that SQLite file
+        self.decision_log = CompassDecisionLog(log_path, log_policy)
+        self.reasoning_engine = EthicalReasoningEngine(directives, directive_scorers)
         self.constraint_enforcer = EthicalConstraintEnforcement(hard_constraints)
         self.action_selector = ActionSelector()
         self.transparency = TransparencyExplainability(self.decision_log)
-        self.monitoring = MonitoringFeedbackLoop()
+        self.monitoring = MonitoringFeedbackLoop(log_path, log_policy)
         self.governance = GovernanceOversight()
 
     def perceive(self, environment: Dict, user_commands: List[Dict], system_state: Dict) -> PerceptionInput:
         return PerceptionInput(environment, user_commands, system_state)
 
     def decide_and_act(self, actions: List[Action], context: PerceptionInput) -> Optional[Dict]:
-        evaluations = self.reasoning_engine.evaluate_actions(actions, context)
-        permissible = self.constraint_enforcer.filter_permissible(evaluations, context)
-        selected = self.action_selector.select(permissible)
-        if not selected:
+        # One feature matrix serves every constraint and directive; only
+        # permissible actions are scored, and only the winner gets an evaluation
+        features = ActionFeatures(actions, self.constraint_enforcer.feature_names +
+                                  self.reasoning_engine.feature_names)
+        rows = np.flatnonzero(self.constraint_enforcer.permissible_mask(features, context))
+        scores = self.reasoning_engine.score_matrix(features, context, rows)
+        index = self.action_selector.select_index(scores)
+        if index is None:
             return None
+        selected = self.reasoning_engine.evaluation(actions[rows[index]], scores[index])
         explanation = self.transparency.explain(selected)
         # Simulate action execution and monitoring
         outcome = {"status": "executed", "details": f"Action {selected.action.id} performed."}
@@ -154,6 +272,12 @@ class COMPASSFramework:
     def get_metrics(self):
         return self.monitoring.get_metrics()
 
+    def query_logs(self, **filters) -> Tuple[List[Dict], Optional[int]]:
+        return self.decision_log.query(**filters)
+
+    def query_metrics(self, **filters) -> Tuple[List[Dict], Optional[int]]:
+        return self.monitoring.metrics.query(**filters)
+
     def governance_review(self):
         self.governance.review(self.get_logs())
 
@@ -0,0 +1,186 @@
+"""
+COMPASS record logs
+
+Append-only storage for decision logs and monitoring metrics: a bounded
+in-memory tail of recent records, optionally backed by a SQLite table
+indexed by timestamp and action id, with retention and compaction.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+class RetentionPolicy:
+    def __init__(self, tail_size: int = 1000, max_age_seconds: Optional[float] = None,
+                 max_records: Optional[int] = None, enforce_every: int = 1000,
+                 compact_after_deletes: int = 100000):
+        # Records kept in memory for get_logs() and recent-record queries
+        self.tail_size = tail_size
+        # Records older than this, or beyond the newest max_records, are deleted
+        self.max_age_seconds = max_age_seconds
+        self.max_records = max_records
+        # Retention runs every enforce_every appends; the database file is
+        # vacuumed once compact_after_deletes records have been deleted
+        self.enforce_every = enforce_every
+        self.compact_after_deletes = compact_after_deletes
+
+
+class RecordLog:
+    """Append-only log of dict records with "timestamp" and "action_id" keys.
+
+    Without a path only the in-memory tail is kept.
+    """
+
+    def __init__(self, path: Optional[str] = None, table: str = "records",
+                 policy: Optional[RetentionPolicy] = None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self.policy = policy or RetentionPolicy()
+        self.tail = deque(maxlen=self.policy.tail_size)  # (seq, record)
+        self.last_seq = 0
+        self._lock = threading.Lock()
+        self._appends = 0
+        self._deletes = 0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "seq INTEGER PRIMARY KEY, timestamp REAL, action_id TEXT, data TEXT)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_timestamp ON {table} (timestamp)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_action ON {table} (action_id, seq)")
+            self._conn.commit()
+            self._load_tail()
+
+    def _load_tail(self):
+        rows = self._conn.execute(
+            f"SELECT seq, data FROM {self.table} ORDER BY seq DESC LIMIT ?",
+            (self.policy.tail_size,)).fetchall()
+        for seq, data in reversed(rows):
+            self.tail.append((seq, json.loads(data)))
+        # Read separately, as the tail may hold no rows (tail_size=0)
+        self.last_seq = self._conn.execute(f"SELECT MAX(seq) FROM {self.table}").fetchone()[0] or 0
+
+    def append(self, record: Dict) -> int:
+        """Store a record, returning its sequence number."""
+        with self._lock:
+            self.last_seq += 1
+            self.tail.append((self.last_seq, record))
+            if self._conn is not None:
+                self._conn.execute(
+                    f"INSERT INTO {self.table} (seq, timestamp, action_id, data) VALUES (?, ?, ?, ?)",
+                    (self.last_seq, record.get("timestamp"), record.get("action_id"),
+                     json.dumps(record, default=str)))
+                self._conn.commit()
+            self._appends += 1
+            if self._appends % self.policy.enforce_every == 0:
+                self._enforce_retention()
+            return self.last_seq
+
+    def recent(self) -> List[Dict]:
+        """Records in the in-memory tail, oldest first."""
+        with self._lock:
+            return [record for _, record in self.tail]
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              action_id: Optional[str] = None, after: int = 0,
+              limit: int = 100) -> Tuple[List[Dict], Optional[int]]:
+        """Records with start <= timestamp < end and the given action id, oldest first.
+
+        after is the cursor returned by the previous page. Returns the page
+        and the cursor for the next one (None when there are no more records).
+        """
+        with self._lock:
+            if self._conn is None or self._tail_covers(after):
+                matches = [(seq, record) for seq, record in self.tail
+                           if seq > after and self._matches(record, start, end, action_id)]
+            else:
+                clauses, params = ["seq > ?"], [after]
+                if start is not None:
+                    clauses.append("timestamp >= ?")
+                    params.append(start)
+                if end is not None:
+                    clauses.append("timestamp < ?")
+                    params.append(end)
+                if action_id is not None:
+                    clauses.append("action_id = ?")
+                    params.append(action_id)
+                rows = self._conn.execute(
+                    f"SELECT seq, data FROM {self.table} WHERE {' AND '.join(clauses)} "
+                    "ORDER BY seq LIMIT ?", params + [limit + 1]).fetchall()
+                matches = [(seq, json.loads(data)) for seq, data in rows]
+        page = matches[:limit]
+        next_cursor = page[-1][0] if len(matches) > limit else None
+        return [record for _, record in page], next_cursor
+
+    def _tail_covers(self, after: int) -> bool:
+        # Every record after the cursor is still in memory. An empty tail
+        # (tail_size=0, or trimmed by retention) only covers a cursor with
+        # nothing after it
+        if not self.tail:
+            return after >= self.last_seq
+        return self.tail[0][0] <= after + 1
+
+    @staticmethod
+    def _matches(record: Dict, start: Optional[float], end: Optional[float],
+                 action_id: Optional[str]) -> bool:
+        timestamp = record.get("timestamp")
+        if start is not None and (timestamp is None or timestamp < start):
+            return False
+        if end is not None and (timestamp is None or timestamp >= end):
+            return False
+        return action_id is None or record.get("action_id") == action_id
+
+    def enforce_retention(self, now: Optional[float] = None) -> int:
+        """Delete records outside the retention policy, returning how many."""
+        with self._lock:
+            return self._enforce_retention(now)
+
+    def _enforce_retention(self, now: Optional[float] = None) -> int:
+        policy = self.policy
+        cutoff = None
+        if policy.max_age_seconds is not None:
+            cutoff = (now or time.time()) - policy.max_age_seconds
+        min_seq = 0
+        if policy.max_records is not None:
+            min_seq = self.last_seq - policy.max_records
+
+        while self.tail and (self.tail[0][0] <= min_seq or
+                             (cutoff is not None and self.tail[0][1].get("timestamp", cutoff) < cutoff)):
+            self.tail.popleft()
+        if self._conn is None:
+            return 0
+
+        deleted = self._conn.execute(f"DELETE FROM {self.table} WHERE seq <= ?", (min_seq,)).rowcount
+        if cutoff is not None:
+            deleted += self._conn.execute(
+                f"DELETE FROM {self.table} WHERE timestamp < ?", (cutoff,)).rowcount
+        self._conn.commit()
+        self._deletes += deleted
+        if self._deletes >= policy.compact_after_deletes:
+            self._compact()
+        return deleted
+
+    def compact(self):
+        """Reclaim space left by deleted records."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        if self._conn is not None:
+            self._conn.execute("VACUUM")
+            self._deletes = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from head_1.frameworks.ethics.___files.compass_log import RecordLog, RetentionPolicy
+
+
+class TestRecordLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "records.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_query_without_tail_reads_database(self):
+        log = RecordLog(self.path, policy=RetentionPolicy(tail_size=0))
+        for i in range(10):
+            log.append({"timestamp": 1000.0 + i, "action_id": "a" if i % 2 else "b"})
+        self.assertEqual(log.recent(), [])
+
+        records, cursor = log.query(limit=4)
+        self.assertEqual([record["timestamp"] for record in records], [1000.0, 1001.0, 1002.0, 1003.0])
+        records, cursor = log.query(after=cursor, limit=10)
+        self.assertEqual(len(records), 6)
+        self.assertIsNone(cursor)
+        self.assertEqual(len(log.query(action_id="a")[0]), 5)
+        self.assertEqual(log.query(after=10), ([], None))
+        log.close()
+
+        # Reopened, the sequence continues from the database
+        log = RecordLog(self.path, policy=RetentionPolicy(tail_size=0))
+        self.assertEqual(len(log.query(start=1005.0)[0]), 5)
+        self.assertEqual(log.append({"timestamp": 1010.0, "action_id": "a"}), 11)
+        self.assertEqual(len(log.query(after=10)[0]), 1)
+        log.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
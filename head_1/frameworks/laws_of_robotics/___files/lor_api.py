@@ -3,22 +3,28 @@ API for the Laws of Robotics framework.
 
 This module provides a REST API layer for the Laws of Robotics framework,
 allowing external systems to interact with it.
+
+Evaluation and selection requests run in per-request evaluation contexts
+(see LawsEngine.evaluation_context), so they can be served concurrently;
+only requests that change orders or state take the framework lock.
 """
 
 import json
 import time
 import logging
+import threading
 import uuid
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Tuple, Any, Optional, Union
 from dataclasses import asdict
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 
 from .lor_core import (
-    LORFramework, LORConfig, Action, Order, State, Vector3, HumanState,
+    LORFramework, LORConfig, LawsEngine, Action, Order, State, Vector3, HumanState,
     PhysicalState, PsychologicalState, SocialContext, Effect,
     EnvironmentState, ActionClassification, integrate_with_python_system
 )
+from .lor_codec import decode_action, decode_state, dumps as encode_json, loads as decode_json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,9 +37,15 @@ CORS(app)  # Enable Cross-Origin Resource Sharing
 # Global framework instance
 global_framework: Optional[LORFramework] = None
 
+# Serializes changes to the global framework's orders and state
+framework_lock = threading.RLock()
+
 # API version
 API_VERSION = "1.0.0"
 
+# Largest number of scenarios accepted by one batch request
+MAX_BATCH_SCENARIOS = 100
+
 # Helper functions
 def serialize_object(obj):
     """Serialize objects to JSON."""
@@ -46,80 +58,81 @@ def serialize_object(obj):
 
 def deserialize_action(action_data: Dict) -> Action:
     """Deserialize an Action from JSON data."""
-    estimated_effects = []
-    if "estimated_effects" in action_data:
-        for effect_data in action_data["estimated_effects"]:
-            estimated_effects.append(Effect(
-                target_id=effect_data.get("target_id", ""),
-                effect_type=effect_data.get("effect_type", ""),
-                magnitude=float(effect_data.get("magnitude", 0.0)),
-                probability=float(effect_data.get("probability", 0.0))
-            ))
-    
-    return Action(
-        action_id=action_data.get("id", ""),
-        parameters=action_data.get("parameters", {}),
-        estimated_effects=estimated_effects
-    )
+    return decode_action(action_data)
 
 def deserialize_state(state_data: Dict) -> State:
-    """Deserialize a State from JSON data."""
-    environment_data = state_data.get("environment", {})
-    boundaries = []
-    for boundary in environment_data.get("boundaries", []):
-        boundaries.append(Vector3(
-            x=float(boundary.get("x", 0.0)),
-            y=float(boundary.get("y", 0.0)),
-            z=float(boundary.get("z", 0.0))
-        ))
-    
-    environment = EnvironmentState(
-        boundaries=boundaries,
-        obstacles=environment_data.get("obstacles", []),
-        conditions=environment_data.get("conditions", {})
-    )
+    """Deserialize a State from JSON data.
     
-    humans = {}
-    for human_id, human_data in state_data.get("humans", {}).items():
-        position_data = human_data.get("position", {})
-        position = Vector3(
-            x=float(position_data.get("x", 0.0)),
-            y=float(position_data.get("y", 0.0)),
-            z=float(position_data.get("z", 0.0))
-        )
-        
-        physical_data = human_data.get("physical_state", {})
-        physical_state = PhysicalState(
-            health=float(physical_data.get("health", 1.0)),
-            vulnerability=float(physical_data.get("vulnerability", 0.5))
-        )
-        
-        psychological_data = human_data.get("psychological_state", {})
-        psychological_state = PsychologicalState(
-            distress=float(psychological_data.get("distress", 0.0)),
-            sensitivity=float(psychological_data.get("sensitivity", 0.5))
-        )
-        
-        social_data = human_data.get("social_context", {})
-        social_context = SocialContext(
-            group_affiliation=social_data.get("group_affiliation", []),
-            social_importance=float(social_data.get("social_importance", 0.5))
-        )
-        
-        humans[human_id] = HumanState(
-            human_id=human_id,
-            position=position,
-            physical_state=physical_state,
-            psychological_state=psychological_state,
-            social_context=social_context
-        )
+    Action history is not deserialized from the API.
+    """
+    return decode_state(state_data)
+
+def request_payload() -> Optional[Any]:
+    """Parse the request body, or None if it is missing or not valid JSON."""
+    body = request.get_data()
+    if not body:
+        return None
+    try:
+        return decode_json(body)
+    except ValueError:
+        return None
+
+def json_response(payload: Dict, status: int = 200) -> Response:
+    """JSON response encoding lor_core objects directly with the codec."""
+    return Response(encode_json(payload), status=status, mimetype="application/json")
+
+def parse_scenario(data: Dict, actions_key: str = "actions") -> Tuple[Optional[State], Optional[List[Action]]]:
+    """Deserialize the optional state and candidate actions of a request."""
+    state = deserialize_state(data["state"]) if "state" in data else None
+    actions = None
+    if actions_key in data:
+        actions = [deserialize_action(a) for a in data[actions_key]]
+    return state, actions
+
+def evaluation_context(state: Optional[State] = None, actions: Optional[List[Action]] = None,
+                       refresh: bool = False) -> LawsEngine:
+    """Create an evaluation context on the global framework for one request.
     
-    return State(
-        environment=environment,
-        humans=humans,
-        action_history=[],  # We don't deserialize action history from API
-        time=state_data.get("time", time.time())
-    )
+    Args:
+        state: State to evaluate against, or None for a snapshot of the
+            framework's current state
+        actions: Candidate actions, or None for those offered by the action
+            selection module
+        refresh: Update the current state from perception first (only
+            when no state is given), as LORFramework.select_action does
+    """
+    with framework_lock:
+        if state is None and refresh:
+            global_framework.update()
+        return global_framework.laws_engine.evaluation_context(state, actions)
+
+def check_batch_size(count: int, limit: int, what: str) -> Optional[str]:
+    """Error message if a batch exceeds its size limit."""
+    if count > limit:
+        return f"Too many {what} in one request ({count} > {limit})"
+    return None
+
+def check_scenarios(scenarios: List[Any]) -> Optional[str]:
+    """Error message for the first malformed scenario of a batch."""
+    for index, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            return f"Scenario {index} must be an object"
+        if not isinstance(scenario.get("actions", []), list):
+            return f"Scenario {index}: actions must be a list"
+    return None
+
+def run_scenario(scenario: Dict) -> Dict:
+    """Evaluate and/or select the actions of one batch scenario."""
+    state, actions = parse_scenario(scenario)
+    context = evaluation_context(state, actions, refresh=True)
+    result = {"success": True}
+    if actions is not None:
+        result["evaluations"] = context.classify_actions(actions)
+    if scenario.get("select", True):
+        action, evaluation = context.select_action()
+        result["action"] = action
+        result["evaluation"] = evaluation
+    return result
 
 # API routes
 @app.route("/api/v1/info", methods=["GET"])
@@ -141,7 +154,8 @@ def initialize_framework() -> Response:
     config_path = data.get("config_path")
     
     try:
-        global_framework = integrate_with_python_system(config_path)
+        with framework_lock:
+            global_framework = integrate_with_python_system(config_path)
         return jsonify({
             "success": True,
             "message": "Framework initialized successfully"
@@ -162,7 +176,7 @@ def evaluate_action() -> Response:
             "error": "Framework not initialized"
         }), 400
     
-    data = request.json
+    data = request_payload()
     if not data or "action" not in data:
         return jsonify({
             "success": False,
@@ -171,11 +185,12 @@ def evaluate_action() -> Response:
     
     try:
         action = deserialize_action(data["action"])
-        evaluation = global_framework.evaluate_action(action)
+        context = evaluation_context(*parse_scenario(data, "candidates"))
+        evaluation = context.classify_action(action)
         
-        return jsonify({
+        return json_response({
             "success": True,
-            "evaluation": evaluation.serialize()
+            "evaluation": evaluation
         })
     except Exception as e:
         logger.error(f"Error evaluating action: {e}")
@@ -184,6 +199,46 @@ def evaluate_action() -> Response:
             "error": str(e)
         }), 500
 
+@app.route("/api/v1/actions/evaluate/batch", methods=["POST"])
+def evaluate_actions() -> Response:
+    """Evaluate several actions against one state."""
+    if not global_framework or not global_framework.initialized:
+        return jsonify({
+            "success": False,
+            "error": "Framework not initialized"
+        }), 400
+    
+    data = request_payload()
+    if not data or not isinstance(data.get("actions"), list):
+        return jsonify({
+            "success": False,
+            "error": "List of actions required"
+        }), 400
+    
+    error = check_batch_size(len(data["actions"]),
+                             global_framework.config.MAX_ACTIONS_EVALUATED, "actions")
+    if error:
+        return jsonify({
+            "success": False,
+            "error": error
+        }), 400
+    
+    try:
+        actions = [deserialize_action(a) for a in data["actions"]]
+        context = evaluation_context(*parse_scenario(data, "candidates"))
+        evaluations = context.classify_actions(actions)
+        
+        return json_response({
+            "success": True,
+            "evaluations": evaluations
+        })
+    except Exception as e:
+        logger.error(f"Error evaluating actions: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route("/api/v1/actions/select", methods=["POST"])
 def select_action() -> Response:
     """Select the optimal action according to the Laws of Robotics."""
@@ -194,19 +249,17 @@ def select_action() -> Response:
         }), 400
     
     try:
-        # Custom state can be provided optionally
-        data = request.json or {}
-        if "state" in data:
-            # Use provided state instead of current state
-            state = deserialize_state(data["state"])
-            global_framework.laws_engine.current_state = state
-        
-        action, evaluation = global_framework.select_action()
+        # Custom state and candidate actions can be provided optionally;
+        # they apply to this request only
+        data = request_payload() or {}
+        state, actions = parse_scenario(data)
+        context = evaluation_context(state, actions, refresh=True)
+        action, evaluation = context.select_action()
         
-        return jsonify({
+        return json_response({
             "success": True,
-            "action": action.serialize(),
-            "evaluation": evaluation.serialize()
+            "action": action,
+            "evaluation": evaluation
         })
     except Exception as e:
         logger.error(f"Error selecting action: {e}")
@@ -215,6 +268,56 @@ def select_action() -> Response:
             "error": str(e)
         }), 500
 
+@app.route("/api/v1/scenarios/evaluate", methods=["POST"])
+def evaluate_scenarios() -> Response:
+    """Evaluate and select actions for several independent scenarios.
+    
+    Each scenario may carry a "state", a list of candidate "actions" (which
+    are all evaluated) and "select" (default true) to also select among them.
+    A failing scenario reports its own error without failing the batch.
+    """
+    if not global_framework or not global_framework.initialized:
+        return jsonify({
+            "success": False,
+            "error": "Framework not initialized"
+        }), 400
+    
+    data = request_payload()
+    if not isinstance(data, dict) or not isinstance(data.get("scenarios"), list):
+        return jsonify({
+            "success": False,
+            "error": "List of scenarios required"
+        }), 400
+    
+    scenarios = data["scenarios"]
+    error = check_batch_size(len(scenarios), MAX_BATCH_SCENARIOS, "scenarios")
+    if not error:
+        error = check_scenarios(scenarios)
+    if not error:
+        error = check_batch_size(sum(len(s.get("actions", [])) for s in scenarios),
+                                 global_framework.config.MAX_ACTIONS_EVALUATED, "actions")
+    if error:
+        return jsonify({
+            "success": False,
+            "error": error
+        }), 400
+    
+    results = []
+    for index, scenario in enumerate(scenarios):
+        try:
+            results.append(run_scenario(scenario))
+        except Exception as e:
+            logger.error(f"Error evaluating scenario {index}: {e}")
+            results.append({
+                "success": False,
+                "error": str(e)
+            })
+    
+    return json_response({
+        "success": True,
+        "results": results
+    })
+
 @app.route("/api/v1/actions/execute", methods=["POST"])
 def execute_action() -> Response:
     """Execute a specified action or select and execute the optimal action."""
@@ -227,14 +330,15 @@ def execute_action() -> Response:
     data = request.json or {}
     
     try:
-        if "action" in data:
-            # Execute specified action
-            action = deserialize_action(data["action"])
-            success = global_framework.execute_action(action)
-        else:
-            # Select and execute optimal action
-            action, evaluation = global_framework.select_action()
-            success = global_framework.execute_action(action)
+        with framework_lock:
+            if "action" in data:
+                # Execute specified action
+                action = deserialize_action(data["action"])
+                success = global_framework.execute_action(action)
+            else:
+                # Select and execute optimal action
+                action, evaluation = global_framework.select_action()
+                success = global_framework.execute_action(action)
             
         return jsonify({
             "success": success,
@@ -273,10 +377,12 @@ def process_order() -> Response:
             human_id=order_data.get("human_id", ""),
             action=action,
             timestamp=order_data.get("timestamp", time.time()),
-            context=order_data.get("context", {})
+            context=order_data.get("context", {}),
+            expires_at=order_data.get("expires_at")
         )
         
-        success = global_framework.process_order(order)
+        with framework_lock:
+            success = global_framework.process_order(order)
         
         return jsonify({
             "success": success,
@@ -300,7 +406,8 @@ def remove_order(order_id: str) -> Response:
         }), 400
     
     try:
-        success = global_framework.laws_engine.remove_order(order_id)
+        with framework_lock:
+            success = global_framework.laws_engine.remove_order(order_id)
         
         return jsonify({
             "success": success,
@@ -330,9 +437,9 @@ def get_state() -> Response:
                 "error": "No state available"
             }), 404
             
-        return jsonify({
+        return json_response({
             "success": True,
-            "state": state.serialize()
+            "state": state
         })
     except Exception as e:
         logger.error(f"Error getting state: {e}")
@@ -350,7 +457,7 @@ def update_state() -> Response:
             "error": "Framework not initialized"
         }), 400
     
-    data = request.json
+    data = request_payload()
     if not data or "state" not in data:
         return jsonify({
             "success": False,
@@ -359,7 +466,8 @@ def update_state() -> Response:
     
     try:
         state = deserialize_state(data["state"])
-        global_framework.laws_engine.current_state = state
+        with framework_lock:
+            global_framework.laws_engine.current_state = state
         
         return jsonify({
             "success": True,
@@ -395,13 +503,81 @@ def internal_server_error(error):
     }), 500
 
 # Main entry point
-def run_api(host: str = "0.0.0.0", port: int = 5000, debug: bool = False):
-    """Run the LOR API server."""
-    app.run(host=host, port=port, debug=debug)
+def create_app(config_path: str = None) -> Flask:
+    """Initialize the framework and return the WSGI application.
+    
+    Usable as a WSGI server entry point, e.g.
+    gunicorn "head_1.frameworks.laws_of_robotics.___files.lor_api:create_app()"
+    """
+    global global_framework
+    with framework_lock:
+        if not global_framework or not global_framework.initialized:
+            global_framework = integrate_with_python_system(config_path)
+    return app
+
+def run_api(host: str = "0.0.0.0", port: int = 5000, debug: bool = False,
+            server: str = "flask", workers: int = 1, threads: int = 8):
+    """Run the LOR API server.
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        debug: Run the Flask development server in debug mode
+        server: "flask" (development server), "waitress" (multi-threaded)
+            or "gunicorn" (multi-process, each worker with its own framework;
+            orders and state are per worker, so prefer the stateless batch
+            endpoints there)
+        workers: Worker processes for gunicorn
+        threads: Worker threads per process for waitress and gunicorn
+    """
+    if server == "flask":
+        app.run(host=host, port=port, debug=debug, threaded=True)
+    elif server == "waitress":
+        try:
+            from waitress import serve
+        except ImportError:
+            raise RuntimeError("waitress is required for server='waitress'")
+        serve(app, host=host, port=port, threads=threads)
+    elif server == "gunicorn":
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            raise RuntimeError("gunicorn is required for server='gunicorn'")
+        
+        options = {
+            "bind": f"{host}:{port}",
+            "workers": workers,
+            "threads": threads,
+            "worker_class": "gthread"
+        }
+        
+        class LORApplication(BaseApplication):
+            def load_config(self):
+                for key, value in options.items():
+                    self.cfg.set(key, value)
+                    
+            def load(self):
+                return app
+        
+        LORApplication().run()
+    else:
+        raise ValueError(f"Unknown server: {server}")
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Laws of Robotics API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--server", choices=["flask", "waitress", "gunicorn"], default="flask")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--config", default=None)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    
     # Initialize the framework
-    global_framework = integrate_with_python_system()
+    create_app(args.config)
     
     # Run the API server
-    run_api(debug=True)
+    run_api(args.host, args.port, args.debug, args.server, args.workers, args.threads)
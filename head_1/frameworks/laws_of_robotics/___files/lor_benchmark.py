@@ -0,0 +1,473 @@
+"""
+Benchmarks for the Laws of Robotics framework.
+
+Run from the repository root, for example:
+
+    python -m head_1.frameworks.laws_of_robotics.___files.lor_benchmark select --sizes 10 100 1000
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import random
+import time
+import logging
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from .lor_core import (
+    LawsEngine, LORConfig, Action, Order, State, Vector3, HumanState,
+    PhysicalState, PsychologicalState, SocialContext, Effect, EnvironmentState,
+    HarmTensor
+)
+from . import lor_codec
+
+logger = logging.getLogger("lor_benchmark")
+
+GROUPS = ["family", "work", "community"]
+EFFECT_TYPES = ["physical", "psychological", "societal", "integrity"]
+
+
+class HashReasoning:
+    """Deterministic stand-in for a reasoning module.
+
+    Probabilities are derived from a hash of the query so repeated runs are
+    comparable; call_count records how many queries were issued.
+    """
+
+    def __init__(self):
+        self.call_count = 0
+
+    def compute_causal_probability(self, cause, effect, state, time):
+        self.call_count += 1
+        digest = hashlib.md5(repr((cause, sorted(effect.items()))).encode()).hexdigest()
+        value = int(digest, 16)
+        return (value % 1000) / 1000 * 0.06, ((value // 1000) % 1000) / 1000 * 0.3
+
+
+class FixedActionSelection:
+    """Action selection module returning a fixed candidate list."""
+
+    def __init__(self, actions: List[Action]):
+        self.actions = actions
+
+    def get_available_actions(self, state):
+        return self.actions
+
+    def execute_action(self, action):
+        return True
+
+
+def build_scenario(num_actions: int, num_humans: int = 5, num_orders: int = 3,
+                   seed: int = 0) -> Tuple[State, List[Action], List[Order]]:
+    """Build a reproducible scene with random effects and orders."""
+    rng = random.Random(seed)
+
+    humans = {}
+    for i in range(num_humans):
+        human_id = f"human{i}"
+        humans[human_id] = HumanState(
+            human_id=human_id,
+            position=Vector3(rng.uniform(0, 10), rng.uniform(0, 10), 0.0),
+            psychological_state=PsychologicalState(sensitivity=rng.random()),
+            social_context=SocialContext(
+                group_affiliation=rng.sample(GROUPS, rng.randint(0, 2)),
+                social_importance=rng.random()
+            )
+        )
+
+    targets = list(humans) + GROUPS + ["system"]
+    actions = []
+    for i in range(num_actions):
+        effects = [
+            Effect(
+                target_id=rng.choice(targets),
+                effect_type=rng.choice(EFFECT_TYPES),
+                magnitude=rng.random() * 0.3,
+                probability=rng.random() * 0.3
+            )
+            for _ in range(rng.randint(0, 3))
+        ]
+        actions.append(Action(f"action{i}", {"variant": i % 7}, effects))
+
+    orders = [
+        Order(f"order{i}", "human0", actions[rng.randrange(num_actions)], time.time())
+        for i in range(min(num_orders, num_actions))
+    ]
+
+    state = State(
+        environment=EnvironmentState(boundaries=[], obstacles=[], conditions={}),
+        humans=humans,
+        time=time.time()
+    )
+    return state, actions, orders
+
+
+def build_engine(state: State, actions: List[Action], orders: List[Order],
+                 cache_enabled: bool = True) -> Tuple[LawsEngine, HashReasoning]:
+    """Create a LawsEngine wired to the benchmark modules."""
+    config = LORConfig()
+    config.EVALUATION_CACHE_ENABLED = cache_enabled
+    engine = LawsEngine(config)
+    reasoning = HashReasoning()
+    engine.set_reasoning(reasoning)
+    engine.set_action_selection(FixedActionSelection(actions))
+    engine.current_state = state
+    for order in orders:
+        engine.add_order(order)
+    return engine, reasoning
+
+
+def per_candidate_select(engine: LawsEngine, state: State) -> Action:
+    """Selection by classifying every candidate independently.
+
+    This is the pre-pipeline strategy: each classify_action call re-runs the
+    Law 3 comparison against every other candidate, so it is O(n^2).
+    """
+    evaluations = [engine.classify_action(action, state)
+                   for action in engine._get_possible_actions(state)]
+    by_class: Dict = {}
+    for evaluation in evaluations:
+        by_class.setdefault(evaluation.classification, []).append(evaluation.action)
+
+    for classification in ("MANDATORY", "PREFERRED", "PERMITTED"):
+        candidates = [a for c, acts in by_class.items() if c.name == classification for a in acts]
+        if candidates:
+            if classification == "PREFERRED":
+                return candidates[0]
+            return engine._select_sp_max_action(candidates, state)
+    return engine._select_min_harm_action(
+        [e.action for e in evaluations], state)
+
+
+def benchmark_select(sizes: List[int], num_humans: int, per_candidate_max: int,
+                     repeats: int):
+    """Compare per-candidate classification with the select_action pipeline."""
+    print(f"{'actions':>8} {'strategy':>22} {'seconds':>10} {'reasoning calls':>16} {'selected':>12}")
+    for size in sizes:
+        state, actions, orders = build_scenario(size, num_humans)
+
+        runs = [("pipeline", True)]
+        if size <= per_candidate_max:
+            runs = [("per-candidate", False), ("per-candidate+cache", True)] + runs
+
+        for name, cache_enabled in runs:
+            best = float("inf")
+            for _ in range(repeats):
+                engine, reasoning = build_engine(state, actions, orders, cache_enabled)
+                start = time.perf_counter()
+                if name == "pipeline":
+                    selected, _ = engine.select_action(state)
+                else:
+                    selected = per_candidate_select(engine, state)
+                best = min(best, time.perf_counter() - start)
+            print(f"{size:>8} {name:>22} {best:>10.4f} {reasoning.call_count:>16} {selected.id:>12}")
+
+
+def benchmark_harm(sizes: List[int], num_humans: int, repeats: int):
+    """Compare scalar Law 1 harm scoring with the HarmTensor path."""
+    print(f"{'actions':>8} {'humans':>7} {'scalar s':>10} {'tensor s':>10} {'max abs diff':>13}")
+    for size in sizes:
+        state, actions, _ = build_scenario(size, num_humans)
+        config = LORConfig()
+        config.EVALUATION_CACHE_ENABLED = False
+        engine = LawsEngine(config)
+
+        scalar_best = tensor_best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            scalar = [engine.evaluate_law1(action, state) for action in actions]
+            scalar_best = min(scalar_best, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            harms = HarmTensor(actions, state.humans).compute(config)
+            tensor_best = min(tensor_best, time.perf_counter() - start)
+
+        human_ids = list(state.humans)
+        diff = max(
+            (abs(scalar[a][h].total_harm - harms["total"][a, i])
+             for a in range(size) for i, h in enumerate(human_ids)),
+            default=0.0
+        )
+        print(f"{size:>8} {num_humans:>7} {scalar_best:>10.4f} {tensor_best:>10.4f} {diff:>13.2e}")
+
+
+class ReplayPerception:
+    """Perception module returning fresh copies of a scene each tick.
+    
+    Before each tick, moves one human with probability move_rate, so most
+    ticks report an unchanged scene as a real sensor loop would.
+    """
+    
+    def __init__(self, state: State, move_rate: float, seed: int = 0):
+        self.environment = copy.deepcopy(state.environment)
+        self.humans = copy.deepcopy(state.humans)
+        self.move_rate = move_rate
+        self.rng = random.Random(seed)
+        
+    def get_environment_state(self):
+        return copy.deepcopy(self.environment)
+    
+    def detect_humans(self):
+        if self.humans and self.rng.random() < self.move_rate:
+            human = self.humans[self.rng.choice(list(self.humans))]
+            human.position = Vector3(self.rng.uniform(0, 10), self.rng.uniform(0, 10), 0.0)
+        return copy.deepcopy(self.humans)
+
+
+def benchmark_update(num_actions: int, num_humans: int, ticks: int, move_rate: float):
+    """Perception loop of update_state + select_action, rebuilding vs patching state."""
+    print(f"{'strategy':>12} {'ticks':>6} {'seconds':>10} {'ms/tick':>8} {'reasoning calls':>16}")
+    for name, incremental in (("rebuild", False), ("incremental", True)):
+        state, actions, orders = build_scenario(num_actions, num_humans)
+        engine, reasoning = build_engine(state, actions, orders)
+        engine.config.INCREMENTAL_STATE_UPDATES = incremental
+        engine.set_perception(ReplayPerception(state, move_rate))
+        
+        start = time.perf_counter()
+        for _ in range(ticks):
+            engine.update_state()
+            engine.select_action()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>12} {ticks:>6} {elapsed:>10.4f} {elapsed / ticks * 1000:>8.3f} "
+              f"{reasoning.call_count:>16}")
+
+
+def _post_json(url: str, payload: Dict) -> Dict:
+    """POST a JSON payload to a running API server."""
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as response:
+        return json.loads(response.read())
+
+
+def benchmark_api(num_actions: int, num_humans: int, num_scenarios: int,
+                  url: str = None, concurrency: int = 1):
+    """Per-request vs batch endpoints of lor_api.
+    
+    Without url the Flask app is driven in-process through its test client;
+    with url requests go to a running server from concurrency client threads.
+    """
+    scenarios = []
+    for seed in range(num_scenarios):
+        state, actions, _ = build_scenario(num_actions, num_humans, seed=seed)
+        scenarios.append({"state": state.serialize(),
+                          "actions": [a.serialize() for a in actions]})
+    
+    if url:
+        base = url.rstrip("/")
+        post = lambda path, payload: _post_json(base + path, payload)
+    else:
+        from . import lor_api
+        client = lor_api.create_app().test_client()
+        post = lambda path, payload: client.post(path, json=payload).get_json()
+    
+    def run(requests):
+        """Issue (path, payload) requests, returning elapsed seconds."""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for response in pool.map(lambda r: post(*r), requests):
+                if not response.get("success"):
+                    raise RuntimeError(f"Request failed: {response.get('error')}")
+        return time.perf_counter() - start
+    
+    runs = [
+        ("evaluate x1", "actions",
+         [("/api/v1/actions/evaluate",
+           {"state": sc["state"], "candidates": sc["actions"], "action": action})
+          for sc in scenarios for action in sc["actions"]]),
+        ("evaluate batch", "actions",
+         [("/api/v1/actions/evaluate/batch",
+           {"state": sc["state"], "candidates": sc["actions"], "actions": sc["actions"]})
+          for sc in scenarios]),
+        ("select x1", "scenarios",
+         [("/api/v1/actions/select", sc) for sc in scenarios]),
+        ("scenarios batch", "scenarios",
+         [("/api/v1/scenarios/evaluate", {"scenarios": [dict(sc, select=True) for sc in scenarios]})]),
+    ]
+    
+    print(f"{'endpoint':>16} {'requests':>9} {'seconds':>10} {'items/s':>10}")
+    for name, unit, requests in runs:
+        elapsed = run(requests)
+        items = num_scenarios * (num_actions if unit == "actions" else 1)
+        print(f"{name:>16} {len(requests):>9} {elapsed:>10.4f} {items / elapsed:>10.1f} {unit}")
+
+
+def reference_deserialize_action(action_data: Dict) -> Action:
+    """Field-by-field Action decoding that lor_codec replaced."""
+    estimated_effects = []
+    if "estimated_effects" in action_data:
+        for effect_data in action_data["estimated_effects"]:
+            estimated_effects.append(Effect(
+                target_id=effect_data.get("target_id", ""),
+                effect_type=effect_data.get("effect_type", ""),
+                magnitude=float(effect_data.get("magnitude", 0.0)),
+                probability=float(effect_data.get("probability", 0.0))
+            ))
+    
+    return Action(
+        action_id=action_data.get("id", ""),
+        parameters=action_data.get("parameters", {}),
+        estimated_effects=estimated_effects
+    )
+
+
+def reference_deserialize_state(state_data: Dict) -> State:
+    """Field-by-field State decoding that lor_codec replaced."""
+    environment_data = state_data.get("environment", {})
+    boundaries = []
+    for boundary in environment_data.get("boundaries", []):
+        boundaries.append(Vector3(
+            x=float(boundary.get("x", 0.0)),
+            y=float(boundary.get("y", 0.0)),
+            z=float(boundary.get("z", 0.0))
+        ))
+    
+    environment = EnvironmentState(
+        boundaries=boundaries,
+        obstacles=environment_data.get("obstacles", []),
+        conditions=environment_data.get("conditions", {})
+    )
+    
+    humans = {}
+    for human_id, human_data in state_data.get("humans", {}).items():
+        position_data = human_data.get("position", {})
+        position = Vector3(
+            x=float(position_data.get("x", 0.0)),
+            y=float(position_data.get("y", 0.0)),
+            z=float(position_data.get("z", 0.0))
+        )
+        
+        physical_data = human_data.get("physical_state", {})
+        physical_state = PhysicalState(
+            health=float(physical_data.get("health", 1.0)),
+            vulnerability=float(physical_data.get("vulnerability", 0.5))
+        )
+        
+        psychological_data = human_data.get("psychological_state", {})
+        psychological_state = PsychologicalState(
+            distress=float(psychological_data.get("distress", 0.0)),
+            sensitivity=float(psychological_data.get("sensitivity", 0.5))
+        )
+        
+        social_data = human_data.get("social_context", {})
+        social_context = SocialContext(
+            group_affiliation=social_data.get("group_affiliation", []),
+            social_importance=float(social_data.get("social_importance", 0.5))
+        )
+        
+        humans[human_id] = HumanState(
+            human_id=human_id,
+            position=position,
+            physical_state=physical_state,
+            psychological_state=psychological_state,
+            social_context=social_context
+        )
+    
+    return State(
+        environment=environment,
+        humans=humans,
+        action_history=[],  # We don't deserialize action history from API
+        time=state_data.get("time", time.time())
+    )
+
+
+def benchmark_codec(sizes: List[int], num_actions: int, repeats: int):
+    """Compare lor_codec with field-by-field decoding and serialize() + json."""
+    print(f"{'humans':>7} {'step':>7} {'reference s':>12} {'codec s':>10} {'speedup':>8}")
+    for size in sizes:
+        state, actions, orders = build_scenario(num_actions, size)
+        engine, _ = build_engine(state, actions, orders)
+        evaluations = engine.classify_actions(actions, state)
+        payload = json.dumps({"state": state.serialize(),
+                              "actions": [a.serialize() for a in actions]})
+        
+        def reference_decode():
+            data = json.loads(payload)
+            reference_deserialize_state(data["state"])
+            [reference_deserialize_action(a) for a in data["actions"]]
+            
+        def codec_decode():
+            data = lor_codec.loads(payload)
+            lor_codec.decode_state(data["state"])
+            [lor_codec.decode_action(a) for a in data["actions"]]
+        
+        steps = [
+            ("decode", reference_decode, codec_decode),
+            ("encode",
+             lambda: json.dumps({"state": state.serialize(),
+                                 "evaluations": [e.serialize() for e in evaluations]}),
+             lambda: lor_codec.dumps({"state": state, "evaluations": evaluations})),
+        ]
+        for name, reference, codec in steps:
+            timings = []
+            for func in (reference, codec):
+                best = float("inf")
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    func()
+                    best = min(best, time.perf_counter() - start)
+                timings.append(best)
+            print(f"{size:>7} {name:>7} {timings[0]:>12.5f} {timings[1]:>10.5f} "
+                  f"{timings[0] / timings[1]:>7.1f}x")
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Laws of Robotics benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    select_parser = subparsers.add_parser("select", help="LawsEngine.select_action scaling")
+    select_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    select_parser.add_argument("--humans", type=int, default=5)
+    select_parser.add_argument("--per-candidate-max", type=int, default=100,
+                               help="Largest size to run the O(n^2) strategy on")
+    select_parser.add_argument("--repeats", type=int, default=3)
+
+    harm_parser = subparsers.add_parser("harm", help="Scalar vs HarmTensor harm scoring")
+    harm_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    harm_parser.add_argument("--humans", type=int, default=50)
+    harm_parser.add_argument("--repeats", type=int, default=3)
+
+    update_parser = subparsers.add_parser("update", help="Perception loop with state rebuild vs patch")
+    update_parser.add_argument("--actions", type=int, default=50)
+    update_parser.add_argument("--humans", type=int, default=5)
+    update_parser.add_argument("--ticks", type=int, default=100)
+    update_parser.add_argument("--move-rate", type=float, default=0.1,
+                               help="Probability that a human moves between ticks")
+
+    api_parser = subparsers.add_parser("api", help="lor_api per-request vs batch endpoints")
+    api_parser.add_argument("--actions", type=int, default=20)
+    api_parser.add_argument("--humans", type=int, default=10)
+    api_parser.add_argument("--scenarios", type=int, default=20)
+    api_parser.add_argument("--url", default=None,
+                            help="Base URL of a running server (default: in-process test client)")
+    api_parser.add_argument("--concurrency", type=int, default=1)
+
+    codec_parser = subparsers.add_parser("codec", help="lor_codec vs field-by-field JSON handling")
+    codec_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                              help="Humans per scene")
+    codec_parser.add_argument("--actions", type=int, default=20)
+    codec_parser.add_argument("--repeats", type=int, default=5)
+
+    args = parser.parse_args()
+    logging.getLogger("lor_core").setLevel(logging.WARNING)
+
+    if args.benchmark == "select":
+        benchmark_select(args.sizes, args.humans, args.per_candidate_max, args.repeats)
+    elif args.benchmark == "harm":
+        benchmark_harm(args.sizes, args.humans, args.repeats)
+    elif args.benchmark == "update":
+        benchmark_update(args.actions, args.humans, args.ticks, args.move_rate)
+    elif args.benchmark == "codec":
+        benchmark_codec(args.sizes, args.actions, args.repeats)
+    elif args.benchmark == "api":
+        # Every all-forbidden selection logs a warning
+        logging.getLogger("lor_core").setLevel(logging.ERROR)
+        benchmark_api(args.actions, args.humans, args.scenarios, args.url, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
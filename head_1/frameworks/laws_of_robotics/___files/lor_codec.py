@@ -0,0 +1,181 @@
+"""
+JSON codec for Laws of Robotics payloads.
+
+Decoding runs from per-type field tables compiled into straight-line
+functions that read each field once and call the lor_core constructor
+positionally, with JSON parsed by orjson. Encoding hands the objects to
+orjson, which writes dataclasses natively and takes the remaining classes
+through a per-type table of their attribute dicts, so no serialize() dicts
+are built. Falls back to the standard json module when orjson is missing.
+"""
+
+import json
+import time
+import logging
+from dataclasses import is_dataclass
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from .lor_core import (
+    Action, ActionEvaluation, ActionHistory, ActionRecord, Effect, EnvironmentState,
+    HumanState, LogicStep, Order, PhysicalState, PsychologicalState, SocialContext,
+    State, Vector3
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("lor_codec")
+
+# Field tables: (attribute/JSON key, default, converter or None)
+VECTOR3_FIELDS = (("x", 0.0, float), ("y", 0.0, float), ("z", 0.0, float))
+PHYSICAL_FIELDS = (("health", 1.0, float), ("vulnerability", 0.5, float))
+PSYCHOLOGICAL_FIELDS = (("distress", 0.0, float), ("sensitivity", 0.5, float))
+SOCIAL_FIELDS = (("group_affiliation", None, None), ("social_importance", 0.5, float))
+EFFECT_FIELDS = (("target_id", "", None), ("effect_type", "", None),
+                 ("magnitude", 0.0, float), ("probability", 0.0, float))
+
+
+def compile_decoder(cls: type, fields: Tuple[Tuple[str, Any, Callable], ...]) -> Callable[[Dict], Any]:
+    """Compile a field table into a function decoding a dict into cls.
+
+    The generated function reads every field with a single dict lookup and
+    passes them positionally, so fields must be listed in constructor order.
+    """
+    namespace = {"cls": cls}
+    args = []
+    for index, (name, default, converter) in enumerate(fields):
+        namespace[f"default{index}"] = default
+        value = f"get({name!r}, default{index})"
+        if converter is not None:
+            namespace[f"convert{index}"] = converter
+            value = f"convert{index}({value})"
+        args.append(value)
+    source = (
+        "def decode(data):\n"
+        "    get = data.get\n"
+        f"    return cls({', '.join(args)})\n"
+    )
+    exec(source, namespace)
+    decode = namespace["decode"]
+    decode.__name__ = f"decode_{cls.__name__.lower()}"
+    return decode
+
+
+decode_vector3 = compile_decoder(Vector3, VECTOR3_FIELDS)
+decode_physical_state = compile_decoder(PhysicalState, PHYSICAL_FIELDS)
+decode_psychological_state = compile_decoder(PsychologicalState, PSYCHOLOGICAL_FIELDS)
+decode_social_context = compile_decoder(SocialContext, SOCIAL_FIELDS)
+decode_effect = compile_decoder(Effect, EFFECT_FIELDS)
+
+_EMPTY: Dict = {}
+
+
+def decode_action(data: Dict) -> Action:
+    """Build an Action from its JSON representation."""
+    get = data.get
+    return Action(get("id", ""), get("parameters"),
+                  [decode_effect(e) for e in get("estimated_effects", ())])
+
+
+def decode_human(human_id: str, data: Dict) -> HumanState:
+    """Build a HumanState from its JSON representation."""
+    get = data.get
+    return HumanState(
+        human_id,
+        decode_vector3(get("position", _EMPTY)),
+        decode_physical_state(get("physical_state", _EMPTY)),
+        decode_psychological_state(get("psychological_state", _EMPTY)),
+        decode_social_context(get("social_context", _EMPTY))
+    )
+
+
+def decode_state(data: Dict) -> State:
+    """Build a State from its JSON representation (action history is not decoded)."""
+    environment_data = data.get("environment", _EMPTY)
+    environment = EnvironmentState(
+        boundaries=[decode_vector3(b) for b in environment_data.get("boundaries", ())],
+        obstacles=environment_data.get("obstacles", []),
+        conditions=environment_data.get("conditions", {})
+    )
+    humans = {human_id: decode_human(human_id, human_data)
+              for human_id, human_data in data.get("humans", _EMPTY).items()}
+    return State(
+        environment=environment,
+        humans=humans,
+        time=data.get("time", time.time())
+    )
+
+
+def _encode_evaluation(evaluation: ActionEvaluation) -> Dict:
+    return {
+        "action": evaluation.action,
+        "harm_assessments": evaluation.harm_assessments,
+        "order_compliance": evaluation.order_compliance,
+        "self_preservation_value": evaluation.self_preservation_value,
+        "classification": evaluation.classification.name,
+        "explanation_trace": evaluation.explanation_trace,
+        "cache_stats": evaluation.cache_stats
+    }
+
+
+def _encode_state(state: State) -> Dict:
+    return {
+        "environment": state.environment,
+        "humans": state.humans,
+        "action_history": state.action_history,
+        "time": state.time
+    }
+
+
+def _encode_history(history: ActionHistory) -> List[ActionRecord]:
+    return list(history)
+
+
+def _attributes(obj: Any) -> Dict:
+    return obj.__dict__
+
+
+# Objects whose attribute dicts already match their serialize() output are
+# passed through as-is
+ENCODERS: Dict[type, Callable[[Any], Any]] = {
+    Action: _attributes,
+    ActionRecord: _attributes,
+    HumanState: _attributes,
+    LogicStep: _attributes,
+    Order: _attributes,
+    ActionEvaluation: _encode_evaluation,
+    State: _encode_state,
+    ActionHistory: _encode_history,
+}
+
+
+def _default(obj: Any) -> Any:
+    """Encode objects the JSON backend does not handle natively."""
+    encoder = ENCODERS.get(type(obj))
+    if encoder is not None:
+        return encoder(obj)
+    if is_dataclass(obj):
+        return obj.__dict__
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode obj, including lor_core objects, as UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default).encode()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON text."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
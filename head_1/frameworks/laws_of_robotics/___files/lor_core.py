@@ -6,8 +6,11 @@ for the Laws of Robotics framework.
 """
 
 import time
+import json
+import heapq
 import logging
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Callable, Any, Optional, Set
 from enum import Enum, auto
 from dataclasses import dataclass
@@ -16,6 +19,9 @@ from dataclasses import dataclass
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("lor_core")
 
+# State.__init__ takes a "time" argument that shadows the module
+_now = time.time
+
 # Type definitions
 HumanID = str
 ActionID = str
@@ -167,17 +173,117 @@ class ActionRecord:
             "effects": [vars(e) for e in self.effects]
         }
 
+class ActionHistory:
+    """Bounded, columnar ring buffer of executed actions.
+    
+    Timestamps and result codes are kept in numpy columns and actions and
+    effects in parallel lists, all of fixed capacity. Once full, each
+    append overwrites the oldest record; if spill_path is set the evicted
+    record is first appended to that file as a JSON line.
+    """
+    
+    def __init__(self, capacity: int = 1000, spill_path: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError("ActionHistory capacity must be at least 1")
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.actions: List[Optional[Action]] = [None] * capacity
+        self.effects: List[Optional[List[Effect]]] = [None] * capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.result_codes = np.zeros(capacity, dtype=np.int8)
+        self.start = 0
+        self.count = 0
+        self.spilled = 0
+        
+    @classmethod
+    def from_records(cls, records: List[ActionRecord], capacity: int = 1000,
+                     spill_path: Optional[str] = None) -> 'ActionHistory':
+        """Build a history holding the most recent of the given records."""
+        history = cls(capacity, spill_path)
+        for record in records:
+            history.append(record)
+        return history
+        
+    def append(self, record: ActionRecord):
+        """Add a record, evicting the oldest one when full."""
+        if self.count == self.capacity:
+            if self.spill_path:
+                self._spill(self[0])
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        else:
+            slot = (self.start + self.count) % self.capacity
+            self.count += 1
+        self.actions[slot] = record.action
+        self.effects[slot] = record.effects
+        self.timestamps[slot] = record.timestamp
+        self.result_codes[slot] = record.result_code
+        
+    def _spill(self, record: ActionRecord):
+        """Append an evicted record to the spill file."""
+        try:
+            with open(self.spill_path, "a") as f:
+                f.write(json.dumps(record.serialize()) + "\n")
+            self.spilled += 1
+        except OSError as e:
+            logger.error(f"Error spilling action history to {self.spill_path}: {e}")
+    
+    def _slots(self) -> np.ndarray:
+        """Buffer positions of the stored records, oldest first."""
+        return (self.start + np.arange(self.count)) % self.capacity
+    
+    def timestamp_column(self) -> np.ndarray:
+        """Timestamps of the stored records, oldest first."""
+        return self.timestamps[self._slots()]
+    
+    def result_code_column(self) -> np.ndarray:
+        """Result codes of the stored records, oldest first."""
+        return self.result_codes[self._slots()]
+    
+    def __getitem__(self, index: int) -> ActionRecord:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("ActionHistory index out of range")
+        slot = (self.start + index) % self.capacity
+        return ActionRecord(
+            action=self.actions[slot],
+            timestamp=float(self.timestamps[slot]),
+            result_code=int(self.result_codes[slot]),
+            effects=self.effects[slot]
+        )
+    
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+            
+    def __len__(self) -> int:
+        return self.count
+    
+    def clear(self):
+        """Drop all stored records (spilled records are kept on disk)."""
+        self.actions = [None] * self.capacity
+        self.effects = [None] * self.capacity
+        self.start = 0
+        self.count = 0
+        
+    def serialize(self) -> List[Dict]:
+        """Serialize stored records, oldest first."""
+        return [record.serialize() for record in self]
+
 class Order:
     """Representation of a human order."""
     
     def __init__(self, order_id: OrderID, human_id: HumanID,
                 action: Action, timestamp: float,
-                context: Dict[str, Any] = None):
+                context: Dict[str, Any] = None,
+                expires_at: Optional[float] = None):
         self.id = order_id
         self.human_id = human_id
         self.action = action
         self.timestamp = timestamp
         self.context = context or {}
+        self.expires_at = expires_at
         
     def serialize(self) -> Dict:
         """Serialize order to dictionary."""
@@ -186,27 +292,94 @@ class Order:
             "human_id": self.human_id,
             "action": self.action.serialize(),
             "timestamp": self.timestamp,
-            "context": self.context
+            "context": self.context,
+            "expires_at": self.expires_at
         }
 
+def _human_changed(old: HumanState, new: HumanState) -> bool:
+    """Whether two observations of the same human differ."""
+    return (old.position != new.position or
+            old.physical_state != new.physical_state or
+            old.psychological_state != new.psychological_state or
+            old.social_context != new.social_context)
+
 class State:
-    """Representation of system state."""
+    """Representation of system state.
+    
+    version increases whenever apply_update changes the perceived humans or
+    environment, so holders of a State can detect changes by comparing it.
+    """
     
     def __init__(self, environment: EnvironmentState,
                 humans: Dict[HumanID, HumanState] = None,
-                action_history: List[ActionRecord] = None,
+                action_history: ActionHistory = None,
                 time: float = None):
         self.environment = environment
         self.humans = humans or {}
-        self.action_history = action_history or []
-        self.time = time or time.time()
+        if action_history is None:
+            action_history = ActionHistory()
+        elif not isinstance(action_history, ActionHistory):
+            action_history = ActionHistory.from_records(action_history)
+        self.action_history = action_history
+        self.time = time or _now()
+        self.version = 0
+        
+    def apply_update(self, environment: EnvironmentState,
+                     humans: Dict[HumanID, HumanState],
+                     time: float = None) -> bool:
+        """Patch this state in place from a new perception snapshot.
+        
+        Only environment fields and humans that differ from the current
+        values are replaced; unchanged entries keep their existing objects.
+        Objects that are already part of this state may have been mutated
+        in place, so passing them back always counts as a change.
+        
+        Returns:
+            Whether anything changed (in which case version was bumped)
+        """
+        current = self.environment
+        changed = environment is current
+        for field in ("boundaries", "obstacles", "conditions"):
+            value = getattr(environment, field)
+            if getattr(current, field) != value:
+                setattr(current, field, value)
+                changed = True
+        
+        for human_id in [h for h in self.humans if h not in humans]:
+            del self.humans[human_id]
+            changed = True
+        for human_id, human in humans.items():
+            existing = self.humans.get(human_id)
+            if existing is None or existing is human or _human_changed(existing, human):
+                self.humans[human_id] = human
+                changed = True
+        
+        self.time = time or _now()
+        if changed:
+            self.version += 1
+        return changed
+    
+    def snapshot(self) -> 'State':
+        """Copy of this state unaffected by later apply_update calls.
+        
+        apply_update replaces humans and environment fields rather than
+        mutating them, so copying the containers is enough.
+        """
+        environment = EnvironmentState(
+            boundaries=self.environment.boundaries,
+            obstacles=self.environment.obstacles,
+            conditions=self.environment.conditions
+        )
+        snapshot = State(environment, dict(self.humans), self.action_history, self.time)
+        snapshot.version = self.version
+        return snapshot
         
     def serialize(self) -> Dict:
         """Serialize state to dictionary."""
         return {
             "environment": self.environment.serialize(),
             "humans": {h_id: h.serialize() for h_id, h in self.humans.items()},
-            "action_history": [a.serialize() for a in self.action_history],
+            "action_history": self.action_history.serialize(),
             "time": self.time
         }
 
@@ -240,6 +413,7 @@ class ActionEvaluation:
         self.self_preservation_value: float = 0.0
         self.classification: ActionClassification = ActionClassification.FORBIDDEN
         self.explanation_trace: List[LogicStep] = []
+        self.cache_stats: Dict[str, float] = {}
         
     def serialize(self) -> Dict:
         """Serialize action evaluation to dictionary."""
@@ -249,7 +423,382 @@ class ActionEvaluation:
             "order_compliance": self.order_compliance,
             "self_preservation_value": self.self_preservation_value,
             "classification": self.classification.name,
-            "explanation_trace": [t.serialize() for t in self.explanation_trace]
+            "explanation_trace": [t.serialize() for t in self.explanation_trace],
+            "cache_stats": self.cache_stats
+        }
+
+@dataclass
+class ActionAssessment:
+    """Per-Law results for one action, before classification."""
+    action: Action
+    law1_compliant: bool
+    law1_steps: List[LogicStep]
+    harm_assessments: Dict[HumanID, HarmAssessment]
+    law2_compliant: bool
+    law2_steps: List[LogicStep]
+    order_compliance: Dict[OrderID, bool]
+    self_preservation_value: float
+    law3_steps: List[LogicStep]
+    obligatory: bool
+
+class OrderIndex:
+    """Active orders indexed by order id and by ordered action id.
+    
+    Orders with an expiry time are also filed in a timer wheel of
+    fixed-width time buckets, so expire() only visits buckets that are due
+    instead of scanning every order.
+    """
+    
+    def __init__(self, resolution: float = 1.0):
+        self.resolution = resolution
+        self.by_id: Dict[OrderID, Order] = {}
+        # Inner dicts keep insertion order and allow O(1) removal
+        self.by_action: Dict[ActionID, Dict[OrderID, Order]] = {}
+        self.buckets: Dict[int, Dict[OrderID, Order]] = {}
+        self.due_ticks: List[int] = []
+        
+    def _tick(self, timestamp: float) -> int:
+        """Timer wheel bucket for a timestamp."""
+        return int(timestamp // self.resolution)
+        
+    def add(self, order: Order) -> Optional[Order]:
+        """Index an order, returning any order it replaced with the same id."""
+        replaced = self.remove(order.id)
+        self.by_id[order.id] = order
+        self.by_action.setdefault(order.action.id, {})[order.id] = order
+        if order.expires_at is not None:
+            tick = self._tick(order.expires_at)
+            if tick not in self.buckets:
+                self.buckets[tick] = {}
+                heapq.heappush(self.due_ticks, tick)
+            self.buckets[tick][order.id] = order
+        return replaced
+    
+    def remove(self, order_id: OrderID) -> Optional[Order]:
+        """Remove an order by id, returning it if it was present."""
+        order = self.by_id.pop(order_id, None)
+        if order is None:
+            return None
+        action_orders = self.by_action[order.action.id]
+        del action_orders[order_id]
+        if not action_orders:
+            del self.by_action[order.action.id]
+        if order.expires_at is not None:
+            # Emptied buckets stay in due_ticks until expire() reaches them
+            bucket = self.buckets.get(self._tick(order.expires_at))
+            if bucket is not None:
+                bucket.pop(order_id, None)
+        return order
+    
+    def for_action(self, action_id: ActionID) -> List[Order]:
+        """Orders requesting the given action, oldest first."""
+        action_orders = self.by_action.get(action_id)
+        return list(action_orders.values()) if action_orders else []
+    
+    def expire(self, now: float) -> List[Order]:
+        """Remove and return orders whose expiry time has passed."""
+        expired = []
+        now_tick = self._tick(now)
+        while self.due_ticks and self.due_ticks[0] <= now_tick:
+            tick = self.due_ticks[0]
+            bucket = self.buckets[tick]
+            due = [order for order in bucket.values() if order.expires_at <= now]
+            for order in due:
+                self.remove(order.id)
+            expired.extend(due)
+            if bucket:
+                # Current bucket still holds orders due later in this tick
+                break
+            heapq.heappop(self.due_ticks)
+            del self.buckets[tick]
+        return expired
+    
+    def copy(self) -> 'OrderIndex':
+        """Independent index holding the same orders."""
+        index = OrderIndex(self.resolution)
+        for order in self.by_id.values():
+            index.add(order)
+        return index
+    
+    def __iter__(self):
+        return iter(list(self.by_id.values()))
+    
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+class EvaluationCache:
+    """Memo of evaluation results shared across the Law checks of one state.
+    
+    Entries are only valid for the state (and state version) they were
+    computed against; binding the cache to a different state or version
+    drops every entry.
+    """
+    
+    def __init__(self):
+        self.entries: Dict[Tuple, Any] = {}
+        self.slots: Dict[Tuple, int] = {}
+        self.state = None
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        
+    def bind(self, state: 'State', version: Tuple[int, int]):
+        """Bind the cache to a state version, clearing stale entries."""
+        if state is not self.state or version != self.version:
+            self.entries.clear()
+            self.slots.clear()
+            self.state = state
+            self.version = version
+            
+    def slot(self, action_key: Tuple) -> int:
+        """Small integer standing in for an action key in entry keys.
+        
+        Action keys are nested tuples that are costly to hash repeatedly;
+        entries are keyed by slot instead.
+        """
+        slot = self.slots.get(action_key)
+        if slot is None:
+            slot = self.slots[action_key] = len(self.slots)
+        return slot
+    
+    def get_or_compute(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing it on a miss."""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            self.entries[key] = value
+            return value
+        self.hits += 1
+        return value
+    
+    def invalidate(self):
+        """Drop all entries."""
+        self.entries.clear()
+        self.slots.clear()
+        self.state = None
+        self.version = None
+        
+    def counters(self) -> Tuple[int, int]:
+        """Current (hits, misses) totals."""
+        return self.hits, self.misses
+    
+    def stats_since(self, counters: Tuple[int, int]) -> Dict[str, float]:
+        """Hit/miss statistics accumulated since a counters() snapshot."""
+        hits = self.hits - counters[0]
+        misses = self.misses - counters[1]
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0
+        }
+
+def _freeze(value: Any) -> Any:
+    """Convert nested dicts/lists into a hashable equivalent."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def action_cache_key(action: Action) -> Tuple:
+    """Content key identifying an action's evaluation inputs.
+    
+    Includes the estimated effects, so two actions that compare equal but
+    predict different effects are never confused.
+    """
+    return (
+        action.id,
+        _freeze(action.parameters),
+        tuple((e.target_id, e.effect_type, e.magnitude, e.probability)
+              for e in action.estimated_effects)
+    )
+
+@dataclass
+class CausalQuery:
+    """A single cause -> effect probability query for a reasoning module."""
+    cause: Dict[str, Any]
+    effect: Dict[str, Any]
+    state: 'State'
+    time: float
+
+class BatchedReasoningAdapter:
+    """Expose compute_causal_probabilities on a single-query reasoning module.
+    
+    Queries run one after another, or on a thread pool of max_workers for
+    backends that are safe to call concurrently. Other attributes are
+    delegated to the wrapped module.
+    """
+    
+    def __init__(self, reasoning, max_workers: int = None):
+        self.reasoning = reasoning
+        self.max_workers = max_workers
+        self._executor = None
+        
+    def compute_causal_probability(self, cause, effect, state, time):
+        """Answer one query through the wrapped module."""
+        return self.reasoning.compute_causal_probability(cause, effect, state, time)
+    
+    def compute_causal_probabilities(self, queries: List[CausalQuery]) -> List[Tuple[float, float]]:
+        """Answer queries in order, returning (probability, uncertainty) pairs."""
+        if self.max_workers and len(queries) > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="lor-reasoning")
+            return list(self._executor.map(
+                lambda q: self.reasoning.compute_causal_probability(q.cause, q.effect, q.state, q.time),
+                queries
+            ))
+        return [self.reasoning.compute_causal_probability(q.cause, q.effect, q.state, q.time)
+                for q in queries]
+    
+    def shutdown(self):
+        """Stop the worker threads, if any."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def __getattr__(self, name):
+        if name == "reasoning":
+            raise AttributeError(name)
+        return getattr(self.reasoning, name)
+
+class CandidateActionSelection:
+    """Action selection offering a fixed list of candidate actions.
+    
+    Execution and any other calls are delegated to the wrapped module.
+    """
+    
+    def __init__(self, actions: List[Action], action_selection=None):
+        self.actions = list(actions)
+        self.action_selection = action_selection
+        
+    def get_available_actions(self, state):
+        """Return the candidate actions."""
+        return self.actions
+    
+    def execute_action(self, action):
+        """Execute through the wrapped module, if any."""
+        if self.action_selection is None:
+            raise RuntimeError("No action selection module available for execution")
+        return self.action_selection.execute_action(action)
+    
+    def __getattr__(self, name):
+        if name == "action_selection":
+            raise AttributeError(name)
+        return getattr(self.action_selection, name)
+
+class HarmTensor:
+    """Dense effect representation for scoring many actions against many humans.
+    
+    effects is indexed by (action, human, harm type) and holds the summed
+    magnitude * probability of each action's estimated effects, with
+    societal effects spread to every human affiliated with the target group.
+    sensitivity and social_importance are per-human vectors.
+    """
+    
+    PHYSICAL = 0
+    PSYCHOLOGICAL = 1
+    SOCIETAL = 2
+    
+    def __init__(self, actions: List[Action], humans: Dict[HumanID, HumanState]):
+        self.actions = list(actions)
+        self.human_ids = list(humans.keys())
+        human_index = {human_id: i for i, human_id in enumerate(self.human_ids)}
+        
+        # Social groups referenced by any human, and who belongs to each
+        self.groups: List[str] = []
+        group_index: Dict[str, int] = {}
+        for human in humans.values():
+            for group in human.social_context.group_affiliation:
+                if group not in group_index:
+                    group_index[group] = len(self.groups)
+                    self.groups.append(group)
+        
+        num_actions, num_humans = len(self.actions), len(self.human_ids)
+        self.membership = np.zeros((num_humans, len(self.groups)), dtype=bool)
+        for h, human in enumerate(humans.values()):
+            for group in human.social_context.group_affiliation:
+                self.membership[h, group_index[group]] = True
+        
+        self.sensitivity = np.array(
+            [h.psychological_state.sensitivity for h in humans.values()], dtype=float)
+        self.social_importance = np.array(
+            [h.social_context.social_importance for h in humans.values()], dtype=float)
+        
+        # One pass over the effects; accumulation order matches the scalar path
+        self.effects = np.zeros((num_actions, num_humans, 3))
+        group_effects = np.zeros((num_actions, len(self.groups)))
+        for a, action in enumerate(self.actions):
+            for effect in action.estimated_effects:
+                if effect.effect_type == "physical":
+                    h = human_index.get(effect.target_id)
+                    if h is not None:
+                        self.effects[a, h, self.PHYSICAL] += effect.magnitude * effect.probability
+                elif effect.effect_type == "psychological":
+                    h = human_index.get(effect.target_id)
+                    if h is not None:
+                        self.effects[a, h, self.PSYCHOLOGICAL] += effect.magnitude * effect.probability
+                elif effect.effect_type == "societal":
+                    g = group_index.get(effect.target_id)
+                    if g is not None:
+                        group_effects[a, g] += effect.magnitude * effect.probability
+        
+        if self.groups:
+            # A human's societal harm is the sum over the groups they belong to
+            self.effects[:, :, self.SOCIETAL] = group_effects @ self.membership.T
+    
+    def compute(self, config: 'LORConfig', physical_prob: np.ndarray = None,
+                psychological_prob: np.ndarray = None,
+                group_prob: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Compute harm components and weighted totals for all pairs.
+        
+        Args:
+            config: Framework configuration providing the harm weights
+            physical_prob: Optional (action, human) reasoning probabilities
+                of physical harm
+            psychological_prob: Optional (action, human) reasoning
+                probabilities of psychological harm
+            group_prob: Optional (action, group) reasoning probabilities of
+                societal harm
+            
+        Returns:
+            Dictionary of (action, human) arrays: physical, psychological,
+            societal and total
+        """
+        physical = self.effects[:, :, self.PHYSICAL]
+        psychological = self.effects[:, :, self.PSYCHOLOGICAL] * self.sensitivity
+        societal = self.effects[:, :, self.SOCIETAL]
+        
+        if physical_prob is not None:
+            physical = np.maximum(physical, physical_prob)
+        if psychological_prob is not None:
+            psychological = np.maximum(psychological, psychological_prob * self.sensitivity)
+        if group_prob is not None and self.groups:
+            # Strongest reasoning probability over each human's groups; a
+            # human in no group gets 0, as in the scalar path (-inf would
+            # turn into NaN when scaled by a social importance of 0)
+            masked = np.where(self.membership[np.newaxis, :, :],
+                              group_prob[:, np.newaxis, :], 0.0)
+            societal = np.maximum(societal, masked.max(axis=2) * self.social_importance)
+        
+        physical = np.minimum(1.0, physical)
+        psychological = np.minimum(1.0, psychological)
+        societal = np.minimum(1.0, societal)
+        
+        total = (
+            config.PHYSICAL_HARM_WEIGHT * physical +
+            config.PSYCHOLOGICAL_HARM_WEIGHT * psychological +
+            config.SOCIETAL_HARM_WEIGHT * societal
+        )
+        
+        return {
+            "physical": physical,
+            "psychological": psychological,
+            "societal": societal,
+            "total": total
         }
 
 class LORConfig:
@@ -276,6 +825,30 @@ class LORConfig:
         
         # Performance settings
         self.MAX_ACTIONS_EVALUATED = 1000
+        self.EVALUATION_CACHE_ENABLED = True
+        
+        # Worker threads for reasoning modules that declare thread_safe = True
+        # and only offer single queries (None runs queries sequentially)
+        self.REASONING_MAX_WORKERS = None
+        
+        # Score harm for all candidate actions with HarmTensor before
+        # selection. Bypasses overrides of the _calculate_*_harm methods.
+        self.VECTORIZED_HARM = False
+        
+        # Order expiry: default lifetime in seconds for orders without an
+        # explicit expires_at (None keeps them until removed), and the
+        # timer wheel bucket width used to sweep them
+        self.ORDER_TTL = None
+        self.ORDER_EXPIRY_RESOLUTION = 1.0
+        
+        # Action history: records kept in memory, and an optional JSONL
+        # file that evicted records are appended to
+        self.ACTION_HISTORY_CAPACITY = 1000
+        self.ACTION_HISTORY_SPILL_PATH = None
+        
+        # Patch the current state in place on perception updates instead of
+        # rebuilding it every tick
+        self.INCREMENTAL_STATE_UPDATES = True
     
     @classmethod
     def from_file(cls, filepath: str) -> 'LORConfig':
@@ -308,15 +881,42 @@ class LawsEngine:
         self.action_selection = None
         self.explanation = None
         self.current_state = None
-        self.active_orders = []
+        self.order_index = OrderIndex(config.ORDER_EXPIRY_RESOLUTION)
+        
+        # Bumped whenever perceived state or orders change, invalidating
+        # the evaluation cache
+        self.state_version = 0
+        self.evaluation_cache = EvaluationCache()
+        
+    @property
+    def active_orders(self) -> List[Order]:
+        """Active orders in the order they were added."""
+        return list(self.order_index)
+    
+    @active_orders.setter
+    def active_orders(self, orders: List[Order]):
+        self.order_index = OrderIndex(self.config.ORDER_EXPIRY_RESOLUTION)
+        for order in orders:
+            self.order_index.add(order)
+        self.invalidate_cache()
         
     def set_perception(self, perception):
         """Set the perception module."""
         self.perception = perception
         
     def set_reasoning(self, reasoning):
-        """Set the reasoning module."""
+        """Set the reasoning module.
+        
+        Modules without a batched compute_causal_probabilities method are
+        wrapped in a BatchedReasoningAdapter.
+        """
+        if reasoning is not None and not hasattr(reasoning, "compute_causal_probabilities"):
+            max_workers = None
+            if getattr(reasoning, "thread_safe", False):
+                max_workers = self.config.REASONING_MAX_WORKERS
+            reasoning = BatchedReasoningAdapter(reasoning, max_workers)
         self.reasoning = reasoning
+        self.invalidate_cache()
         
     def set_action_selection(self, action_selection):
         """Set the action selection module."""
@@ -333,11 +933,20 @@ class LawsEngine:
             
         environment = self.perception.get_environment_state()
         humans = self.perception.detect_humans()
+        self.expire_orders()
+        
+        if self.current_state and self.config.INCREMENTAL_STATE_UPDATES:
+            # Cached evaluations stay valid unless the patch changed
+            # something; the state version keys the cache
+            self.current_state.apply_update(environment, humans, time.time())
+            return
         
         # If we have a previous state, carry over the action history
-        action_history = []
         if self.current_state:
             action_history = self.current_state.action_history
+        else:
+            action_history = ActionHistory(self.config.ACTION_HISTORY_CAPACITY,
+                                           self.config.ACTION_HISTORY_SPILL_PATH)
             
         self.current_state = State(
             environment=environment,
@@ -345,30 +954,183 @@ class LawsEngine:
             action_history=action_history,
             time=time.time()
         )
+        self.invalidate_cache()
+    
+    def invalidate_cache(self):
+        """Discard cached evaluations.
+        
+        Called automatically when state or orders change; call it directly
+        after mutating the current state in place.
+        """
+        self.state_version += 1
+        self.evaluation_cache.invalidate()
+    
+    def evaluation_context(self, state: State = None,
+                           actions: List[Action] = None) -> 'LawsEngine':
+        """Create an independent engine for evaluating a single request.
         
+        The context shares configuration and modules with this engine and
+        starts from a snapshot of its active orders, but has its own state
+        and evaluation cache. Concurrent contexts therefore never touch each
+        other's data or this engine's.
+        
+        Args:
+            state: State to evaluate against (defaults to a snapshot of the
+                current state)
+            actions: Candidate actions (defaults to those offered by the
+                action selection module)
+            
+        Returns:
+            A LawsEngine bound to the given state
+        """
+        context = LawsEngine(self.config)
+        context.perception = self.perception
+        context.reasoning = self.reasoning
+        context.explanation = self.explanation
+        context.action_selection = self.action_selection
+        if actions is not None:
+            context.action_selection = CandidateActionSelection(actions, self.action_selection)
+        context.order_index = self.order_index.copy()
+        if state is None and self.current_state is not None:
+            state = self.current_state.snapshot()
+        context.current_state = state
+        return context
+    
+    def _action_slot(self, action: Action, state: State) -> Optional[int]:
+        """Cache slot identifying action within the evaluation cache for state."""
+        if not self.config.EVALUATION_CACHE_ENABLED:
+            return None
+        self.evaluation_cache.bind(state, (state.version, self.state_version))
+        return self.evaluation_cache.slot(action_cache_key(action))
+    
+    def _cached(self, state: State, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """Look up key in the evaluation cache for state, computing on a miss."""
+        if not self.config.EVALUATION_CACHE_ENABLED:
+            return compute()
+        self.evaluation_cache.bind(state, (state.version, self.state_version))
+        return self.evaluation_cache.get_or_compute(key, compute)
+        
+    def _causal_probability(self, action: Action, event: Dict[str, Any],
+                            state: State) -> Tuple[float, float]:
+        """Probability and uncertainty that action causes event.
+        
+        Served from queries prefetched for the current decision when
+        available, otherwise issued to the reasoning module on its own.
+        """
+        return self._cached(
+            state, ("causal", self._action_slot(action, state), _freeze(event)),
+            lambda: self.reasoning.compute_causal_probabilities([
+                CausalQuery({"action": action.id, "parameters": action.parameters},
+                            event, state, state.time)
+            ])[0]
+        )
+    
+    def _harm_events(self, state: State) -> List[Dict[str, Any]]:
+        """Reasoning events queried for every action when assessing harm."""
+        events = []
+        groups = []
+        for human_id, human_state in state.humans.items():
+            events.append({"type": "physical_harm", "target": human_id})
+            events.append({"type": "psychological_harm", "target": human_id})
+            for group in human_state.social_context.group_affiliation:
+                if group not in groups:
+                    groups.append(group)
+        events.extend({"type": "societal_harm", "target_group": group} for group in groups)
+        events.append({"type": "system_integrity_maintained"})
+        return events
+    
+    def _issue_causal_queries(self, requests: List[Tuple[Action, Dict[str, Any]]],
+                              state: State):
+        """Send all uncached (action, event) queries in one batched call."""
+        entries = self.evaluation_cache.entries
+        keys, queries = [], []
+        pending = set()
+        for action, event in requests:
+            key = ("causal", self._action_slot(action, state), _freeze(event))
+            if key in entries or key in pending:
+                continue
+            pending.add(key)
+            keys.append(key)
+            queries.append(CausalQuery({"action": action.id, "parameters": action.parameters},
+                                       event, state, state.time))
+        if queries:
+            results = self.reasoning.compute_causal_probabilities(queries)
+            entries.update(zip(keys, results))
+    
+    def prefetch_causal_probabilities(self, actions: List[Action], state: State = None,
+                                      ordered_actions: List[Action] = None):
+        """Gather the reasoning queries a decision needs and batch them.
+        
+        The first batch covers harm and integrity events for every action.
+        Threshold queries depend on those harms, so a second batch covers
+        the Law 1 violation checks of ordered_actions.
+        """
+        state = state or self.current_state
+        if not self.reasoning or not self.config.EVALUATION_CACHE_ENABLED:
+            return
+        
+        # Skip actions whose queries were already gathered for this state
+        entries = self.evaluation_cache.entries
+        pending = []
+        pending_slots = set()
+        for action in actions + (ordered_actions or []):
+            slot = self._action_slot(action, state)
+            if ("prefetched", slot) not in entries:
+                entries[("prefetched", slot)] = True
+                pending.append(action)
+                pending_slots.add(slot)
+        if not pending:
+            return
+        
+        events = self._harm_events(state)
+        self._issue_causal_queries(
+            [(action, event) for action in pending for event in events],
+            state
+        )
+        
+        threshold_requests = []
+        for action in ordered_actions or []:
+            if self._action_slot(action, state) not in pending_slots:
+                continue
+            for human_id, assessment in self.evaluate_law1(action, state).items():
+                threshold = self._get_harm_threshold(human_id, state.time)
+                if assessment.total_harm <= threshold:
+                    threshold_requests.append((action, {
+                        "type": "harm_exceeds_threshold",
+                        "threshold": threshold,
+                        "target": human_id
+                    }))
+        self._issue_causal_queries(threshold_requests, state)
+    
     def evaluate_law1(self, action: Action, state: State = None) -> Dict[HumanID, HarmAssessment]:
         """Evaluate action against Law 1 (non-harm principle)."""
         state = state or self.current_state
         if not state:
             raise RuntimeError("No state available for evaluation")
             
+        action_key = self._action_slot(action, state)
+        harm_assessments = self._cached(
+            state, ("law1_assessments", action_key),
+            lambda: self._assess_harms(action, action_key, state)
+        )
+        return dict(harm_assessments)
+    
+    def _assess_harms(self, action: Action, action_key: Optional[int],
+                      state: State) -> Dict[HumanID, HarmAssessment]:
+        """Build the harm assessment of an action for every human."""
         harm_assessments = {}
         
         for human_id, human_state in state.humans.items():
-            # Calculate potential harm components
-            physical_harm = self._calculate_physical_harm(action, human_state, state)
-            psychological_harm = self._calculate_psychological_harm(action, human_state, state)
-            societal_harm = self._calculate_societal_harm(action, human_state, state)
-            
-            # Apply weights from configuration
-            total_harm = (
-                self.config.PHYSICAL_HARM_WEIGHT * physical_harm +
-                self.config.PSYCHOLOGICAL_HARM_WEIGHT * psychological_harm +
-                self.config.SOCIETAL_HARM_WEIGHT * societal_harm
+            physical_harm, psychological_harm, societal_harm, total_harm = self._cached(
+                state, ("harm", action_key, human_id),
+                lambda: self._calculate_harm_components(action, human_state, state)
             )
             
             # Estimate confidence of assessment
-            confidence = self._calculate_harm_confidence(action, human_state, state)
+            confidence = self._cached(
+                state, ("harm_confidence", action_key, human_id),
+                lambda: self._calculate_harm_confidence(action, human_state, state)
+            )
             
             harm_assessments[human_id] = HarmAssessment(
                 physical_harm=physical_harm,
@@ -380,6 +1142,88 @@ class LawsEngine:
         
         return harm_assessments
     
+    def _calculate_harm_components(self, action: Action, human_state: HumanState,
+                                   state: State) -> Tuple[float, float, float, float]:
+        """Calculate physical, psychological, societal and weighted total harm."""
+        physical_harm = self._calculate_physical_harm(action, human_state, state)
+        psychological_harm = self._calculate_psychological_harm(action, human_state, state)
+        societal_harm = self._calculate_societal_harm(action, human_state, state)
+        
+        # Apply weights from configuration
+        total_harm = (
+            self.config.PHYSICAL_HARM_WEIGHT * physical_harm +
+            self.config.PSYCHOLOGICAL_HARM_WEIGHT * psychological_harm +
+            self.config.SOCIETAL_HARM_WEIGHT * societal_harm
+        )
+        
+        return physical_harm, psychological_harm, societal_harm, total_harm
+    
+    def prime_harm_cache(self, actions: List[Action], state: State = None):
+        """Score harm for many actions at once and seed the evaluation cache.
+        
+        Uses HarmTensor to compute physical, psychological and societal harm
+        for every (action, human) pair in one NumPy pass; later Law 1 checks
+        on these actions are served from the cache.
+        """
+        state = state or self.current_state
+        if not state:
+            raise RuntimeError("No state available for evaluation")
+        if not self.config.EVALUATION_CACHE_ENABLED or not actions or not state.humans:
+            return
+        
+        tensor = HarmTensor(actions, state.humans)
+        physical_prob = psychological_prob = group_prob = None
+        confidence = np.full((len(tensor.actions), len(tensor.human_ids)), 0.8)
+        
+        if self.reasoning:
+            physical_prob = np.zeros(confidence.shape)
+            psychological_prob = np.zeros(confidence.shape)
+            group_prob = np.zeros((len(tensor.actions), len(tensor.groups)))
+            
+            # One batched reasoning call, then fill the arrays from the cache
+            self.prefetch_causal_probabilities(tensor.actions, state)
+            for a, action in enumerate(tensor.actions):
+                for h, human_id in enumerate(tensor.human_ids):
+                    prob, uncertainty = self._causal_probability(
+                        action, {"type": "physical_harm", "target": human_id}, state)
+                    physical_prob[a, h] = prob
+                    confidence[a, h] = max(0.1, min(0.99, 1.0 - uncertainty))
+                    
+                    psychological_prob[a, h], _ = self._causal_probability(
+                        action, {"type": "psychological_harm", "target": human_id}, state)
+                
+                for g, group in enumerate(tensor.groups):
+                    group_prob[a, g], _ = self._causal_probability(
+                        action, {"type": "societal_harm", "target_group": group}, state)
+        
+        harms = tensor.compute(self.config, physical_prob, psychological_prob, group_prob)
+        
+        # Python floats for the cached values, so results match the scalar path
+        physical = harms["physical"].tolist()
+        psychological = harms["psychological"].tolist()
+        societal = harms["societal"].tolist()
+        total = harms["total"].tolist()
+        confidence = confidence.tolist()
+        
+        self.evaluation_cache.bind(state, (state.version, self.state_version))
+        entries = self.evaluation_cache.entries
+        for a, action in enumerate(tensor.actions):
+            action_key = self.evaluation_cache.slot(action_cache_key(action))
+            assessments = {}
+            for h, human_id in enumerate(tensor.human_ids):
+                entries[("harm", action_key, human_id)] = (
+                    physical[a][h], psychological[a][h], societal[a][h], total[a][h]
+                )
+                entries[("harm_confidence", action_key, human_id)] = confidence[a][h]
+                assessments[human_id] = HarmAssessment(
+                    physical_harm=physical[a][h],
+                    psychological_harm=psychological[a][h],
+                    societal_harm=societal[a][h],
+                    total_harm=total[a][h],
+                    confidence=confidence[a][h]
+                )
+            entries[("law1_assessments", action_key)] = assessments
+    
     def _calculate_physical_harm(self, action: Action, human_state: HumanState, state: State) -> float:
         """Calculate potential physical harm of action to human."""
         # Basic implementation - to be enhanced by specific implementations
@@ -399,12 +1243,7 @@ class LawsEngine:
             }
             
             # Get probability from reasoning engine
-            prob, _ = self.reasoning.compute_causal_probability(
-                {"action": action.id, "parameters": action.parameters},
-                harm_event,
-                state,
-                state.time
-            )
+            prob, _ = self._causal_probability(action, harm_event, state)
             
             # Adjust physical harm based on reasoning
             physical_harm = max(physical_harm, prob)
@@ -433,12 +1272,7 @@ class LawsEngine:
             }
             
             # Get probability from reasoning engine
-            prob, _ = self.reasoning.compute_causal_probability(
-                {"action": action.id, "parameters": action.parameters},
-                harm_event,
-                state,
-                state.time
-            )
+            prob, _ = self._causal_probability(action, harm_event, state)
             
             # Adjust psychological harm based on reasoning
             psychological_harm = max(psychological_harm, prob * human_state.psychological_state.sensitivity)
@@ -467,12 +1301,7 @@ class LawsEngine:
                 }
                 
                 # Get probability from reasoning engine
-                prob, _ = self.reasoning.compute_causal_probability(
-                    {"action": action.id, "parameters": action.parameters},
-                    harm_event,
-                    state,
-                    state.time
-                )
+                prob, _ = self._causal_probability(action, harm_event, state)
                 
                 # Adjust societal harm based on reasoning and social importance
                 societal_harm = max(societal_harm, prob * human_state.social_context.social_importance)
@@ -489,12 +1318,7 @@ class LawsEngine:
         if self.reasoning:
             # Get uncertainty for physical harm prediction
             harm_event = {"type": "physical_harm", "target": human_state.id}
-            _, uncertainty = self.reasoning.compute_causal_probability(
-                {"action": action.id, "parameters": action.parameters},
-                harm_event,
-                state,
-                state.time
-            )
+            _, uncertainty = self._causal_probability(action, harm_event, state)
             
             # Convert uncertainty to confidence (inverse relationship)
             confidence = max(0.1, min(0.99, 1.0 - uncertainty))
@@ -504,6 +1328,14 @@ class LawsEngine:
     def is_law1_compliant(self, action: Action, state: State = None) -> Tuple[bool, List[LogicStep]]:
         """Check if action complies with Law 1."""
         state = state or self.current_state
+        complies, explanation_steps = self._cached(
+            state, ("law1", self._action_slot(action, state)),
+            lambda: self._check_law1(action, state)
+        )
+        return complies, list(explanation_steps)
+    
+    def _check_law1(self, action: Action, state: State) -> Tuple[bool, List[LogicStep]]:
+        """Compare each human's harm assessment against their threshold."""
         harm_assessments = self.evaluate_law1(action, state)
         
         explanation_steps = []
@@ -533,17 +1365,22 @@ class LawsEngine:
                      state: State = None) -> Tuple[Dict[OrderID, bool], List[LogicStep]]:
         """Evaluate action against Law 2 (obedience principle)."""
         state = state or self.current_state
-        orders = orders or self.active_orders
         
         # Filter to orders for this specific action
-        relevant_orders = [order for order in orders if order.action.id == action.id]
+        if orders:
+            relevant_orders = [order for order in orders if order.action.id == action.id]
+        else:
+            relevant_orders = self.order_index.for_action(action.id)
         
         compliance_results = {}
         explanation_steps = []
         
         for order in relevant_orders:
             # Check if obeying would violate Law 1
-            law1_violation_prob = self._calculate_law1_violation_probability(order.action, state)
+            law1_violation_prob = self._cached(
+                state, ("law1_violation", self._action_slot(order.action, state)),
+                lambda: self._calculate_law1_violation_probability(order.action, state)
+            )
             
             complies = law1_violation_prob < self.config.UNCERTAINTY_THRESHOLD
             
@@ -563,21 +1400,16 @@ class LawsEngine:
         """Calculate probability that action violates Law 1."""
         # Basic implementation
         violation_prob = 0.0
+        action_key = self._action_slot(action, state)
         
         # Check each human for potential harm exceeding threshold
         for human_id, human_state in state.humans.items():
             threshold = self._get_harm_threshold(human_id, state.time)
             
-            # Calculate harm components
-            physical_harm = self._calculate_physical_harm(action, human_state, state)
-            psychological_harm = self._calculate_psychological_harm(action, human_state, state)
-            societal_harm = self._calculate_societal_harm(action, human_state, state)
-            
-            # Apply weights from configuration
-            total_harm = (
-                self.config.PHYSICAL_HARM_WEIGHT * physical_harm +
-                self.config.PSYCHOLOGICAL_HARM_WEIGHT * psychological_harm +
-                self.config.SOCIETAL_HARM_WEIGHT * societal_harm
+            # Calculate harm components (shared with evaluate_law1)
+            _, _, _, total_harm = self._cached(
+                state, ("harm", action_key, human_id),
+                lambda: self._calculate_harm_components(action, human_state, state)
             )
             
             # Probability that harm exceeds threshold
@@ -595,12 +1427,7 @@ class LawsEngine:
                         "target": human_id
                     }
                     
-                    individual_prob, _ = self.reasoning.compute_causal_probability(
-                        {"action": action.id, "parameters": action.parameters},
-                        harm_event,
-                        state,
-                        state.time
-                    )
+                    individual_prob, _ = self._causal_probability(action, harm_event, state)
             
             # Update overall violation probability
             # Use the maximum probability across all humans
@@ -613,7 +1440,7 @@ class LawsEngine:
         state = state or self.current_state
         
         # If no orders exist, Law 2 is not applicable (always complies)
-        if not self.active_orders:
+        if not self.order_index:
             step = LogicStep(
                 description="Law 2 compliance check",
                 result=True,
@@ -622,8 +1449,7 @@ class LawsEngine:
             return True, [step]
         
         # Check if action is directly ordered
-        relevant_orders = [order for order in self.active_orders 
-                         if order.action.id == action.id]
+        relevant_orders = self.order_index.for_action(action.id)
         
         if not relevant_orders:
             # Action wasn't ordered, but that's okay if no conflicting orders exist
@@ -645,7 +1471,7 @@ class LawsEngine:
             description="Law 2 overall compliance",
             result=complies,
             justification=f"At least one order can be followed: {complies}",
-            derived_from=explanation_steps
+            derived_from=list(explanation_steps)
         )
         
         explanation_steps.append(summary_step)
@@ -656,7 +1482,10 @@ class LawsEngine:
         state = state or self.current_state
         
         # Calculate probability of maintaining system integrity
-        integrity_probability = self._calculate_integrity_probability(action, state)
+        integrity_probability = self._cached(
+            state, ("integrity", self._action_slot(action, state)),
+            lambda: self._calculate_integrity_probability(action, state)
+        )
         
         # Calculate value of system integrity in current context
         integrity_value = self._calculate_integrity_value(state)
@@ -690,12 +1519,7 @@ class LawsEngine:
                 "type": "system_integrity_maintained"
             }
             
-            prob, _ = self.reasoning.compute_causal_probability(
-                {"action": action.id, "parameters": action.parameters},
-                integrity_event,
-                state,
-                state.time
-            )
+            prob, _ = self._causal_probability(action, integrity_event, state)
             
             # Use the reasoning engine's probability if available
             if prob > 0:
@@ -719,65 +1543,117 @@ class LawsEngine:
         
         return integrity_value
     
+    def classify_actions(self, actions: List[Action], state: State = None) -> List[ActionEvaluation]:
+        """Classify several actions, batching their reasoning queries.
+        
+        Equivalent to calling classify_action for each action.
+        """
+        state = state or self.current_state
+        self.expire_orders()
+        self.prefetch_causal_probabilities(
+            list(actions) + [self._get_inaction_action()], state,
+            [order.action for order in self.order_index]
+        )
+        return [self.classify_action(action, state) for action in actions]
+    
     def classify_action(self, action: Action, state: State = None) -> ActionEvaluation:
         """Classify action according to the Three Laws."""
         state = state or self.current_state
-        evaluation = ActionEvaluation(action)
+        self.expire_orders()
+        cache_counters = self.evaluation_cache.counters()
+        
+        self.prefetch_causal_probabilities(
+            [action, self._get_inaction_action()], state,
+            [order.action for order in self.order_index]
+        )
+        assessment = self._assess_action(action, state)
+        
+        # Only permitted, non-mandatory actions need the Law 3 comparison
+        is_preferred = False
+        if assessment.law1_compliant and not assessment.obligatory:
+            is_preferred = self._is_preferred_action(action, state)
         
+        evaluation = self._build_evaluation(assessment, is_preferred)
+        evaluation.cache_stats = self.evaluation_cache.stats_since(cache_counters)
+        logger.debug(f"Classified {action.id} as {evaluation.classification.name} "
+                     f"(cache hit ratio {evaluation.cache_stats['hit_ratio']:.2f})")
+        return evaluation
+    
+    def _assess_action(self, action: Action, state: State) -> 'ActionAssessment':
+        """Evaluate an action against each Law exactly once."""
         # Evaluate against Law 1
         law1_compliant, law1_steps = self.is_law1_compliant(action, state)
-        evaluation.harm_assessments = self.evaluate_law1(action, state)
+        harm_assessments = self.evaluate_law1(action, state)
         
         # Evaluate against Law 2
         law2_compliant, law2_steps = self.is_law2_compliant(action, state)
-        compliance_results, _ = self.evaluate_law2(action, self.active_orders, state)
-        evaluation.order_compliance = compliance_results
+        compliance_results, _ = self.evaluate_law2(action, None, state)
         
         # Evaluate against Law 3
         law3_value, law3_steps = self.evaluate_law3(action, state)
-        evaluation.self_preservation_value = law3_value
+        
+        obligatory = (law1_compliant and
+                      self._is_obligatory(action, state, law1_compliant, law2_compliant))
+        
+        return ActionAssessment(
+            action=action,
+            law1_compliant=law1_compliant,
+            law1_steps=law1_steps,
+            harm_assessments=harm_assessments,
+            law2_compliant=law2_compliant,
+            law2_steps=law2_steps,
+            order_compliance=compliance_results,
+            self_preservation_value=law3_value,
+            law3_steps=law3_steps,
+            obligatory=obligatory
+        )
+    
+    def _build_evaluation(self, assessment: 'ActionAssessment',
+                          is_preferred: bool) -> ActionEvaluation:
+        """Derive the classification and explanation trace of an assessed action."""
+        evaluation = ActionEvaluation(assessment.action)
+        evaluation.harm_assessments = assessment.harm_assessments
+        evaluation.order_compliance = assessment.order_compliance
+        evaluation.self_preservation_value = assessment.self_preservation_value
         
         # Combine explanations
-        evaluation.explanation_trace = law1_steps + law2_steps + law3_steps
+        evaluation.explanation_trace = (assessment.law1_steps + assessment.law2_steps +
+                                        assessment.law3_steps)
         
         # Classify action
-        if not law1_compliant:
+        if not assessment.law1_compliant:
             evaluation.classification = ActionClassification.FORBIDDEN
             summary_step = LogicStep(
                 description="Final action classification",
                 result=False,
                 justification="Action is FORBIDDEN: Violates Law 1 (non-harm)",
-                derived_from=evaluation.explanation_trace
+                derived_from=list(evaluation.explanation_trace)
             )
-        elif self._is_obligatory(action, state, law1_compliant, law2_compliant):
+        elif assessment.obligatory:
             evaluation.classification = ActionClassification.MANDATORY
             summary_step = LogicStep(
                 description="Final action classification",
                 result=True,
                 justification="Action is MANDATORY: Required by Law 1 or Law 2",
-                derived_from=evaluation.explanation_trace
+                derived_from=list(evaluation.explanation_trace)
+            )
+        elif is_preferred:
+            # Permitted, not mandatory, and optimal for Law 3
+            evaluation.classification = ActionClassification.PREFERRED
+            summary_step = LogicStep(
+                description="Final action classification",
+                result=True,
+                justification="Action is PREFERRED: Optimal for Law 3",
+                derived_from=list(evaluation.explanation_trace)
             )
         else:
-            # Action is permitted but not mandatory
-            # Check if it's preferred (optimal for Law 3)
-            is_preferred = self._is_preferred_action(action, state)
-            
-            if is_preferred:
-                evaluation.classification = ActionClassification.PREFERRED
-                summary_step = LogicStep(
-                    description="Final action classification",
-                    result=True,
-                    justification="Action is PREFERRED: Optimal for Law 3",
-                    derived_from=evaluation.explanation_trace
-                )
-            else:
-                evaluation.classification = ActionClassification.PERMITTED
-                summary_step = LogicStep(
-                    description="Final action classification",
-                    result=True,
-                    justification="Action is PERMITTED: Complies with Laws 1-2",
-                    derived_from=evaluation.explanation_trace
-                )
+            evaluation.classification = ActionClassification.PERMITTED
+            summary_step = LogicStep(
+                description="Final action classification",
+                result=True,
+                justification="Action is PERMITTED: Complies with Laws 1-2",
+                derived_from=list(evaluation.explanation_trace)
+            )
         
         evaluation.explanation_trace.append(summary_step)
         return evaluation
@@ -791,8 +1667,7 @@ class LawsEngine:
         
         # Check if action is directly ordered and Law 1 compliant
         if law1_compliant and law2_compliant:
-            relevant_orders = [order for order in self.active_orders 
-                             if order.action.id == action.id]
+            relevant_orders = self.order_index.for_action(action.id)
             if relevant_orders:
                 compliance_results, _ = self.evaluate_law2(action, relevant_orders, state)
                 if any(compliance_results.values()):
@@ -816,6 +1691,7 @@ class LawsEngine:
         """Determine if action is preferred according to Law 3."""
         # Get all possible actions
         possible_actions = self._get_possible_actions(state)
+        self.prefetch_causal_probabilities(possible_actions, state)
         
         # Filter to only Law 1-2 compliant actions
         compliant_actions = []
@@ -837,6 +1713,39 @@ class LawsEngine:
         
         return True
     
+    @staticmethod
+    def _preferred_flags(assessments: List['ActionAssessment']) -> List[bool]:
+        """Law 3 preference of each assessed action in linear time.
+        
+        Equivalent to calling _is_preferred_action for every candidate: an
+        action is preferred when every other Law 1-2 compliant action has a
+        strictly lower self-preservation value. Actions comparing equal are
+        grouped, and the best two groups give each action its strongest rival.
+        """
+        best_by_group: Dict[Tuple, float] = {}
+        for assessment in assessments:
+            if assessment.law1_compliant and assessment.law2_compliant:
+                group = (assessment.action.id, _freeze(assessment.action.parameters))
+                value = assessment.self_preservation_value
+                if group not in best_by_group or value > best_by_group[group]:
+                    best_by_group[group] = value
+        
+        top_group, top_value = None, -float('inf')
+        runner_up_value = -float('inf')
+        for group, value in best_by_group.items():
+            if value > top_value:
+                runner_up_value = top_value
+                top_group, top_value = group, value
+            elif value > runner_up_value:
+                runner_up_value = value
+        
+        flags = []
+        for assessment in assessments:
+            group = (assessment.action.id, _freeze(assessment.action.parameters))
+            rival_value = runner_up_value if group == top_group else top_value
+            flags.append(rival_value < assessment.self_preservation_value)
+        return flags
+    
     def _get_possible_actions(self, state: State) -> List[Action]:
         """Get all possible actions in the current state."""
         if not self.action_selection:
@@ -866,6 +1775,8 @@ class LawsEngine:
         if not self.action_selection:
             raise RuntimeError("No action selection module available")
             
+        self.expire_orders()
+        
         # Get all possible actions
         possible_actions = self._get_possible_actions(state)
         
@@ -878,11 +1789,29 @@ class LawsEngine:
         }
         
         evaluations = {}
-        
-        for action in possible_actions:
-            evaluation = self.classify_action(action, state)
-            evaluations[action] = evaluation
-            classified_actions[evaluation.classification].append(action)
+        cache_counters = self.evaluation_cache.counters()
+        
+        # Inaction and ordered actions are assessed alongside the candidates
+        ordered_actions = [order.action for order in self.order_index]
+        assessed_actions = possible_actions + [self._get_inaction_action()]
+        if self.config.VECTORIZED_HARM:
+            self.prime_harm_cache(assessed_actions + ordered_actions, state)
+        self.prefetch_causal_probabilities(assessed_actions, state, ordered_actions)
+        
+        # Evaluate harm, order compliance and self-preservation once per
+        # action, then classify from those tables
+        assessments = [self._assess_action(action, state) for action in possible_actions]
+        preferred_flags = self._preferred_flags(assessments)
+        assessed = {id(assessment.action): assessment for assessment in assessments}
+        
+        for assessment, is_preferred in zip(assessments, preferred_flags):
+            evaluation = self._build_evaluation(assessment, is_preferred)
+            evaluations[assessment.action] = evaluation
+            classified_actions[evaluation.classification].append(assessment.action)
+        
+        cache_stats = self.evaluation_cache.stats_since(cache_counters)
+        for evaluation in evaluations.values():
+            evaluation.cache_stats = cache_stats
         
         # Select action according to priority
         selected_action = None
@@ -891,7 +1820,7 @@ class LawsEngine:
         if classified_actions[ActionClassification.MANDATORY]:
             # If multiple mandatory actions, select one that maximizes self-preservation
             mandatory_actions = classified_actions[ActionClassification.MANDATORY]
-            selected_action = self._select_sp_max_action(mandatory_actions, state)
+            selected_action = self._select_sp_max_action(mandatory_actions, state, assessed)
         
         # 2. Otherwise if there are preferred actions, select one
         elif classified_actions[ActionClassification.PREFERRED]:
@@ -902,13 +1831,13 @@ class LawsEngine:
         elif classified_actions[ActionClassification.PERMITTED]:
             # Select permitted action with highest self-preservation value
             permitted_actions = classified_actions[ActionClassification.PERMITTED]
-            selected_action = self._select_sp_max_action(permitted_actions, state)
+            selected_action = self._select_sp_max_action(permitted_actions, state, assessed)
         
         # 4. If all actions are forbidden, select least harmful
         else:
             # Find action that causes minimal harm
             forbidden_actions = classified_actions[ActionClassification.FORBIDDEN]
-            selected_action = self._select_min_harm_action(forbidden_actions, state)
+            selected_action = self._select_min_harm_action(forbidden_actions, state, assessed)
             
             # Log that we're taking a forbidden action
             logger.warning("All actions forbidden - selecting least harmful option")
@@ -922,8 +1851,12 @@ class LawsEngine:
             
         return selected_action, evaluation
     
-    def _select_sp_max_action(self, actions: List[Action], state: State) -> Action:
-        """Select action with maximum self-preservation value."""
+    def _select_sp_max_action(self, actions: List[Action], state: State,
+                              assessed: Dict[int, ActionAssessment] = None) -> Action:
+        """Select action with maximum self-preservation value.
+        
+        assessed optionally maps id(action) to precomputed assessments.
+        """
         if not actions:
             return None
             
@@ -931,15 +1864,22 @@ class LawsEngine:
         best_action = None
         
         for action in actions:
-            sp_value, _ = self.evaluate_law3(action, state)
+            if assessed and id(action) in assessed:
+                sp_value = assessed[id(action)].self_preservation_value
+            else:
+                sp_value, _ = self.evaluate_law3(action, state)
             if sp_value > max_sp:
                 max_sp = sp_value
                 best_action = action
                 
         return best_action
     
-    def _select_min_harm_action(self, actions: List[Action], state: State) -> Action:
-        """Select action with minimum harm."""
+    def _select_min_harm_action(self, actions: List[Action], state: State,
+                                assessed: Dict[int, ActionAssessment] = None) -> Action:
+        """Select action with minimum harm.
+        
+        assessed optionally maps id(action) to precomputed assessments.
+        """
         if not actions:
             return None
             
@@ -948,7 +1888,10 @@ class LawsEngine:
         
         for action in actions:
             # Compute maximum harm across all humans
-            harm_assessments = self.evaluate_law1(action, state)
+            if assessed and id(action) in assessed:
+                harm_assessments = assessed[id(action)].harm_assessments
+            else:
+                harm_assessments = self.evaluate_law1(action, state)
             max_harm = max(
                 (assessment.total_harm for assessment in harm_assessments.values()),
                 default=0.0
@@ -974,11 +1917,35 @@ class LawsEngine:
             logger.error("Invalid order: missing human ID or action")
             return False
             
+        if order.expires_at is None and self.config.ORDER_TTL is not None:
+            order.expires_at = order.timestamp + self.config.ORDER_TTL
+            
         # Add to active orders
-        self.active_orders.append(order)
+        if self.order_index.add(order) is not None:
+            logger.warning(f"Order {order.id} replaced an active order with the same ID")
+        self.invalidate_cache()
         logger.info(f"Order added: {order.action.id} from human {order.human_id}")
         return True
     
+    def expire_orders(self, now: float = None) -> List[Order]:
+        """Drop orders whose expiry time has passed.
+        
+        Runs automatically before each decision; only timer wheel buckets
+        that are due are visited.
+        
+        Args:
+            now: Reference time (defaults to the current time)
+            
+        Returns:
+            The orders that expired
+        """
+        expired = self.order_index.expire(time.time() if now is None else now)
+        if expired:
+            self.invalidate_cache()
+            for order in expired:
+                logger.info(f"Order expired: {order.id}")
+        return expired
+    
     def remove_order(self, order_id: OrderID) -> bool:
         """Remove an order.
         
@@ -988,10 +1955,8 @@ class LawsEngine:
         Returns:
             Whether the order was removed successfully
         """
-        initial_count = len(self.active_orders)
-        self.active_orders = [o for o in self.active_orders if o.id != order_id]
-        
-        if len(self.active_orders) < initial_count:
+        if self.order_index.remove(order_id) is not None:
+            self.invalidate_cache()
             logger.info(f"Order removed: {order_id}")
             return True
         else:
@@ -0,0 +1,25 @@
+import json
+import unittest
+from unittest import mock
+
+from head_1.frameworks.laws_of_robotics.___files import lor_codec
+from head_1.frameworks.laws_of_robotics.___files.lor_core import Action, ActionEvaluation
+
+
+class TestCodec(unittest.TestCase):
+    def test_non_string_order_ids(self):
+        # process_order keeps a client-supplied id as is, so compliance can be keyed by an int
+        evaluation = ActionEvaluation(Action("act", {}, []))
+        evaluation.order_compliance = {5: True, "order-6": False}
+
+        encoded = lor_codec.loads(lor_codec.dumps({"evaluation": evaluation}))
+        self.assertEqual(encoded["evaluation"]["order_compliance"], {"5": True, "order-6": False})
+
+        # Same output as the standard json fallback
+        with mock.patch.object(lor_codec, "orjson", None):
+            fallback = json.loads(lor_codec.dumps({"evaluation": evaluation}))
+        self.assertEqual(encoded, fallback)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import math
+import unittest
+
+from head_1.frameworks.laws_of_robotics.___files.lor_core import (
+    Action, Effect, EnvironmentState, HumanState, LawsEngine, LORConfig, SocialContext, State, Vector3
+)
+
+
+class FixedReasoning:
+    """Reasoning module answering every causal query with the same probability."""
+
+    def compute_causal_probabilities(self, queries):
+        return [(0.4, 0.2) for _ in queries]
+
+
+class TestHarmTensor(unittest.TestCase):
+    def make_engine(self, cache_enabled):
+        config = LORConfig()
+        config.EVALUATION_CACHE_ENABLED = cache_enabled
+        engine = LawsEngine(config)
+        engine.reasoning = FixedReasoning()
+        return engine
+
+    def test_matches_scalar_path_for_human_without_groups(self):
+        humans = {
+            "member": HumanState("member", Vector3(0, 0, 0),
+                                 social_context=SocialContext(["family"], social_importance=0.8)),
+            "loner": HumanState("loner", Vector3(1, 0, 0),
+                                social_context=SocialContext([], social_importance=0.0)),
+        }
+        state = State(EnvironmentState(boundaries=[], obstacles=[], conditions={}), humans)
+        action = Action("act", {}, [Effect("family", "societal", 0.5, 0.5),
+                                    Effect("loner", "physical", 0.3, 1.0)])
+
+        # Without the cache every harm comes from the scalar _calculate_* methods
+        scalar = self.make_engine(cache_enabled=False).evaluate_law1(action, state)
+        engine = self.make_engine(cache_enabled=True)
+        engine.prime_harm_cache([action], state)
+        tensor = engine.evaluate_law1(action, state)
+
+        for human_id in humans:
+            for field in ("physical_harm", "psychological_harm", "societal_harm", "total_harm"):
+                value = getattr(tensor[human_id], field)
+                self.assertFalse(math.isnan(value), (human_id, field))
+                self.assertAlmostEqual(value, getattr(scalar[human_id], field), msg=(human_id, field))
+        self.assertEqual(tensor["loner"].societal_harm, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+"""
+Load tests for the unified MCP server.
+
+Run from the repository root, for example:
+
+    python -m head_1.system.mcp.mcp_benchmark overload --loads 0.5 1 2 4
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from head_1.system.mcp.unified_mcp_server import UnifiedMCPServer
+
+logger = logging.getLogger("mcp_benchmark")
+
+
+class SimulatedProvider:
+    """Completion provider standing in for a backend of fixed capacity.
+
+    At most capacity requests are served at once, each taking an
+    exponentially distributed time around service_time; the rest queue
+    inside the "backend" without bound, as they would on a real one.
+    """
+
+    def __init__(self, capacity: int, service_time: float, seed: int = 0):
+        self.capacity = capacity
+        self.service_time = service_time
+        self.rng = random.Random(seed)
+        self.workers = asyncio.Semaphore(capacity)
+
+    async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        async with self.workers:
+            await asyncio.sleep(self.rng.expovariate(1 / self.service_time))
+        return {"text": "ok"}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of values (0.0 if there are none)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def offer_load(base_url: str, rate: float, duration: float, seed: int = 0) -> List[Dict[str, Any]]:
+    """Send completion requests with Poisson arrivals at rate per second.
+
+    The load is open-loop: requests are sent on schedule whether or not
+    earlier ones have been answered, as independent clients would.
+
+    Returns:
+        One record per request with its send time, latency and status
+    """
+    rng = random.Random(seed)
+    records: List[Dict[str, Any]] = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as client:
+        async with client.post(f"{base_url}/api/v1/session", json={}) as response:
+            session_id = (await response.json())["session"]["session_id"]
+        url = f"{base_url}/api/v1/session/{session_id}/complete"
+
+        async def send(sent_at: float):
+            try:
+                async with client.post(url, json={"prompt": "benchmark"}) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError as e:
+                logger.debug(f"Request failed: {e}")
+                status = 0
+            records.append({"sent": sent_at, "latency": time.monotonic() - sent_at, "status": status})
+
+        start = time.monotonic()
+        tasks = []
+        next_at = start
+        while next_at < start + duration:
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            tasks.append(asyncio.create_task(send(time.monotonic())))
+            next_at += rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+    for record in records:
+        record["sent"] -= start
+    return records
+
+
+def summarize(records: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+    """Status counts and latency percentiles of successful requests.
+
+    p99 is also reported for the first and last thirds of the run, by send
+    time: under sustained overload an unbounded queue shows up as a last
+    third far slower than the first.
+    """
+    ok = [r for r in records if r["status"] == 200]
+
+    def p99_between(low: float, high: float) -> float:
+        return percentile([r["latency"] for r in ok if low <= r["sent"] < high], 0.99)
+
+    return {
+        "sent": len(records),
+        "ok": len(ok),
+        "429": sum(1 for r in records if r["status"] == 429),
+        "503": sum(1 for r in records if r["status"] == 503),
+        "other": sum(1 for r in records if r["status"] not in (200, 429, 503)),
+        "p50": percentile([r["latency"] for r in ok], 0.5),
+        "p99": percentile([r["latency"] for r in ok], 0.99),
+        "p99_first": p99_between(0.0, duration / 3),
+        "p99_last": p99_between(2 * duration / 3, duration),
+    }
+
+
+async def run_overload(capacity: int, service_time: float, loads: List[float], duration: float,
+                       max_queue: int, max_wait: float, url: Optional[str]):
+    """Offer increasing multiples of the backend's capacity, with and without admission control."""
+    capacity_rps = capacity / service_time
+    print(f"backend capacity: {capacity} concurrent x {service_time * 1000:.0f} ms = {capacity_rps:.0f} req/s")
+    print(f"{'load':>5} {'admission':>10} {'sent':>6} {'ok':>6} {'429':>6} {'503':>6} {'other':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'p99 first':>10} {'p99 last':>9}")
+
+    modes = {"on": {"max_concurrency": capacity, "max_queue": max_queue, "max_wait": max_wait},
+             # Limits that are never reached: every request goes straight to the backend
+             "off": {"max_concurrency": 1 << 30, "max_queue": 1 << 30, "max_wait": 3600.0}}
+    if url is not None:
+        # The admission limits of a running server are its own
+        modes = {"server": None}
+
+    for load in loads:
+        for mode, limits in modes.items():
+            if url is None:
+                server = UnifiedMCPServer(
+                    log_level="WARNING",
+                    model_providers={"completion": SimulatedProvider(capacity, service_time)},
+                    admission_limits={"completion": limits}
+                )
+                test_server = TestServer(server.app)
+                await test_server.start_server()
+                base_url = str(test_server.make_url("")).rstrip("/")
+            else:
+                base_url = url.rstrip("/")
+            try:
+                records = await offer_load(base_url, load * capacity_rps, duration)
+            finally:
+                if url is None:
+                    await test_server.close()
+                    await server.stop()
+            stats = summarize(records, duration)
+            print(f"{load:>4.1f}x {mode:>10} {stats['sent']:>6} {stats['ok']:>6} {stats['429']:>6} "
+                  f"{stats['503']:>6} {stats['other']:>6} {stats['p50'] * 1000:>8.0f} "
+                  f"{stats['p99'] * 1000:>8.0f} {stats['p99_first'] * 1000:>10.0f} "
+                  f"{stats['p99_last'] * 1000:>9.0f}")
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Unified MCP server load tests")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    overload_parser = subparsers.add_parser(
+        "overload", help="Completion latency and rejections beyond provider capacity"
+    )
+    overload_parser.add_argument("--capacity", type=int, default=8,
+                                 help="Requests the simulated backend serves at once")
+    overload_parser.add_argument("--service-time", type=float, default=0.05,
+                                 help="Mean seconds the backend takes per request")
+    overload_parser.add_argument("--loads", type=float, nargs="+", default=[0.5, 1.0, 2.0, 4.0],
+                                 help="Offered load as multiples of the backend's capacity")
+    overload_parser.add_argument("--duration", type=float, default=10.0,
+                                 help="Seconds of load per run")
+    overload_parser.add_argument("--max-queue", type=int, default=16)
+    overload_parser.add_argument("--max-wait", type=float, default=0.5)
+    overload_parser.add_argument("--url", default=None,
+                                 help="Base URL of a running server with a completion provider "
+                                      "(default: in-process server with the simulated backend)")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    # One access log line per request would swamp the results
+    logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+
+    if args.benchmark == "overload":
+        asyncio.run(run_overload(args.capacity, args.service_time, args.loads, args.duration,
+                                 args.max_queue, args.max_wait, args.url))
+
+
+if __name__ == "__main__":
+    main()
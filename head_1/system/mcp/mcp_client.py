@@ -5,13 +5,17 @@ This module provides a client library for interacting with MCP servers.
 It enables applications to seamlessly integrate with MCP-enabled systems.
 """
 
+import array
+import base64
 import json
 import logging
 import aiohttp
 import asyncio
 import os
+import sys
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Any, Tuple, Union
 
 # Configure logger
 logger = logging.getLogger("mcp-client")
@@ -45,7 +49,7 @@ class MCPClient:
         
     async def __aenter__(self):
         """Enter async context manager."""
-        self._aiohttp_session = aiohttp.ClientSession()
+        self._get_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -274,6 +278,103 @@ class MCPClient:
                 
             return result.get("result", {})
             
+    async def _stream(self, url: str, data: Dict[str, Any], operation: str) -> AsyncIterator[Dict[str, Any]]:
+        """POST a streaming request and yield its events.
+        
+        Args:
+            url: Endpoint URL
+            data: Request body (stream is set to true)
+            operation: Operation name for error messages
+            
+        Yields:
+            {"type": "delta", "delta": ...} events, then one
+            {"type": "done", "result": ..., "processing_time": ...} event
+        """
+        async with self._get_session().post(
+            url,
+            json={**data, "stream": True},
+            headers={"Accept": "application/x-ndjson"}
+        ) as resp:
+            if resp.status != 200:
+                error_info = await resp.text()
+                raise Exception(f"{operation} failed: {resp.status} - {error_info}")
+                
+            async for line in resp.content:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "error":
+                    error = event.get("error", {})
+                    raise Exception(f"API error: {error.get('message', 'Unknown error')}")
+                yield event
+                
+    async def stream_complete(
+        self,
+        prompt: str,
+        model: str = "default",
+        session_id: str = None,
+        update_context: bool = False,
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a completion from the model.
+        
+        Takes the same arguments as complete().
+        
+        Yields:
+            Delta events as the model produces output, then a done event
+            carrying the merged result
+        """
+        session_id = session_id or self.session_id
+        if not session_id:
+            raise ValueError("No session ID provided or stored")
+            
+        data = {
+            "prompt": prompt,
+            "model": model,
+            "update_context": update_context,
+            **kwargs
+        }
+        
+        async for event in self._stream(f"{self.api_base}/session/{session_id}/complete", data, "Completion"):
+            yield event
+            
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "default",
+        session_id: str = None,
+        continue_conversation: bool = True,
+        update_context: bool = True,
+        max_history: int = 10,
+        max_history_size: int = 50,
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a chat response from the model.
+        
+        Takes the same arguments as chat(). The session's chat history is
+        updated once the stream completes.
+        
+        Yields:
+            Delta events as the model produces output, then a done event
+            carrying the merged result
+        """
+        session_id = session_id or self.session_id
+        if not session_id:
+            raise ValueError("No session ID provided or stored")
+            
+        data = {
+            "messages": messages,
+            "model": model,
+            "continue_conversation": continue_conversation,
+            "update_context": update_context,
+            "max_history": max_history,
+            "max_history_size": max_history_size,
+            **kwargs
+        }
+        
+        async for event in self._stream(f"{self.api_base}/session/{session_id}/chat", data, "Chat"):
+            yield event
+            
     async def embedding(
         self,
         input_text: Union[str, List[str]],
@@ -281,6 +382,7 @@ class MCPClient:
         session_id: str = None,
         store_in_context: bool = False,
         context_key: str = "embeddings",
+        encoding_format: str = "float",
         **kwargs
     ) -> Dict[str, Any]:
         """Get embeddings from the model.
@@ -291,6 +393,8 @@ class MCPClient:
             session_id: Session ID (uses the stored session ID if not provided)
             store_in_context: Whether to store embeddings in the session context
             context_key: Key to use for storing embeddings in context
+            encoding_format: "float", or "base64" to transfer the vectors as packed
+                float32 (they are decoded back to lists of floats)
             **kwargs: Additional parameters to pass to the API
             
         Returns:
@@ -305,6 +409,7 @@ class MCPClient:
             "model": model,
             "store_in_context": store_in_context,
             "context_key": context_key,
+            "encoding_format": encoding_format,
             **kwargs
         }
         
@@ -321,8 +426,22 @@ class MCPClient:
                 error = result.get("error", {})
                 raise Exception(f"API error: {error.get('message', 'Unknown error')}")
                 
-            return result.get("result", {})
+            embedding_result = result.get("result", {})
+            if embedding_result.get("encoding_format") == "base64":
+                embedding_result["data"] = [
+                    self._decode_float32(vector) for vector in embedding_result.get("data", [])
+                ]
+                del embedding_result["encoding_format"]
+            return embedding_result
             
+    @staticmethod
+    def _decode_float32(encoded: str) -> List[float]:
+        """Decode a base64 string of little-endian float32 values."""
+        values = array.array("f", base64.b64decode(encoded))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tolist()
+        
     async def list_models(self) -> Dict[str, Any]:
         """List available models.
         
@@ -371,6 +490,10 @@ class MCPSyncClient:
     """Synchronous client for interacting with MCP servers.
     
     This is a wrapper around the async client for use in synchronous code.
+    Calls run on an event loop in a background thread owned by the client,
+    so one client can be used from many threads at once (and from code
+    that is itself running an event loop), and all calls share the async
+    client's aiohttp session and its connection pool.
     """
     
     def __init__(
@@ -394,42 +517,109 @@ class MCPSyncClient:
             session_id=session_id,
             default_ttl=default_ttl
         )
-        self._loop = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
         self._client_session = None
         
-    def _get_event_loop(self):
-        """Get or create an event loop.
+    def _get_event_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the client's event loop, starting its thread on first use.
         
         Returns:
-            asyncio.AbstractEventLoop instance
+            asyncio.AbstractEventLoop running in the client's thread
         """
-        if self._loop is None:
-            try:
-                self._loop = asyncio.get_event_loop()
-            except RuntimeError:
-                # No event loop in current thread, create a new one
-                self._loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(self._loop)
-        return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=self._run_loop, args=(loop,), name="mcp-sync-client", daemon=True
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+            
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
         
-    def _run_coroutine(self, coroutine):
-        """Run a coroutine in the event loop.
+    def _run_coroutine(self, coroutine, timeout: Optional[float] = None):
+        """Run a coroutine on the client's event loop and wait for its result.
         
         Args:
             coroutine: Coroutine to run
+            timeout: Maximum seconds to wait (no limit if not provided)
             
         Returns:
             Result of the coroutine
         """
         loop = self._get_event_loop()
-        if loop.is_running():
-            # If we're already in an event loop, use asyncio.run_coroutine_threadsafe
-            import concurrent.futures
-            future = asyncio.run_coroutine_threadsafe(coroutine, loop)
-            return future.result()
-        else:
-            # Otherwise, just run the coroutine
-            return loop.run_until_complete(coroutine)
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError("MCPSyncClient cannot be called from its own event loop; use MCPClient")
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+            
+    def gather(
+        self,
+        *requests: Tuple[str, Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False
+    ) -> List[Any]:
+        """Issue many requests concurrently and wait for all of them.
+        
+        Args:
+            *requests: (method name, keyword arguments) pairs naming MCPClient
+                methods, e.g. ("chat", {"messages": [...]})
+            max_concurrency: Maximum requests in flight at once (no limit if not provided)
+            return_exceptions: Return exceptions in place of results instead of raising the first
+            
+        Returns:
+            The results in request order
+        """
+        for method, _ in requests:
+            if method.startswith("_") or not callable(getattr(self.async_client, method, None)):
+                raise ValueError(f"Unknown MCPClient method: {method}")
+                
+        async def run_all():
+            semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+            
+            async def run_one(method: str, kwargs: Dict[str, Any]):
+                if semaphore is None:
+                    return await getattr(self.async_client, method)(**kwargs)
+                async with semaphore:
+                    return await getattr(self.async_client, method)(**kwargs)
+                    
+            return await asyncio.gather(
+                *(run_one(method, kwargs) for method, kwargs in requests),
+                return_exceptions=return_exceptions
+            )
+            
+        return self._run_coroutine(run_all())
+        
+    def close(self):
+        """Close the shared aiohttp session and stop the event loop thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+            
+        async def close_session():
+            if self.async_client._aiohttp_session is not None:
+                await self.async_client._aiohttp_session.close()
+                self.async_client._aiohttp_session = None
+                
+        if threading.current_thread() is thread:
+            raise RuntimeError("MCPSyncClient cannot be closed from its own event loop")
+        asyncio.run_coroutine_threadsafe(close_session(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
             
     def __enter__(self):
         """Enter context manager."""
@@ -438,8 +628,11 @@ class MCPSyncClient:
         
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit context manager."""
-        self._run_coroutine(self.async_client.__aexit__(exc_type, exc_val, exc_tb))
-        self._client_session = None
+        try:
+            self._run_coroutine(self.async_client.__aexit__(exc_type, exc_val, exc_tb))
+        finally:
+            self._client_session = None
+            self.close()
         
     def create_session(self, context: Dict[str, Any] = None, metadata: Dict[str, Any] = None, ttl: int = None) -> Dict[str, Any]:
         """Create a new MCP session."""
@@ -478,8 +671,46 @@ class MCPSyncClient:
             **kwargs
         ))
         
+    def _iterate(self, stream: AsyncIterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Iterate an async stream from synchronous code."""
+        try:
+            while True:
+                try:
+                    yield self._run_coroutine(stream.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._run_coroutine(stream.aclose())
+            
+    def stream_complete(self, prompt: str, model: str = "default", session_id: str = None,
+                        update_context: bool = False, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Stream a completion from the model."""
+        return self._iterate(self.async_client.stream_complete(
+            prompt=prompt,
+            model=model,
+            session_id=session_id,
+            update_context=update_context,
+            **kwargs
+        ))
+        
+    def stream_chat(self, messages: List[Dict[str, str]], model: str = "default", session_id: str = None,
+                    continue_conversation: bool = True, update_context: bool = True,
+                    max_history: int = 10, max_history_size: int = 50, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Stream a chat response from the model."""
+        return self._iterate(self.async_client.stream_chat(
+            messages=messages,
+            model=model,
+            session_id=session_id,
+            continue_conversation=continue_conversation,
+            update_context=update_context,
+            max_history=max_history,
+            max_history_size=max_history_size,
+            **kwargs
+        ))
+        
     def embedding(self, input_text: Union[str, List[str]], model: str = "default", session_id: str = None, 
-                store_in_context: bool = False, context_key: str = "embeddings", **kwargs) -> Dict[str, Any]:
+                store_in_context: bool = False, context_key: str = "embeddings",
+                encoding_format: str = "float", **kwargs) -> Dict[str, Any]:
         """Get embeddings from the model."""
         return self._run_coroutine(self.async_client.embedding(
             input_text=input_text, 
@@ -487,6 +718,7 @@ class MCPSyncClient:
             session_id=session_id, 
             store_in_context=store_in_context, 
             context_key=context_key, 
+            encoding_format=encoding_format,
             **kwargs
         ))
         
@@ -830,20 +830,36 @@ mcp_fastapi = MCPFastAPIIntegration()
         
         # Create provider files
         default_providers = {
-            "openai_provider": """
+            "openai_provider": '''
 import os
 import json
+import asyncio
 import aiohttp
 from typing import Dict, Any, List, Optional
 
 class OpenAIProvider:
     """OpenAI API provider for MCP."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_connections: int = 100,
+        max_connections_per_host: int = 32,
+        max_concurrency: int = 64,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: int = 300,
+        request_timeout: float = 300.0
+    ):
         """Initialize the OpenAI provider.
         
         Args:
             api_key: OpenAI API key (defaults to OPENAI_API_KEY environment variable)
+            max_connections: Total pooled connections
+            max_connections_per_host: Pooled connections per upstream host
+            max_concurrency: Maximum in-flight requests to the API
+            keepalive_timeout: Seconds an idle connection is kept open
+            dns_cache_ttl: Seconds resolved upstream addresses are cached
+            request_timeout: Total seconds allowed per API request
         """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         if not self.api_key:
@@ -853,6 +869,62 @@ class OpenAIProvider:
         self.chat_models = ["gpt-3.5-turbo", "gpt-4"]
         self.completion_models = ["text-davinci-003", "text-davinci-002"]
         self.embedding_models = ["text-embedding-ada-002"]
+        
+        # Connection pool and concurrency limits; the session is shared by all requests
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.max_concurrency = max_concurrency
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = request_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the provider's HTTP session, creating it on first use.
+        
+        The session is created lazily because aiohttp binds it to the
+        running event loop, and the provider instance is built at import.
+        
+        Returns:
+            Long-lived client session sharing one connection pool
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the HTTP session and its pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def pool_stats(self) -> Dict[str, int]:
+        """Get connection pool statistics.
+        
+        Returns:
+            Dictionary with in-flight requests and active/idle connections
+        """
+        stats = {
+            "in_flight": self.max_concurrency - self._semaphore._value,
+            "active": 0,
+            "idle": 0,
+            "limit": self.max_connections
+        }
+        if self._session is not None and not self._session.closed:
+            connector = self._session.connector
+            stats["active"] = len(connector._acquired)
+            stats["idle"] = sum(len(conns) for conns in connector._conns.values())
+        return stats
     
     async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Process a model request.
@@ -888,7 +960,8 @@ class OpenAIProvider:
         temperature = request.get("temperature", 0.7)
         max_tokens = request.get("max_tokens", None)
         
-        async with aiohttp.ClientSession() as session:
+        session = self._get_session()
+        async with self._semaphore:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -936,7 +1009,8 @@ class OpenAIProvider:
         temperature = request.get("temperature", 0.7)
         max_tokens = request.get("max_tokens", 100)
         
-        async with aiohttp.ClientSession() as session:
+        session = self._get_session()
+        async with self._semaphore:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -986,7 +1060,8 @@ class OpenAIProvider:
         else:
             inputs = input_text
         
-        async with aiohttp.ClientSession() as session:
+        session = self._get_session()
+        async with self._semaphore:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -1030,21 +1105,37 @@ class OpenAIProvider:
 
 # Create an instance of the provider
 provider = OpenAIProvider()
-""",
-            "huggingface_provider": """
+''',
+            "huggingface_provider": '''
 import os
 import json
+import asyncio
 import aiohttp
 from typing import Dict, Any, List, Optional
 
 class HuggingFaceProvider:
     """HuggingFace API provider for MCP."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_connections: int = 100,
+        max_connections_per_host: int = 32,
+        max_concurrency: int = 64,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: int = 300,
+        request_timeout: float = 300.0
+    ):
         """Initialize the HuggingFace provider.
         
         Args:
             api_key: HuggingFace API key (defaults to HUGGINGFACE_API_KEY environment variable)
+            max_connections: Total pooled connections
+            max_connections_per_host: Pooled connections per upstream host
+            max_concurrency: Maximum in-flight requests to the API
+            keepalive_timeout: Seconds an idle connection is kept open
+            dns_cache_ttl: Seconds resolved upstream addresses are cached
+            request_timeout: Total seconds allowed per API request
         """
         self.api_key = api_key or os.environ.get("HUGGINGFACE_API_KEY")
         if not self.api_key:
@@ -1056,6 +1147,62 @@ class HuggingFaceProvider:
         self.chat_models = ["facebook/blenderbot-400M-distill"]
         self.completion_models = ["gpt2", "EleutherAI/gpt-neo-1.3B"]
         self.embedding_models = ["sentence-transformers/all-MiniLM-L6-v2"]
+        
+        # Connection pool and concurrency limits; the session is shared by all requests
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.max_concurrency = max_concurrency
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = request_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the provider's HTTP session, creating it on first use.
+        
+        The session is created lazily because aiohttp binds it to the
+        running event loop, and the provider instance is built at import.
+        
+        Returns:
+            Long-lived client session sharing one connection pool
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the HTTP session and its pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def pool_stats(self) -> Dict[str, int]:
+        """Get connection pool statistics.
+        
+        Returns:
+            Dictionary with in-flight requests and active/idle connections
+        """
+        stats = {
+            "in_flight": self.max_concurrency - self._semaphore._value,
+            "active": 0,
+            "idle": 0,
+            "limit": self.max_connections
+        }
+        if self._session is not None and not self._session.closed:
+            connector = self._session.connector
+            stats["active"] = len(connector._acquired)
+            stats["idle"] = sum(len(conns) for conns in connector._conns.values())
+        return stats
     
     async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Process a model request.
@@ -1099,7 +1246,8 @@ class HuggingFaceProvider:
         if not user_message:
             user_message = "Hello"
         
-        async with aiohttp.ClientSession() as session:
+        session = self._get_session()
+        async with self._semaphore:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -1145,7 +1293,8 @@ class HuggingFaceProvider:
         model = request.get("model", self.completion_models[0])
         prompt = request.get("prompt", "")
         
-        async with aiohttp.ClientSession() as session:
+        session = self._get_session()
+        async with self._semaphore:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -1195,7 +1344,8 @@ class HuggingFaceProvider:
         else:
             inputs = input_text
         
-        async with aiohttp.ClientSession() as session:
+        session = self._get_session()
+        async with self._semaphore:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -1242,7 +1392,7 @@ class HuggingFaceProvider:
 
 # Create an instance of the provider
 provider = HuggingFaceProvider()
-"""
+'''
         }
         
         # Create __init__.py to make it a proper package
@@ -1512,11 +1662,13 @@ async def load_providers():
                         request["type"] = "embedding"
                         return await provider_instance(request)
                     
-                    # Add list_models method to the providers if the original has it
-                    if hasattr(provider_instance, "list_models"):
-                        completion_provider.list_models = provider_instance.list_models
-                        chat_provider.list_models = provider_instance.list_models
-                        embedding_provider.list_models = provider_instance.list_models
+                    # Expose list_models, close and pool_stats if the original has them
+                    for attr in ("list_models", "close", "pool_stats"):
+                        if hasattr(provider_instance, attr):
+                            method = getattr(provider_instance, attr)
+                            setattr(completion_provider, attr, method)
+                            setattr(chat_provider, attr, method)
+                            setattr(embedding_provider, attr, method)
                     
                     # Register the providers
                     providers["completion"] = completion_provider
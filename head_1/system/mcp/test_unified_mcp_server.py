@@ -0,0 +1,311 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from aiohttp.test_utils import TestClient, TestServer
+
+from head_1.system.mcp.unified_mcp_server import (
+    AdmissionController, AdmissionRejected, ChatHistory, EmbeddingDispatcher, InMemorySessionStore,
+    MCPSession, MCPSessionManager, MmapVectorStore, SQLiteSessionStore, UnifiedMCPServer, merge_delta
+)
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).digest()
+
+
+class TestMmapVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rows_after_interrupted_append(self):
+        store = MmapVectorStore(self.directory)
+        store.put_many("model", [(digest("a"), [1.0, 1.0], 1), (digest("b"), [2.0, 2.0], 2)])
+        vectors_path = store.tables["model"]["vectors_path"]
+        # A put_many that stopped after writing its vector, and a torn row after it
+        with open(vectors_path, "ab") as f:
+            np.asarray([[9.0, 9.0]], dtype=np.float32).tofile(f)
+            f.write(b"\x00\x00")
+
+        store = MmapVectorStore(self.directory)
+        self.assertEqual(store.get("model", digest("b")), ([2.0, 2.0], 2))
+        store.put_many("model", [(digest("c"), [3.0, 3.0], 3)])
+        self.assertEqual(store.get("model", digest("c")), ([3.0, 3.0], 3))
+
+        store = MmapVectorStore(self.directory)
+        self.assertEqual([store.get("model", digest(text))[0] for text in "abc"],
+                         [[1.0, 1.0], [2.0, 2.0], [3.0, 3.0]])
+
+
+class TestMergeDelta(unittest.TestCase):
+    def test_appends_only_text_fields(self):
+        result = {}
+        for delta in ({"model": "m", "message": {"role": "assistant", "content": "Hel"}},
+                      {"model": "m", "message": {"role": "assistant", "content": "lo"}, "text": "a"},
+                      {"model": "m", "message": {"content": "!"}, "text": "b", "finish_reason": "stop",
+                       "usage": {"total_tokens": 3}}):
+            merge_delta(result, delta)
+        self.assertEqual(result, {"model": "m", "message": {"role": "assistant", "content": "Hello!"},
+                                  "text": "ab", "finish_reason": "stop", "usage": {"total_tokens": 3}})
+
+
+class TestChatHistory(unittest.TestCase):
+    def test_trim(self):
+        history = ChatHistory([{"content": "one two"}, {"content": "three"}, {"content": "one two"},
+                               {"content": "four five six"}])
+        self.assertEqual(history.tokens, 8)
+
+        history.trim(max_messages=3)
+        self.assertEqual(history.to_list(), [{"content": "three"}, {"content": "one two"},
+                                             {"content": "four five six"}])
+        # The later copy of the evicted message is still held
+        self.assertIn({"content": "one two"}, history)
+
+        history.trim(max_tokens=4)
+        self.assertEqual(history.to_list(), [{"content": "four five six"}])
+        self.assertEqual(history.tokens, 3)
+        self.assertNotIn({"content": "one two"}, history)
+        self.assertTrue(history.add_new({"content": "one two"}))
+        self.assertFalse(history.add_new({"content": "one two"}))
+
+    def test_recent(self):
+        history = ChatHistory([{"content": "a b c"}, {"content": "d"}, {"content": "e f"}])
+        self.assertEqual(history.recent(max_messages=2), [{"content": "d"}, {"content": "e f"}])
+        self.assertEqual(history.recent(max_tokens=3), [{"content": "d"}, {"content": "e f"}])
+        self.assertEqual(history.recent(max_tokens=1), [])
+        self.assertEqual(history.recent(), history.to_list())
+        # Reading does not evict
+        self.assertEqual(len(history), 3)
+
+
+class TestInMemorySessionStore(unittest.TestCase):
+    def test_expire_requeues_accessed_sessions(self):
+        store = InMemorySessionStore(num_shards=1)
+        for session_id in ("idle", "active"):
+            session = MCPSession(session_id, ttl=10)
+            session.update_last_accessed(1000.0)
+            store.put(session)
+        store.get("active").update_last_accessed(1008.0)
+
+        self.assertEqual(store.expire(1011.0), ["idle"])
+        # Requeued under its new deadline rather than expired
+        self.assertEqual(store.shards[0].heap, [(1018.0, "active")])
+        self.assertEqual(store.expire(1017.0), [])
+        self.assertEqual(store.expire(1019.0), ["active"])
+        self.assertEqual(len(store), 0)
+
+    def test_deleted_session_entry_is_skipped(self):
+        store = InMemorySessionStore(num_shards=1)
+        session = MCPSession("session", ttl=10)
+        session.update_last_accessed(1000.0)
+        store.put(session)
+        store.delete("session")
+        self.assertEqual(store.expire(1011.0), [])
+        self.assertEqual(len(store), 0)
+
+
+class TestSQLiteSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "sessions.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def history_seqs(self, store, session_id):
+        return [seq for (seq,) in store._conn.execute(
+            "SELECT seq FROM history WHERE session_id = ? ORDER BY seq", (session_id,))]
+
+    def test_reload_trimmed_history(self):
+        store = SQLiteSessionStore(self.path, max_history_entries=3)
+        manager = MCPSessionManager(store=store, max_history_entries=3)
+        session = manager.create_session("session", context={"topic": "tests"}, metadata={"priority": "high"})
+        for i in range(5):
+            manager.add_to_history(session, {"turn": i})
+        # Persisted history is trimmed along with the in-memory one
+        self.assertEqual(self.history_seqs(store, "session"), [2, 3, 4])
+        store.close()
+
+        store = SQLiteSessionStore(self.path, max_history_entries=3)
+        manager = MCPSessionManager(store=store, max_history_entries=3)
+        session = manager.get_session("session")
+        self.assertEqual(session.context, {"topic": "tests"})
+        self.assertEqual(session.metadata, {"priority": "high"})
+        self.assertEqual([entry["turn"] for entry in session.history], [2, 3, 4])
+
+        # Sequence numbers continue after the reloaded entries
+        manager.add_to_history(session, {"turn": 5})
+        self.assertEqual(self.history_seqs(store, "session"), [3, 4, 5])
+        store.close()
+
+    def test_reload_trims_to_store_bounds(self):
+        store = SQLiteSessionStore(self.path, max_history_entries=5)
+        manager = MCPSessionManager(store=store, max_history_entries=5)
+        session = manager.create_session("session")
+        for i in range(5):
+            manager.add_to_history(session, {"turn": i})
+        store.close()
+
+        store = SQLiteSessionStore(self.path, max_history_entries=2)
+        session = store.get("session")
+        self.assertEqual([entry["turn"] for entry in session.history], [3, 4])
+        store.close()
+
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    async def test_displacement(self):
+        controller = AdmissionController("test", max_concurrency=1, max_queue=1)
+        admitted_at = await controller.acquire()
+        low = asyncio.create_task(controller.acquire("low"))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(controller.acquire("high"))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as raised:
+            await low
+        self.assertEqual((raised.exception.reason, raised.exception.status), ("displaced", 429))
+        # Nothing lower than "normal" is left to displace
+        with self.assertRaises(AdmissionRejected) as raised:
+            await controller.acquire("normal")
+        self.assertEqual((raised.exception.reason, raised.exception.status), ("queue_full", 429))
+
+        controller.release(admitted_at)
+        controller.release(await high)
+        self.assertEqual((controller.in_flight, controller.waiting), (0, 0))
+
+    async def test_timeout(self):
+        controller = AdmissionController("test", max_concurrency=1, max_wait=0.05)
+        admitted_at = await controller.acquire()
+        with self.assertRaises(AdmissionRejected) as raised:
+            await controller.acquire()
+        self.assertEqual((raised.exception.reason, raised.exception.status), ("timeout", 503))
+        self.assertEqual(controller.waiting, 0)
+
+        controller.release(admitted_at)
+        self.assertEqual(controller.in_flight, 0)
+        controller.release(await controller.acquire())
+
+    async def test_admitted_stream_releases_slot(self):
+        controller = AdmissionController("test", max_concurrency=1)
+        closed = []
+
+        async def deltas():
+            try:
+                yield {"text": "a"}
+                yield {"text": "b"}
+            finally:
+                closed.append(True)
+
+        # Closed without being iterated, e.g. the client went away
+        stream = controller.hold(deltas(), await controller.acquire())
+        await stream.aclose()
+        await stream.aclose()
+        self.assertEqual(controller.in_flight, 0)
+
+        stream = controller.hold(deltas(), await controller.acquire())
+        self.assertEqual([delta async for delta in stream], [{"text": "a"}, {"text": "b"}])
+        self.assertEqual(controller.in_flight, 0)
+        self.assertEqual(closed, [True])
+
+        # A waiter gets the slot when the stream holding it ends
+        stream = controller.hold(deltas(), await controller.acquire())
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(controller.waiting, 1)
+        await stream.__anext__()
+        await stream.aclose()
+        controller.release(await waiter)
+        self.assertEqual(controller.in_flight, 0)
+
+
+class TestEmbeddingDispatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_scatter(self):
+        calls = []
+
+        async def provider(request):
+            calls.append(request)
+            return {"model": request["model"],
+                    "data": [[float(len(text))] for text in request["input"]],
+                    "usage": {"total_tokens": sum(len(text) for text in request["input"]), "unit": "chars"}}
+
+        dispatcher = EmbeddingDispatcher(provider, max_batch_size=64, max_delay=0.01)
+        results = await asyncio.gather(
+            dispatcher.embed({"model": "m", "input": "a", "session_context": {}}),
+            dispatcher.embed({"model": "m", "input": ["bb", "ccc"]}),
+            dispatcher.embed({"model": "other", "input": "dddd"}),
+            dispatcher.embed({"model": "m", "input": "eeee"}),
+        )
+
+        # One call per model, without the session context
+        self.assertEqual(sorted((call["model"], call["input"]) for call in calls),
+                         [("m", ["a", "bb", "ccc", "eeee"]), ("other", ["dddd"])])
+        self.assertEqual([result["data"] for result in results],
+                         [[[1.0]], [[2.0], [3.0]], [[4.0]], [[4.0]]])
+        # Usage is split in proportion to each request's input length
+        self.assertEqual([result["usage"] for result in results],
+                         [{"total_tokens": 1, "unit": "chars"}, {"total_tokens": 5, "unit": "chars"},
+                          {"total_tokens": 4, "unit": "chars"}, {"total_tokens": 4, "unit": "chars"}])
+
+    async def test_batch_size(self):
+        calls = []
+
+        def provider(request):
+            calls.append(list(request["input"]))
+            return {"data": [[0.0] for _ in request["input"]]}
+
+        dispatcher = EmbeddingDispatcher(provider, max_batch_size=2, max_delay=0.01)
+        results = await asyncio.gather(*(dispatcher.embed({"input": text}) for text in "abc"))
+        self.assertEqual(calls, [["a", "b"], ["c"]])
+        self.assertEqual([len(result["data"]) for result in results], [1, 1, 1])
+
+    async def test_provider_error_reaches_every_request(self):
+        def provider(request):
+            return {"data": []}
+
+        dispatcher = EmbeddingDispatcher(provider, max_delay=0.01)
+        results = await asyncio.gather(dispatcher.embed({"input": "a"}), dispatcher.embed({"input": "b"}),
+                                       return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+
+class TestResponseEncoding(unittest.IsolatedAsyncioTestCase):
+    async def test_configured_encoder(self):
+        encoded = []
+
+        def json_dumps(obj):
+            encoded.append(obj)
+            return json.dumps(obj).encode()
+
+        async def completion(request):
+            yield {"text": "a"}
+            yield {"text": "b"}
+
+        server = UnifiedMCPServer(log_level="WARNING", model_providers={"completion": completion},
+                                  json_dumps=json_dumps)
+        async with TestClient(TestServer(server.app)) as client:
+            response = await client.get("/api/v1/session/missing")
+            self.assertEqual(response.status, 404)
+            self.assertEqual((await response.json())["error"]["type"], "SessionNotFound")
+            self.assertEqual(encoded[-1]["error"]["type"], "SessionNotFound")
+
+            response = await client.post("/api/v1/session", json={})
+            session_id = (await response.json())["session"]["session_id"]
+            response = await client.post(f"/api/v1/session/{session_id}/complete",
+                                         json={"prompt": "p", "stream": True})
+            events = [json.loads(line) for line in (await response.text()).splitlines()]
+            self.assertEqual([event["type"] for event in events], ["delta", "delta", "done"])
+            self.assertEqual(events[-1]["result"], {"text": "ab"})
+            self.assertEqual([obj.get("type") for obj in encoded[-3:]], ["delta", "delta", "done"])
+        await server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,17 +10,29 @@ integrating capabilities from various server implementations to provide:
 - Built-in monitoring and diagnostics
 """
 
+import array
 import asyncio
 import base64
 import datetime
+import functools
+import gzip
 import hashlib
+import heapq
+import inspect
 import json
 import logging
+import math
 import os
+import platform
+import sqlite3
+import sys
+import threading
 import time
+import unicodedata
 import uuid
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union, Callable, Awaitable
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple, Union, Callable, Awaitable
 
 import aiohttp
 from aiohttp import web
@@ -29,6 +41,21 @@ import psutil
 import prometheus_client
 from prometheus_client import Counter, Gauge, Histogram
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Configure logger
 logger = logging.getLogger("mcp-server")
 
@@ -40,51 +67,415 @@ MCP_STATUS_ERROR = "error"
 # Define metrics
 REQUEST_COUNT = Counter('mcp_requests_total', 'Total number of MCP requests', ['endpoint', 'status'])
 REQUEST_LATENCY = Histogram('mcp_request_duration_seconds', 'Request latency in seconds', ['endpoint'])
+TIME_TO_FIRST_TOKEN = Histogram(
+    'mcp_time_to_first_token_seconds',
+    'Time from receiving a request to sending the first model output, in seconds',
+    ['endpoint', 'mode']
+)
 MODEL_TOKENS_PROCESSED = Counter('mcp_tokens_processed_total', 'Total tokens processed', ['model', 'operation'])
+EMBEDDING_BATCH_SIZE = Histogram(
+    'mcp_embedding_batch_size',
+    'Inputs per batched embedding provider call',
+    ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+EMBEDDING_QUEUE_DELAY = Histogram(
+    'mcp_embedding_queue_delay_seconds',
+    'Time embedding requests wait before their batch is sent to the provider',
+    ['model'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    'mcp_embedding_cache_lookups_total',
+    'Embedding cache lookups per input',
+    ['model', 'result']
+)
 ACTIVE_SESSIONS = Gauge('mcp_active_sessions', 'Number of active MCP sessions')
+ADMISSION_IN_FLIGHT = Gauge('mcp_admission_in_flight', 'Admitted provider requests in flight', ['provider'])
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'mcp_admission_queue_depth',
+    'Provider requests waiting for admission',
+    ['provider', 'lane']
+)
+ADMISSION_WAIT = Gauge(
+    'mcp_admission_wait_seconds',
+    'Moving average of the time admitted provider requests waited in the queue',
+    ['provider']
+)
+ADMISSION_REJECTED = Counter(
+    'mcp_admission_rejected_total',
+    'Provider requests rejected by admission control',
+    ['provider', 'reason']
+)
 MEMORY_USAGE = Gauge('mcp_memory_usage_bytes', 'Memory usage of the MCP server')
+RESPONSE_BYTES = Counter(
+    'mcp_response_bytes_total',
+    'Response body bytes before (raw) and after (sent) compression',
+    ['stage']
+)
+PROVIDER_POOL = Gauge(
+    'mcp_provider_pool',
+    'Provider HTTP connection pool usage (in_flight, active, idle, limit)',
+    ['provider', 'state']
+)
+
+# Embedding response formats: JSON floats, base64 float32 per vector, or a raw float32 matrix
+EMBEDDING_FORMATS = ("float", "base64", "binary")
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode objects the JSON backend does not handle natively."""
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    return str(obj)
+
+
+def dumps_json(obj: Any) -> bytes:
+    """Encode obj as UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_json_default).encode()
+
+
+def pack_float32(vectors: List[Any]) -> Tuple[bytes, int]:
+    """Pack equal-length vectors into a little-endian float32 row-major matrix.
+    
+    Returns:
+        The packed bytes and the vector dimensions
+    """
+    if not len(vectors):
+        return b"", 0
+    if np is not None:
+        try:
+            matrix = np.asarray(vectors, dtype="<f4")
+        except ValueError:
+            matrix = None
+        if matrix is None or matrix.ndim != 2:
+            raise ValueError("Embedding vectors must be flat and of equal length")
+        return matrix.tobytes(), matrix.shape[1]
+    dimensions = len(vectors[0])
+    packed = array.array("f")
+    for vector in vectors:
+        if len(vector) != dimensions:
+            raise ValueError("Embedding vectors must be flat and of equal length")
+        packed.extend(vector)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes(), dimensions
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the response content coding from an Accept-Encoding header.
+    
+    Prefers br (when brotli is installed) over gzip; codings the client
+    gives q=0 are skipped.
+    """
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            quality = float(value) if name.strip() == "q" else 1.0
+        except ValueError:
+            quality = 1.0
+        if quality > 0:
+            accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the negotiated content coding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+
+def is_stream(result: Any) -> bool:
+    """Check whether a provider result is an async iterator of deltas."""
+    return hasattr(result, '__aiter__')
+
+
+# Keys whose string values are streamed in pieces, and appended by merge_delta
+STREAM_TEXT_KEYS = frozenset({"content", "text", "delta"})
+
+
+def merge_delta(result: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a streamed delta into the accumulated result, in place.
+
+    Strings under STREAM_TEXT_KEYS are appended to the accumulated string,
+    nested dicts are merged recursively and any other value, such as a
+    role, model or finish_reason repeated in every delta, replaces the
+    accumulated one.
+
+    Args:
+        result: The result accumulated so far
+        delta: The delta to merge
+
+    Returns:
+        The accumulated result
+    """
+    for key, value in delta.items():
+        current = result.get(key)
+        if key in STREAM_TEXT_KEYS and isinstance(value, str) and isinstance(current, str):
+            result[key] = current + value
+        elif isinstance(value, dict) and isinstance(current, dict):
+            merge_delta(current, value)
+        elif isinstance(value, dict):
+            result[key] = merge_delta({}, value)
+        else:
+            result[key] = value
+    return result
+
+
+async def collect_stream(deltas: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+    """Consume a stream of deltas and return the merged result."""
+    result: Dict[str, Any] = {}
+    async for delta in deltas:
+        merge_delta(result, delta)
+    return result
+
+
+class SessionHistory:
+    """Bounded history of session entries, evicting the oldest first.
+
+    Entries are kept while there are at most max_entries of them and their
+    encoded JSON sizes add up to at most max_bytes; the newest entry is
+    always kept. Every entry gets a sequence number that stores use to
+    trim their persisted copies.
+    """
+
+    def __init__(self, max_entries: int = 100, max_bytes: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: Deque[Tuple[int, int, Dict[str, Any]]] = deque()  # (seq, size, entry)
+        self.bytes = 0
+        self.next_seq = 0
+
+    def append(self, entry: Dict[str, Any], size: Optional[int] = None, seq: Optional[int] = None) -> int:
+        """Add an entry, evicting old ones beyond the bounds.
+
+        Args:
+            entry: The history entry
+            size: Encoded size of the entry (computed if not provided)
+            seq: Sequence number (the next one if not provided)
+
+        Returns:
+            The entry's sequence number
+        """
+        if size is None:
+            size = len(json.dumps(entry, default=str))
+        if seq is None:
+            seq = self.next_seq
+        self.next_seq = seq + 1
+        self.entries.append((seq, size, entry))
+        self.bytes += size
+        while len(self.entries) > 1 and (
+                len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted_size, _ = self.entries.popleft()
+            self.bytes -= evicted_size
+        return seq
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest retained entry."""
+        return self.entries[0][0] if self.entries else self.next_seq
+
+    def __iter__(self):
+        return (entry for _, _, entry in self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self.entries[index][2]
+
+
+class ChatHistory:
+    """Chat messages kept in a session's context, oldest first.
+
+    Messages are held in a deque with a digest count per distinct message,
+    so membership checks, appends and evictions take constant time. Each
+    message's token estimate is kept alongside it so the history can be
+    trimmed, and read back, by token budget as well as message count.
+    Serialized contexts hold the plain message list (see to_list).
+    """
+
+    def __init__(self, messages: Optional[List[Dict[str, Any]]] = None):
+        self.messages: Deque[Tuple[str, int, Dict[str, Any]]] = deque()  # (digest, tokens, message)
+        self.digests: Dict[str, int] = {}
+        self.tokens = 0
+        for message in messages or ():
+            self.append(message)
+
+    @staticmethod
+    def digest(message: Any) -> str:
+        """Digest of a message's canonical JSON encoding."""
+        encoded = json.dumps(message, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    @staticmethod
+    def estimate_tokens(message: Any) -> int:
+        """Approximate token count of a message (its whitespace-separated words)."""
+        content = message.get("content", "") if isinstance(message, dict) else message
+        if not isinstance(content, str):
+            content = json.dumps(content, default=str)
+        return max(1, len(content.split()))
+
+    def __contains__(self, message: Any) -> bool:
+        return self.digest(message) in self.digests
+
+    def append(self, message: Dict[str, Any], digest: Optional[str] = None) -> None:
+        """Add a message at the newest end."""
+        digest = digest or self.digest(message)
+        tokens = self.estimate_tokens(message)
+        self.messages.append((digest, tokens, message))
+        self.digests[digest] = self.digests.get(digest, 0) + 1
+        self.tokens += tokens
+
+    def add_new(self, message: Dict[str, Any]) -> bool:
+        """Add a message unless an equal one is already held.
+
+        Returns:
+            True if the message was added
+        """
+        digest = self.digest(message)
+        if digest in self.digests:
+            return False
+        self.append(message, digest)
+        return True
+
+    def trim(self, max_messages: Optional[int] = None, max_tokens: Optional[int] = None) -> None:
+        """Evict the oldest messages until both bounds are met."""
+        while self.messages and (
+                (max_messages is not None and len(self.messages) > max_messages) or
+                (max_tokens is not None and self.tokens > max_tokens)):
+            digest, tokens, _ = self.messages.popleft()
+            self.tokens -= tokens
+            count = self.digests[digest] - 1
+            if count:
+                self.digests[digest] = count
+            else:
+                del self.digests[digest]
+
+    def recent(self, max_messages: Optional[int] = None, max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get the newest messages that fit both bounds, oldest first.
+
+        Only the returned messages are visited, so the cost does not grow
+        with the length of the history.
+        """
+        selected = []
+        tokens = 0
+        for _, message_tokens, message in reversed(self.messages):
+            if max_messages is not None and len(selected) >= max_messages:
+                break
+            if max_tokens is not None and tokens + message_tokens > max_tokens:
+                break
+            selected.append(message)
+            tokens += message_tokens
+        selected.reverse()
+        return selected
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [message for _, _, message in self.messages]
+
+    def __iter__(self):
+        return (message for _, _, message in self.messages)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
 
 class MCPSession:
     """Represents a stateful MCP session with context tracking."""
     
-    def __init__(self, session_id: str = None, ttl: int = 3600):
+    def __init__(self, session_id: str = None, ttl: int = 3600,
+                 max_history_entries: int = 100, max_history_bytes: int = 1024 * 1024):
         """Initialize a new MCP session.
         
         Args:
             session_id: Optional session ID (generated if not provided)
             ttl: Time-to-live in seconds for this session (default: 1 hour)
+            max_history_entries: Maximum number of history entries kept
+            max_history_bytes: Maximum encoded size of the kept history entries
         """
         self.session_id = session_id or str(uuid.uuid4())
         self.created_at = datetime.datetime.now()
-        self.last_accessed = self.created_at
+        self.accessed_at = self.created_at.timestamp()
         self.ttl = ttl
         self.context: Dict[str, Any] = {}
-        self.history: List[Dict[str, Any]] = []
+        self.history = SessionHistory(max_history_entries, max_history_bytes)
         self.metadata: Dict[str, Any] = {}
+
+    @property
+    def last_accessed(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.accessed_at)
+
+    @property
+    def expires_at(self) -> float:
+        return self.accessed_at + self.ttl
         
-    def update_last_accessed(self):
+    def update_last_accessed(self, now: Optional[float] = None):
         """Update the last_accessed timestamp."""
-        self.last_accessed = datetime.datetime.now()
+        self.accessed_at = now or time.time()
         
-    def is_expired(self) -> bool:
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """Check if this session has expired.
         
+        Args:
+            now: Current time as a Unix timestamp (read from the clock if not provided)
+
         Returns:
             True if the session has expired, False otherwise
         """
-        elapsed = (datetime.datetime.now() - self.last_accessed).total_seconds()
-        return elapsed > self.ttl
+        return (now or time.time()) > self.expires_at
         
-    def add_to_history(self, entry: Dict[str, Any]):
+    def add_to_history(self, entry: Dict[str, Any]) -> Tuple[int, int, Dict[str, Any]]:
         """Add an entry to the session history.
         
         Args:
             entry: The history entry to add
+
+        Returns:
+            The stored entry's sequence number, encoded size and contents
         """
-        self.history.append({
+        entry = {
             **entry,
             "timestamp": datetime.datetime.now().isoformat()
-        })
+        }
+        size = len(json.dumps(entry, default=str))
+        seq = self.history.append(entry, size)
+        return seq, size, entry
+        
+    def get_chat_history(self) -> ChatHistory:
+        """Get the context's chat history, converting a stored message list.
+        
+        Returns:
+            The ChatHistory held at context['chat_history']
+        """
+        chat_history = self.context.get('chat_history')
+        if not isinstance(chat_history, ChatHistory):
+            chat_history = ChatHistory(chat_history if isinstance(chat_history, list) else None)
+            self.context['chat_history'] = chat_history
+        return chat_history
+        
+    def plain_context(self) -> Dict[str, Any]:
+        """Get the context with its chat history as a plain message list.
+        
+        Returns:
+            JSON-serializable copy of the context
+        """
+        chat_history = self.context.get('chat_history')
+        if isinstance(chat_history, ChatHistory):
+            return {**self.context, 'chat_history': chat_history.to_list()}
+        return self.context
         
     def to_dict(self) -> Dict[str, Any]:
         """Convert the session to a dictionary.
@@ -96,27 +487,307 @@ class MCPSession:
             "session_id": self.session_id,
             "created_at": self.created_at.isoformat(),
             "last_accessed": self.last_accessed.isoformat(),
-            "context": self.context,
+            "context": self.plain_context(),
             "history_length": len(self.history),
             "metadata": self.metadata
         }
 
 
+class SessionStore:
+    """Storage backend for MCP sessions.
+
+    Stores must be safe to call from several threads. A session returned by
+    get() may be modified in place; the manager calls save() after context
+    or metadata changes and append_history() for every history entry.
+    """
+
+    def get(self, session_id: str) -> Optional[MCPSession]:
+        """Get a stored session, expired or not."""
+        raise NotImplementedError
+
+    def put(self, session: MCPSession):
+        """Store a new session, replacing any session with the same ID."""
+        raise NotImplementedError
+
+    def save(self, session: MCPSession):
+        """Persist changes to a stored session's context and metadata."""
+
+    def touch(self, session: MCPSession):
+        """Record that a stored session was accessed."""
+
+    def append_history(self, session: MCPSession, seq: int, size: int, entry: Dict[str, Any]):
+        """Persist a history entry already added to session.history."""
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session, returning whether it existed."""
+        raise NotImplementedError
+
+    def expire(self, now: float) -> List[str]:
+        """Remove every session expired at now, returning their IDs."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release resources held by the store."""
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class _SessionShard:
+    __slots__ = ("lock", "sessions", "deadlines", "heap")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, MCPSession] = {}
+        # Deadline each session is queued under in the heap; heap entries
+        # whose deadline no longer matches are stale and skipped
+        self.deadlines: Dict[str, float] = {}
+        self.heap: List[Tuple[float, str]] = []
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions held in memory, split over independently locked shards.
+
+    Each shard keeps a heap of expiry deadlines. Accesses do not touch the
+    heap: when a queued deadline comes due for a session that was accessed
+    since, it is requeued under its new deadline, so expiring sessions costs
+    O(log n) per expired or requeued session rather than a scan of all.
+    """
+
+    def __init__(self, num_shards: int = 16):
+        self.shards = [_SessionShard() for _ in range(num_shards)]
+        self._count = 0
+        self._count_lock = threading.Lock()
+
+    def _shard(self, session_id: str) -> _SessionShard:
+        return self.shards[hash(session_id) % len(self.shards)]
+
+    def get(self, session_id: str) -> Optional[MCPSession]:
+        return self._shard(session_id).sessions.get(session_id)
+
+    def put(self, session: MCPSession):
+        shard = self._shard(session.session_id)
+        with shard.lock:
+            replaced = shard.sessions.get(session.session_id)
+            shard.sessions[session.session_id] = session
+            if session.session_id not in shard.deadlines:
+                shard.deadlines[session.session_id] = session.expires_at
+                heapq.heappush(shard.heap, (session.expires_at, session.session_id))
+        if replaced is None:
+            self._add_count(1)
+
+    def delete(self, session_id: str) -> bool:
+        shard = self._shard(session_id)
+        with shard.lock:
+            session = shard.sessions.pop(session_id, None)
+            shard.deadlines.pop(session_id, None)
+        if session is None:
+            return False
+        self._add_count(-1)
+        return True
+
+    def expire(self, now: float) -> List[str]:
+        expired = []
+        for shard in self.shards:
+            with shard.lock:
+                heap = shard.heap
+                while heap and heap[0][0] <= now:
+                    deadline, session_id = heapq.heappop(heap)
+                    if shard.deadlines.get(session_id) != deadline:
+                        continue
+                    session = shard.sessions[session_id]
+                    if session.expires_at >= now:
+                        shard.deadlines[session_id] = session.expires_at
+                        heapq.heappush(heap, (session.expires_at, session_id))
+                        continue
+                    del shard.sessions[session_id]
+                    del shard.deadlines[session_id]
+                    expired.append(session_id)
+        if expired:
+            self._add_count(-len(expired))
+        return expired
+
+    def _add_count(self, delta: int):
+        with self._count_lock:
+            self._count += delta
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions persisted to a SQLite database, so they survive restarts.
+
+    Only the cache_size most recently used sessions are kept in memory; the
+    others are loaded on access with their persisted history, which is
+    trimmed to the same bounds as the in-memory history. Access times are
+    written at most every touch_interval seconds per session.
+    """
+
+    def __init__(self, path: str, cache_size: int = 1024, touch_interval: float = 5.0,
+                 max_history_entries: int = 100, max_history_bytes: int = 1024 * 1024):
+        self.path = path
+        self.cache_size = cache_size
+        self.touch_interval = touch_interval
+        self.max_history_entries = max_history_entries
+        self.max_history_bytes = max_history_bytes
+        self.cache: "OrderedDict[str, MCPSession]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, created_at REAL, accessed_at REAL, "
+            "expires_at REAL, ttl INTEGER, context TEXT, metadata TEXT)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "session_id TEXT, seq INTEGER, size INTEGER, data TEXT, "
+            "PRIMARY KEY (session_id, seq))")
+        self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[MCPSession]:
+        with self._lock:
+            session = self.cache.get(session_id)
+            if session is not None:
+                self.cache.move_to_end(session_id)
+                return session
+            row = self._conn.execute(
+                "SELECT created_at, accessed_at, ttl, context, metadata FROM sessions "
+                "WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            session = MCPSession(session_id, row[2], self.max_history_entries, self.max_history_bytes)
+            session.created_at = datetime.datetime.fromtimestamp(row[0])
+            session.accessed_at = row[1]
+            session.context = json.loads(row[3])
+            session.metadata = json.loads(row[4])
+            for seq, size, data in self._conn.execute(
+                    "SELECT seq, size, data FROM history WHERE session_id = ? ORDER BY seq",
+                    (session_id,)):
+                session.history.append(json.loads(data), size, seq)
+            self._touched[session_id] = session.accessed_at
+            self._cache(session)
+            return session
+
+    def put(self, session: MCPSession):
+        with self._lock:
+            self._conn.execute("DELETE FROM history WHERE session_id = ?", (session.session_id,))
+            self._write(session)
+            self._conn.commit()
+            self._cache(session)
+
+    def save(self, session: MCPSession):
+        with self._lock:
+            self._write(session)
+            self._conn.commit()
+
+    def _write(self, session: MCPSession):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (session.session_id, session.created_at.timestamp(), session.accessed_at,
+             session.expires_at, session.ttl, json.dumps(session.plain_context(), default=str),
+             json.dumps(session.metadata, default=str)))
+        self._touched[session.session_id] = session.accessed_at
+
+    def touch(self, session: MCPSession):
+        with self._lock:
+            if session.accessed_at - self._touched.get(session.session_id, 0) >= self.touch_interval:
+                self._flush_access(session)
+                self._conn.commit()
+
+    def _flush_access(self, session: MCPSession):
+        self._conn.execute(
+            "UPDATE sessions SET accessed_at = ?, expires_at = ? WHERE session_id = ?",
+            (session.accessed_at, session.expires_at, session.session_id))
+        self._touched[session.session_id] = session.accessed_at
+
+    def append_history(self, session: MCPSession, seq: int, size: int, entry: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?)",
+                (session.session_id, seq, size, json.dumps(entry, default=str)))
+            self._conn.execute(
+                "DELETE FROM history WHERE session_id = ? AND seq < ?",
+                (session.session_id, session.history.first_seq))
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            self.cache.pop(session_id, None)
+            self._touched.pop(session_id, None)
+            deleted = self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+            self._conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+            return deleted > 0
+
+    def expire(self, now: float) -> List[str]:
+        with self._lock:
+            expired = []
+            rows = self._conn.execute(
+                "SELECT session_id FROM sessions WHERE expires_at < ?", (now,)).fetchall()
+            for (session_id,) in rows:
+                session = self.cache.get(session_id)
+                if session is not None and not session.is_expired(now):
+                    # Accessed since its access time was last written
+                    self._flush_access(session)
+                    continue
+                self.cache.pop(session_id, None)
+                self._touched.pop(session_id, None)
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+                expired.append(session_id)
+            self._conn.commit()
+            return expired
+
+    def _cache(self, session: MCPSession):
+        self.cache[session.session_id] = session
+        self.cache.move_to_end(session.session_id)
+        while len(self.cache) > self.cache_size:
+            _, evicted = self.cache.popitem(last=False)
+            if evicted.accessed_at > self._touched.get(evicted.session_id, 0):
+                self._flush_access(evicted)
+                self._conn.commit()
+            self._touched.pop(evicted.session_id, None)
+
+    def close(self):
+        with self._lock:
+            for session in self.cache.values():
+                if session.accessed_at > self._touched.get(session.session_id, 0):
+                    self._flush_access(session)
+            self._conn.commit()
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
 class MCPSessionManager:
     """Manages MCP sessions and their lifecycle."""
     
-    def __init__(self, cleanup_interval: int = 300):
+    def __init__(self, cleanup_interval: int = 300, store: Optional[SessionStore] = None,
+                 max_history_entries: int = 100, max_history_bytes: int = 1024 * 1024):
         """Initialize the session manager.
         
         Args:
             cleanup_interval: Interval in seconds for cleanup of expired sessions
+            store: Session storage backend (sessions are kept in memory if not provided)
+            max_history_entries: Maximum number of history entries kept per session
+            max_history_bytes: Maximum encoded size of the history kept per session
         """
-        self.sessions: Dict[str, MCPSession] = {}
+        self.store = store if store is not None else InMemorySessionStore()
         self.cleanup_interval = cleanup_interval
         self.cleanup_task = None
+        self.max_history_entries = max_history_entries
+        self.max_history_bytes = max_history_bytes
         
     async def start(self):
         """Start the session manager and its cleanup task."""
+        ACTIVE_SESSIONS.set(len(self.store))
         self.cleanup_task = asyncio.create_task(self._cleanup_loop())
         
     async def stop(self):
@@ -127,6 +798,7 @@ class MCPSessionManager:
                 await self.cleanup_task
             except asyncio.CancelledError:
                 pass
+        self.store.close()
                 
     async def _cleanup_loop(self):
         """Background task to clean up expired sessions."""
@@ -141,35 +813,48 @@ class MCPSessionManager:
                 
     def _cleanup_expired_sessions(self):
         """Remove expired sessions."""
-        expired_sessions = [
-            session_id for session_id, session in self.sessions.items()
-            if session.is_expired()
-        ]
+        expired_sessions = self.store.expire(time.time())
         
         for session_id in expired_sessions:
             logger.debug(f"Removing expired session: {session_id}")
-            del self.sessions[session_id]
             
         if expired_sessions:
             logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
             # Update metrics
-            ACTIVE_SESSIONS.set(len(self.sessions))
+            ACTIVE_SESSIONS.set(len(self.store))
             
-    def create_session(self, session_id: Optional[str] = None, ttl: int = 3600) -> MCPSession:
+    def create_session(
+        self,
+        session_id: Optional[str] = None,
+        ttl: int = 3600,
+        context: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> MCPSession:
         """Create a new session.
         
         Args:
             session_id: Optional custom session ID
             ttl: Time-to-live in seconds
+            context: Optional initial context
+            metadata: Optional session metadata
             
         Returns:
             The newly created session
         """
-        session = MCPSession(session_id=session_id, ttl=ttl)
-        self.sessions[session.session_id] = session
+        session = MCPSession(
+            session_id=session_id,
+            ttl=ttl,
+            max_history_entries=self.max_history_entries,
+            max_history_bytes=self.max_history_bytes
+        )
+        if context:
+            session.context.update(context)
+        if metadata:
+            session.metadata.update(metadata)
+        self.store.put(session)
         
         # Update metrics
-        ACTIVE_SESSIONS.set(len(self.sessions))
+        ACTIVE_SESSIONS.set(len(self.store))
         
         return session
         
@@ -182,13 +867,33 @@ class MCPSessionManager:
         Returns:
             The session if found, None otherwise
         """
-        session = self.sessions.get(session_id)
+        session = self.store.get(session_id)
         if session:
-            if session.is_expired():
-                del self.sessions[session_id]
+            now = time.time()
+            if session.is_expired(now):
+                self.delete_session(session_id)
                 return None
-            session.update_last_accessed()
+            session.update_last_accessed(now)
+            self.store.touch(session)
         return session
+
+    def save_session(self, session: MCPSession):
+        """Persist changes made to a session's context or metadata.
+        
+        Args:
+            session: The modified session
+        """
+        self.store.save(session)
+
+    def add_to_history(self, session: MCPSession, entry: Dict[str, Any]):
+        """Add an entry to a session's history.
+        
+        Args:
+            session: The session
+            entry: The history entry to add
+        """
+        seq, size, stored_entry = session.add_to_history(entry)
+        self.store.append_history(session, seq, size, stored_entry)
         
     def delete_session(self, session_id: str) -> bool:
         """Delete a session by ID.
@@ -199,13 +904,527 @@ class MCPSessionManager:
         Returns:
             True if the session was deleted, False if it didn't exist
         """
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        if self.store.delete(session_id):
             # Update metrics
-            ACTIVE_SESSIONS.set(len(self.sessions))
+            ACTIVE_SESSIONS.set(len(self.store))
             return True
         return False
 
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+# Embedding request keys handled by the server rather than the provider
+EMBEDDING_SERVER_KEYS = frozenset({"input", "session_context", "store_in_context", "context_key", "encoding_format"})
+
+
+def embedding_params(request: Dict[str, Any]) -> Dict[str, Any]:
+    """The parameters of an embedding request that the provider's output depends on."""
+    return {k: v for k, v in request.items() if k not in EMBEDDING_SERVER_KEYS}
+
+
+class MmapVectorStore:
+    """Append-only on-disk vector store, read through memory maps.
+    
+    Each namespace gets a raw array file of fixed-dimension vectors, an
+    index file of (sha256 digest, token count) records in the same row
+    order and a small JSON header. The index is loaded into memory; vectors
+    are only paged in when read.
+    """
+    
+    INDEX_RECORD_SIZE = 36  # 32-byte digest + uint32 token count
+    
+    def __init__(self, directory: str, dtype: str = "float32"):
+        """Initialize the store.
+        
+        Args:
+            directory: Directory holding the vector files
+            dtype: Storage type for new namespaces ("float32" or "float16")
+        """
+        if np is None:
+            raise ImportError("numpy is required for the on-disk embedding cache")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(dtype)
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        
+    def _table(self, namespace: str, dim: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        table = self.tables.get(namespace)
+        if table is not None:
+            return table
+        stem = self.directory / hashlib.sha256(namespace.encode()).hexdigest()[:16]
+        header_path = stem.with_suffix(".json")
+        if header_path.exists():
+            header = json.loads(header_path.read_text())
+        elif dim is not None:
+            header = {"namespace": namespace, "dim": dim, "dtype": self.dtype.name}
+            header_path.write_text(json.dumps(header))
+        else:
+            return None
+        table = {
+            "vectors_path": stem.with_suffix(".vec"),
+            "index_path": stem.with_suffix(".idx"),
+            "dim": header["dim"],
+            "dtype": np.dtype(header["dtype"]),
+            "rows": {},
+            "count": 0,
+            "mmap": None,
+            "mapped_rows": 0
+        }
+        row_size = table["dim"] * table["dtype"].itemsize
+        vector_rows = table["vectors_path"].stat().st_size // row_size if table["vectors_path"].exists() else 0
+        count = 0
+        if table["index_path"].exists():
+            index = table["index_path"].read_bytes()
+            count = min(len(index) // self.INDEX_RECORD_SIZE, vector_rows)
+            for row in range(count):
+                record = index[row * self.INDEX_RECORD_SIZE:(row + 1) * self.INDEX_RECORD_SIZE]
+                table["rows"][record[:32]] = (row, int.from_bytes(record[32:], "little"))
+            table["count"] = count
+        # Drop rows beyond the last complete pair (a put_many interrupted
+        # between its two appends, or a torn row): put_many appends at the
+        # end of each file and records the next rows as count onwards
+        for path, size in ((table["vectors_path"], count * row_size),
+                           (table["index_path"], count * self.INDEX_RECORD_SIZE)):
+            if path.exists() and path.stat().st_size > size:
+                os.truncate(path, size)
+        self.tables[namespace] = table
+        return table
+        
+    def get(self, namespace: str, digest: bytes) -> Optional[Tuple[List[float], int]]:
+        """Look up a vector and its token count."""
+        table = self._table(namespace)
+        if table is None or digest not in table["rows"]:
+            return None
+        row, tokens = table["rows"][digest]
+        if row >= table["mapped_rows"]:
+            table["mmap"] = np.memmap(
+                table["vectors_path"], dtype=table["dtype"], mode="r",
+                shape=(table["count"], table["dim"])
+            )
+            table["mapped_rows"] = table["count"]
+        return table["mmap"][row].astype(np.float32).tolist(), tokens
+        
+    def put_many(self, namespace: str, items: List[Tuple[bytes, List[float], int]]):
+        """Append (digest, vector, token count) entries not stored yet."""
+        if not items:
+            return
+        table = self._table(namespace, dim=len(items[0][1]))
+        new_items, seen = [], set()
+        for digest, vector, tokens in items:
+            if digest not in table["rows"] and digest not in seen and len(vector) == table["dim"]:
+                new_items.append((digest, vector, tokens))
+                seen.add(digest)
+        if not new_items:
+            return
+        vectors = np.asarray([vector for _, vector, _ in new_items], dtype=table["dtype"])
+        with open(table["vectors_path"], "ab") as f:
+            vectors.tofile(f)
+        with open(table["index_path"], "ab") as f:
+            f.write(b"".join(
+                digest + min(tokens, 0xFFFFFFFF).to_bytes(4, "little") for digest, _, tokens in new_items
+            ))
+        for digest, _, tokens in new_items:
+            table["rows"][digest] = (table["count"], tokens)
+            table["count"] += 1
+
+
+class EmbeddingCache:
+    """Content-addressed cache of embedding vectors.
+    
+    Entries are keyed by the request's provider parameters (model and any
+    provider options) and the sha256 of the NFC-normalized, stripped input
+    text, and hold the vector with the input's share of the tokens it cost.
+    An in-memory LRU tier is backed by an optional MmapVectorStore.
+    """
+    
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None, dtype: str = "float32"):
+        """Initialize the cache.
+        
+        Args:
+            max_entries: Entries kept in the in-memory tier
+            path: Directory for the on-disk tier (memory only if not provided)
+            dtype: On-disk vector type ("float32" or "float16")
+        """
+        self.max_entries = max_entries
+        self.memory: "OrderedDict[Tuple[str, bytes], Tuple[List[float], int]]" = OrderedDict()
+        self.disk = MmapVectorStore(path, dtype) if path else None
+        
+    @staticmethod
+    def digest(text: str) -> bytes:
+        """Content address of an input text."""
+        return hashlib.sha256(unicodedata.normalize("NFC", str(text)).strip().encode()).digest()
+        
+    def get(self, namespace: str, digest: bytes) -> Optional[Tuple[List[float], int]]:
+        """Look up a vector and its token count."""
+        key = (namespace, digest)
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.move_to_end(key)
+            return entry
+        if self.disk is not None:
+            entry = self.disk.get(namespace, digest)
+            if entry is not None:
+                self._remember(key, entry)
+        return entry
+        
+    def put_many(self, namespace: str, items: List[Tuple[bytes, List[float], int]]):
+        """Store (digest, vector, token count) entries."""
+        for digest, vector, tokens in items:
+            self._remember((namespace, digest), (vector, tokens))
+        if self.disk is not None:
+            self.disk.put_many(namespace, items)
+            
+    def _remember(self, key: Tuple[str, bytes], entry: Tuple[List[float], int]):
+        if self.max_entries <= 0:
+            return
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+
+class EmbeddingDispatcher:
+    """Coalesces concurrent embedding requests into batched provider calls.
+    
+    Requests with the same model and provider parameters are queued until
+    max_batch_size inputs are waiting or the oldest has waited max_delay
+    seconds, then sent to the provider as one request. The returned vectors
+    are scattered back to the waiting requests, and the reported usage is
+    split between them in proportion to their input lengths. Batched
+    requests span sessions, so the provider does not receive a
+    session_context.
+    """
+    
+    def __init__(self, provider: Callable, max_batch_size: int = 64, max_delay: float = 0.005):
+        """Initialize the dispatcher.
+        
+        Args:
+            provider: Embedding provider function
+            max_batch_size: Maximum number of inputs per provider call
+            max_delay: Maximum seconds a request waits for others to join its batch
+        """
+        self.provider = provider
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        # Batch key -> provider parameters and queued (inputs, future, enqueue time)
+        self.params: Dict[str, Dict[str, Any]] = {}
+        self.pending: Dict[str, List[Tuple[List[str], asyncio.Future, float]]] = {}
+        self.pending_inputs: Dict[str, int] = {}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        self.tasks = set()
+        
+    async def embed(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Embed a request's input as part of a batch.
+        
+        Args:
+            request: Embedding request, as passed to the provider
+            
+        Returns:
+            The provider result for this request's inputs
+        """
+        inputs = request['input']
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+        params = embedding_params(request)
+        if not inputs:
+            return await self._call(params, inputs)
+            
+        key = json.dumps(params, sort_keys=True, default=str)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key not in self.pending:
+            self.params[key] = params
+            self.pending[key] = []
+            self.pending_inputs[key] = 0
+        self.pending[key].append((inputs, future, time.monotonic()))
+        self.pending_inputs[key] += len(inputs)
+        
+        if self.pending_inputs[key] >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self.timers:
+            self.timers[key] = loop.call_later(self.max_delay, self._flush, key)
+        return await future
+        
+    def _flush(self, key: str):
+        """Send everything queued under key to the provider."""
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        params = self.params.pop(key)
+        queued = self.pending.pop(key)
+        del self.pending_inputs[key]
+        
+        # Split into batches of at most max_batch_size inputs (a single
+        # larger request is sent on its own)
+        batch, size = [], 0
+        for item in queued:
+            if batch and size + len(item[0]) > self.max_batch_size:
+                self._start(params, batch)
+                batch, size = [], 0
+            batch.append(item)
+            size += len(item[0])
+        self._start(params, batch)
+        
+    def _start(self, params: Dict[str, Any], batch: List[Tuple[List[str], asyncio.Future, float]]):
+        task = asyncio.create_task(self._dispatch(params, batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        
+    async def _call(self, params: Dict[str, Any], inputs: List[str]) -> Dict[str, Any]:
+        result = self.provider({**params, "input": inputs})
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+        
+    async def _dispatch(self, params: Dict[str, Any], batch: List[Tuple[List[str], asyncio.Future, float]]):
+        """Embed one batch and resolve its requests' futures."""
+        model = params.get('model', 'default')
+        now = time.monotonic()
+        inputs = []
+        for request_inputs, _, enqueued_at in batch:
+            EMBEDDING_QUEUE_DELAY.labels(model).observe(now - enqueued_at)
+            inputs.extend(request_inputs)
+        EMBEDDING_BATCH_SIZE.labels(model).observe(len(inputs))
+        
+        try:
+            result = await self._call(params, inputs)
+            vectors = result.get('data', [])
+            if len(vectors) != len(inputs):
+                raise ValueError(
+                    f"Embedding provider returned {len(vectors)} vectors for {len(inputs)} inputs"
+                )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+            
+        usage = result.get('usage', {})
+        lengths = [sum(len(str(text)) for text in request_inputs) for request_inputs, _, _ in batch]
+        total_length = sum(lengths) or 1
+        offset = 0
+        for (request_inputs, future, _), length in zip(batch, lengths):
+            end = offset + len(request_inputs)
+            if not future.done():
+                future.set_result({
+                    **result,
+                    "data": vectors[offset:end],
+                    "usage": {
+                        name: round(value * length / total_length) if isinstance(value, (int, float)) else value
+                        for name, value in usage.items()
+                    }
+                })
+            offset = end
+
+
+# Admission priority lanes, highest first; sessions pick one with metadata["priority"]
+ADMISSION_LANES = ("high", "normal", "low")
+
+
+class AdmissionRejected(Exception):
+    """Raised when admission control turns a provider request away."""
+    
+    def __init__(self, provider_type: str, reason: str, status: int, retry_after: int):
+        super().__init__(f"Provider {provider_type} is saturated ({reason}), retry after {retry_after}s")
+        self.provider_type = provider_type
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmittedStream:
+    """A provider stream holding an admission slot until it ends or is closed.
+    
+    Unlike an async generator, closing it releases the slot even if it was
+    never iterated, e.g. when the client went away before the first delta.
+    """
+    
+    def __init__(self, controller: 'AdmissionController', deltas: AsyncIterator[Dict[str, Any]],
+                 admitted_at: float):
+        self.controller = controller
+        self.deltas = deltas
+        self.admitted_at = admitted_at
+        self._iterator: Optional[AsyncIterator[Dict[str, Any]]] = None
+        self._closed = False
+        
+    def __aiter__(self) -> 'AdmittedStream':
+        return self
+        
+    async def __anext__(self) -> Dict[str, Any]:
+        if self._closed:
+            raise StopAsyncIteration
+        if self._iterator is None:
+            self._iterator = self.deltas.__aiter__()
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            # Exhausted, failed or cancelled: the slot is no longer needed
+            await self.aclose()
+            raise
+            
+    async def aclose(self):
+        """Close the provider stream and release the slot, once."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            aclose = getattr(self.deltas, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+        finally:
+            self.controller.release(self.admitted_at)
+
+
+class AdmissionController:
+    """Bounds the in-flight requests to one provider, with a bounded wait queue.
+    
+    Up to max_concurrency requests run at once. Further requests wait in
+    per-priority FIFO lanes and are admitted highest lane first as slots
+    free up. When the queue holds max_queue requests, a new request
+    displaces the newest waiter of a lower lane, or is rejected with 429
+    if there is none; a request that waits longer than max_wait seconds
+    is rejected with 503. Rejections carry a Retry-After estimate from the
+    moving average of the provider's service time.
+    """
+    
+    def __init__(self, provider_type: str, max_concurrency: int = 32, max_queue: int = 128,
+                 max_wait: float = 30.0):
+        """Initialize the controller.
+        
+        Args:
+            provider_type: Provider type, used in metrics and errors
+            max_concurrency: Maximum admitted requests in flight
+            max_queue: Maximum requests waiting for admission
+            max_wait: Maximum seconds a request waits before it is rejected
+        """
+        self.provider_type = provider_type
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.lanes: List[Deque[asyncio.Future]] = [deque() for _ in ADMISSION_LANES]
+        self.waiting = 0
+        self.service_time = 0.0  # Moving average of seconds a request holds its slot
+        self.wait_time = 0.0     # Moving average of seconds admitted requests waited
+        
+    @staticmethod
+    def lane(priority: Any) -> int:
+        """Index of the lane for a priority name (unknown names use "normal")."""
+        try:
+            return ADMISSION_LANES.index(priority)
+        except ValueError:
+            return ADMISSION_LANES.index("normal")
+            
+    def retry_after(self) -> int:
+        """Estimated seconds until a slot frees up for a new request."""
+        rounds = (self.waiting + 1) / max(1, self.max_concurrency)
+        return max(1, math.ceil(rounds * self.service_time))
+        
+    def _reject(self, reason: str, status: int) -> AdmissionRejected:
+        ADMISSION_REJECTED.labels(self.provider_type, reason).inc()
+        return AdmissionRejected(self.provider_type, reason, status, self.retry_after())
+        
+    def _update_gauges(self):
+        ADMISSION_IN_FLIGHT.labels(self.provider_type).set(self.in_flight)
+        for name, lane in zip(ADMISSION_LANES, self.lanes):
+            ADMISSION_QUEUE_DEPTH.labels(self.provider_type, name).set(len(lane))
+            
+    async def acquire(self, priority: Any = "normal") -> float:
+        """Wait for a slot.
+        
+        Args:
+            priority: Lane name from ADMISSION_LANES
+            
+        Returns:
+            The admission time (time.monotonic()), to pass to release()
+            
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        if self.in_flight < self.max_concurrency and not self.waiting:
+            self.in_flight += 1
+            self._update_gauges()
+            return time.monotonic()
+            
+        lane = self.lane(priority)
+        if self.waiting >= self.max_queue:
+            # Displace the newest waiter of the lowest lane below this one
+            for lower in range(len(self.lanes) - 1, lane, -1):
+                if self.lanes[lower]:
+                    displaced = self.lanes[lower].pop()
+                    self.waiting -= 1
+                    displaced.set_exception(self._reject("displaced", 429))
+                    break
+            else:
+                raise self._reject("queue_full", 429)
+                
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[lane].append(future)
+        self.waiting += 1
+        self._update_gauges()
+        enqueued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Admitted just as the wait timed out
+                self.release(time.monotonic())
+            else:
+                self._withdraw(lane, future)
+            raise self._reject("timeout", 503)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release(time.monotonic())
+            else:
+                self._withdraw(lane, future)
+            raise
+        waited = time.monotonic() - enqueued_at
+        self.wait_time = 0.9 * self.wait_time + 0.1 * waited
+        ADMISSION_WAIT.labels(self.provider_type).set(self.wait_time)
+        return time.monotonic()
+        
+    def _withdraw(self, lane: int, future: asyncio.Future):
+        """Remove a waiter that gave up (bounded by max_queue)."""
+        try:
+            self.lanes[lane].remove(future)
+            self.waiting -= 1
+        except ValueError:
+            pass
+        if not future.done():
+            future.cancel()
+        self._update_gauges()
+        
+    def release(self, admitted_at: float):
+        """Free a slot, handing it to the highest-priority waiter.
+        
+        Args:
+            admitted_at: The time returned by acquire()
+        """
+        self.service_time = 0.9 * self.service_time + 0.1 * (time.monotonic() - admitted_at)
+        for lane in self.lanes:
+            if lane:
+                self.waiting -= 1
+                lane.popleft().set_result(None)
+                break
+        else:
+            self.in_flight -= 1
+        self._update_gauges()
+        
+    def hold(self, deltas: AsyncIterator[Dict[str, Any]], admitted_at: float) -> AdmittedStream:
+        """Relay a provider stream, keeping the slot until it ends or is closed."""
+        return AdmittedStream(self, deltas, admitted_at)
+                
+    def stats(self) -> Dict[str, Any]:
+        """Get the controller's current load."""
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queued": {name: len(lane) for name, lane in zip(ADMISSION_LANES, self.lanes)},
+            "max_queue": self.max_queue,
+            "avg_wait_seconds": self.wait_time,
+            "avg_service_seconds": self.service_time
+        }
+
 
 class UnifiedMCPServer:
     """Unified MCP server implementation integrating multiple capabilities."""
@@ -217,7 +1436,16 @@ class UnifiedMCPServer:
         cors_origins: List[str] = None,
         metrics_port: int = 8081,
         log_level: str = "INFO",
-        model_providers: Dict[str, Callable] = None
+        model_providers: Dict[str, Callable] = None,
+        session_store: Optional[SessionStore] = None,
+        embedding_batch_size: int = 64,
+        embedding_batch_delay: float = 0.005,
+        embedding_cache_size: int = 10000,
+        embedding_cache_path: Optional[str] = None,
+        embedding_cache_dtype: str = "float32",
+        json_dumps: Optional[Callable[[Any], bytes]] = None,
+        compression_min_size: Optional[int] = 1024,
+        admission_limits: Optional[Dict[str, Dict[str, Any]]] = None
     ):
         """Initialize the unified MCP server.
         
@@ -228,6 +1456,17 @@ class UnifiedMCPServer:
             metrics_port: Port for exposing Prometheus metrics
             log_level: Logging level
             model_providers: Dictionary mapping model types to provider functions
+            session_store: Session storage backend (sessions are kept in memory if not provided)
+            embedding_batch_size: Maximum inputs per batched embedding call (1 disables batching)
+            embedding_batch_delay: Maximum seconds an embedding request waits to be batched
+            embedding_cache_size: Embedding vectors cached in memory (0 disables the memory tier)
+            embedding_cache_path: Directory for the on-disk embedding cache tier
+            embedding_cache_dtype: On-disk embedding vector type ("float32" or "float16")
+            json_dumps: Function encoding response data as JSON bytes (dumps_json if not provided)
+            compression_min_size: Smallest response body, in bytes, compressed for
+                clients that accept gzip or br (None disables compression)
+            admission_limits: AdmissionController settings (max_concurrency, max_queue,
+                max_wait) per provider type; unlisted types use the defaults
         """
         # Server configuration
         self.host = host
@@ -244,11 +1483,27 @@ class UnifiedMCPServer:
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         
+        # Response encoding
+        self.json_dumps = json_dumps or dumps_json
+        self.compression_min_size = compression_min_size
+        
         # Application state
-        self.app = web.Application()
+        self.app = web.Application(middlewares=[self.compression_middleware])
         self.metrics_app = web.Application()
-        self.session_manager = MCPSessionManager()
+        self.session_manager = MCPSessionManager(store=session_store)
         self.model_providers = model_providers or {}
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_batch_delay = embedding_batch_delay
+        self.embedding_dispatcher: Optional[EmbeddingDispatcher] = None
+        self.admission_limits = admission_limits or {}
+        self.admission: Dict[str, AdmissionController] = {}
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if embedding_cache_size > 0 or embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(
+                max_entries=embedding_cache_size,
+                path=embedding_cache_path,
+                dtype=embedding_cache_dtype
+            )
         self.start_time = datetime.datetime.now()
         
         # Setup server
@@ -300,6 +1555,9 @@ class UnifiedMCPServer:
                     process = psutil.Process(os.getpid())
                     memory_info = process.memory_info()
                     MEMORY_USAGE.set(memory_info.rss)
+                    for provider_type, stats in self.provider_pool_stats().items():
+                        for state, value in stats.items():
+                            PROVIDER_POOL.labels(provider_type, state).set(value)
                     await asyncio.sleep(15)
                 except asyncio.CancelledError:
                     break
@@ -331,9 +1589,37 @@ class UnifiedMCPServer:
         return runner, metrics_runner
         
     async def stop(self):
-        """Stop the MCP server."""
+        """Stop the MCP server and close provider connection pools."""
         await self.session_manager.stop()
         
+        # Several provider types may share one provider instance; close each once
+        closed = set()
+        for provider_type, provider_func in self.model_providers.items():
+            close = getattr(provider_func, 'close', None)
+            if close is None or close in closed:
+                continue
+            closed.add(close)
+            try:
+                await close()
+            except Exception as e:
+                logger.error(f"Error closing provider {provider_type}: {e}")
+                
+    def provider_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get connection pool statistics from providers that report them.
+        
+        Returns:
+            Dictionary mapping provider types to their pool statistics
+        """
+        stats = {}
+        for provider_type, provider_func in self.model_providers.items():
+            pool_stats = getattr(provider_func, 'pool_stats', None)
+            if pool_stats is not None:
+                try:
+                    stats[provider_type] = pool_stats()
+                except Exception as e:
+                    logger.error(f"Error reading pool stats for {provider_type}: {e}")
+        return stats
+        
     def register_model_provider(self, model_type: str, provider_func: Callable):
         """Register a model provider function.
         
@@ -350,25 +1636,36 @@ class UnifiedMCPServer:
         try:
             return await handler(request)
         except web.HTTPException as ex:
-            return web.json_response({
-                "status": MCP_STATUS_ERROR,
-                "error": {
-                    "type": ex.__class__.__name__,
-                    "message": str(ex),
-                    "code": ex.status
-                }
-            }, status=ex.status)
+            return self._error_response(str(ex), ex.__class__.__name__, ex.status)
         except Exception as e:
             logger.exception("Unexpected error")
-            return web.json_response({
-                "status": MCP_STATUS_ERROR,
-                "error": {
-                    "type": "InternalServerError",
-                    "message": str(e),
-                    "code": 500
-                }
-            }, status=500)
+            return self._error_response(str(e), "InternalServerError", 500)
             
+    @web.middleware
+    async def compression_middleware(self, request, handler):
+        """Middleware compressing large response bodies for clients that accept it."""
+        response = await handler(request)
+        body = response.body if type(response) is web.Response else None
+        if not isinstance(body, (bytes, bytearray)) or 'Content-Encoding' in response.headers:
+            return response
+        RESPONSE_BYTES.labels('raw').inc(len(body))
+        encoding = None
+        if self.compression_min_size is not None and len(body) >= self.compression_min_size:
+            encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is not None:
+            if len(body) > 1024 * 1024:
+                # Keep the event loop responsive while large bodies are compressed
+                body = await asyncio.get_running_loop().run_in_executor(
+                    None, compress_body, body, encoding
+                )
+            else:
+                body = compress_body(body, encoding)
+            response.body = body
+            response.headers['Content-Encoding'] = encoding
+            response.headers['Vary'] = 'Accept-Encoding'
+        RESPONSE_BYTES.labels('sent').inc(len(body))
+        return response
+        
     def _generate_response(self, data: Dict[str, Any], status_code: int = 200) -> web.Response:
         """Generate a consistent JSON response.
         
@@ -384,7 +1681,11 @@ class UnifiedMCPServer:
             **data,
             "timestamp": datetime.datetime.now().isoformat()
         }
-        return web.json_response(response_data, status=status_code)
+        return web.Response(
+            body=self.json_dumps(response_data),
+            status=status_code,
+            content_type='application/json'
+        )
         
     def _error_response(
         self, 
@@ -402,15 +1703,19 @@ class UnifiedMCPServer:
         Returns:
             JSON error response
         """
-        return web.json_response({
-            "status": MCP_STATUS_ERROR,
-            "error": {
-                "type": error_type,
-                "message": message,
-                "code": status_code
-            },
-            "timestamp": datetime.datetime.now().isoformat()
-        }, status=status_code)
+        return web.Response(
+            body=self.json_dumps({
+                "status": MCP_STATUS_ERROR,
+                "error": {
+                    "type": error_type,
+                    "message": message,
+                    "code": status_code
+                },
+                "timestamp": datetime.datetime.now().isoformat()
+            }),
+            status=status_code,
+            content_type='application/json'
+        )
         
     # API Route handlers
     async def create_session(self, request: web.Request) -> web.Response:
@@ -431,15 +1736,15 @@ class UnifiedMCPServer:
             ttl = int(data.get('ttl', 3600))
             session_id = data.get('session_id')
             
-            session = self.session_manager.create_session(session_id=session_id, ttl=ttl)
-            
-            # Apply initial context if provided
-            if 'context' in data and isinstance(data['context'], dict):
-                session.context.update(data['context'])
-                
-            # Apply metadata if provided
-            if 'metadata' in data and isinstance(data['metadata'], dict):
-                session.metadata.update(data['metadata'])
+            # Apply initial context and metadata if provided
+            context = data.get('context')
+            metadata = data.get('metadata')
+            session = self.session_manager.create_session(
+                session_id=session_id,
+                ttl=ttl,
+                context=context if isinstance(context, dict) else None,
+                metadata=metadata if isinstance(metadata, dict) else None
+            )
                 
             REQUEST_COUNT.labels('/api/v1/session', 'success').inc()
             return self._generate_response({
@@ -544,49 +1849,82 @@ class UnifiedMCPServer:
             # Enrich request with session context
             enriched_request = {
                 **data,
-                "session_context": session.context
+                "session_context": session.plain_context()
             }
             
             # Process the completion
+            endpoint = '/api/v1/session/{session_id}/complete'
+            record = functools.partial(self._record_completion, session, data, model)
             try:
                 start_time = time.time()
-                completion_result = await self.model_providers['completion'](enriched_request)
-                processing_time = time.time() - start_time
-                
-                # Update metrics
-                MODEL_TOKENS_PROCESSED.labels(model, 'completion').inc(
-                    completion_result.get('usage', {}).get('total_tokens', 0)
+                completion_result = await self._call_provider(
+                    'completion', enriched_request, session.metadata.get('priority', 'normal')
                 )
                 
-                # Add to session history
-                history_entry = {
-                    "type": "completion",
-                    "request": data,
-                    "response": completion_result,
-                    "processing_time": processing_time
-                }
-                session.add_to_history(history_entry)
-                
-                # Update context with completion result if requested
-                if data.get('update_context', False):
-                    context_updates = completion_result.get('context_updates', {})
-                    if context_updates:
-                        session.context.update(context_updates)
+                if data.get('stream', False):
+                    return await self._stream_response(
+                        request, endpoint, completion_result, start_time, record, "CompletionError"
+                    )
+                if is_stream(completion_result):
+                    completion_result = await collect_stream(completion_result)
+                processing_time = time.time() - start_time
+                TIME_TO_FIRST_TOKEN.labels(endpoint, 'full').observe(processing_time)
+                record(completion_result, processing_time)
                         
-                REQUEST_COUNT.labels('/api/v1/session/{session_id}/complete', 'success').inc()
+                REQUEST_COUNT.labels(endpoint, 'success').inc()
                 return self._generate_response({
                     "result": completion_result,
                     "processing_time": processing_time
                 })
                 
+            except AdmissionRejected as e:
+                return self._rejection_response(endpoint, e)
             except Exception as e:
                 logger.exception("Error processing completion")
-                REQUEST_COUNT.labels('/api/v1/session/{session_id}/complete', 'error').inc()
+                REQUEST_COUNT.labels(endpoint, 'error').inc()
                 return self._error_response(
                     f"Error processing completion: {str(e)}",
                     "CompletionError",
                     500
                 )
+
+    def _record_completion(
+        self,
+        session: MCPSession,
+        data: Dict[str, Any],
+        model: str,
+        completion_result: Dict[str, Any],
+        processing_time: float
+    ):
+        """Record a finished completion in metrics and the session.
+        
+        Args:
+            session: The session the completion ran in
+            data: The completion request
+            model: The requested model
+            completion_result: The provider's (merged) result
+            processing_time: Seconds taken by the provider
+        """
+        # Update metrics
+        MODEL_TOKENS_PROCESSED.labels(model, 'completion').inc(
+            completion_result.get('usage', {}).get('total_tokens', 0)
+        )
+        
+        # Add to session history
+        history_entry = {
+            "type": "completion",
+            "request": data,
+            "response": completion_result,
+            "processing_time": processing_time
+        }
+        self.session_manager.add_to_history(session, history_entry)
+        
+        # Update context with completion result if requested
+        if data.get('update_context', False):
+            context_updates = completion_result.get('context_updates', {})
+            if context_updates:
+                session.context.update(context_updates)
+                self.session_manager.save_session(session)
                 
     async def chat(self, request: web.Request) -> web.Response:
         """Handle a chat request.
@@ -633,9 +1971,10 @@ class UnifiedMCPServer:
                 
             # Get previous messages from history if this is a continuing conversation
             if data.get('continue_conversation', False) and 'chat_history' in session.context:
-                # Prepend previous messages from context, respecting max history if specified
-                max_history = data.get('max_history', 10)
-                history_messages = session.context.get('chat_history', [])[-max_history:]
+                # Prepend the newest previous messages within the message and token limits
+                history_messages = session.get_chat_history().recent(
+                    data.get('max_history', 10), data.get('max_history_tokens')
+                )
                 
                 # Only add history if it's not empty
                 if history_messages:
@@ -644,64 +1983,236 @@ class UnifiedMCPServer:
             # Enrich request with session context
             enriched_request = {
                 **data,
-                "session_context": session.context
+                "session_context": session.plain_context()
             }
             
             # Process the chat request
+            endpoint = '/api/v1/session/{session_id}/chat'
+            record = functools.partial(self._record_chat, session, data, model)
             try:
                 start_time = time.time()
-                chat_result = await self.model_providers['chat'](enriched_request)
-                processing_time = time.time() - start_time
-                
-                # Update metrics
-                MODEL_TOKENS_PROCESSED.labels(model, 'chat').inc(
-                    chat_result.get('usage', {}).get('total_tokens', 0)
+                chat_result = await self._call_provider(
+                    'chat', enriched_request, session.metadata.get('priority', 'normal')
                 )
                 
-                # Add to session history
-                history_entry = {
-                    "type": "chat",
-                    "request": data,
-                    "response": chat_result,
-                    "processing_time": processing_time
-                }
-                session.add_to_history(history_entry)
-                
-                # Update context with chat history if requested
-                if data.get('update_context', True):
-                    # Initialize chat history if it doesn't exist
-                    if 'chat_history' not in session.context:
-                        session.context['chat_history'] = []
-                        
-                    # Add the new message exchanges to history
-                    for message in data['messages']:
-                        # Only add messages that aren't already in history
-                        if message not in session.context['chat_history']:
-                            session.context['chat_history'].append(message)
-                            
-                    # Add the response to history
-                    if 'message' in chat_result:
-                        session.context['chat_history'].append(chat_result['message'])
-                        
-                    # Trim history if it's too long
-                    max_history_size = data.get('max_history_size', 50)
-                    if len(session.context['chat_history']) > max_history_size:
-                        session.context['chat_history'] = session.context['chat_history'][-max_history_size:]
+                if data.get('stream', False):
+                    return await self._stream_response(
+                        request, endpoint, chat_result, start_time, record, "ChatError"
+                    )
+                if is_stream(chat_result):
+                    chat_result = await collect_stream(chat_result)
+                processing_time = time.time() - start_time
+                TIME_TO_FIRST_TOKEN.labels(endpoint, 'full').observe(processing_time)
+                record(chat_result, processing_time)
                         
-                REQUEST_COUNT.labels('/api/v1/session/{session_id}/chat', 'success').inc()
+                REQUEST_COUNT.labels(endpoint, 'success').inc()
                 return self._generate_response({
                     "result": chat_result,
                     "processing_time": processing_time
                 })
                 
+            except AdmissionRejected as e:
+                return self._rejection_response(endpoint, e)
             except Exception as e:
                 logger.exception("Error processing chat")
-                REQUEST_COUNT.labels('/api/v1/session/{session_id}/chat', 'error').inc()
+                REQUEST_COUNT.labels(endpoint, 'error').inc()
                 return self._error_response(
                     f"Error processing chat: {str(e)}",
                     "ChatError",
                     500
                 )
+
+    def _record_chat(
+        self,
+        session: MCPSession,
+        data: Dict[str, Any],
+        model: str,
+        chat_result: Dict[str, Any],
+        processing_time: float
+    ):
+        """Record a finished chat exchange in metrics, history and chat_history.
+        
+        Args:
+            session: The session the chat ran in
+            data: The chat request, with any prepended history messages
+            model: The requested model
+            chat_result: The provider's (merged) result
+            processing_time: Seconds taken by the provider
+        """
+        # Update metrics
+        MODEL_TOKENS_PROCESSED.labels(model, 'chat').inc(
+            chat_result.get('usage', {}).get('total_tokens', 0)
+        )
+        
+        # Add to session history
+        history_entry = {
+            "type": "chat",
+            "request": data,
+            "response": chat_result,
+            "processing_time": processing_time
+        }
+        self.session_manager.add_to_history(session, history_entry)
+        
+        # Update context with chat history if requested
+        if data.get('update_context', True):
+            chat_history = session.get_chat_history()
+                
+            # Add the new message exchanges to history, skipping messages already in it
+            for message in data['messages']:
+                chat_history.add_new(message)
+                    
+            # Add the response to history
+            if 'message' in chat_result:
+                chat_history.append(chat_result['message'])
+                
+            # Trim history to the message and token limits
+            chat_history.trim(data.get('max_history_size', 50), data.get('max_history_size_tokens'))
+            self.session_manager.save_session(session)
+
+    def _admission(self, provider_type: str) -> AdmissionController:
+        """Get the admission controller for a provider type, creating it on first use."""
+        controller = self.admission.get(provider_type)
+        if controller is None:
+            controller = AdmissionController(provider_type, **self.admission_limits.get(provider_type, {}))
+            self.admission[provider_type] = controller
+        return controller
+        
+    async def _call_provider(
+        self,
+        provider_type: str,
+        provider_request: Dict[str, Any],
+        priority: Any = "normal"
+    ) -> Any:
+        """Call a model provider once admission control grants a slot.
+        
+        Providers may be coroutines returning a result dict, or return an
+        async iterator of result deltas (see merge_delta); a stream keeps
+        its slot until it is exhausted or closed.
+        
+        Args:
+            provider_type: The type of provider to call
+            provider_request: The enriched request
+            priority: Admission lane (see ADMISSION_LANES)
+            
+        Returns:
+            The result dict or the async iterator of deltas
+            
+        Raises:
+            AdmissionRejected: If the provider is saturated
+        """
+        controller = self._admission(provider_type)
+        admitted_at = await controller.acquire(priority)
+        try:
+            result = await self._invoke_provider(provider_type, provider_request)
+        except BaseException:
+            controller.release(admitted_at)
+            raise
+        if is_stream(result):
+            return controller.hold(result, admitted_at)
+        controller.release(admitted_at)
+        return result
+        
+    async def _invoke_provider(self, provider_type: str, provider_request: Dict[str, Any]) -> Any:
+        """Call a model provider directly, without admission control."""
+        result = self.model_providers[provider_type](provider_request)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+        
+    def _rejection_response(self, endpoint: str, rejection: AdmissionRejected) -> web.Response:
+        """Build the 429/503 response for a request turned away by admission control."""
+        REQUEST_COUNT.labels(endpoint, 'rejected').inc()
+        response = self._error_response(str(rejection), "ProviderSaturated", rejection.status)
+        response.headers['Retry-After'] = str(rejection.retry_after)
+        return response
+
+    def _stream_event(self, event: str, payload: Dict[str, Any], sse: bool) -> bytes:
+        """Encode a stream event as an SSE event or an NDJSON line."""
+        if sse:
+            return b"event: " + event.encode() + b"\ndata: " + self.json_dumps(payload) + b"\n\n"
+        return self.json_dumps({"type": event, **payload}) + b"\n"
+
+    async def _stream_response(
+        self,
+        request: web.Request,
+        endpoint: str,
+        result: Any,
+        start_time: float,
+        record: Callable[[Dict[str, Any], float], None],
+        error_type: str
+    ) -> web.StreamResponse:
+        """Relay a provider's deltas to the client as they are produced.
+        
+        Sends server-sent events when the client accepts text/event-stream
+        and chunked NDJSON otherwise: a "delta" event per provider delta,
+        then a "done" event with the merged result, or an "error" event.
+        The merged result is recorded in the session once the stream
+        completes.
+        
+        Args:
+            request: HTTP request
+            endpoint: Endpoint label for metrics
+            result: Provider result dict or async iterator of deltas
+            start_time: Time the provider was called
+            record: Callback recording the merged result and processing time
+            error_type: Error type reported if the provider fails
+            
+        Returns:
+            The streamed response
+        """
+        sse = 'text/event-stream' in request.headers.get('Accept', '')
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream" if sse else "application/x-ndjson",
+            "Cache-Control": "no-cache"
+        })
+        response.enable_chunked_encoding()
+        
+        async def single_delta():
+            yield result
+            
+        deltas = result if is_stream(result) else single_delta()
+        merged: Dict[str, Any] = {}
+        first = True
+        try:
+            # Inside the try, so the stream (and its admission slot) is
+            # closed if the client is already gone
+            await response.prepare(request)
+            async for delta in deltas:
+                if first:
+                    TIME_TO_FIRST_TOKEN.labels(endpoint, 'stream').observe(time.time() - start_time)
+                    first = False
+                merge_delta(merged, delta)
+                await response.write(self._stream_event("delta", {"delta": delta}, sse))
+            processing_time = time.time() - start_time
+            record(merged, processing_time)
+            await response.write(self._stream_event("done", {
+                "status": MCP_STATUS_SUCCESS,
+                "result": merged,
+                "processing_time": processing_time,
+                "timestamp": datetime.datetime.now().isoformat()
+            }, sse))
+            REQUEST_COUNT.labels(endpoint, 'success').inc()
+        except ConnectionResetError:
+            logger.info(f"Client disconnected during stream on {endpoint}")
+            REQUEST_COUNT.labels(endpoint, 'error').inc()
+            return response
+        except Exception as e:
+            if not response.prepared:
+                # Nothing was sent yet; the caller answers with a plain error
+                raise
+            logger.exception(f"Error streaming {endpoint}")
+            REQUEST_COUNT.labels(endpoint, 'error').inc()
+            await response.write(self._stream_event("error", {
+                "status": MCP_STATUS_ERROR,
+                "error": {"type": error_type, "message": str(e), "code": 500},
+                "timestamp": datetime.datetime.now().isoformat()
+            }, sse))
+        finally:
+            aclose = getattr(deltas, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+        await response.write_eof()
+        return response
                 
     async def embedding(self, request: web.Request) -> web.Response:
         """Handle an embedding request.
@@ -735,6 +2246,16 @@ class UnifiedMCPServer:
                 REQUEST_COUNT.labels('/api/v1/session/{session_id}/embedding', 'error').inc()
                 return self._error_response("Missing required field: input")
                 
+            encoding_format = data.get('encoding_format')
+            if encoding_format is None:
+                accepts_binary = 'application/octet-stream' in request.headers.get('Accept', '')
+                encoding_format = 'binary' if accepts_binary else 'float'
+            if encoding_format not in EMBEDDING_FORMATS:
+                REQUEST_COUNT.labels('/api/v1/session/{session_id}/embedding', 'error').inc()
+                return self._error_response(
+                    f"Invalid encoding_format: {encoding_format} (expected one of {', '.join(EMBEDDING_FORMATS)})"
+                )
+                
             model = data.get('model', 'default')
             
             # Check if we have a provider for embeddings
@@ -749,19 +2270,29 @@ class UnifiedMCPServer:
             # Enrich request with session context
             enriched_request = {
                 **data,
-                "session_context": session.context
+                "session_context": session.plain_context()
             }
             
-            # Process the embedding request
+            # Process the embedding request; admission covers the whole request since
+            # cache lookups and batching decide what reaches the provider
+            endpoint = '/api/v1/session/{session_id}/embedding'
             try:
                 start_time = time.time()
-                embedding_result = await self.model_providers['embedding'](enriched_request)
+                controller = self._admission('embedding')
+                admitted_at = await controller.acquire(session.metadata.get('priority', 'normal'))
+                try:
+                    embedding_result = await self._embed(enriched_request)
+                finally:
+                    controller.release(admitted_at)
                 processing_time = time.time() - start_time
                 
-                # Update metrics
+                # Update metrics (usage only covers inputs sent to the provider)
                 MODEL_TOKENS_PROCESSED.labels(model, 'embedding').inc(
                     embedding_result.get('usage', {}).get('total_tokens', 0)
                 )
+                MODEL_TOKENS_PROCESSED.labels(model, 'embedding_cache_hit').inc(
+                    embedding_result.get('cache', {}).get('cached_tokens', 0)
+                )
                 
                 # Add to session history
                 history_entry = {
@@ -774,7 +2305,7 @@ class UnifiedMCPServer:
                     },
                     "processing_time": processing_time
                 }
-                session.add_to_history(history_entry)
+                self.session_manager.add_to_history(session, history_entry)
                 
                 # Store embeddings in context if requested
                 if data.get('store_in_context', False) and 'data' in embedding_result:
@@ -790,13 +2321,14 @@ class UnifiedMCPServer:
                         "model": model,
                         "timestamp": datetime.datetime.now().isoformat()
                     })
+                    self.session_manager.save_session(session)
                     
+                response = self._embedding_response(embedding_result, encoding_format, processing_time)
                 REQUEST_COUNT.labels('/api/v1/session/{session_id}/embedding', 'success').inc()
-                return self._generate_response({
-                    "result": embedding_result,
-                    "processing_time": processing_time
-                })
+                return response
                 
+            except AdmissionRejected as e:
+                return self._rejection_response(endpoint, e)
             except Exception as e:
                 logger.exception("Error processing embedding")
                 REQUEST_COUNT.labels('/api/v1/session/{session_id}/embedding', 'error').inc()
@@ -806,6 +2338,134 @@ class UnifiedMCPServer:
                     500
                 )
                 
+    def _embedding_response(
+        self,
+        embedding_result: Dict[str, Any],
+        encoding_format: str,
+        processing_time: float
+    ) -> web.Response:
+        """Encode an embedding result in the requested format.
+        
+        "float" returns the vectors as JSON numbers and "base64" as base64
+        strings of little-endian float32 values. "binary" returns the
+        vectors as one row-major little-endian float32 matrix in an
+        application/octet-stream body, with the count, dimensions, model,
+        usage and processing time in X-MCP-* headers.
+        
+        Args:
+            embedding_result: The embedding result
+            encoding_format: One of EMBEDDING_FORMATS
+            processing_time: Seconds taken to embed the inputs
+            
+        Returns:
+            The HTTP response
+        """
+        vectors = embedding_result.get('data', [])
+        if encoding_format == 'binary':
+            body, dimensions = pack_float32(vectors)
+            return web.Response(body=body, content_type='application/octet-stream', headers={
+                "X-MCP-Embedding-Count": str(len(vectors)),
+                "X-MCP-Embedding-Dimensions": str(dimensions),
+                "X-MCP-Embedding-Model": str(embedding_result.get('model', '')),
+                "X-MCP-Usage": json.dumps(embedding_result.get('usage', {})),
+                "X-MCP-Processing-Time": str(processing_time)
+            })
+        if encoding_format == 'base64':
+            embedding_result = {
+                **embedding_result,
+                "data": [base64.b64encode(pack_float32([vector])[0]).decode() for vector in vectors],
+                "encoding_format": "base64"
+            }
+        return self._generate_response({
+            "result": embedding_result,
+            "processing_time": processing_time
+        })
+        
+    async def _embed(self, embedding_request: Dict[str, Any]) -> Dict[str, Any]:
+        """Embed a request's inputs, serving what it can from the cache.
+        
+        Only inputs missing from the cache (each distinct one once) are sent
+        to the provider. The result's usage covers those inputs; its "cache"
+        entry counts hits, misses and the tokens the hits originally cost.
+        
+        Args:
+            embedding_request: The enriched embedding request
+            
+        Returns:
+            The embedding result for the request's inputs
+        """
+        cache = self.embedding_cache
+        if cache is None:
+            return await self._embed_uncached(embedding_request)
+            
+        inputs = embedding_request['input']
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        params = embedding_params(embedding_request)
+        namespace = json.dumps(params, sort_keys=True, default=str)
+        model = params.get('model', 'default')
+        
+        vectors: List[Any] = [None] * len(texts)
+        cached_tokens = 0
+        missing: Dict[bytes, List[int]] = {}
+        for position, text in enumerate(texts):
+            digest = cache.digest(text)
+            entry = cache.get(namespace, digest)
+            if entry is None:
+                missing.setdefault(digest, []).append(position)
+            else:
+                vectors[position] = entry[0]
+                cached_tokens += entry[1]
+        hits = len(texts) - sum(len(positions) for positions in missing.values())
+        EMBEDDING_CACHE_LOOKUPS.labels(model, 'hit').inc(hits)
+        EMBEDDING_CACHE_LOOKUPS.labels(model, 'miss').inc(len(texts) - hits)
+        
+        if missing:
+            miss_texts = [texts[positions[0]] for positions in missing.values()]
+            result = await self._embed_uncached({**embedding_request, "input": miss_texts})
+            miss_vectors = result.get('data', [])
+            if len(miss_vectors) != len(miss_texts):
+                raise ValueError(
+                    f"Embedding provider returned {len(miss_vectors)} vectors for {len(miss_texts)} inputs"
+                )
+            # Attribute the provider's tokens to inputs in proportion to their length
+            total_tokens = result.get('usage', {}).get('total_tokens', 0)
+            lengths = [len(str(text)) for text in miss_texts]
+            total_length = sum(lengths) or 1
+            entries = []
+            for (digest, positions), vector, length in zip(missing.items(), miss_vectors, lengths):
+                entries.append((digest, vector, round(total_tokens * length / total_length)))
+                for position in positions:
+                    vectors[position] = vector
+            cache.put_many(namespace, entries)
+        else:
+            result = {"model": embedding_request.get('model'), "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+            
+        return {
+            **result,
+            "data": vectors,
+            "cache": {"hits": hits, "misses": len(missing), "cached_tokens": cached_tokens}
+        }
+        
+    async def _embed_uncached(self, embedding_request: Dict[str, Any]) -> Dict[str, Any]:
+        """Send an embedding request to the provider, batched when enabled.
+        
+        Args:
+            embedding_request: The enriched embedding request
+            
+        Returns:
+            The provider result for the request's inputs
+        """
+        provider = self.model_providers['embedding']
+        if self.embedding_batch_size <= 1:
+            return await self._invoke_provider('embedding', embedding_request)
+        if self.embedding_dispatcher is None or self.embedding_dispatcher.provider is not provider:
+            self.embedding_dispatcher = EmbeddingDispatcher(
+                provider,
+                max_batch_size=self.embedding_batch_size,
+                max_delay=self.embedding_batch_delay
+            )
+        return await self.embedding_dispatcher.embed(embedding_request)
+            
     async def list_models(self, request: web.Request) -> web.Response:
         """List available models.
         
@@ -861,7 +2521,7 @@ class UnifiedMCPServer:
                     "formatted": str(uptime)
                 },
                 "sessions": {
-                    "active": len(self.session_manager.sessions)
+                    "active": len(self.session_manager)
                 },
                 "system": {
                     "memory_usage": {
@@ -872,7 +2532,12 @@ class UnifiedMCPServer:
                     "platform": platform.platform(),
                     "python_version": platform.python_version()
                 },
-                "providers": list(self.model_providers.keys())
+                "providers": list(self.model_providers.keys()),
+                "provider_pools": self.provider_pool_stats(),
+                "admission": {
+                    provider_type: controller.stats()
+                    for provider_type, controller in self.admission.items()
+                }
             }
             
             REQUEST_COUNT.labels('/api/v1/status', 'success').inc()
@@ -919,14 +2584,18 @@ class MCPModelProvider:
         return {"error": "Not implemented"}
         
     @staticmethod
-    async def __call__(request: Dict[str, Any]) -> Dict[str, Any]:
+    async def __call__(request: Dict[str, Any]) -> Union[Dict[str, Any], AsyncIterator[Dict[str, Any]]]:
         """Process a model request.
         
+        Chat and completion providers may instead return an async iterator
+        of partial results, which the server relays to streaming clients
+        and merges with merge_delta.
+        
         Args:
             request: Model request data
             
         Returns:
-            Dictionary with model response
+            Dictionary with model response, or an async iterator of deltas
         """
         raise NotImplementedError("Model providers must implement __call__")
 
@@ -937,7 +2606,8 @@ async def run_server(
     port: int = 8080,
     metrics_port: int = 8081,
     log_level: str = "INFO",
-    model_providers: Dict[str, Callable] = None
+    model_providers: Dict[str, Callable] = None,
+    session_store: Optional[SessionStore] = None
 ):
     """Run the MCP server.
     
@@ -947,13 +2617,15 @@ async def run_server(
         metrics_port: Port for metrics server
         log_level: Logging level
         model_providers: Model provider functions
+        session_store: Session storage backend (in memory if not provided)
     """
     server = UnifiedMCPServer(
         host=host,
         port=port,
         metrics_port=metrics_port,
         log_level=log_level,
-        model_providers=model_providers
+        model_providers=model_providers,
+        session_store=session_store
     )
     
     runner, metrics_runner = await server.start()